@@ -31,7 +31,7 @@ bootstrap_django(__file__)
 import nav.logs
 
 from nav.models.manage import Cam
-from nav.event import Event
+from nav.event import Event, EventQ
 from nav.web.macwatch.models import MacWatch
 from nav.web.macwatch.models import MacWatchMatch
 
@@ -76,8 +76,8 @@ def prioritize_location(cam_objects, logger):
     return prioritized_cams.get(rank)
 
 
-def post_event(mac_watch, cam, logger):
-    """Post an event on the event-queue, obviously..."""
+def make_event(mac_watch, cam):
+    """Make an event for a mac-address that has moved or appeared"""
     source = "macwatch"
     target = "eventEngine"
     eventtypeid = "info"
@@ -95,12 +95,32 @@ def post_event(mac_watch, cam, logger):
     event['mac'] = cam.mac
     event['macwatch-mac'] = mac_watch.mac
     event['alerttype'] = 'macWarning'
+    return event
+
+
+def post_events(events, logger):
+    """Post all events on the event-queue in one go.  If that fails, the
+    events are posted one by one, so that a single bad event cannot prevent
+    the others from being posted.
+
+    :returns: The number of events that were posted.
+    """
     try:
-        event.post()
-    except Exception as why:
-        logger.exception("Unhandled exception while posting event")
-        return False
-    return True
+        return EventQ.post_events(events)
+    except Exception:
+        logger.warning("Failed to post %d events in one go, posting them "
+                       "one by one", len(events), exc_info=True)
+
+    posted = 0
+    for event in events:
+        try:
+            event.post()
+        except Exception:
+            logger.exception("Unhandled exception while posting event %r",
+                             event)
+        else:
+            posted += 1
+    return posted
 
 
 def find_the_latest(macwatch_matches):
@@ -136,6 +156,9 @@ def main():
     logger.info("--> Starting macwatch <--")
 
     # For each active macwatch entry, check if mac is active and post event.
+    # Events and their matches are collected and posted at the end.
+    events = []
+    new_matches = []
     for mac_watch in MacWatch.objects.all():
         logger.info("Checking for activity on %s", mac_watch.mac)
 
@@ -187,15 +210,26 @@ def main():
                 # Mac has moved (or appeared). Post event on eventq
                 logger.info("%s has appeared on %s (%s:%s)",
                             cam.mac, cam.sysname, cam.module, cam.port)
-                if post_event(mac_watch, cam, logger):
-                    logger.info("Event posted for macwatch = %s", mac_watch.id)
-                    new_macwatch_match = MacWatchMatch(macwatch=mac_watch,
-                                                       cam=cam,
-                                                       posted=datetime.now())
-                    new_macwatch_match.save()
-                else:
-                    logger.warning("Failed to post event, no alert will be "
-                                   "given.")
+                events.append(make_event(mac_watch, cam))
+                new_matches.append(MacWatchMatch(macwatch=mac_watch, cam=cam))
+
+    if events:
+        posted = post_events(events, logger)
+        if posted < len(events):
+            logger.warning("Failed to post %d of %d events, no alerts will "
+                           "be given for these.", len(events) - posted,
+                           len(events))
+        # Only record matches whose events were actually posted, so that the
+        # others are retried on the next run
+        posted_matches = [match for event, match in zip(events, new_matches)
+                          if event.eventqid]
+        if posted_matches:
+            logger.info("%d events posted for macwatches = %s",
+                        len(posted_matches),
+                        sorted(set(m.macwatch.id for m in posted_matches)))
+        for new_macwatch_match in posted_matches:
+            new_macwatch_match.posted = datetime.now()
+            new_macwatch_match.save()
 
     logger.info("--> Done checking for macs in %s seconds <--", time.clock())
 
@@ -34,6 +34,8 @@ from nav.config import NAV_CONFIG, NAVConfigParser
 import nav.buildconf
 from nav.snmptrapd.plugin import load_handler_modules, ModuleLoadError
 from nav.snmptrapd.trap import SNMPTrap
+from nav.snmptrapd.pipeline import TrapPipeline
+from nav.snmptrapd import lookup
 from nav.util import is_valid_ip, address_to_string
 from nav.db import getConnection
 from nav.bootstrap import bootstrap_django
@@ -49,6 +51,7 @@ _logger = logging.getLogger('nav.snmptrapd')
 _traplogger = logging.getLogger('nav.snmptrapd.traplog')
 handlermodules = None
 config = None
+STOP_TIMEOUT = 10  # seconds
 
 DEFAULT_PORT = 162
 DEFAULT_ADDRESSES = (
@@ -146,22 +149,53 @@ def main():
         signal.signal(signal.SIGTERM, signal_handler)
 
         _logger.info("Snmptrapd started, listening on %s", addresses_text)
+        pipeline = make_pipeline()
         try:
-            server.listen(opts.community, trap_handler)
+            server.listen(opts.community, pipeline.put)
         except SystemExit:
             raise
         except Exception as why:
             _logger.critical("Fatal exception ocurred", exc_info=True)
+        finally:
+            pipeline.stop(STOP_TIMEOUT)
 
     else:
         daemon.writepidfile(pidfile)
+        pipeline = make_pipeline()
         # Start listening and exit cleanly if interrupted.
         try:
             _logger.info("Listening on %s", addresses_text)
-            server.listen(opts.community, trap_handler)
+            server.listen(opts.community, pipeline.put)
         except KeyboardInterrupt as why:
             _logger.error("Received keyboard interrupt, exiting.")
             server.close()
+        finally:
+            pipeline.stop(STOP_TIMEOUT)
+
+
+def make_pipeline():
+    """Creates and starts a pipeline of trap handler workers, as configured
+    in snmptrapd.conf, along with the invalidation of the handlers' shared
+    lookup caches.
+
+    Must be called after daemonizing, as the threads would not survive the
+    fork.
+    """
+    lookup.configure(
+        max_size=config.getint('snmptrapd', 'lookup_cache_size'),
+        ttl=config.getint('snmptrapd', 'lookup_cache_ttl'),
+    )
+    lookup.ChangeListener().start()
+
+    pipeline = TrapPipeline(
+        trap_handler,
+        workers=config.getint('snmptrapd', 'workers'),
+        queue_size=config.getint('snmptrapd', 'queue_size'),
+        batch_size=config.getint('snmptrapd', 'batch_size'),
+        stats_interval=config.getint('snmptrapd', 'stats_interval'),
+    )
+    pipeline.start()
+    return pipeline
 
 
 def parse_args():
@@ -199,7 +233,7 @@ def Address(address):
 
 
 def trap_handler(trap):
-    """Handles a trap.
+    """Handles a trap.  Runs in one of the trap pipeline's worker threads.
 
     :type trap: SNMPTrap
 
@@ -229,7 +263,8 @@ def trap_handler(trap):
             )
         # Assuming that the handler used the same connection as this
         # function, we rollback any uncommitted changes.  This is to
-        # avoid idling in transactions.
+        # avoid idling in transactions.  Connections are per thread, so this
+        # will not affect the other trap handler workers.
         connection.rollback()
 
     _log_trap_handle_result(handled_by, trap)
@@ -284,6 +319,15 @@ def signal_handler(signum, _):
 
 class SnmptrapdConfig(NAVConfigParser):
     """Configparser for snmptrapd"""
+    DEFAULT_CONFIG = u"""
+[snmptrapd]
+workers = 4
+queue_size = 10000
+batch_size = 100
+stats_interval = 300
+lookup_cache_size = 10000
+lookup_cache_ttl = 300
+"""
     DEFAULT_CONFIG_FILES = ['snmptrapd.conf']
 
 
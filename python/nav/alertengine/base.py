@@ -25,10 +25,16 @@ from datetime import datetime
 from django.db import transaction, reset_queries
 from django.utils.lru_cache import lru_cache
 
-from nav.models.profiles import (Account, AccountAlertQueue, AlertSubscription,
-                                 AlertAddress, FilterGroup, AlertPreference,
-                                 TimePeriod)
+from nav.models.profiles import (AccountAlertQueue, AlertSubscription,
+                                 AlertAddress, AlertPreference, TimePeriod)
 from nav.models.event import AlertQueue
+from nav.alertengine.filters import FilterCache, RECORD_RELATIONS
+from nav.alertengine.subscriptions import SubscriptionCache
+
+# Compiled alert profile filters and account subscriptions, kept across
+# alertengine runs
+_filter_cache = FilterCache()
+_subscription_cache = SubscriptionCache()
 
 
 def check_alerts(debug=False):
@@ -51,7 +57,8 @@ def check_alerts(debug=False):
     now = datetime.now()
 
     # Get all alerts that aren't in alert queue due to subscription
-    new_alerts = AlertQueue.objects.filter(accountalertqueue__isnull=True)
+    new_alerts = AlertQueue.objects.filter(
+        accountalertqueue__isnull=True).select_related(*RECORD_RELATIONS)
     num_new_alerts = len(new_alerts)
 
     initial_alerts = AlertQueue.objects.values_list('id', flat=True)
@@ -124,82 +131,50 @@ def handle_new_alerts(new_alerts):
     """Handles new alerts on the queue"""
     memoized_check_alert = lru_cache()(check_alert_against_filtergroupcontents)
     logger = logging.getLogger('nav.alertengine.handle_new_alerts')
-    accounts = []
-
-    def subscription_sort_key(subscription):
-        """Return a key to sort alertsubscriptions in a prioritized order."""
-        sort_order = [
-            AlertSubscription.NOW,
-            AlertSubscription.NEXT,
-            AlertSubscription.DAILY,
-            AlertSubscription.WEEKLY,
-            ]
-        try:
-            return sort_order.index(subscription.type)
-        except ValueError:
-            return subscription.type
-
-    # Build datastructure that contains accounts and corresponding
-    # filtergroupcontent_set so that we don't redo db queries to much
-    for account in Account.objects.filter(
-            alertpreference__active_profile__isnull=False):
-        profile = account.get_active_profile()
-        time_period = profile.get_active_timeperiod() if profile else None
-
-        if not time_period:
-            continue
-
-        current_alertsubscriptions = sorted(
-            time_period.alertsubscription_set.all(),
-            key=subscription_sort_key)
-
-        tmp = []
-        for alertsubscription in current_alertsubscriptions:
-            tmp.append(
-                (alertsubscription,
-                 alertsubscription.filter_group.filtergroupcontent_set.all()))
+    _filter_cache.refresh()
+    _subscription_cache.refresh()
 
-        if tmp:
-            permissions = []
-            for filtergroup in FilterGroup.objects.filter(
-                    group_permissions__accounts__in=[account]):
-                permissions.append(filtergroup.filtergroupcontent_set.all())
-
-            accounts.append((account, tmp, permissions))
-            del permissions
-
-        del tmp
-        del current_alertsubscriptions
-        del account
+    # The cached datastructure contains accounts and their corresponding
+    # filtergroupcontents so that we don't redo db queries to much
+    accounts = _subscription_cache.get_active_subscriptions()
 
     # Remember which alerts are sent where to avoid duplicates
     dupemap = set()
 
+    # Queue entries to be created in bulk once all accounts are checked
+    to_queue = []
+
     # Check all acounts against all their active subscriptions
     for account, alertsubscriptions, permissions in accounts:
         logger.debug("Checking new alerts for account '%s'", account)
 
         for alert in new_alerts:
             _check_match_and_permission(account, alert, alertsubscriptions,
-                                        dupemap, logger, memoized_check_alert,
-                                        permissions)
+                                        dupemap, to_queue, logger,
+                                        memoized_check_alert, permissions)
             del alert
         del account
         del permissions
 
+    if to_queue:
+        AccountAlertQueue.objects.bulk_create(to_queue)
+        logger.debug("Queued %d alert(s) for accounts", len(to_queue))
+
+    del to_queue
     del memoized_check_alert
     del new_alerts
     gc.collect()
 
 
 def _check_match_and_permission(account, alert, alertsubscriptions, dupemap,
-                                logger, memoized_check_alert, permissions):
+                                to_queue, logger, memoized_check_alert,
+                                permissions):
     for alertsubscription, filtergroupcontents in alertsubscriptions:
         # Check if alert matches, and if user has permission
         if memoized_check_alert(alert, filtergroupcontents, 'match check'):
             queued = _check_permissions(account, alert, alertsubscription,
-                                        dupemap, logger, memoized_check_alert,
-                                        permissions)
+                                        dupemap, to_queue, logger,
+                                        memoized_check_alert, permissions)
 
             if not queued:
                 logger.warning(
@@ -214,20 +189,21 @@ def _check_match_and_permission(account, alert, alertsubscriptions, dupemap,
         del filtergroupcontents
 
 
-def _check_permissions(account, alert, alertsubscription, dupemap, logger,
-                       memoized_check_alert, permissions):
+def _check_permissions(account, alert, alertsubscription, dupemap, to_queue,
+                       logger, memoized_check_alert, permissions):
     for permission in permissions:
         if memoized_check_alert(alert, permission, 'permission check'):
             logger.debug(
                 "Matched permission subscription %d" % alertsubscription.id)
 
             # Queue all alerts, avoiding duplicates. The individual users'
-            # queues will be processed later.
+            # queues will be processed later. New alerts are never already
+            # queued, so the queue entries can safely be created in bulk.
             if (alert.id, alertsubscription.alert_address_id) not in dupemap:
-                AccountAlertQueue.objects.get_or_create(
+                to_queue.append(AccountAlertQueue(
                     account=account,
                     alert=alert,
-                    subscription=alertsubscription)
+                    subscription=alertsubscription))
                 dupemap.add((alert.id, alertsubscription.alert_address_id))
                 logger.info('alert %d queued for %s due to subscription %d',
                             alert.id, account, alertsubscription.id)
@@ -446,7 +422,8 @@ def check_alert_against_filtergroupcontents(alert, filtergroupcontents, atype):
 
         # If we have not matched the message see if we can match it
         if not matches and content.include:
-            matches = content.filter.verify(alert) == content.positive
+            matches = (_filter_cache.verify(content.filter, alert)
+                       == content.positive)
 
             if matches:
                 logger.debug('alert %d: got included by filter %d in %s',
@@ -454,7 +431,8 @@ def check_alert_against_filtergroupcontents(alert, filtergroupcontents, atype):
 
         # If the alert has been matched try excluding it
         elif matches and not content.include:
-            matches = content.filter.verify(alert) != content.positive
+            matches = (_filter_cache.verify(content.filter, alert)
+                       != content.positive)
 
             # Log that we excluded the alert
             if not matches:
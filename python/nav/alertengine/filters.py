@@ -0,0 +1,383 @@
+#
+# Copyright (C) 2019 Uninett AS
+#
+# This file is part of Network Administration Visualized (NAV).
+#
+# NAV is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License version 3 as published by the Free
+# Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.  You should have received a copy of the GNU General Public
+# License along with NAV. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Compilation of alert profile filters into in-memory predicates.
+
+`Filter.verify()` matches an alert against a filter by running one SQL query
+for every (alert, filter) pair.  This module compiles each filter's
+expressions into plain Python predicates instead, which are evaluated against
+the attributes of an alert and its directly related objects, as prefetched by
+`AlertQueue.objects.select_related(*RECORD_RELATIONS)`.
+
+Only expressions on single-valued relations of an alert (i.e. the alert
+itself, its netbox and the netbox' room, location, organization, category,
+type and vendor) and with operators whose SQL semantics are easily reproduced
+are compiled.  Any remaining expressions of a filter are verified using
+`Filter.verify()`, so that a filter's result is always the same as it would be
+with plain SQL.
+
+Compiled filters are cached by :py:class:`FilterCache`, until a change is
+detected in any of the profile tables they were compiled from.
+
+"""
+import logging
+import re
+
+from django.db import connection
+
+from nav.models.manage import Location
+from nav.models.profiles import MatchField, Operator
+
+_logger = logging.getLogger(__name__)
+
+# Relations of an alert that can be evaluated in memory. Multi-valued
+# relations (like netbox__module) are omitted, as their SQL semantics
+# (i.e. "any related row matches") are left to the database.
+RECORD_RELATIONS = (
+    'alert_type',
+    'event_type',
+    'netbox',
+    'netbox__category',
+    'netbox__organization',
+    'netbox__room',
+    'netbox__room__location',
+    'netbox__type',
+    'netbox__type__vendor',
+)
+COMPILABLE_RELATIONS = frozenset(('',) + RECORD_RELATIONS)
+
+STRING_TYPES = ('CharField', 'TextField')
+INTEGER_TYPES = ('AutoField', 'IntegerField', 'SmallIntegerField',
+                 'BigIntegerField', 'PositiveIntegerField',
+                 'PositiveSmallIntegerField')
+
+# Constructs of PostgreSQL's regular expression dialect that Python's re
+# module would silently interpret differently
+POSTGRESQL_ONLY_REGEXP = re.compile(r'\[\[[:=.]|\\[mMyY]|^\*\*\*|\(\?[a-z]')
+
+FINGERPRINT_SQL = """
+SELECT md5(string_agg(profile_row, '|' ORDER BY profile_row))
+FROM (SELECT 'filter' || f::TEXT AS profile_row FROM filter f
+      UNION ALL
+      SELECT 'expression' || e::TEXT FROM expression e
+      UNION ALL
+      SELECT 'matchfield' || m::TEXT FROM matchfield m
+      UNION ALL
+      SELECT 'location' || l::TEXT FROM location l) AS profile_rows
+"""
+
+
+class UncompilableExpression(Exception):
+    """Raised when an expression cannot be compiled into a predicate"""
+    pass
+
+
+class AlertRecord(object):
+    """A flattened view of an alert and its directly related objects, as
+    addressed by the Django lookup paths used by MatchField.
+
+    """
+    def __init__(self, alert):
+        self.alert = alert
+        self._values = {}
+
+    def get(self, path):
+        """Returns the value at the end of a lookup path, such as
+        'netbox__room__location_id', or None if the path cannot be followed
+        to its end.
+
+        """
+        try:
+            return self._values[path]
+        except KeyError:
+            value = self.alert
+            for attr in path.split('__'):
+                value = getattr(value, attr, None)
+                if value is None:
+                    break
+            self._values[path] = value
+            return value
+
+
+class CompiledFilter(object):
+    """A Filter compiled into a list of predicates, with a list of remaining
+    expressions that must be verified using SQL.
+
+    """
+    def __init__(self, filtr, predicates, sql_expressions):
+        self.filter = filtr
+        self.predicates = predicates
+        self.sql_expressions = sql_expressions
+
+    def __repr__(self):
+        return "<CompiledFilter %s: %d predicates, %d SQL expressions>" % (
+            self.filter.id, len(self.predicates), len(self.sql_expressions))
+
+    def matches(self, record):
+        """Returns True if the alert represented by record matches this
+        filter.
+
+        """
+        if not all(predicate(record) for predicate in self.predicates):
+            return False
+        if self.sql_expressions:
+            return self.filter.verify(record.alert, self.sql_expressions)
+        return True
+
+
+def compile_filter(filtr, expressions=None):
+    """Compiles a Filter into a CompiledFilter.
+
+    :param expressions: The filter's list of expressions, if already loaded.
+
+    """
+    if expressions is None:
+        expressions = filtr.expression_set.select_related('match_field')
+    predicates = []
+    sql_expressions = []
+    for expression in expressions:
+        try:
+            predicates.append(compile_expression(expression))
+        except UncompilableExpression as error:
+            _logger.debug("filter %s: verifying %s using SQL: %s",
+                          filtr.id, expression, error)
+            sql_expressions.append(expression)
+    return CompiledFilter(filtr, predicates, sql_expressions)
+
+
+def compile_expression(expression):
+    """Compiles an Expression into a predicate that takes an AlertRecord
+    argument.
+
+    :raises UncompilableExpression: if the expression's match field or
+                                    operator cannot be evaluated in memory.
+
+    """
+    match_field = expression.match_field
+    if match_field.data_type == MatchField.IP:
+        raise UncompilableExpression("IP address match field")
+    if match_field.name == 'Location':
+        return _compile_location(expression.value)
+
+    path, field_type = _get_path_and_type(match_field)
+    convert = _get_converter(field_type)
+    operator = expression.operator
+    value = expression.value
+    if operator == Operator.EQUALS:
+        expected = convert(value)
+        return lambda record: _equals(record.get(path), expected)
+    elif operator == Operator.NOT_EQUAL:
+        expected = convert(value)
+        return lambda record: not _equals(record.get(path), expected)
+    elif operator == Operator.IN:
+        members = set(convert(v) for v in value.split('|'))
+        return lambda record: record.get(path) in members
+    elif operator in (Operator.GREATER, Operator.GREATER_EQ,
+                      Operator.LESS, Operator.LESS_EQ):
+        if field_type not in INTEGER_TYPES:
+            # string ordering depends on the database's collation
+            raise UncompilableExpression("ordering of non-integer values")
+        return _compile_comparison(path, operator, convert(value))
+    elif operator in (Operator.STARTSWITH, Operator.ENDSWITH,
+                      Operator.CONTAINS):
+        return _compile_substring_match(path, operator, value)
+    elif operator == Operator.REGEXP:
+        return _compile_regexp(path, value)
+    elif operator == Operator.WILDCARD:
+        if field_type not in STRING_TYPES:
+            raise UncompilableExpression("wildcard match on non-string")
+        return _compile_wildcard(path, value)
+
+    raise UncompilableExpression("unsupported operator %r" % operator)
+
+
+def _get_path_and_type(match_field):
+    """Returns the AlertRecord lookup path and Django field type of a match
+    field.
+
+    """
+    table = match_field.value_id.split('.')[0]
+    relation = MatchField.FOREIGN_MAP.get(table)
+    if relation is None or match_field.value_id not in MatchField.MODEL_MAP:
+        raise UncompilableExpression("unknown match field")
+    if relation not in COMPILABLE_RELATIONS:
+        raise UncompilableExpression("multi-valued relation %s" % relation)
+
+    model, attname = MatchField.MODEL_MAP[match_field.value_id]
+    field = [f for f in model._meta.fields if f.attname == attname][0]
+    if field.is_relation:
+        field = field.target_field
+    path = '%s__%s' % (relation, attname) if relation else attname
+    return path, field.get_internal_type()
+
+
+def _get_converter(field_type):
+    if field_type in STRING_TYPES:
+        return _to_text
+    elif field_type in INTEGER_TYPES:
+        return _to_int
+    raise UncompilableExpression("unsupported field type %s" % field_type)
+
+
+def _to_text(value):
+    return value
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise UncompilableExpression("%r is not an integer" % value)
+
+
+def _equals(actual, expected):
+    return actual is not None and actual == expected
+
+
+def _compile_comparison(path, operator, expected):
+    compare = {
+        Operator.GREATER: lambda actual: actual > expected,
+        Operator.GREATER_EQ: lambda actual: actual >= expected,
+        Operator.LESS: lambda actual: actual < expected,
+        Operator.LESS_EQ: lambda actual: actual <= expected,
+    }[operator]
+
+    def _predicate(record):
+        actual = record.get(path)
+        return actual is not None and compare(actual)
+    return _predicate
+
+
+def _compile_substring_match(path, operator, value):
+    expected = value.upper()
+    match = {
+        Operator.STARTSWITH: lambda actual: actual.startswith(expected),
+        Operator.ENDSWITH: lambda actual: actual.endswith(expected),
+        Operator.CONTAINS: lambda actual: expected in actual,
+    }[operator]
+
+    def _predicate(record):
+        actual = record.get(path)
+        return actual is not None and match((u"%s" % actual).upper())
+    return _predicate
+
+
+def _compile_regexp(path, value):
+    if POSTGRESQL_ONLY_REGEXP.search(value):
+        raise UncompilableExpression("PostgreSQL specific regexp")
+    try:
+        regexp = re.compile(value, re.IGNORECASE | re.UNICODE)
+    except re.error as error:
+        raise UncompilableExpression("invalid regexp: %s" % error)
+
+    def _predicate(record):
+        actual = record.get(path)
+        return actual is not None and bool(regexp.search(u"%s" % actual))
+    return _predicate
+
+
+def _compile_wildcard(path, value):
+    """Compiles an SQL ILIKE pattern into a regular expression"""
+    parts = []
+    chars = iter(value)
+    for char in chars:
+        if char == '%':
+            parts.append('.*')
+        elif char == '_':
+            parts.append('.')
+        elif char == '\\':
+            parts.append(re.escape(next(chars, '\\')))
+        else:
+            parts.append(re.escape(char))
+    regexp = re.compile(u''.join(parts) + r'\Z',
+                        re.IGNORECASE | re.UNICODE | re.DOTALL)
+
+    def _predicate(record):
+        actual = record.get(path)
+        return actual is not None and bool(regexp.match(actual))
+    return _predicate
+
+
+def _compile_location(value):
+    locations = Location.objects.filter(pk__in=value.split('|'))
+    location_ids = set(descendant.pk
+                       for location in locations
+                       for descendant in
+                       location.get_descendants(include_self=True))
+    return lambda record: (
+        record.get('netbox__room__location_id') in location_ids)
+
+
+class FilterCache(object):
+    """A cache of compiled filters, which is flushed whenever changes are
+    detected in the profile tables that filters are compiled from.
+
+    """
+    def __init__(self):
+        self._fingerprint = None
+        self._filters = {}
+        self._records = {}
+
+    def refresh(self):
+        """Flushes the cache if the profile tables have changed since the
+        filters were last compiled.  Should be called before processing a new
+        batch of alerts.
+
+        """
+        self._records = {}
+        fingerprint = get_profiles_fingerprint()
+        if fingerprint != self._fingerprint:
+            _logger.debug("profile tables have changed, recompiling filters")
+            self._fingerprint = fingerprint
+            self._filters = {}
+
+    def get(self, filtr):
+        """Returns the CompiledFilter of a Filter"""
+        try:
+            return self._filters[filtr.id]
+        except KeyError:
+            compiled = self._filters[filtr.id] = compile_filter(filtr)
+            return compiled
+
+    def get_record(self, alert):
+        """Returns a cached AlertRecord for alert"""
+        try:
+            return self._records[alert.id]
+        except KeyError:
+            record = self._records[alert.id] = AlertRecord(alert)
+            return record
+
+    def verify(self, filtr, alert):
+        """Verifies whether alert matches filtr, like Filter.verify() does"""
+        return self.get(filtr).matches(self.get_record(alert))
+
+
+def get_profiles_fingerprint():
+    """Returns a digest of the current contents of all the tables that are
+    involved in compiling filters.
+
+    """
+    return get_fingerprint(FINGERPRINT_SQL)
+
+
+def get_fingerprint(sql):
+    """Runs a fingerprinting SQL query and returns the single value it
+    produces.
+
+    """
+    cursor = connection.cursor()
+    cursor.execute(sql)
+    return cursor.fetchone()[0]
+
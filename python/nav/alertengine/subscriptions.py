@@ -0,0 +1,183 @@
+#
+# Copyright (C) 2019 Uninett AS
+#
+# This file is part of Network Administration Visualized (NAV).
+#
+# NAV is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License version 3 as published by the Free
+# Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.  You should have received a copy of the GNU General Public
+# License along with NAV. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Caching of the alert subscriptions of all accounts.
+
+Every alertengine run needs to know the active alert subscriptions of every
+account, along with the contents of the subscribed filter groups and of the
+filter groups each account has permission to.  This structure is loaded from
+the database using a fixed number of queries, and is kept between runs until a
+change is detected in any of the profile tables it was loaded from.
+
+Since the active time period of a profile depends on the time of day, only
+the choice of active subscriptions is made anew on every run.
+
+"""
+import logging
+from collections import defaultdict
+
+from nav.alertengine.filters import get_fingerprint
+from nav.models.profiles import (Account, AlertSubscription, TimePeriod,
+                                 FilterGroupContent, FilterGroup)
+
+_logger = logging.getLogger(__name__)
+
+FINGERPRINT_SQL = """
+SELECT md5(string_agg(profile_row, '|' ORDER BY profile_row))
+FROM (SELECT 'account' || (a.id, a.login)::TEXT AS profile_row FROM account a
+      UNION ALL
+      SELECT 'alertpreference' || (p.accountid, p.activeprofile)::TEXT
+      FROM alertpreference p
+      UNION ALL
+      SELECT 'alertprofile' || p::TEXT FROM alertprofile p
+      UNION ALL
+      SELECT 'timeperiod' || t::TEXT FROM timeperiod t
+      UNION ALL
+      SELECT 'alertsubscription' || s::TEXT FROM alertsubscription s
+      UNION ALL
+      SELECT 'filtergroupcontent' || c::TEXT FROM filtergroupcontent c
+      UNION ALL
+      SELECT 'permission' || g::TEXT FROM filtergroup_group_permission g
+      UNION ALL
+      SELECT 'member' || m::TEXT FROM accountgroup_accounts m
+     ) AS profile_rows
+"""
+
+# The order in which subscriptions of an account are processed
+SUBSCRIPTION_ORDER = [
+    AlertSubscription.NOW,
+    AlertSubscription.NEXT,
+    AlertSubscription.DAILY,
+    AlertSubscription.WEEKLY,
+]
+
+
+def subscription_sort_key(subscription):
+    """Return a key to sort alertsubscriptions in a prioritized order."""
+    try:
+        return SUBSCRIPTION_ORDER.index(subscription.type)
+    except ValueError:
+        return subscription.type
+
+
+class AccountSubscriptions(object):
+    """The alert profile, time periods, subscriptions and filter group
+    permissions of a single account.
+
+    """
+    def __init__(self, account, profile):
+        self.account = account
+        self.profile = profile
+        self.timeperiods = []
+        # {timeperiod_id: [(subscription, filtergroupcontents), ...]}
+        self.subscriptions = defaultdict(list)
+        # [filtergroupcontents, ...]
+        self.permissions = []
+
+    def get_active_subscriptions(self, now=None):
+        """Returns a list of (subscription, filtergroupcontents) tuples for
+        the currently active time period of the account's profile.
+
+        """
+        time_period = self.profile.find_active_timeperiod(self.timeperiods,
+                                                          now)
+        if not time_period:
+            return []
+        return self.subscriptions.get(time_period.id, [])
+
+
+class SubscriptionCache(object):
+    """A cache of every account's alert subscriptions, which is reloaded
+    whenever changes are detected in the profile tables it was loaded from.
+
+    """
+    def __init__(self):
+        self._fingerprint = None
+        self._accounts = []
+
+    def refresh(self):
+        """Reloads the subscription structure if any profile tables have
+        changed since it was last loaded.
+
+        """
+        fingerprint = get_fingerprint(FINGERPRINT_SQL)
+        if fingerprint != self._fingerprint:
+            _logger.debug("profile tables have changed, "
+                          "reloading alert subscriptions")
+            self._accounts = load_account_subscriptions()
+            self._fingerprint = fingerprint
+
+    def get_active_subscriptions(self, now=None):
+        """Returns a list of (account, subscriptions, permissions) tuples for
+        every account that has active alert subscriptions, where
+
+        - subscriptions is a list of (subscription, filtergroupcontents)
+          tuples, in prioritized order, and
+        - permissions is a list of filtergroupcontents the account has
+          permission to.
+
+        """
+        result = []
+        for account in self._accounts:
+            subscriptions = account.get_active_subscriptions(now)
+            if subscriptions:
+                result.append((account.account, subscriptions,
+                               account.permissions))
+        return result
+
+
+def load_account_subscriptions():
+    """Loads the alert subscription structure of every account that has an
+    active alert profile.
+
+    :returns: A list of AccountSubscriptions objects.
+
+    """
+    accounts = dict(
+        (account.id, AccountSubscriptions(
+            account, account.alertpreference.active_profile))
+        for account in Account.objects.filter(
+            alertpreference__active_profile__isnull=False
+        ).select_related('alertpreference__active_profile'))
+    by_profile = dict((account.profile.id, account)
+                      for account in accounts.values())
+
+    contents = defaultdict(list)
+    for content in FilterGroupContent.objects.select_related(
+            'filter').order_by('priority'):
+        contents[content.filter_group_id].append(content)
+    contents = dict((group, tuple(items)) for group, items in contents.items())
+
+    timeperiods = TimePeriod.objects.filter(profile__in=list(by_profile))
+    profile_of_period = {}
+    for timeperiod in timeperiods:
+        by_profile[timeperiod.profile_id].timeperiods.append(timeperiod)
+        profile_of_period[timeperiod.id] = timeperiod.profile_id
+
+    subscriptions = AlertSubscription.objects.filter(
+        time_period__in=list(profile_of_period))
+    for subscription in sorted(subscriptions, key=subscription_sort_key):
+        account = by_profile[profile_of_period[subscription.time_period_id]]
+        account.subscriptions[subscription.time_period_id].append(
+            (subscription, contents.get(subscription.filter_group_id, ())))
+
+    permissions = FilterGroup.objects.filter(
+        group_permissions__accounts__in=list(accounts)
+    ).values_list('group_permissions__accounts', 'id').distinct()
+    for account_id, filtergroup_id in sorted(permissions):
+        accounts[account_id].permissions.append(
+            contents.get(filtergroup_id, ()))
+
+    return sorted(accounts.values(), key=lambda a: a.account.login)
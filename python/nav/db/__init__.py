@@ -22,6 +22,7 @@ from functools import wraps
 import logging
 import os
 import sys
+import threading
 import time
 
 import psycopg2
@@ -149,14 +150,21 @@ def getConnection(scriptName, database='nav'):
     the given scriptName.  Connections are cached, so that future
     calls using the same parameters will receive an already open
     connection.
+
+    Connections are cached per thread, as a transaction started on a
+    connection would otherwise be shared by every thread using it.
     """
     (dbhost, port, dbname, user, password) = get_connection_parameters(
         scriptName, database)
-    cache_key = (dbname, user)
-
-    # First, invalidate any dead connections.  Return a connection
-    # object from the cache if one exists, open a new one if not.
-    _connection_cache.invalidate()
+    cache_key = (dbname, user, threading.current_thread().ident)
+
+    # First, invalidate a dead connection.  Return a connection object from
+    # the cache if one exists, open a new one if not.  Only this thread's
+    # connection is validated, as the connections of other threads may be in
+    # the middle of a transaction.
+    if cache_key in _connection_cache:
+        if _connection_cache[cache_key].is_invalid():
+            del _connection_cache[cache_key]
     try:
         connection = _connection_cache[cache_key].object
     except KeyError:
@@ -175,16 +183,43 @@ def getConnection(scriptName, database='nav'):
 
 def closeConnections():
     """Close all cached database connections"""
-    for connection in _connection_cache.values():
+    for connection in list(_connection_cache.values()):
+        try:
+            connection.object.close()
+        except psycopg2.InterfaceError:
+            pass
+
+
+def close_orphaned_connections():
+    """Closes and uncaches the cached database connections of threads that
+    have exited.
+
+    :returns: The number of connections closed.
+
+    """
+    alive = set(thread.ident for thread in threading.enumerate())
+    count = 0
+    for key, connection in list(_connection_cache.items()):
+        if key[-1] in alive:
+            continue
+        try:
+            del _connection_cache[key]
+        except KeyError:
+            continue  # already removed by another thread
         try:
             connection.object.close()
         except psycopg2.InterfaceError:
             pass
+        count += 1
+    if count:
+        _logger.debug("Closed %d database connections of exited threads",
+                      count)
+    return count
 
 
 def commit_all_connections():
     """Attempts to commit the current transactions on all cached connections"""
-    conns = (v.object for v in _connection_cache.values())
+    conns = [v.object for v in list(_connection_cache.values())]
     for conn in conns:
         conn.commit()
 
@@ -14,6 +14,7 @@
 # along with NAV. If not, see <http://www.gnu.org/licenses/>.
 #
 """Various functionality to bridge legacy NAV code with Django"""
+import threading
 
 try:
     from django.utils.deprecation import MiddlewareMixin
@@ -29,12 +30,17 @@ class LegacyCleanupMiddleware(MiddlewareMixin):
 
     """
     def process_response(self, _request, response):
-        """Rolls back any uncommitted legacy database connections,
-        to avoid idling indefinitely in transactions.
+        """Rolls back any uncommitted legacy database connections of the
+        current thread, to avoid idling indefinitely in transactions, and
+        closes the connections of threads that have exited.
 
         """
-        connections = (v.object for v in db._connection_cache.values())
+        thread = threading.current_thread().ident
+        # other threads may cache new connections while we iterate
+        cached = list(db._connection_cache.items())
+        connections = [v.object for key, v in cached if key[-1] == thread]
         for conn in connections:
             conn.rollback()
+        db.close_orphaned_connections()
 
         return response
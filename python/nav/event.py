@@ -19,8 +19,11 @@ from __future__ import absolute_import
 import nav.db
 from nav.errors import GeneralException
 
-from nav.models.event import EventType, AlertType
-from django.db import transaction
+# The eventq columns that can be set from Event attributes
+EVENT_FIELDS = ('source', 'target', 'deviceid', 'netboxid', 'subid', 'time',
+                'eventtypeid', 'state', 'value', 'severity')
+# The maximum number of events to insert using a single statement
+MAX_BATCH_SIZE = 500
 
 
 class Event(dict):
@@ -139,6 +142,35 @@ class EventQ(object):
         event.eventqid = eventqid
         return cursor.statusmessage
 
+    @classmethod
+    def post_events(cls, events):
+        """Posts a list of events to the event queue in a single transaction,
+        using multi-row inserts.
+
+        Either all or none of the events are posted.  The eventqid attribute
+        of each event is set once the transaction has been committed.
+
+        :returns: The number of events posted.
+
+        """
+        events = list(events)
+        for event in events:
+            if event.eventqid:
+                raise EventAlreadyPostedError(event.eventqid)
+        if not events:
+            return 0
+
+        conn = cls._get_connection()
+        try:
+            eventqids = insert_events(conn.cursor(), events)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        for event, eventqid in zip(events, eventqids):
+            event.eventqid = eventqid
+        return len(events)
+
     @classmethod
     def consume_events(cls, target):
         """Consume and return a list of Event objects queued for this target.
@@ -188,6 +220,59 @@ class EventQ(object):
         return cursor.statusmessage
 
 
+def insert_events(cursor, events):
+    """Inserts a list of Event objects into eventq and eventqvar using
+    multi-row INSERT statements, but does not commit the transaction.
+
+    Any DB-API cursor will do, including one from a Django connection, which
+    makes it possible to post events as part of a larger transaction.
+
+    :returns: A list of the eventqids allocated to the events, in the same
+              order as the events.
+
+    """
+    eventqids = []
+    for start in range(0, len(events), MAX_BATCH_SIZE):
+        eventqids.extend(
+            _insert_event_batch(cursor, events[start:start + MAX_BATCH_SIZE]))
+    return eventqids
+
+
+def _insert_event_batch(cursor, events):
+    # Allocating all ids up front, rather than relying on the order of rows
+    # returned by INSERT ... RETURNING, makes pairing ids with events safe.
+    cursor.execute("SELECT nextval('eventq_eventqid_seq') "
+                   "FROM generate_series(1, %s)", (len(events),))
+    eventqids = [row[0] for row in cursor.fetchall()]
+
+    rows = []
+    params = []
+    for eventqid, event in zip(eventqids, events):
+        values = [getattr(event, attr, None) for attr in EVENT_FIELDS]
+        if not any(values):
+            raise EventIncompleteError(event)
+        # unset attributes get the column defaults, as with post_event()
+        placeholders = ['%s' if value else 'DEFAULT' for value in values]
+        params.append(eventqid)
+        params.extend(value for value in values if value)
+        rows.append("(%%s, %s)" % ", ".join(placeholders))
+    cursor.execute(
+        "INSERT INTO eventq (eventqid, %s) VALUES %s" % (
+            ", ".join(EVENT_FIELDS), ", ".join(rows)),
+        params)
+
+    variables = [(eventqid,) + item
+                 for eventqid, event in zip(eventqids, events)
+                 for item in event.items()]
+    if variables:
+        cursor.execute(
+            "INSERT INTO eventqvar (eventqid, var, val) VALUES %s" %
+            ", ".join(["(%s, %s, %s)"] * len(variables)),
+            [value for variable in variables for value in variable])
+
+    return eventqids
+
+
 class EventIdAllocationError(GeneralException):
     """Error allocating a new event ID from the queue"""
     pass
@@ -208,7 +293,6 @@ class EventNotPostedError(GeneralException):
     pass
 
 
-@transaction.atomic
 def create_type_hierarchy(hierarchy):
     """Create an event/alert type hierarchy in the database.
 
@@ -236,28 +320,34 @@ def create_type_hierarchy(hierarchy):
     >>>
 
     """
-    created_count = 0
-
-    for event_type, alert_types in hierarchy.items():
-        event_type_name, event_descr, stateful = event_type
-        if stateful not in ('y', 'n'):
-            # Parse the stateful var as a boolean
-            stateful = stateful and 'y' or 'n'
-
-        try:
-            etype = EventType.objects.get(id=event_type_name)
-        except EventType.DoesNotExist:
-            etype = EventType(id=event_type_name, description=event_descr,
-                              stateful=stateful)
-            etype.save()
-            created_count += 1
-
-        for alert_type_name, alert_descr in alert_types:
-            atype, created = AlertType.objects.get_or_create(
-                name=alert_type_name, event_type=etype)
-            if created:
-                atype.description = alert_descr
-                atype.save()
+    # Imported here, so that the rest of this module can be used by daemons
+    # that do not bootstrap Django
+    from nav.models.event import EventType, AlertType
+    from django.db import transaction
+
+    with transaction.atomic():
+        created_count = 0
+
+        for event_type, alert_types in hierarchy.items():
+            event_type_name, event_descr, stateful = event_type
+            if stateful not in ('y', 'n'):
+                # Parse the stateful var as a boolean
+                stateful = stateful and 'y' or 'n'
+
+            try:
+                etype = EventType.objects.get(id=event_type_name)
+            except EventType.DoesNotExist:
+                etype = EventType(id=event_type_name, description=event_descr,
+                                  stateful=stateful)
+                etype.save()
                 created_count += 1
 
-    return created_count
+            for alert_type_name, alert_descr in alert_types:
+                atype, created = AlertType.objects.get_or_create(
+                    name=alert_type_name, event_type=etype)
+                if created:
+                    atype.description = alert_descr
+                    atype.save()
+                    created_count += 1
+
+        return created_count
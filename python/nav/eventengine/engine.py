@@ -21,6 +21,14 @@ SQL is needed::
 
     CREATE RULE eventq_notify AS ON INSERT TO eventq DO ALSO NOTIFY new_event;
 
+Likewise, the cached map of unresolved alerts is reloaded when other processes
+modify the alert history, given the following SQL::
+
+    CREATE RULE alerthist_notify_update AS ON UPDATE TO alerthist
+      DO ALSO NOTIFY alerthist_changed;
+    CREATE RULE alerthist_notify_delete AS ON DELETE TO alerthist
+      DO ALSO NOTIFY alerthist_changed;
+
 """
 import logging
 import sched
@@ -33,7 +41,7 @@ from nav.eventengine.plugin import EventHandler
 from nav.eventengine.alerts import AlertGenerator
 from nav.eventengine.config import EVENTENGINE_CONF
 from nav.eventengine import unresolved
-from nav.models.event import EventQueue as Event
+from nav.models.event import EventQueue as Event, prefetch_subjects
 import nav.db
 from django.db import connection, DatabaseError, transaction
 
@@ -71,6 +79,35 @@ def swallow_unhandled_exceptions(func):
     return _decorated
 
 
+class QueryCounter(object):
+    """Context manager to count the SQL queries issued through Django's
+    database connection within its context.
+
+    Counting is only enabled when debug logging is enabled for this module,
+    otherwise the count attribute will be None.  Since Django's query log is
+    bounded, counts are capped at roughly 9000 queries.
+
+    """
+    def __init__(self):
+        self.count = None
+        self._old_force_debug_cursor = None
+
+    def __enter__(self):
+        self.count = None
+        if _logger.isEnabledFor(logging.DEBUG):
+            self._old_force_debug_cursor = connection.force_debug_cursor
+            connection.force_debug_cursor = True
+            connection.queries_log.clear()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._old_force_debug_cursor is not None:
+            self.count = len(connection.queries_log)
+            connection.queries_log.clear()
+            connection.force_debug_cursor = self._old_force_debug_cursor
+            self._old_force_debug_cursor = None
+
+
 class EventEngine(object):
     """Event processing engine.
 
@@ -81,6 +118,12 @@ class EventEngine(object):
     # too often, since we rely on PostgreSQL notification when new events are
     # inserted into the queue.
     CHECK_INTERVAL = 30
+    # max age of the unresolved alerts map before it is resynchronized from
+    # the database. the map is otherwise updated in place as alerts are
+    # posted, or reloaded on notification of changes from other processes.
+    UNRESOLVED_RESYNC_INTERVAL = 300
+    # max number of events to load from the queue in one go
+    EVENT_BATCH_SIZE = 500
     PLUGIN_TASKS_PRIORITY = 1
     _logger = logging.getLogger(__name__)
 
@@ -115,12 +158,26 @@ class EventEngine(object):
                 self._listen()
                 return
             if conn.notifies:
-                self._logger.debug("got event notification from database")
-                self._schedule_next_queuecheck()
+                self._handle_notifications(conn)
                 del conn.notifies[:]
         else:
             time.sleep(delay)
 
+    def _handle_notifications(self, conn):
+        channels = set(notify.channel for notify in conn.notifies)
+        if 'new_event' in channels:
+            self._logger.debug("got event notification from database")
+            self._schedule_next_queuecheck()
+
+        # ignore alert history changes made by ourselves, as these have
+        # already been recorded in the unresolved alerts map
+        my_pid = conn.get_backend_pid()
+        if any(notify.channel == 'alerthist_changed' and notify.pid != my_pid
+               for notify in conn.notifies):
+            self._logger.debug("alert history was changed by another process, "
+                               "invalidating map of unresolved alerts")
+            unresolved.invalidate()
+
     def start(self):
         "Starts the event engine"
         self._logger.info("--- starting event engine ---")
@@ -139,6 +196,7 @@ class EventEngine(object):
         _logger.debug("registering event listener with PostgreSQL")
         cursor = connection.cursor()
         cursor.execute('LISTEN new_event')
+        cursor.execute('LISTEN alerthist_changed')
 
     def _load_new_events_and_reschedule(self):
         self.load_new_events()
@@ -157,27 +215,57 @@ class EventEngine(object):
     def load_new_events(self):
         "Loads and processes new events on the queue, if any"
         self._logger.debug("checking for new events on queue")
-        events = Event.objects.filter(target=self.target).order_by('id')
-        if events:
+        for events in self._get_event_batches():
             old_events = [event for event in events
                           if event.id in self._unfinished]
             new_events = [event for event in events
                           if event.id not in self._unfinished]
             self._logger.info("found %d new and %d old events in queue db",
                               len(new_events), len(old_events))
-            for event in new_events:
-                unresolved.update()
-                try:
-                    self.handle_event(event)
-                except Exception:
-                    self._logger.exception("Unhandled exception while "
-                                           "handling %s, deleting event",
-                                           event)
-                    if event.id:
-                        event.delete()
+            with QueryCounter() as counter:
+                prefetch_subjects(new_events)
+                self._handle_new_events(new_events)
+            if new_events and counter.count is not None:
+                self._logger.debug(
+                    "%d queries for %d events (%.1f queries per event)",
+                    counter.count, len(new_events),
+                    counter.count / float(len(new_events)))
 
         self._log_task_queue()
 
+    def _get_event_batches(self):
+        """Generates batches of at most EVENT_BATCH_SIZE events from the queue,
+        with their related objects and variables prefetched.
+
+        """
+        events = Event.objects.filter(target=self.target).order_by('id')
+        events = events.select_related(
+            'source', 'device', 'netbox', 'event_type',
+        ).prefetch_related('variables')
+        last_id = 0
+        while True:
+            batch = list(events.filter(id__gt=last_id)[:self.EVENT_BATCH_SIZE])
+            if batch:
+                yield batch
+            if len(batch) < self.EVENT_BATCH_SIZE:
+                break
+            last_id = batch[-1].id
+
+    def _handle_new_events(self, events):
+        for event in events:
+            unresolved.update_if_stale(self.UNRESOLVED_RESYNC_INTERVAL)
+            try:
+                self.handle_event(event)
+            except Exception:
+                self._logger.exception("Unhandled exception while "
+                                       "handling %s, deleting event",
+                                       event)
+                # any changes to the unresolved map may have been rolled
+                # back along with the event's transaction
+                unresolved.invalidate()
+                if event.id:
+                    event.delete()
+
     def _log_task_queue(self):
         logger = logging.getLogger(__name__ + '.queue')
         if not logger.isEnabledFor(logging.DEBUG):
@@ -220,8 +308,8 @@ class EventEngine(object):
         """Returns True if the event's associated netbox is currently on
         maintenance.
         """
-        return event.netbox and event.netbox.get_unresolved_alerts(
-            'maintenanceState').count() > 0
+        return (event.netbox_id is not None
+                and unresolved.netbox_is_on_maintenance(event.netbox_id))
 
     @transaction.atomic()
     def handle_event(self, event):
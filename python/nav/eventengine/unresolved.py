@@ -13,14 +13,30 @@
 # details.  You should have received a copy of the GNU General Public License
 # along with NAV. If not, see <http://www.gnu.org/licenses/>.
 #
-"""Loading and caching of unresolved alert states from the database"""
+"""Loading and caching of unresolved alert states from the database.
+
+The map of unresolved alerts is loaded from the database once, and is then
+kept up to date in place as the eventengine opens and resolves alert states
+(see :py:func:`record`).  To pick up changes made to the alert history by
+other processes, the map is fully resynchronized from the database when it
+has been explicitly invalidated, or when it is older than a given max age
+(see :py:func:`update_if_stale`).
+
+"""
+import logging
+import time
+from collections import defaultdict
 
 from nav.models.event import AlertHistory
 from nav.models.fields import INFINITY
-import logging
 
 _logger = logging.getLogger(__name__)
 _unresolved_alerts_map = {}
+# {netbox_id: set of unresolved maintenanceState alert keys}
+_maintenance_map = defaultdict(set)
+_last_update = None
+
+MAINTENANCE_STATE = 'maintenanceState'
 
 
 def get_map():
@@ -32,10 +48,66 @@ def update():
     """Updates the map of unresolved alerts from the database"""
     # yes mr. pylint, we use global state, this module acts as a singleton
     # pylint: disable=W0603
-    global _unresolved_alerts_map
+    global _unresolved_alerts_map, _maintenance_map, _last_update
     unresolved = AlertHistory.objects.filter(end_time__gte=INFINITY)
     _unresolved_alerts_map = dict((alert.get_key(), alert)
                                   for alert in unresolved)
+    _maintenance_map = defaultdict(set)
+    for key in _unresolved_alerts_map:
+        netbox_id, _subid, event_type_id = key
+        if event_type_id == MAINTENANCE_STATE:
+            _maintenance_map[netbox_id].add(key)
+    _last_update = time.time()
+    _logger.debug("loaded %d unresolved alerts from database",
+                  len(_unresolved_alerts_map))
+
+
+def update_if_stale(max_age):
+    """Updates the map of unresolved alerts from the database if it has been
+    invalidated, or if it was last loaded more than max_age seconds ago.
+
+    """
+    if _last_update is None or time.time() - _last_update > max_age:
+        update()
+
+
+def invalidate():
+    """Invalidates the map of unresolved alerts, ensuring it is reloaded from
+    the database on the next call to :py:func:`update_if_stale`.
+
+    """
+    # pylint: disable=W0603
+    global _last_update
+    _last_update = None
+
+
+def record(alert):
+    """Updates the map of unresolved alerts in place with an AlertHistory
+    entry that has just been opened or resolved.
+
+    """
+    key = alert.get_key()
+    is_maintenance = alert.event_type_id == MAINTENANCE_STATE
+    if alert.end_time and alert.end_time >= INFINITY:
+        _unresolved_alerts_map[key] = alert
+        if is_maintenance:
+            _maintenance_map[alert.netbox_id].add(key)
+    else:
+        current = _unresolved_alerts_map.get(key)
+        if current is not None and current.id == alert.id:
+            del _unresolved_alerts_map[key]
+            if is_maintenance:
+                _maintenance_map[alert.netbox_id].discard(key)
+                if not _maintenance_map[alert.netbox_id]:
+                    del _maintenance_map[alert.netbox_id]
+
+
+def netbox_is_on_maintenance(netbox_id):
+    """Returns True if there is an unresolved maintenanceState alert for the
+    netbox identified by netbox_id.
+
+    """
+    return bool(_maintenance_map.get(netbox_id))
 
 
 def refers_to_unresolved_alert(event):
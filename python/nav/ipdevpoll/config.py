@@ -32,6 +32,7 @@ class IpdevpollConfig(NAVConfigParser):
 [ipdevpoll]
 logfile = ipdevpolld.log
 max_concurrent_jobs = 500
+device_cache_size = 1000
 
 [snmp]
 timeout = 1.5
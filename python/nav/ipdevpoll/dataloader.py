@@ -24,6 +24,12 @@ This module contains functionality to periodically load from the
 database and cache a list of Netboxes to poll.  It also loads and
 caches Type and Vendor data.
 
+Netbox reloads are incremental: A cheap digest of each netbox row is fetched
+on every reload, and only netboxes whose digest has changed since the last
+load are fully reloaded, with all their related data.  A full reload is still
+performed at regular intervals, to catch changes to related data, such as
+rooms and types.
+
 Data is loaded synchronously from the database using Django models -
 the model objects are "shadowed" using the shadows.Netbox class, so
 that the resulting objects will be guaranteed to stay away from the
@@ -32,6 +38,7 @@ from the database can be executed in a separate thread to avoid
 interfering with the daemon's asynchronous operations.
 
 """
+import datetime
 from collections import defaultdict
 
 from nav.models import manage, event
@@ -64,10 +71,16 @@ class NetboxLoader(dict):
 
     """
     _logger = ipdevpoll.ContextLogger()
+    full_reload_interval = datetime.timedelta(minutes=30)
+    # {netboxid: {job_name: end_time}}, shared by all loaders in the process
+    last_updated_times = None
 
     def __init__(self):
         super(NetboxLoader, self).__init__()
         self.peak_count = 0
+        self._digests = {}
+        self._snmp_down = set()
+        self._last_full_reload = datetime.datetime.min
         # touch _logger to initialize logging context right away
         # pylint: disable=W0104
         self._logger
@@ -89,31 +102,40 @@ class NetboxLoader(dict):
             changed in the database since the last load operation.
 
         """
-        related = ('room__location', 'type__vendor',
-                   'category', 'organization')
         snmp_down = set(event.AlertHistory.objects.unresolved(
             'snmpAgentState').values_list('netbox__id', flat=True))
         self._logger.debug("These netboxes have active snmpAgentStates: %r",
                            snmp_down)
-        queryset = manage.Netbox.objects.filter(deleted_at__isnull=True)
-        queryset = list(queryset.select_related(*related))
-        for netbox in queryset:
-            netbox.snmp_up = netbox.id not in snmp_down
-        netbox_list = storage.shadowify_queryset(queryset)
+        digests = load_netbox_digests()
+
+        full_reload = self._is_full_reload_due()
+        if full_reload:
+            reload_ids = set(digests)
+        else:
+            reload_ids = set(
+                netboxid for netboxid, digest in digests.items()
+                if self._digests.get(netboxid) != digest)
+            reload_ids.update(
+                snmp_down.symmetric_difference(self._snmp_down).intersection(
+                    digests))
+
+        netbox_list = self._load_netboxes(reload_ids, snmp_down, full_reload)
         netbox_dict = dict((netbox.id, netbox) for netbox in netbox_list)
 
-        times = load_last_updated_times()
+        times = self._get_last_updated_times()
         for netbox in netbox_list:
-            netbox.last_updated = times.get(netbox.id, {})
+            netbox.last_updated = times.setdefault(netbox.id, {})
 
         django_debug_cleanup()
 
+        # netboxes that disappeared between queries are considered gone
+        vanished_ids = reload_ids.difference(netbox_dict)
         previous_ids = set(self.keys())
-        current_ids = set(netbox_dict.keys())
+        current_ids = set(digests).difference(vanished_ids)
         lost_ids = previous_ids.difference(current_ids)
         new_ids = current_ids.difference(previous_ids)
 
-        same_ids = previous_ids.intersection(current_ids)
+        same_ids = previous_ids.intersection(netbox_dict)
         changed_ids = set(i for i in same_ids
                           if is_netbox_changed(self[i], netbox_dict[i]))
 
@@ -125,19 +147,61 @@ class NetboxLoader(dict):
         for i in same_ids:
             self[i].copy(netbox_dict[i])
 
+        self._digests = dict((i, digests[i]) for i in current_ids)
+        self._snmp_down = snmp_down
         self.peak_count = max(self.peak_count, len(self))
 
         anything_changed = len(new_ids) or len(lost_ids) or len(changed_ids)
         log = self._logger.info if anything_changed else self._logger.debug
 
-        log("Loaded %d netboxes from database "
-            "(%d new, %d removed, %d changed, %d peak)",
-            len(netbox_dict), len(new_ids), len(lost_ids), len(changed_ids),
+        log("Loaded %d of %d netboxes from database (%s reload; "
+            "%d new, %d removed, %d changed, %d peak)",
+            len(netbox_dict), len(self),
+            "full" if full_reload else "incremental",
+            len(new_ids), len(lost_ids), len(changed_ids),
             self.peak_count
             )
 
         return (new_ids, lost_ids, changed_ids)
 
+    def _is_full_reload_due(self):
+        now = datetime.datetime.now()
+        if now - self._last_full_reload > self.full_reload_interval:
+            self._last_full_reload = now
+            return True
+        return False
+
+    @staticmethod
+    def _load_netboxes(netbox_ids, snmp_down, full_reload=False):
+        if not netbox_ids:
+            return []
+        related = ('room__location', 'type__vendor',
+                   'category', 'organization')
+        queryset = manage.Netbox.objects.filter(deleted_at__isnull=True)
+        if not full_reload:
+            queryset = queryset.filter(id__in=netbox_ids)
+        queryset = list(queryset.select_related(*related))
+        for netbox in queryset:
+            netbox.snmp_up = netbox.id not in snmp_down
+        return storage.shadowify_queryset(queryset)
+
+    @classmethod
+    def _get_last_updated_times(cls):
+        if cls.last_updated_times is None:
+            cls.last_updated_times = load_last_updated_times()
+        return cls.last_updated_times
+
+    @classmethod
+    def set_last_updated(cls, netbox_id, job_name, timestamp=None):
+        """Records the time of a successful job run in the in-memory table of
+        last-updated times, which is only loaded from the job log once.
+
+        """
+        if cls.last_updated_times is None:
+            return
+        times = cls.last_updated_times.setdefault(netbox_id, {})
+        times[job_name] = timestamp or datetime.datetime.now()
+
     def load_all(self):
         """Asynchronously load netboxes from database."""
         return run_in_thread(self.load_all_s)
@@ -170,6 +234,19 @@ def is_netbox_changed(netbox1, netbox2):
     return False
 
 
+def load_netbox_digests():
+    """Loads a digest of the row data of each non-deleted netbox.
+
+    :returns: A dict of {netboxid: digest}. A netbox' digest will change
+              whenever any of its columns change.
+
+    """
+    cursor = django.db.connection.cursor()
+    cursor.execute("SELECT netboxid, md5(netbox::TEXT) FROM netbox "
+                   "WHERE deleted_at IS NULL")
+    return dict(cursor.fetchall())
+
+
 def load_last_updated_times():
     """Loads the last-successful timestamps of each job of each netbox"""
     sql = """SELECT
@@ -0,0 +1,136 @@
+#
+# Copyright (C) 2019 Uninett AS
+#
+# This file is part of Network Administration Visualized (NAV).
+#
+# NAV is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.  You should have received a copy of the GNU General Public
+# License along with NAV. If not, see <http://www.gnu.org/licenses/>.
+#
+"""A bounded, process-wide cache of device specific data.
+
+When ipdevpoll runs in multiprocess mode, all jobs for a given netbox are
+dispatched to the same worker process (see :py:mod:`nav.ipdevpoll.pool`).
+Plugins and storage managers can therefore keep data they would otherwise
+read from the database on every job run in the module-level `device_cache`
+instance::
+
+    sensors = yield device_cache.get_or_load(
+        self.netbox.id, 'sensors', self._get_sensors)
+
+Cached values expire after a maximum age. All values cached for a netbox are
+also invalidated whenever a job has saved data about that netbox, and the
+least recently used netboxes are evicted once the cache holds more than its
+maximum number of netboxes.
+
+"""
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from twisted.internet import defer
+
+from nav.ipdevpoll import db
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE = timedelta(minutes=10)
+
+
+class DeviceCache(object):
+    """A least-recently-used cache of arbitrary values, keyed on netbox id and
+    a per-netbox key.
+
+    """
+    def __init__(self, max_devices=None, max_age=DEFAULT_MAX_AGE):
+        self._max_devices = max_devices
+        self.max_age = max_age
+        # {netbox_id: {key: (timestamp, value)}}
+        self._devices = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_devices(self):
+        """The maximum number of netboxes to cache values for"""
+        if self._max_devices is None:
+            from nav.ipdevpoll.config import ipdevpoll_conf
+            self._max_devices = ipdevpoll_conf.getint('ipdevpoll',
+                                                      'device_cache_size')
+        return self._max_devices
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __repr__(self):
+        return "<%s with %d devices>" % (self.__class__.__name__, len(self))
+
+    def get(self, netbox_id, key, default=None):
+        """Returns the value cached for a netbox under key, or default if no
+        unexpired value is cached.
+
+        """
+        entries = self._devices.get(netbox_id)
+        if entries is None or key not in entries:
+            self.misses += 1
+            return default
+        timestamp, value = entries[key]
+        if datetime.now() - timestamp > self.max_age:
+            del entries[key]
+            self.misses += 1
+            return default
+        self._touch(netbox_id)
+        self.hits += 1
+        return value
+
+    def set(self, netbox_id, key, value):
+        """Caches value for a netbox under key"""
+        entries = self._devices.setdefault(netbox_id, {})
+        entries[key] = (datetime.now(), value)
+        self._touch(netbox_id)
+        while len(self._devices) > self.max_devices:
+            evicted, _ = self._devices.popitem(last=False)
+            _logger.debug("evicted netbox %s from device cache", evicted)
+
+    def _touch(self, netbox_id):
+        # OrderedDict.move_to_end() is not available on Python 2
+        self._devices[netbox_id] = self._devices.pop(netbox_id)
+
+    def get_or_load(self, netbox_id, key, loader, *args, **kwargs):
+        """Returns the value cached for a netbox under key, calling loader in
+        a database thread to produce and cache it if no value is cached.
+
+        :returns: A deferred whose result is the cached or loaded value.
+
+        """
+        missing = object()
+        value = self.get(netbox_id, key, missing)
+        if value is not missing:
+            return defer.succeed(value)
+
+        def _cache(result):
+            self.set(netbox_id, key, result)
+            return result
+
+        df = db.run_in_thread(loader, *args, **kwargs)
+        df.addCallback(_cache)
+        return df
+
+    def invalidate(self, netbox_id=None):
+        """Removes all values cached for netbox_id, or for all netboxes if
+        netbox_id is None.
+
+        """
+        if netbox_id is None:
+            self._devices.clear()
+        else:
+            self._devices.pop(netbox_id, None)
+
+
+device_cache = DeviceCache()
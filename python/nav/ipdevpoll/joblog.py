@@ -0,0 +1,133 @@
+#
+# Copyright (C) 2019 Uninett AS
+#
+# This file is part of Network Administration Visualized (NAV).
+#
+# NAV is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.  You should have received a copy of the GNU General Public
+# License along with NAV. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Buffered logging of completed jobs to the ipdevpoll_job_log table.
+
+Rather than inserting one row per completed job, job records are collected in
+the module-level `job_log` buffer, which writes them to the database using a
+single multi-row INSERT statement when it has grown to a given size, when its
+oldest record reaches a given age, or when ipdevpoll shuts down.
+
+"""
+import datetime
+import logging
+from collections import namedtuple
+
+from django.db import connection
+from twisted.internet import reactor, defer
+
+from nav.ipdevpoll import db
+
+_logger = logging.getLogger(__name__)
+
+MAX_BUFFER_SIZE = 500
+MAX_BUFFER_AGE = 10  # seconds
+
+JobRecord = namedtuple('JobRecord',
+                       'netbox_id job_name end_time duration success interval')
+
+INSERT_SQL = """
+INSERT INTO ipdevpoll_job_log
+       (netboxid, job_name, end_time, duration, success, "interval")
+SELECT record.*
+FROM (VALUES {rows}) AS record (netboxid, job_name, end_time, duration,
+                                success, "interval")
+JOIN netbox USING (netboxid)
+WHERE netbox.deleted_at IS NULL
+"""
+ROW_TEMPLATE = ("(%s::INTEGER, %s::VARCHAR, %s::TIMESTAMP,"
+                " %s::DOUBLE PRECISION, %s::BOOLEAN, %s::INTEGER)")
+
+
+class JobLogBuffer(object):
+    """Buffers job records for batched insertion into ipdevpoll_job_log"""
+
+    def __init__(self, max_size=MAX_BUFFER_SIZE, max_age=MAX_BUFFER_AGE):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.records = []
+        self._flush_call = None
+        self._shutdown_trigger = None
+        self.callLater = reactor.callLater
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, netbox_id, job_name, timestamp, duration, success,
+            interval):
+        """Adds the record of a completed job to the buffer.
+
+        :param timestamp: The job's end time, as a UNIX timestamp.
+        :param success: True if the job succeeded, False if it failed, or None
+                        if it did nothing.
+
+        """
+        self.records.append(JobRecord(
+            netbox_id, job_name, datetime.datetime.fromtimestamp(timestamp),
+            duration, success, interval))
+        if self._shutdown_trigger is None:
+            self._shutdown_trigger = reactor.addSystemEventTrigger(
+                "before", "shutdown", self.flush)
+
+        if len(self.records) >= self.max_size:
+            self.flush()
+        elif not self._flush_call or not self._flush_call.active():
+            self._flush_call = self.callLater(self.max_age, self.flush)
+
+    def flush(self):
+        """Writes all buffered records to the database.
+
+        :returns: A deferred that fires when the records have been written.
+
+        """
+        if self._flush_call and self._flush_call.active():
+            self._flush_call.cancel()
+        records, self.records = self.records, []
+        if not records:
+            return defer.succeed(None)
+
+        df = db.run_in_thread(insert_job_records, records)
+        df.addErrback(self._log_flush_failure, len(records))
+        return df
+
+    @staticmethod
+    def _log_flush_failure(failure, count):
+        if failure.check(db.ResetDBConnectionError):
+            return  # this is being logged all over the place at the moment
+        _logger.warning("failed to log %d jobs to database: %s",
+                        count, failure.getErrorMessage())
+
+
+@db.cleanup_django_debug_after
+def insert_job_records(records):
+    """Inserts a list of JobRecords into ipdevpoll_job_log using a single
+    query.
+
+    Records of netboxes that have been deleted, or whose deletion has been
+    requested, are silently discarded.
+
+    """
+    sql = INSERT_SQL.format(rows=", ".join([ROW_TEMPLATE] * len(records)))
+    params = [value for record in records for value in record]
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+    discarded = len(records) - cursor.rowcount
+    if discarded > 0:
+        _logger.info("Not logging %d jobs to db; these IP devices have been "
+                     "deleted", discarded)
+    _logger.debug("logged %d jobs to db", cursor.rowcount)
+
+
+job_log = JobLogBuffer()
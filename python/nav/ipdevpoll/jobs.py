@@ -30,9 +30,10 @@ from nav.ipdevpoll.snmp import snmpprotocol, AgentProxy
 from nav.ipdevpoll.snmp.common import SnmpError
 from nav.metrics.carbon import send_metrics
 from nav.metrics.templates import metric_prefix_for_ipdevpoll_job
-from nav.models import manage
 from nav.util import splitby
 from nav.ipdevpoll import db
+from nav.ipdevpoll.devicecache import device_cache
+from nav.ipdevpoll.joblog import job_log
 from .plugins import plugin_registry
 from . import storage, shadows, dataloader
 from .utils import log_unhandled_failure
@@ -373,9 +374,21 @@ class JobHandler(object):
 
         log_text.insert(0, "Job %r timings for %s:" %
                         (self.name, self.netbox.sysname))
+        log_text.extend(self._get_row_count_log_lines())
 
         self._timing_logger.debug("\n".join(log_text))
 
+    def _get_row_count_log_lines(self):
+        lines = []
+        for manager in self.storage_queue:
+            for phase, counts in sorted(manager.get_row_counts().items()):
+                if counts:
+                    counts = " ".join("%s=%d" % item
+                                      for item in sorted(counts.items()))
+                    lines.append("%s rows written during %s: %s" %
+                                 (manager.cls.__name__, phase, counts))
+        return lines
+
     def get_current_runtime(self):
         """Returns time elapsed since the start of the job as a timedelta."""
         return datetime.datetime.now() - self._start_time
@@ -400,8 +413,19 @@ class JobHandler(object):
             self._cleanup_containers_after_save()
 
         df = db.run_in_thread(complete_save_cycle)
+        df.addCallback(self._invalidate_device_cache)
         return df
 
+    def _invalidate_device_cache(self, result=None):
+        """Invalidates any device data cached for the netbox, if this job
+        saved anything but the netbox itself.
+
+        """
+        if any(manager.cls is not shadows.Netbox
+               for manager in self.storage_queue):
+            device_cache.invalidate(self.netbox.id)
+        return result
+
     def _prepare_containers_for_save(self):
         """Runs every queued manager's prepare routine"""
         for manager in self.storage_queue:
@@ -497,33 +521,19 @@ class JobHandler(object):
         """
         return len([o for o in gc.get_objects() if isinstance(o, cls)])
 
-    # pylint: disable=W0703
-    @defer.inlineCallbacks
     def _log_job_externally(self, success=True):
-        """Logs a job to the database"""
+        """Logs a job to the database and to Graphite.
+
+        Database records are buffered by the job_log buffer from
+        :py:mod:`nav.ipdevpoll.joblog` and written in batches.
+
+        """
         duration = self.get_current_runtime()
         duration_in_seconds = (duration.days * 86400 +
                                duration.seconds +
                                duration.microseconds / 1e6)
         timestamp = time.time()
 
-        def _create_record(timestamp):
-            netbox = manage.Netbox.objects.get(id=self.netbox.id)
-            if netbox.deleted_at:
-                _logger.info("Not logging job to db; delete of this IP device"
-                             " was requested at %s", netbox.deleted_at)
-                return
-
-            log = manage.IpdevpollJobLog(
-                netbox_id=self.netbox.id,
-                job_name=self.name,
-                end_time=datetime.datetime.fromtimestamp(timestamp),
-                duration=duration_in_seconds,
-                success=success,
-                interval=self.interval
-            )
-            log.save()
-
         def _log_to_graphite():
             prefix = metric_prefix_for_ipdevpoll_job(self.netbox.sysname,
                                                      self.name)
@@ -532,9 +542,5 @@ class JobHandler(object):
             send_metrics([runtime])
 
         _log_to_graphite()
-        try:
-            yield db.run_in_thread(_create_record, timestamp)
-        except db.ResetDBConnectionError:
-            pass  # this is being logged all over the place at the moment
-        except Exception as error:
-            _logger.warning("failed to log job to database: %s", error)
+        job_log.add(self.netbox.id, self.name, timestamp, duration_in_seconds,
+                    success, self.interval)
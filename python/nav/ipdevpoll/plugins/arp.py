@@ -35,28 +35,21 @@ the name for historical reasons.
 
 """
 
-import operator
-from datetime import datetime, timedelta
-
-from IPy import IP
 from twisted.internet import defer
 
 from nav.mibs.ip_mib import IpMib
 from nav.mibs.ipv6_mib import Ipv6Mib
 from nav.mibs.cisco_ietf_ip_mib import CiscoIetfIpMib
 
-from nav.models import manage
-from nav.ipdevpoll import Plugin, db
-from nav.ipdevpoll import storage, shadows
+from nav.ipdevpoll import Plugin
+from nav.ipdevpoll import shadows
+from nav.ipdevpoll.prefixcache import prefix_cache
 
 INCOMPLETE_MAC = '00:00:00:00:00:00'
 
 
 class Arp(Plugin):
     """Collects ARP records for IPv4 devices and NDP cache for IPv6 devices."""
-    prefix_cache = [] # prefix cache, should be sorted by descending mask length
-    prefix_cache_update_time = datetime.min
-    prefix_cache_max_age = timedelta(minutes=5)
 
     @classmethod
     def can_handle(cls, netbox):
@@ -67,9 +60,7 @@ class Arp(Plugin):
     @defer.inlineCallbacks
     def handle(self):
         # Start by checking the prefix cache
-        prefix_cache_age = datetime.now() - self.prefix_cache_update_time
-        if prefix_cache_age > self.prefix_cache_max_age:
-            yield self._update_prefix_cache()
+        yield prefix_cache.update_if_expired()
 
         self._logger.debug("Collecting IP/MAC mappings")
 
@@ -94,15 +85,14 @@ class Arp(Plugin):
                                len(cisco_ip_mappings))
             mappings.update(cisco_ip_mappings)
 
-        yield self._process_data(mappings)
+        self._process_data(mappings)
 
-    @defer.inlineCallbacks
     def _process_data(self, mappings):
         """Process collected mapping data.
 
-        1. Find all open ARP database records for this netbox
-        2. Add Arp containers for all newly discovered mappings
-        3. Add Arp containers to expire missing mappings
+        Adds Arp containers for all the discovered mappings. Comparison with
+        the open ARP records in the database, and expiry of missing mappings,
+        is left to the Arp storage manager.
 
         """
         # Collected mappings include ifindexes.  Arp table doesn't
@@ -113,113 +103,25 @@ class Arp(Plugin):
         if stripped:
             self._logger.debug("stripped %d incomplete mappings", stripped)
 
-        # Get open mappings from database to compare with
-        open_mappings = yield self._load_existing_mappings()
-
-        new_mappings = found_mappings.difference(open_mappings)
-        expireable_mappings = set(open_mappings).difference(found_mappings)
-
-        self._logger.debug("Mappings: %d new / %d expired / %d kept",
-                           len(new_mappings), len(expireable_mappings),
-                           len(open_mappings) - len(expireable_mappings))
-
-        self._make_new_mappings(new_mappings)
-        self._expire_arp_records(open_mappings[mapping]
-                                 for mapping in expireable_mappings)
-
-    @defer.inlineCallbacks
-    def _load_existing_mappings(self):
-        """Load the existing ARP records for this box from the db.
-
-        Returns:
-
-          A deferred whose result is a dictionary: { (ip, mac): arpid }
-        """
-        self._logger.debug("Loading open arp records from database")
-        open_arp_records_queryset = manage.Arp.objects.filter(
-            netbox__id=self.netbox.id,
-            end_time__gte=datetime.max).values('id', 'ip', 'mac')
-        open_arp_records = yield db.run_in_thread(
-            storage.shadowify_queryset_and_commit,
-            open_arp_records_queryset)
-        self._logger.debug("Loaded %d open records from arp",
-                           len(open_arp_records))
-
-        open_mappings = dict(((IP(arp['ip']), arp['mac']), arp['id'])
-                             for arp in open_arp_records)
-        defer.returnValue(open_mappings)
-
-    @classmethod
-    def _update_prefix_cache(cls):
-        cls.prefix_cache_update_time = datetime.now()
-        df = db.run_in_thread(cls._load_prefixes_synchronously)
-        df.addCallback(cls._update_prefix_cache_with_result)
-        return df
-
-    @classmethod
-    def _load_prefixes_synchronously(cls):
-        return list(manage.Prefix.objects.all().values('id', 'net_address'))
-
-    @classmethod
-    def _update_prefix_cache_with_result(cls, prefixes):
-        cls._logger.debug(
-            "Populating prefix cache with %d prefixes", len(prefixes))
-
-        prefixes = [(IP(p['net_address']), p['id']) for p in prefixes]
-        prefixes.sort(key=operator.itemgetter(1), reverse=True)
-
-        del cls.prefix_cache[:]
-        cls.prefix_cache.extend(prefixes)
+        self._make_mappings(found_mappings)
 
-    def _make_new_mappings(self, mappings):
-        """Convert a sequence of (ip, mac) tuples into a Arp shadow containers.
+    def _make_mappings(self, mappings):
+        """Convert a sequence of (ip, mac) tuples into Arp containers.
 
         Arguments:
 
           mappings -- An iterable containing tuples: (ip, mac)
 
         """
-        netbox = self.containers.factory(None, shadows.Netbox)
-        timestamp = datetime.now()
-        infinity = datetime.max
+        # ensure the Arp manager runs, even if nothing was found
+        arps = self.containers.setdefault(shadows.Arp, {})
 
         for (ip, mac) in mappings:
             if not ip or not mac:
                 continue  # Some devices seem to return empty results!
-            arp = self.containers.factory((ip, mac), shadows.Arp)
-            arp.netbox = netbox
-            arp.sysname = self.netbox.sysname
-            arp.ip = ip.strCompressed()
-            arp.mac = mac
-            arp.prefix_id = self._find_largest_matching_prefix(ip)
-            arp.start_time = timestamp
-            arp.end_time = infinity
-
-    def _expire_arp_records(self, arp_ids):
-        """Create containers to force expiry of a set of Arp records.
-
-        Arguments:
-
-          arp_ids -- An iterable containing db primary keys for Arp records.
-
-        """
-        timestamp = datetime.now()
-
-        for arp_id in arp_ids:
-            arp = self.containers.factory(arp_id, shadows.Arp)
-            arp.id = arp_id
-            arp.end_time = timestamp
-
-    def _find_largest_matching_prefix(self, ip):
-        """Find the largest prefix that ip is part of.
-
-        Returns:
-
-          An integer prefix ID, or None if no matches were found.
-        """
-        for prefix_addr, prefix_id in self.prefix_cache:
-            if ip in prefix_addr:
-                return prefix_id
+            arps[(ip, mac)] = shadows.Arp(
+                ip=ip.strCompressed(), mac=mac,
+                prefix_id=prefix_cache.lookup(ip))
 
 
 def ipv6_address_in_mappings(mappings):
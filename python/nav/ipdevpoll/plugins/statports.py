@@ -21,6 +21,7 @@ from django.utils.six import itervalues
 from twisted.internet import defer
 from nav.ipdevpoll import Plugin
 from nav.ipdevpoll import db
+from nav.ipdevpoll.devicecache import device_cache
 from nav.metrics.carbon import send_metrics
 from nav.metrics.templates import metric_path_for_interface
 from nav.mibs import reduce_index
@@ -82,7 +83,8 @@ class StatPorts(Plugin):
 
         timestamp = time.time()
         stats = yield self._get_stats()
-        netboxes = yield db.run_in_thread(self._get_netbox_list)
+        netboxes = yield device_cache.get_or_load(
+            self.netbox.id, 'netbox_list', self._get_netbox_list)
         tuples = list(self._make_metrics(stats, netboxes=netboxes,
                                          timestamp=timestamp))
         if tuples:
@@ -112,6 +114,7 @@ class StatPorts(Plugin):
 
         for row in itervalues(stats):
             hc_counters = use_hc_counters(row) or hc_counters
+            ifname = row['ifName'] or row['ifDescr']
             for key in LOGGED_COUNTERS:
                 if key not in row:
                     continue
@@ -119,8 +122,7 @@ class StatPorts(Plugin):
                 if value is not None:
                     for netbox in netboxes:
                         # duplicate metrics for all involved netboxes
-                        path = metric_path_for_interface(
-                            netbox, row['ifName'] or row['ifDescr'], key)
+                        path = metric_path_for_interface(netbox, ifname, key)
                         yield (path, (timestamp, value))
 
         if stats:
@@ -21,8 +21,7 @@ from twisted.internet import defer
 from django.utils.six import iteritems
 
 from nav.ipdevpoll import Plugin
-from nav.ipdevpoll import db
-from nav.ipdevpoll.db import run_in_thread
+from nav.ipdevpoll.devicecache import device_cache
 from nav.metrics.carbon import send_metrics
 from nav.metrics.templates import metric_path_for_sensor
 from nav.models.manage import Sensor
@@ -42,7 +41,8 @@ class StatSensors(Plugin):
         base_can_handle = yield defer.maybeDeferred(
             super(StatSensors, cls).can_handle, netbox)
         if base_can_handle:
-            i_can_handle = yield run_in_thread(cls._has_sensors, netbox)
+            i_can_handle = yield device_cache.get_or_load(
+                netbox.id, 'has_sensors', cls._has_sensors, netbox)
             defer.returnValue(i_can_handle)
         defer.returnValue(base_can_handle)
 
@@ -54,8 +54,10 @@ class StatSensors(Plugin):
     def handle(self):
         if self.netbox.master:
             defer.returnValue(None)
-        netboxes = yield db.run_in_thread(self._get_netbox_list)
-        sensors = yield run_in_thread(self._get_sensors)
+        netboxes = yield device_cache.get_or_load(
+            self.netbox.id, 'netbox_list', self._get_netbox_list)
+        sensors = yield device_cache.get_or_load(
+            self.netbox.id, 'sensors', self._get_sensors)
         self._logger.debug("retrieving data from %d sensors", len(sensors))
         oids = list(sensors.keys())
         requests = [oids[x:x+MAX_SENSORS_PER_REQUEST]
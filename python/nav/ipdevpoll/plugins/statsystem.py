@@ -20,7 +20,7 @@ from twisted.internet import defer
 from twisted.internet.error import TimeoutError
 
 from nav.ipdevpoll import Plugin
-from nav.ipdevpoll import db
+from nav.ipdevpoll.devicecache import device_cache
 from nav.metrics.carbon import send_metrics
 from nav.metrics.templates import (
     metric_path_for_bandwith,
@@ -70,7 +70,8 @@ class StatSystem(Plugin):
     def handle(self):
         if self.netbox.master:
             defer.returnValue(None)
-        netboxes = yield db.run_in_thread(self._get_netbox_list)
+        netboxes = yield device_cache.get_or_load(
+            self.netbox.id, 'netbox_list', self._get_netbox_list)
         bandwidth = yield self._collect_bandwidth(netboxes)
         cpu = yield self._collect_cpu(netboxes)
         sysuptime = yield self._collect_sysuptime(netboxes)
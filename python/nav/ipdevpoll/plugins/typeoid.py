@@ -29,10 +29,6 @@ from nav.models import manage
 from django.db import connection
 
 from nav.enterprise import ids
-CONSTANT_PREFIX = 'VENDOR_ID_'
-_enterprise_map = {value: constant
-                   for constant, value in vars(ids).items()
-                   if constant.startswith(CONSTANT_PREFIX)}
 
 
 class InvalidResponseError(Exception):
@@ -145,9 +141,9 @@ def get_vendor_id(sysobjectid):
 def make_new_vendor_id(sysobjectid):
     """Makes up a new vendorid based on a sysObjectID"""
     enterprise = get_enterprise_id(sysobjectid)
-    if enterprise in _enterprise_map:
-        name = _enterprise_map[enterprise]
-        name = name.replace(CONSTANT_PREFIX, '').replace('_', '').lower()[:15]
+    name = enterprise is not None and ids.get_constant_name(enterprise)
+    if name:
+        name = name.replace(ids.PREFIX, '').replace('_', '').lower()[:15]
         return name
     else:
         return u'unknown'
@@ -15,6 +15,9 @@
 #
 """Handle sending jobs to worker processes."""
 from __future__ import print_function
+import bisect
+import hashlib
+import math
 import os
 import sys
 
@@ -27,6 +30,14 @@ import twisted.internet.endpoints
 from nav.ipdevpoll import ContextLogger
 from . import control, jobs
 
+# Number of points each worker slot occupies on the netbox hash ring
+RING_REPLICAS = 64
+# A worker will not be given more than this many times the average number of
+# active jobs per worker...
+LOAD_FACTOR = 1.25
+# ...unless it has fewer than this many active jobs
+MIN_LOAD_BOUND = 10
+
 
 def initialize_worker():
     handler = JobHandler()
@@ -182,13 +193,14 @@ class Worker(object):
 
     _logger = ContextLogger()
 
-    def __init__(self, pool, threadpoolsize, max_jobs):
+    def __init__(self, pool, threadpoolsize, max_jobs, slot=None):
         self.active_jobs = 0
         self.total_jobs = 0
         self.max_concurrent_jobs = 0
         self.pool = pool
         self.threadpoolsize = threadpoolsize
         self.max_jobs = max_jobs
+        self.slot = slot
 
     @inlineCallbacks
     def start(self):
@@ -237,32 +249,99 @@ class Worker(object):
         return self.process.callRemote(Cancel, serial=serial)
 
 
+class HashRing(object):
+    """A consistent hash ring, mapping arbitrary keys to a set of nodes.
+
+    Each node is placed at several pseudo-random points on the ring. A key
+    maps to the node at the first point following the key's own hash value,
+    so that adding or removing a node only moves the keys of that node.
+
+    """
+    def __init__(self, nodes=(), replicas=RING_REPLICAS):
+        self.replicas = replicas
+        self._hashes = []
+        self._nodes = []
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(value):
+        digest = hashlib.md5(str(value).encode('utf-8')).hexdigest()
+        return int(digest[:16], 16)
+
+    def add(self, node):
+        """Adds a node to the ring"""
+        for replica in range(self.replicas):
+            point = self._hash("%s-%s" % (node, replica))
+            index = bisect.bisect(self._hashes, point)
+            self._hashes.insert(index, point)
+            self._nodes.insert(index, node)
+
+    def remove(self, node):
+        """Removes a node from the ring"""
+        points = [(point, other)
+                  for point, other in zip(self._hashes, self._nodes)
+                  if other != node]
+        self._hashes = [point for point, _ in points]
+        self._nodes = [other for _, other in points]
+
+    def get_nodes(self, key):
+        """Returns a list of every node on the ring, in the order of
+        preference for key.
+
+        """
+        start = bisect.bisect(self._hashes, self._hash(key))
+        result = []
+        for index in range(start, start + len(self._nodes)):
+            node = self._nodes[index % len(self._nodes)]
+            if node not in result:
+                result.append(node)
+        return result
+
+
 class WorkerPool(object):
     """This class represent a pool of worker processes to which jobs can
-    be scheduled"""
+    be scheduled.
+
+    Jobs are dispatched with netbox affinity: Each worker occupies a slot on
+    a consistent hash ring of netbox ids, so that all jobs for a netbox will
+    run in the same worker process for as long as that worker lives. The
+    worker's per-process caches (see :py:mod:`nav.ipdevpoll.devicecache`)
+    thereby stay warm between job runs. While a slot has no ready worker, its
+    netboxes are spread to the next slots on the ring, and a worker that has
+    more than its fair share of active jobs will pass new jobs on to the next
+    slot as well.
+
+    """
 
     _logger = ContextLogger()
 
     def __init__(self, workers, max_jobs, threadpoolsize=None):
         twisted.internet.endpoints.log = HackLog
         self.workers = set()
+        self.slots = {}
+        self.ring = HashRing(range(workers))
         self.target_count = workers
         self.max_jobs = max_jobs
         self.threadpoolsize = threadpoolsize
-        for i in range(self.target_count):
-            self._spawn_worker()
+        for slot in range(self.target_count):
+            self._spawn_worker(slot)
         self.serial = 0
         self.jobs = dict()
 
     def worker_died(self, worker):
         self.workers.remove(worker)
+        if self.slots.get(worker.slot) is worker:
+            del self.slots[worker.slot]
         if not worker.done():
-            self._spawn_worker()
+            self._spawn_worker(worker.slot)
 
     @inlineCallbacks
-    def _spawn_worker(self):
-        worker = yield Worker(self, self.threadpoolsize, self.max_jobs).start()
+    def _spawn_worker(self, slot=None):
+        worker = yield Worker(self, self.threadpoolsize, self.max_jobs,
+                              slot).start()
         self.workers.add(worker)
+        self.slots[slot] = worker
 
     def _cleanup(self, result, deferred):
         serial, worker = self.jobs[deferred]
@@ -274,15 +353,33 @@ class WorkerPool(object):
         ready_workers = [w for w in self.workers if not w.done()]
         if not ready_workers:
             raise RuntimeError("No ready workers")
-        worker = min(ready_workers, key=lambda x: x.active_jobs)
+        worker = self._choose_worker(kwargs.get('netbox'), ready_workers)
         self.serial += 1
         deferred = worker.execute(self.serial, command, **kwargs)
         if worker.done():
-            self._spawn_worker()
+            self._spawn_worker(worker.slot)
         self.jobs[deferred] = (self.serial, worker)
         deferred.addBoth(self._cleanup, deferred)
         return deferred
 
+    def _choose_worker(self, netbox, ready_workers):
+        """Chooses the worker to run a job for netbox.
+
+        The netbox' preferred worker is the first ready worker found on the
+        hash ring, unless that worker's load exceeds the bound given by
+        LOAD_FACTOR and MIN_LOAD_BOUND.
+
+        """
+        if netbox is not None:
+            active_jobs = sum(w.active_jobs for w in ready_workers)
+            max_load = max(MIN_LOAD_BOUND, int(math.ceil(
+                LOAD_FACTOR * (active_jobs + 1) / len(ready_workers))))
+            for slot in self.ring.get_nodes(netbox):
+                worker = self.slots.get(slot)
+                if worker in ready_workers and worker.active_jobs < max_load:
+                    return worker
+        return min(ready_workers, key=lambda x: x.active_jobs)
+
     def cancel(self, deferred):
         if deferred not in self.jobs:
             self._logger.debug("Cancelling job that isn't known")
@@ -309,8 +406,9 @@ class WorkerPool(object):
             active=len(self.workers),
             target=self.target_count))
         for worker in self.workers:
-            self._logger.info(" - ready {ready} active {active}"
+            self._logger.info(" - slot {slot} ready {ready} active {active}"
                               " max {max} total {total}".format(
+                                  slot=worker.slot,
                                   ready=not worker.done(),
                                   active=worker.active_jobs,
                                   max=worker.max_concurrent_jobs,
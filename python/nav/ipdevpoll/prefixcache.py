@@ -0,0 +1,93 @@
+#
+# Copyright (C) 2019 Uninett AS
+#
+# This file is part of Network Administration Visualized (NAV).
+#
+# NAV is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.  You should have received a copy of the GNU General Public
+# License along with NAV. If not, see <http://www.gnu.org/licenses/>.
+#
+"""A process-wide cache of NAV's prefixes, for mapping IP addresses to their
+most specific prefix.
+
+Plugins that need to map addresses to prefixes should share the module-level
+`prefix_cache` instance, refreshing it using `update_if_expired()` before
+use::
+
+    yield prefix_cache.update_if_expired()
+    prefix_id = prefix_cache.lookup(ip)
+
+"""
+import logging
+from datetime import datetime, timedelta
+
+from twisted.internet import defer
+
+from nav.models import manage
+from nav.prefixindex import PrefixIndex
+from nav.ipdevpoll import db
+
+_logger = logging.getLogger(__name__)
+
+
+class PrefixCache(object):
+    """Caches a longest-prefix-match index of every prefix in NAV's database,
+    mapping addresses to prefix ids.
+
+    """
+    def __init__(self, max_age=timedelta(minutes=5)):
+        self.max_age = max_age
+        self.index = PrefixIndex()
+        self.update_time = datetime.min
+
+    def is_expired(self):
+        """Returns True if the cache is older than its max age"""
+        return datetime.now() - self.update_time > self.max_age
+
+    def update_if_expired(self):
+        """Reloads the prefix list from the database if the cache has expired.
+
+        :returns: A Deferred that fires when the cache is up to date.
+
+        """
+        if self.is_expired():
+            return self.update()
+        return defer.succeed(None)
+
+    def update(self):
+        """Reloads the prefix list from the database, applying only the
+        differences to the current index.
+
+        :returns: A Deferred that fires when the update is complete.
+
+        """
+        # set this up front, to avoid concurrent jobs piling on more reloads
+        self.update_time = datetime.now()
+        df = db.run_in_thread(self._load_prefixes_synchronously)
+        df.addCallback(self._update_with_result)
+        return df
+
+    @staticmethod
+    def _load_prefixes_synchronously():
+        return dict(manage.Prefix.objects.values_list('net_address', 'id'))
+
+    def _update_with_result(self, prefixes):
+        changed, removed = self.index.sync(prefixes)
+        _logger.debug("prefix cache updated: %d prefixes (%d added or changed,"
+                      " %d removed)", len(self.index), changed, removed)
+
+    def lookup(self, ip):
+        """Returns the id of the most specific prefix that ip is part of, or
+        None if no matches were found.
+
+        """
+        return self.index.lookup(ip)
+
+
+prefix_cache = PrefixCache()
@@ -17,6 +17,7 @@
 
 import logging
 import datetime
+import hashlib
 import time
 from operator import itemgetter
 from collections import defaultdict
@@ -46,6 +47,37 @@ from .jobs import JobHandler, AbortedJobError, SuggestedReschedule
 
 _logger = logging.getLogger(__name__)
 
+# Jobs that are overdue at startup are spread over this many seconds
+MAX_OVERDUE_SPLAY = 30
+
+
+def get_phase(netbox_id, job_name, interval):
+    """Returns a stable, pseudo-random offset of a netbox' job runs within the
+    job's interval.
+
+    Scheduling every job run at a time that is phase seconds into an interval
+    spreads the runs of a job evenly across its interval, no matter when
+    ipdevpoll was started, and will keep them spread over time.
+
+    :returns: A number of seconds, 0 <= phase < interval.
+
+    """
+    if interval <= 0:
+        return 0
+    key = u"%s:%s" % (job_name, netbox_id)
+    digest = hashlib.md5(key.encode('utf-8')).hexdigest()
+    return (int(digest[:12], 16) % int(interval * 1000)) / 1000.0
+
+
+def get_next_run_time(earliest, interval, phase):
+    """Returns the first point in time from earliest that is phase seconds
+    into an interval, counting intervals from the epoch.
+
+    """
+    if interval <= 0:
+        return earliest
+    return earliest + (phase - earliest) % interval
+
 
 class NetboxJobScheduler(object):
     """Netbox job schedule handler.
@@ -71,7 +103,9 @@ class NetboxJobScheduler(object):
         self.cancelled = False
         self._deferred = Deferred()
         self._next_call = None
+        self._scheduled_time = None
         self._last_job_started_at = 0
+        self.phase = get_phase(netbox.id, job.name, job.interval)
         self.running = False
         self._start_time = None
         self._current_job = None
@@ -81,11 +115,41 @@ class NetboxJobScheduler(object):
         """Returns time elapsed since the start of the job as a timedelta."""
         return datetime.datetime.now() - self._start_time
 
-    def start(self):
-        """Start polling schedule."""
-        self._next_call = self.callLater(0, self.run_job)
+    def start(self, delay=0):
+        """Start polling schedule.
+
+        :param delay: The number of seconds to wait before the first job run.
+
+        """
+        self.reschedule(delay)
         return self._deferred
 
+    def get_initial_delay(self, last_updated=None):
+        """Returns the number of seconds to wait before the first job run,
+        which is at the next point in time given by this job's phase, but no
+        later than when the job is due.
+
+        :param last_updated: The time this job was last successfully run for
+                             the netbox, if ever. Jobs that have never been
+                             run are run right away.  Jobs that are overdue
+                             are run within MAX_OVERDUE_SPLAY seconds,
+                             spread by their phase.
+
+        """
+        if not last_updated or last_updated == datetime.datetime.min:
+            return 0
+        now = time.time()
+        interval = self.job.interval
+        due = time.mktime(last_updated.timetuple()) + interval
+        if due <= now:
+            splay = min(MAX_OVERDUE_SPLAY, interval)
+            return self.phase % splay if splay > 0 else 0
+        return min(get_next_run_time(now, interval, self.phase), due) - now
+
+    def resume(self):
+        """Runs a job that was queued due to intensity limits"""
+        self._next_call = self.callLater(0, self.run_job)
+
     def cancel(self):
         """Cancel scheduling of this job for this box.
 
@@ -148,6 +212,7 @@ class NetboxJobScheduler(object):
 
         self.count_job()
         self._last_job_started_at = time.time()
+        self._log_lateness()
 
         deferred.addErrback(self._adjust_intensity_on_snmperror)
         deferred.addCallbacks(self._reschedule_on_success,
@@ -180,11 +245,35 @@ class NetboxJobScheduler(object):
         _COUNTERS.increment(counter_path)
         _COUNTERS.start()
 
+    def _log_lateness(self):
+        """Sends the time between the scheduled and the actual start of the
+        current job run as a metric.
+
+        """
+        if self._scheduled_time is None:
+            return
+        lateness = max(0, self._last_job_started_at - self._scheduled_time)
+        prefix = metric_prefix_for_ipdevpoll_job(self.netbox.sysname,
+                                                 self.job.name)
+        send_metrics([(prefix + ".lateness",
+                       (self._last_job_started_at, lateness))])
+
     def _reschedule_on_success(self, result):
-        """Reschedules the next normal run of this job."""
-        delay = max(0, self.job.interval - self.get_runtime())
+        """Reschedules the next normal run of this job.
+
+        The next run will be at the next point in time given by this job's
+        phase, but no sooner than half an interval after the start of the
+        previous run.
+
+        """
+        now = time.time()
+        earliest = max(now,
+                       self._last_job_started_at + self.job.interval / 2.0)
+        delay = get_next_run_time(earliest, self.job.interval,
+                                  self.phase) - now
         self.reschedule(delay)
         if result:
+            NetboxLoader.set_last_updated(self.netbox.id, self.job.name)
             self._log_finished_job(True)
         else:
             self._logger.debug("job did nothing")
@@ -239,7 +328,8 @@ class NetboxJobScheduler(object):
         self._logger.debug("Next %r job for %s will be in %d seconds (%s)",
                            self.job.name, self.netbox.sysname, delay, next_time)
 
-        if self._next_call.active():
+        self._scheduled_time = time.time() + delay
+        if self._next_call and self._next_call.active():
             self._next_call.reset(delay)
         else:
             self._next_call = self.callLater(delay, self.run_job)
@@ -299,7 +389,7 @@ class NetboxJobScheduler(object):
         queue = self.get_job_queue()
         if queue and not self.is_job_limit_reached():
             handler = queue.pop(0)
-            return handler.start()
+            return handler.resume()
 
     @classmethod
     def unqueue_next_global_job(cls):
@@ -308,7 +398,7 @@ class NetboxJobScheduler(object):
             for index, handler in enumerate(cls.global_job_queue):
                 if not handler.is_job_limit_reached():
                     del cls.global_job_queue[index]
-                    return handler.start()
+                    return handler.resume()
 
     def get_job_queue(self):
         if self.job.name not in self.job_queues:
@@ -421,7 +511,8 @@ class JobScheduler(object):
         netbox = self.netboxes[netbox_id]
         scheduler = NetboxJobScheduler(self.job, netbox, self.pool)
         self.active_netboxes[netbox_id] = scheduler
-        return scheduler.start()
+        last_updated = netbox.last_updated.get(self.job.name)
+        return scheduler.start(scheduler.get_initial_delay(last_updated))
 
     def cancel_netbox_scheduler(self, netbox_id):
         if netbox_id not in self.active_netboxes:
@@ -0,0 +1,137 @@
+#
+# Copyright (C) 2019 Uninett AS
+#
+# This file is part of Network Administration Visualized (NAV).
+#
+# NAV is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.  You should have received a copy of the GNU General Public
+# License along with NAV. If not, see <http://www.gnu.org/licenses/>.
+#
+"""arp record storage and handling.
+
+The arp plugin always collects the full set of IP/MAC mappings from a router.
+Updating NAV's arp table from this set goes roughly like this:
+
+* The full set of found (ip, mac) mappings is copied into a temporary table,
+  using PostgreSQL's COPY protocol.
+
+* Any open arp record (i.e. one whose end_time='infinity') of the current
+  netbox that is not among the found mappings is closed by setting its
+  end_time to the current time.
+
+* Any found mapping that is not among the netbox' open arp records is
+  inserted as a new open record.
+
+All of this is done using a handful of set-based SQL statements in a single
+transaction, regardless of the size of the router's arp cache.
+
+"""
+import datetime
+from collections import namedtuple, defaultdict
+
+from django.db import connection, transaction
+from django.utils.six import StringIO
+
+from nav.ipdevpoll.storage import DefaultManager
+from .netbox import Netbox
+
+Arp = namedtuple('Arp', 'ip mac prefix_id')
+
+TEMP_TABLE = 'ipdevpoll_arp_found'
+
+
+class ArpManager(DefaultManager):
+    """Manages Arp records"""
+
+    def __init__(self, *args, **kwargs):
+        super(ArpManager, self).__init__(*args, **kwargs)
+        self.netbox = self.containers.get(None, Netbox)
+        self._row_counts = defaultdict(dict)
+
+    def prepare(self):
+        pass
+
+    @transaction.atomic()
+    def save(self):
+        cursor = connection.cursor()
+        found = self._copy_found_mappings(cursor)
+        now = datetime.datetime.now()
+        closed = self._close_missing(cursor, now)
+        inserted = self._insert_new(cursor, now)
+        self._logger.debug("Mappings: %d found / %d new / %d expired",
+                           found, inserted, closed)
+        self._row_counts['save'].update(inserted=inserted, closed=closed)
+
+    def _copy_found_mappings(self, cursor):
+        """Copies the found mappings into a temporary table that is dropped
+        when the current transaction commits.
+
+        :returns: The number of mappings copied.
+
+        """
+        cursor.execute(
+            """
+            CREATE TEMPORARY TABLE {table} (
+              ip INET NOT NULL,
+              mac MACADDR NOT NULL,
+              prefixid INTEGER
+            ) ON COMMIT DROP
+            """.format(table=TEMP_TABLE))
+
+        data = StringIO()
+        count = 0
+        for arp in self.get_managed():
+            prefix_id = r'\N' if arp.prefix_id is None else arp.prefix_id
+            data.write(u"%s\t%s\t%s\n" % (arp.ip, arp.mac, prefix_id))
+            count += 1
+        data.seek(0)
+        cursor.copy_from(data, TEMP_TABLE, columns=('ip', 'mac', 'prefixid'))
+        cursor.execute("ANALYZE {table}".format(table=TEMP_TABLE))
+        return count
+
+    def _close_missing(self, cursor, timestamp):
+        cursor.execute(
+            """
+            UPDATE arp
+            SET end_time = %s
+            WHERE netboxid = %s
+              AND end_time >= 'infinity'
+              AND NOT EXISTS (SELECT 1
+                              FROM {table} found
+                              WHERE found.ip = arp.ip
+                                AND found.mac = arp.mac)
+            """.format(table=TEMP_TABLE),
+            [timestamp, self.netbox.id])
+        return cursor.rowcount
+
+    def _insert_new(self, cursor, timestamp):
+        cursor.execute(
+            """
+            INSERT INTO arp
+              (netboxid, prefixid, sysname, ip, mac, start_time, end_time)
+            SELECT %s, found.prefixid, %s, found.ip, found.mac, %s, 'infinity'
+            FROM {table} found
+            WHERE NOT EXISTS (SELECT 1
+                              FROM arp
+                              WHERE arp.netboxid = %s
+                                AND arp.end_time >= 'infinity'
+                                AND arp.ip = found.ip
+                                AND arp.mac = found.mac)
+            """.format(table=TEMP_TABLE),
+            [self.netbox.id, self.netbox.sysname, timestamp, self.netbox.id])
+        return cursor.rowcount
+
+    def cleanup(self):
+        pass
+
+    def get_row_counts(self):
+        return self._row_counts
+
+
+Arp.manager = ArpManager
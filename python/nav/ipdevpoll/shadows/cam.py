@@ -42,10 +42,14 @@ grace period of MAX_MISS_COUNT collector runs.  If a "closed" cam record is
 found again within MAX_MISS_COUNT collector runs, the existing record can be
 reclaimed by resetting end_time to infinity.
 
+All database writes are done in bulk: New records are inserted using
+multi-row INSERT statements, while reclaimed and closed records are updated
+using a single UPDATE statement for each distinct set of changed values.
+
 """
 import datetime
 import logging
-from collections import namedtuple
+from collections import namedtuple, defaultdict
 
 from nav.models import manage
 from nav.models.fields import INFINITY
@@ -56,6 +60,7 @@ from .netbox import Netbox
 from .interface import Interface
 
 MAX_MISS_COUNT = 3
+INSERT_BATCH_SIZE = 1000
 
 
 Cam = namedtuple('Cam', 'ifindex mac')
@@ -77,6 +82,7 @@ class CamManager(DefaultManager):
     def __init__(self, *args, **kwargs):
         super(CamManager, self).__init__(*args, **kwargs)
         self.netbox = self.containers.get(None, Netbox)
+        self._row_counts = defaultdict(dict)
 
     def prepare(self):
         self._remove_sentinel()
@@ -118,17 +124,18 @@ class CamManager(DefaultManager):
 
     @transaction.atomic()
     def save(self):
-        # Reuse the same object over and over in an attempt to avoid the
-        # overhead of Python object creation
-        record = manage.Cam(
-            netbox_id=self.netbox.id, sysname=self.netbox.sysname,
-            start_time=datetime.datetime.now(), end_time=INFINITY)
-        for cam in self._new:
-            record.id = None
-            record.port = self._get_port_for(cam.ifindex)
-            record.ifindex = cam.ifindex
-            record.mac = cam.mac
-            record.save()
+        now = datetime.datetime.now()
+        records = [
+            manage.Cam(netbox_id=self.netbox.id, sysname=self.netbox.sysname,
+                       start_time=now, end_time=INFINITY,
+                       port=self._get_port_for(cam.ifindex),
+                       ifindex=cam.ifindex, mac=cam.mac)
+            for cam in self._new
+        ]
+        if records:
+            manage.Cam.objects.bulk_create(records,
+                                           batch_size=INSERT_BATCH_SIZE)
+        self._row_counts['save']['inserted'] = len(records)
 
         # reclaim recently closed records
         keepers = (self._previously_open[cam] for cam in self._keepers)
@@ -137,6 +144,7 @@ class CamManager(DefaultManager):
             self._logger.debug("reclaiming %r", reclaim)
             manage.Cam.objects.filter(id__in=reclaim).update(
                 end_time=INFINITY, miss_count=0)
+        self._row_counts['save']['reclaimed'] = len(reclaim)
 
     def _get_port_for(self, ifindex):
         """Gets a port name from an ifindex, either from newly collected or
@@ -160,24 +168,39 @@ class CamManager(DefaultManager):
 
         return self._ifnames.get(ifindex, '')
 
+    @transaction.atomic()
     def cleanup(self):
+        now = datetime.datetime.now()
+        updates = defaultdict(list)
         for cam_detail in self._missing:
-            self._close_missing(cam_detail)
+            upd = self._get_close_update(cam_detail, now)
+            if upd:
+                updates[tuple(sorted(upd.items()))].append(cam_detail.id)
 
-    @classmethod
-    def _close_missing(cls, cam_detail):
+        for upd, ids in updates.items():
+            self._logger.debug("closing %r: %r", upd, ids)
+            manage.Cam.objects.filter(id__in=ids).update(**dict(upd))
+        self._row_counts['cleanup']['closed'] = sum(
+            len(ids) for ids in updates.values())
+
+    @staticmethod
+    def _get_close_update(cam_detail, now):
+        """Returns a dict of field updates needed to close or further expire
+        a missing cam record.
+
+        """
         upd = {}
-        cls._logger.debug("closing %r", cam_detail)
         if cam_detail.end_time >= INFINITY:
-            upd['end_time'] = datetime.datetime.now()
+            upd['end_time'] = now
 
         if cam_detail.miss_count >= 0:
             miss_count = cam_detail.miss_count + 1
             upd['miss_count'] = (miss_count if miss_count < MAX_MISS_COUNT
                                  else None)
+        return upd
 
-        if upd:
-            manage.Cam.objects.filter(id=cam_detail.id).update(**upd)
+    def get_row_counts(self):
+        return self._row_counts
 
     @classmethod
     def add_sentinel(cls, containers):
@@ -20,14 +20,14 @@ from itertools import groupby
 
 from nav.Snmp import safestring
 from nav.models import manage
-from nav.models.event import EventQueue as Event, EventQueueVar as EventVar
 from nav.models.event import AlertHistory
+from nav.event import Event, insert_events
 from nav import natsort
 
 from nav.ipdevpoll.storage import Shadow, DefaultManager
 
 from django.db.models import Q
-from django.db import transaction
+from django.db import transaction, connection
 
 from .netbox import Netbox
 
@@ -239,8 +239,10 @@ class InterfaceManager(DefaultManager):
             self._logger.debug("posting linkState events for %r: %s",
                                linkstate_filter, ifnames(eventful_ifcs))
 
-        for ifc in eventful_ifcs:
-            ifc.post_linkstate_event()
+        events = [ifc.make_linkstate_event() for ifc in eventful_ifcs]
+        events = [event for event in events if event]
+        if events:
+            insert_events(connection.cursor(), events)
 
     def get_linkstate_filter(self):
         from nav.ipdevpoll.config import ipdevpoll_conf as conf
@@ -276,10 +278,12 @@ class Interface(Shadow):
         else:
             return False
 
-    def post_linkstate_event(self):
+    def make_linkstate_event(self):
         """
-        Posts a linkState event, but only if the interface is
+        Makes a linkState event to be posted, but only if the interface is
         administratively up and the link status has changed.
+
+        :returns: A nav.event.Event object, or None.
         """
         if not self.is_admin_up():
             self._logger.debug("withholding linkState event, interface %s is "
@@ -291,9 +295,9 @@ class Interface(Shadow):
 
         oldstate, newstate = self.ifoperstatus_change
         if newstate == manage.Interface.OPER_DOWN:
-            self._make_linkstate_event(True)
+            return self._make_linkstate_event(True)
         elif newstate == manage.Interface.OPER_UP:
-            self._make_linkstate_event(False)
+            return self._make_linkstate_event(False)
 
     def is_admin_up(self):
         """Returns True if interface is administratively up"""
@@ -301,22 +305,15 @@ class Interface(Shadow):
 
     def _make_linkstate_event(self, start=True):
         django_ifc = self.get_existing_model()
-        event = Event()
-        event.source_id = 'ipdevpoll'
-        event.target_id = 'eventEngine'
-        event.netbox_id = self.netbox.id
-        event.device = django_ifc.netbox.device
-        event.subid = self.id
-        event.event_type_id = 'linkState'
-        event.state = event.STATE_START if start else event.STATE_END
-        event.save()
-
-        EventVar(event_queue=event, variable='alerttype',
-                 value='linkDown' if start else 'linkUp').save()
-        EventVar(event_queue=event, variable='interface',
-                 value=self.ifname).save()
-        EventVar(event_queue=event, variable='ifalias',
-                 value=django_ifc.ifalias or '').save()
+        event = Event(source='ipdevpoll', target='eventEngine',
+                      netboxid=self.netbox.id,
+                      deviceid=django_ifc.netbox.device_id,
+                      subid=self.id, eventtypeid='linkState',
+                      state='s' if start else 'e')
+        event['alerttype'] = 'linkDown' if start else 'linkUp'
+        event['interface'] = self.ifname
+        event['ifalias'] = django_ifc.ifalias or ''
+        return event
 
     def get_existing_model(self, containers=None):
         """Returns the existing Django ORM object represented by this object.
@@ -19,10 +19,12 @@ import logging
 from functools import wraps
 from collections import namedtuple
 
-from twisted.internet import reactor
+from twisted.internet import defer, error, reactor
 from twisted.internet.defer import succeed
 from twisted.internet.task import deferLater
 
+from nav.oids import OID
+
 _logger = logging.getLogger(__name__)
 
 
@@ -65,6 +67,15 @@ def throttled(func):
     return wraps(func)(_wrapper)
 
 
+class SnmpError(Exception):
+    pass
+
+
+class ColumnWalkError(SnmpError):
+    """Raised when an agent mishandles a multi-column GETBULK request"""
+    pass
+
+
 # pylint: disable=R0903
 class AgentProxyMixIn(object):
     """Common AgentProxy mix-in class.
@@ -76,6 +87,11 @@ class AgentProxyMixIn(object):
     properly.
 
     """
+    # errors that make getColumns() give up parallel walks for the session;
+    # backend-specific agent errors are added by the mixing classes
+    walk_fallback_errors = (ColumnWalkError, SnmpError, error.TimeoutError,
+                            defer.TimeoutError)
+
     def __init__(self, *args, **kwargs):
         """Initializes an agent proxy.
 
@@ -89,6 +105,7 @@ class AgentProxyMixIn(object):
             self.snmp_parameters = SNMP_DEFAULTS
         self._result_cache = {}
         self._last_request = 0
+        self._parallel_walk_failed = False
         self.throttle_delay = self.snmp_parameters.throttle_delay
 
         super(AgentProxyMixIn, self).__init__(*args, **kwargs)
@@ -111,6 +128,61 @@ class AgentProxyMixIn(object):
         kwargs['maxRepetitions'] = self.snmp_parameters.max_repetitions
         return super(AgentProxyMixIn, self).getTable(*args, **kwargs)
 
+    # pylint: disable=C0103
+    def getColumns(self, oids):
+        """Retrieves the contents of several table columns.
+
+        Unless the agent only speaks SNMPv1, the columns are walked in
+        parallel, advancing every column in the same GETBULK requests. If the
+        agent mishandles such multi-column requests, or they fail with an
+        error or timeout (e.g. because the responses grow too big), the
+        columns are walked one by one using getTable() instead, and the agent
+        will not be asked for parallel walks for the remainder of this
+        session.
+
+        Each column is cached individually for the remainder of the session,
+        just like single-column getTable() responses are.
+
+        :param oids: A list of column OID strings.
+        :returns: A deferred whose result is a dictionary of the same form as
+                  that of getTable(): {column_oid: {oid: value}}
+
+        """
+        missing = [oid for oid in oids if (oid,) not in self._result_cache]
+        if len(missing) > 1 and self._can_walk_in_parallel():
+            walker = ColumnWalker(self, missing,
+                                  self.snmp_parameters.max_repetitions)
+            df = walker.walk()
+            df.addCallbacks(self._cache_columns, self._walk_failed,
+                            errbackArgs=(missing,))
+        else:
+            df = self._get_columns_serially(missing)
+
+        df.addCallback(lambda _: dict((oid, self._result_cache[(oid,)][oid])
+                                      for oid in oids))
+        return df
+
+    def _can_walk_in_parallel(self):
+        version = str(getattr(self, 'snmpVersion', ''))
+        return not self._parallel_walk_failed and '1' not in version
+
+    def _cache_columns(self, result):
+        for oid, column in result.items():
+            self._result_cache[(oid,)] = {oid: column}
+
+    def _walk_failed(self, failure, oids):
+        failure.trap(*self.walk_fallback_errors)
+        _logger.debug("%r: parallel column walk failed, walking columns "
+                      "one by one instead: %s",
+                      self, failure.getErrorMessage())
+        self._parallel_walk_failed = True
+        return self._get_columns_serially(oids)
+
+    @defer.inlineCallbacks
+    def _get_columns_serially(self, oids):
+        for oid in oids:
+            yield self.getTable([oid])
+
     # hey, we're mimicking someone else's API here, never mind the bollocks:
     # pylint: disable=C0111,C0103
     @throttled
@@ -163,5 +235,67 @@ def snmp_parameter_factory(host=None):
     return SNMPParameters(**params)
 
 
-class SnmpError(Exception):
-    pass
+class ColumnWalker(object):
+    """Walks several table columns in parallel, using GETBULK requests that
+    advance the unfinished columns together.
+
+    To keep responses within the size of a normal max_repetitions walk, each
+    request asks for at most max_repetitions columns, and divides the
+    max_repetitions values between them.
+
+    The varbinds of a GETBULK response are interleaved, i.e. the n-th varbind
+    belongs to the (n modulo number of requested OIDs)-th requested column.
+    Responses that are truncated by the agent to fit its maximum message size
+    are fine, as every column is resumed from the last OID it received.
+
+    """
+    def __init__(self, proxy, oids, max_repetitions):
+        self.proxy = proxy
+        self.max_repetitions = max_repetitions
+        self.oids = dict((OID(oid), oid) for oid in oids)
+        self.results = dict((column, []) for column in self.oids)
+        self.last_oid = dict((column, column) for column in self.oids)
+        self.active = sorted(self.oids)
+
+    @defer.inlineCallbacks
+    def walk(self):
+        """Walks the columns to their ends.
+
+        :returns: A deferred whose result is a dictionary of the same form as
+                  that of getTable(): {column_oid: {oid: value}}
+
+        """
+        while self.active:
+            requested = self.active[:self.max_repetitions]
+            repetitions = max(1, self.max_repetitions // len(requested))
+            response = yield self.proxy._getbulk(
+                0, repetitions,
+                [self.last_oid[column] for column in requested])
+            self._process_response(requested, response)
+
+        defer.returnValue(dict(
+            (self.oids[column], dict((str(oid), value)
+                                     for oid, value in self.results[column]))
+            for column in self.oids))
+
+    def _process_response(self, requested, response):
+        if not response:
+            raise ColumnWalkError("empty response while walking %d columns"
+                                  % len(requested))
+        finished = set()
+        for position, (oid, value) in enumerate(response):
+            column = requested[position % len(requested)]
+            if column in finished:
+                continue
+            oid = OID(oid)
+            if oid < self.last_oid[column]:
+                raise ColumnWalkError("response OID %s precedes %s"
+                                      % (oid, self.last_oid[column]))
+            elif oid == self.last_oid[column] or \
+                    not column.is_a_prefix_of(oid):
+                finished.add(column)
+            else:
+                self.results[column].append((oid, value))
+                self.last_oid[column] = oid
+        self.active = [column for column in self.active
+                       if column not in finished]
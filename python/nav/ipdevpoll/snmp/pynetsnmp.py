@@ -58,6 +58,13 @@ class AgentProxy(common.AgentProxyMixIn, twistedsnmp.AgentProxy):
     """pynetsnmp AgentProxy derivative to adjust the silly 1000 value
     limit imposed in getTable calls"""
 
+    # agent errors (such as tooBig) are only reported through the
+    # twistedsnmp SnmpError class in recent pynetsnmp versions
+    walk_fallback_errors = common.AgentProxyMixIn.walk_fallback_errors + (
+        netsnmp.SnmpError,
+        getattr(twistedsnmp, 'SnmpError', netsnmp.SnmpError),
+    )
+
     if pynetsnmp_limits_results():
         def getTable(self, *args, **kwargs):
             if 'limit' not in kwargs:
@@ -90,6 +90,16 @@ class DefaultManager(object):
         """Runs any necessary cleanup hooks after save is done"""
         self.cls.cleanup_after_save(self.containers)
 
+    def get_row_counts(self):
+        """Returns statistics about the database rows written by this manager.
+
+        :returns: A dict of {phase: {operation: row_count}}, where phase is
+                  either 'save' or 'cleanup'. The default manager does not
+                  keep any such statistics, and returns an empty dict.
+
+        """
+        return {}
+
     def get_managed(self):
         """Returns the list of container objects managed by this instance"""
         if self.cls in self.containers:
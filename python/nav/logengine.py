@@ -38,17 +38,23 @@ files, one of which this program will have exclusive access to.
 ## the program crashes before the lines are inserted into the
 ## database, all the read log lines are lost.
 
-## TODO: Possible future enhancement is the ability to tail a log file
-## continually, instead of reading and truncating as a cron job.
+## When run with the --follow option, logengine avoids this problem by
+## running continuously, tailing the log file instead of truncating it, and
+## recording how far into the file it has read once lines have been inserted
+## into the database.
 
 from __future__ import absolute_import, print_function
 
 import re
 import fcntl
+import io
+import os
 import sys
 import errno
 import atexit
 import logging
+import time
+from collections import namedtuple
 from configparser import ConfigParser
 import datetime
 import optparse
@@ -59,10 +65,14 @@ import nav
 import nav.logs
 from nav import db
 from nav import daemon
-from nav.config import find_configfile
+from nav.config import find_configfile, NAV_CONFIG
 
 
 PID_FILE = 'logengine.pid'
+OFFSET_FILE = 'logengine.offset'
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_POLL_INTERVAL = 1  # seconds
+MAX_RETRY_DELAY = 60  # seconds
 _logger = logging.getLogger("nav.logengine")
 
 
@@ -102,9 +112,72 @@ def get_exception_dicts(config):
     return exceptionorigin, exceptiontype, exceptiontypeorigin
 
 
-_typical_match_re = re.compile(
+def get_priority_exceptions(config):
+    """Returns a PriorityExceptions object describing the priorityexceptions
+    section of config.
+
+    """
+    return PriorityExceptions(*get_exception_dicts(config))
+
+
+class PriorityExceptions(object):
+    """Priority overrides for messages of given types and/or origins, as
+    configured in the priorityexceptions section of logger.conf.
+
+    Overrides are looked up once for each distinct combination of message
+    type and origin, and remembered from then on.
+
+    """
+    def __init__(self, exceptionorigin, exceptiontype, exceptiontypeorigin):
+        self.by_origin = self._as_priorities(exceptionorigin)
+        self.by_type = self._as_priorities(exceptiontype)
+        self.by_type_origin = dict(
+            ((msgtype, origin), priority)
+            for msgtype, origins in exceptiontypeorigin.items()
+            for origin, priority in self._as_priorities(origins).items())
+        self._overrides = {}
+
+    @staticmethod
+    def _as_priorities(exceptions):
+        """Maps the keys of exceptions to integer priorities, or to None
+        where the configured priority is invalid.
+
+        """
+        priorities = {}
+        for key, priority in exceptions.items():
+            try:
+                priorities[key] = int(priority)
+            except ValueError:
+                priorities[key] = None
+        return priorities
+
+    def get_priority(self, msgtype, origin, priority):
+        """Returns the priority of a message of type msgtype from origin,
+        whose own priority is priority.
+
+        """
+        key = (msgtype, origin)
+        try:
+            override = self._overrides[key]
+        except KeyError:
+            override = self._overrides[key] = self._find_override(
+                msgtype.lower(), origin.lower())
+        return priority if override is None else override
+
+    def _find_override(self, msgtype, origin):
+        if (msgtype, origin) in self.by_type_origin:
+            return self.by_type_origin[(msgtype, origin)]
+        elif origin in self.by_origin:
+            return self.by_origin[origin]
+        return self.by_type.get(msgtype)
+
+
+# Matches either typical log lines, or log lines where there is no timestamp
+# from the origin.  Group names of the latter are prefixed by an underscore.
+_message_re = re.compile(
     r"""
     ^
+    (?:
     (?P<servmonth>\w+) \s+ (?P<servday>\d+) \s+      # server month and date
     (?P<servhour>\d+) \: (?P<servmin>\d+) : \d+ \W+  # server hour/min/second
     (?P<origin>\S+)                                  # origin
@@ -116,54 +189,94 @@ _typical_match_re = re.compile(
     (?P<type>[^:]+) :                                # message type
     \s* (?P<description>.*)                          # message (lstripped)
     $
-    """, re.VERBOSE)
-
-# Matches log lines where there is no timestamp from the origin
-_not_so_typical_match_re = re.compile(
-    r"""
-    ^
-    (?P<month>\w+) \s+ (?P<day>\d+) \s+              # server month and date
-    ((?P<year>\d{4}) \s+ )?                          # server year, if present
-    (?P<hour>\d+) : (?P<min>\d+) : (?P<second>\d+)   # server time
+    |
+    (?P<_month>\w+) \s+ (?P<_day>\d+) \s+            # server month and date
+    ((?P<_year>\d{4}) \s+ )?                         # server year, if present
+    (?P<_hour>\d+) : (?P<_min>\d+) : (?P<_second>\d+)  # server time
     \s*
-    (?P<origin>\S+)                                  # origin
+    (?P<_origin>\S+)                                 # origin
     .* %                                             # eat chars until % appears
-    (?P<type>[a-zA-Z0-9\-_]+) :                      # message type
-    \s* (?P<description>.*)                          # message (lstripped)
+    (?P<_type>[a-zA-Z0-9\-_]+) :                     # message type
+    \s* (?P<_description>.*)                         # message (lstripped)
     $
+    )
     """, re.VERBOSE)
 
+_MESSAGE_FIELDS = ('origin', 'month', 'day', 'year', 'hour', 'min', 'second',
+                   'type', 'description')
+_UNTIMED_MESSAGE_FIELDS = tuple('_' + field for field in _MESSAGE_FIELDS)
+
+_priority_re = re.compile(r"^(.*)-(\d*)-(.*)$")
+_category_re = re.compile(r"\W(gw|sw|gsw|fw|ts)\W")
 _type_match_re = re.compile(r"\w+-\d+-?\S*:")
 
+_MONTHS = dict((name, number) for number, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct",
+     "nov", "dec"], 1))
+
+ParsedMessage = namedtuple(
+    'ParsedMessage',
+    'time origin category type facility priorityid mnemonic description')
+
+
+def parse_message(line, now=None):
+    """Parses a Cisco syslog line in a single pass.
+
+    :param line: A line of log text.
+    :param now: The current time, used to guess the year of timestamps that
+                lack one.  Defaults to datetime.datetime.now().
+    :returns: A ParsedMessage tuple, or None if the line cannot be parsed.
+
+    """
+    match = '%' in line and _message_re.match(line)
+    if not match:
+        return None
+    if match.start('type') >= 0:
+        fields = match.group(*_MESSAGE_FIELDS)
+    else:
+        fields = match.group(*_UNTIMED_MESSAGE_FIELDS)
+    origin, month, day, year, hour, minute, second, msgtype, description = (
+        fields)
+
+    prioritymatch = _priority_re.match(msgtype)
+    if not prioritymatch or not prioritymatch.group(1):
+        return None
+    facility, priority, mnemonic = prioritymatch.groups()
+
+    month = _MONTHS.get(month.lower())
+    if year:
+        year = int(year)
+    else:
+        if now is None:
+            now = datetime.datetime.now()
+        year = now.year - 1 if month == 12 and now.month == 1 else now.year
+    try:
+        timestamp = datetime.datetime(year, month, int(day), int(hour),
+                                      int(minute), int(second))
+        priority = int(priority)
+    except (ValueError, TypeError):
+        return None
+
+    categorymatch = _category_re.search(origin)
+    category = categorymatch.group(1) if categorymatch else "rest"
+    return ParsedMessage(timestamp, origin, category, msgtype, facility,
+                         priority, mnemonic, description)
+
 
 def create_message(line, database=None):
+    parsed = parse_message(line)
+    if parsed:
+        return Message(parsed.time, parsed.origin, parsed.type,
+                       parsed.description)
+    log_unparseable_line(line, database)
 
-    typicalmatch = _typical_match_re.search(line)
-    match = typicalmatch or _not_so_typical_match_re.search(line)
 
-    if match:
-        origin = match.group('origin')
-        month = find_month(match.group('month'))
-        if 'year' in match.groupdict() and match.group('year'):
-            year = int(match.group('year'))
-        else:
-            year = find_year(month)
-        day = int(match.group('day'))
-        hour = int(match.group('hour'))
-        minute = int(match.group('min'))
-        second = int(match.group('second'))
-        msgtype = match.group('type')
-        description = match.group('description')
+def log_unparseable_line(line, database=None):
+    """Puts a line that cannot be parsed into the error log, if it shows
+    signs of being in the Cisco format.
 
-        try:
-            timestamp = datetime.datetime(year, month, day, hour, minute,
-                                          second)
-            return Message(timestamp, origin, msgtype, description)
-        except (ValueError, TypeError):
-            _logger.debug("syslog line parse error: %s", line,
-                          exc_info=True)
-
-    # if this message shows sign of cisco format, put it in the error log
+    """
+    _logger.debug("syslog line parse error: %s", line)
     typematch = _type_match_re.search(line)
     if typematch and database:
         database.execute("INSERT INTO errorerror (message) "
@@ -339,12 +452,11 @@ def read_log_lines(config):
 
 # pylint: disable=W0703
 def parse_and_insert(line, database,
-                     categories, origins, types,
-                     exceptionorigin, exceptiontype, exceptiontypeorigin):
+                     categories, origins, types, exceptions):
     """Parse a line of cisco log text and insert into db."""
 
     try:
-        message = create_message(line, database)
+        message = parse_message(line)
     except Exception:
         _logger.exception("Unhandled exception during message parse: %s",
                           line)
@@ -352,18 +464,49 @@ def parse_and_insert(line, database,
 
     if message:
         try:
-            insert_message(message, database,
-                           categories, origins, types,
-                           exceptionorigin, exceptiontype, exceptiontypeorigin)
+            _insert_message_row(
+                make_message_row(message, database,
+                                 categories, origins, types, exceptions),
+                database)
         except Exception:
             _logger.exception("Unhandled exception during message insert: %s",
                               line)
             raise
+    else:
+        log_unparseable_line(line, database)
 
 
 def insert_message(message, database,
                    categories, origins, types,
                    exceptionorigin, exceptiontype, exceptiontypeorigin):
+    exceptions = PriorityExceptions(exceptionorigin, exceptiontype,
+                                    exceptiontypeorigin)
+    _insert_message_row(
+        make_message_row(message, database,
+                         categories, origins, types, exceptions),
+        database)
+
+
+def _insert_message_row(row, database):
+    ## insert message into database
+    database.execute("INSERT INTO log_message (time, origin, "
+                     "newpriority, type, message) "
+                     "VALUES (%s, %s, %s, %s, %s)",
+                     row)
+
+
+def make_message_row(message, database,
+                     categories, origins, types, exceptions):
+    """Returns a (time, origin, newpriority, type, message) tuple for a
+    log_message row.
+
+    :param message: A ParsedMessage tuple or a Message object.
+    :param exceptions: A PriorityExceptions object.
+
+    Any category, origin or message type not already present in the
+    categories, origins and types dictionaries is added to the database.
+
+    """
     ## check origin (host)
     if message.origin not in origins:
         if message.category not in categories:
@@ -379,34 +522,11 @@ def insert_message(message, database,
     typeid = types[message.facility][message.mnemonic]
 
     ## overload priority if exceptions are set
-    m_type = message.type.lower()
-    origin = message.origin.lower()
-    if (m_type in exceptiontypeorigin and
-            origin in exceptiontypeorigin[m_type]):
-        try:
-            message.priorityid = int(exceptiontypeorigin[m_type][origin])
-        except ValueError:
-            pass
-
-    elif origin in exceptionorigin:
-        try:
-            message.priorityid = int(exceptionorigin[origin])
-        except ValueError:
-            pass
-
-    elif m_type in exceptiontype:
-        try:
-            message.priorityid = int(exceptiontype[m_type])
-        except ValueError:
-            pass
+    priority = exceptions.get_priority(message.type, message.origin,
+                                       message.priorityid)
 
-    ## insert message into database
-    database.execute("INSERT INTO log_message (time, origin, "
-                     "newpriority, type, message) "
-                     "VALUES (%s, %s, %s, %s, %s)",
-                     (str(message.time), originid,
-                      message.priorityid, typeid,
-                      message.description))
+    return (str(message.time), originid, priority, typeid,
+            message.description)
 
 
 def add_category(category, categories, database):
@@ -453,23 +573,356 @@ def logengine(config, options):
     types = get_types(database)
 
     ## parse priorityexceptions
-    (exceptionorigin,
-     exceptiontype,
-     exceptiontypeorigin) = get_exception_dicts(config)
+    exceptions = get_priority_exceptions(config)
 
     ## add new records
     _logger.debug("Reading new log entries")
     my_parse_and_insert = swallow_all_but_db_exceptions(parse_and_insert)
     for line in read_log_lines(config):
         my_parse_and_insert(line, database,
-                            categories, origins, types,
-                            exceptionorigin, exceptiontype,
-                            exceptiontypeorigin)
+                            categories, origins, types, exceptions)
 
     # Make sure it all sticks
     connection.commit()
 
 
+def follow(config, options):
+    """Runs continuously, tailing the watched cisco log file and inserting
+    new messages into the database in batches.
+
+    Unlike logengine(), this never truncates the log file, which should
+    instead be rotated by other means.  The dictionaries of known categories,
+    origins and message types are kept between batches.
+
+    While the database is unavailable, the same batch is retried with an
+    increasing delay, and the saved read offset is not advanced.
+
+    """
+    verify_singleton(options.quiet)
+
+    filename = config.get("paths", "syslog")
+    charset = _get_option(config, "paths", "charset", "ISO-8859-1")
+    offset_file = _get_option(config, "paths", "offsetfile",
+                              os.path.join(NAV_CONFIG['PID_DIR'],
+                                           OFFSET_FILE))
+    batch_size = int(_get_option(config, "follow", "batchsize",
+                                 DEFAULT_BATCH_SIZE))
+    poll_interval = float(_get_option(config, "follow", "pollinterval",
+                                      DEFAULT_POLL_INTERVAL))
+
+    exceptions = get_priority_exceptions(config)
+    tailer = LogTailer(filename, offset_file)
+    inserter = BatchInserter(charset, exceptions)
+    _logger.info("Following %s", filename)
+
+    lines = []
+    retry_delay = 0
+    while True:
+        if not lines:
+            lines = tailer.read_lines(batch_size)
+            if not lines:
+                time.sleep(poll_interval)
+                continue
+
+        try:
+            count = inserter.insert(lines)
+        except db.driver.Error:
+            # keep the batch and the old offset, the database may be back
+            retry_delay = min(MAX_RETRY_DELAY, (retry_delay * 2) or 1)
+            _logger.exception("Failed to insert %d log lines, retrying in "
+                              "%d seconds", len(lines), retry_delay)
+            time.sleep(retry_delay)
+            continue
+
+        retry_delay = 0
+        _logger.debug("Inserted %d messages from %d log lines", count,
+                      len(lines))
+        tailer.save_offset()
+        lines = []
+
+
+class BatchInserter(object):
+    """Inserts batches of log lines into the database, keeping the
+    dictionaries of known categories, origins and message types between
+    batches.
+
+    A batch is inserted using a single COPY statement.  If that fails because
+    of bad data, the batch is inserted again, one message at a time, and only
+    the messages that fail are discarded.
+
+    """
+    # psycopg2 refuses parameters containing NUL characters with ValueError
+    DATA_ERRORS = (db.driver.DataError, db.driver.IntegrityError, ValueError)
+
+    def __init__(self, charset, exceptions):
+        self.charset = charset
+        self.exceptions = exceptions
+        self.categories = None
+        self.origins = None
+        self.types = None
+
+    def insert(self, lines):
+        """Inserts the messages of a batch of log lines.
+
+        :returns: The number of messages inserted.
+        :raises db.driver.Error: if the batch could not be inserted for
+                                 other reasons than bad data, e.g. if the
+                                 database connection was lost.  Nothing is
+                                 inserted, and the batch should be retried.
+
+        """
+        connection = None
+        try:
+            connection = db.getConnection('logger', 'logger')
+            try:
+                return self._copy(lines, connection)
+            except self.DATA_ERRORS:
+                _logger.exception("Failed to copy %d log lines, inserting "
+                                  "them one by one", len(lines))
+                self._rollback(connection)
+            return self._insert_singly(lines, connection)
+        except db.driver.Error:
+            self._rollback(connection)
+            raise
+
+    def _copy(self, lines, connection):
+        database = connection.cursor()
+        self._load_dictionaries(database)
+        messages = parse_messages(decode_lines(lines, self.charset), database)
+        rows = make_message_rows(messages, database,
+                                 self.categories, self.origins, self.types,
+                                 self.exceptions)
+        count = copy_message_rows(rows, database)
+        connection.commit()
+        return count
+
+    def _insert_singly(self, lines, connection):
+        database = connection.cursor()
+        self._load_dictionaries(database)
+        count = 0
+        for message in parse_messages(decode_lines(lines, self.charset),
+                                      database):
+            database.execute("SAVEPOINT log_message")
+            try:
+                _insert_message_row(
+                    make_message_row(message, database,
+                                     self.categories, self.origins,
+                                     self.types, self.exceptions),
+                    database)
+            except self.DATA_ERRORS:
+                _logger.exception("Discarding log message: %s",
+                                  message.description)
+                database.execute("ROLLBACK TO SAVEPOINT log_message")
+                # the dictionaries may refer to rows that were rolled back
+                self.categories = None
+                self._load_dictionaries(database)
+            else:
+                count += 1
+        connection.commit()
+        return count
+
+    def _load_dictionaries(self, database):
+        if self.categories is None:
+            self.categories = get_categories(database)
+            self.origins = get_origins(database)
+            self.types = get_types(database)
+
+    def _rollback(self, connection):
+        # the dictionaries may refer to rows that were rolled back
+        self.categories = None
+        if connection is None:
+            return
+        try:
+            connection.rollback()
+        except db.driver.Error:
+            pass
+
+
+def _get_option(config, section, option, default):
+    if config.has_option(section, option):
+        return config.get(section, option)
+    return default
+
+
+def decode_lines(lines, charset):
+    """Decodes and yields each line of a sequence of byte strings"""
+    for line in lines:
+        yield line.decode(charset, 'replace').rstrip(u'\r')
+
+
+def parse_messages(lines, database=None):
+    """Parses and yields a ParsedMessage tuple for each parseable line"""
+    now = datetime.datetime.now()
+    for line in lines:
+        try:
+            message = parse_message(line, now)
+        except Exception:
+            _logger.exception("Unhandled exception during message parse: %s",
+                              line)
+            continue
+        if message:
+            yield message
+        else:
+            log_unparseable_line(line, database)
+
+
+def make_message_rows(messages, database,
+                      categories, origins, types, exceptions):
+    """Yields a log_message row for each message"""
+    for message in messages:
+        yield make_message_row(message, database,
+                               categories, origins, types, exceptions)
+
+
+_copy_escapes = {u'\\': u'\\\\', u'\t': u'\\t', u'\n': u'\\n',
+                 u'\r': u'\\r'}
+_copy_escape_re = re.compile(u'[\\\\\t\n\r]')
+
+
+def _copy_value(value):
+    if value is None:
+        return u'\\N'
+    return _copy_escape_re.sub(lambda match: _copy_escapes[match.group()],
+                               six.text_type(value))
+
+
+def copy_message_rows(rows, database):
+    """Inserts log_message rows using a single COPY statement.
+
+    :returns: The number of rows inserted.
+
+    """
+    data = io.StringIO()
+    count = 0
+    for row in rows:
+        data.write(u'\t'.join(_copy_value(value) for value in row))
+        data.write(u'\n')
+        count += 1
+    if count:
+        data.seek(0)
+        database.copy_expert("COPY log_message (time, origin, newpriority, "
+                             "type, message) FROM STDIN", data)
+    return count
+
+
+class LogTailer(object):
+    """Incrementally reads complete lines from a growing log file, keeping
+    track of how far into the file it has read.
+
+    Rotation of the log file, i.e. when the file is renamed and a new file is
+    created in its place, is detected once the end of the old file has been
+    reached.  Truncation of the log file is also detected.
+
+    The read offset can be saved to a file, and is restored from that file
+    when the same log file is opened again.
+
+    """
+    CHUNK_SIZE = 65536
+
+    def __init__(self, filename, offset_file=None):
+        self.filename = filename
+        self.offset_file = offset_file
+        self.offset = 0
+        self._file = None
+        self._inode = None
+        self._buffer = b''
+        self._lines = []
+
+    def read_lines(self, max_lines):
+        """Returns a list of up to max_lines complete lines, as byte strings
+        without line terminators.  The list is empty if no new complete lines
+        are available.
+
+        """
+        while len(self._lines) < max_lines and self._read_chunk():
+            pass
+        lines = self._lines[:max_lines]
+        del self._lines[:max_lines]
+        self.offset += sum(len(line) + 1 for line in lines)
+        return lines
+
+    def _read_chunk(self):
+        if self._file is None and not self._open():
+            return False
+
+        chunk = self._file.read(self.CHUNK_SIZE)
+        if chunk:
+            lines = (self._buffer + chunk).split(b'\n')
+            self._buffer = lines.pop()
+            self._lines.extend(lines)
+            return True
+
+        if self._lines:
+            return False  # lines from the current file must be consumed first
+        if self._is_rotated():
+            if self._buffer:
+                # the old file's last line was never terminated
+                self._lines.append(self._buffer)
+                self._buffer = b''
+                return False
+            _logger.info("%s was rotated, reopening", self.filename)
+            self._close()
+            self.offset = 0
+            return self._open(restore_offset=False)
+        if os.fstat(self._file.fileno()).st_size < self.offset:
+            _logger.info("%s was truncated, reading from the start",
+                         self.filename)
+            self._file.seek(0)
+            self.offset = 0
+            self._buffer = b''
+            return True
+        return False
+
+    def _open(self, restore_offset=True):
+        try:
+            self._file = open(self.filename, 'rb')
+        except IOError as err:
+            if err.errno != errno.ENOENT:
+                _logger.exception("Couldn't open logfile %s", self.filename)
+            return False
+
+        stat = os.fstat(self._file.fileno())
+        self._inode = stat.st_ino
+        if restore_offset:
+            inode, offset = self._load_offset()
+            if inode == self._inode and offset <= stat.st_size:
+                self.offset = offset
+        self._file.seek(self.offset)
+        self._buffer = b''
+        return True
+
+    def _close(self):
+        if self._file:
+            self._file.close()
+        self._file = None
+
+    def _is_rotated(self):
+        try:
+            return os.stat(self.filename).st_ino != self._inode
+        except OSError:
+            return False  # no new file yet
+
+    def _load_offset(self):
+        try:
+            with open(self.offset_file) as offset_file:
+                inode, offset = offset_file.read().split()
+                return int(inode), int(offset)
+        except (IOError, OSError, TypeError, ValueError):
+            return None, 0
+
+    def save_offset(self):
+        """Saves the current read offset to the offset file"""
+        if not self.offset_file or self._inode is None:
+            return
+        temp_file = self.offset_file + '.tmp'
+        try:
+            with open(temp_file, 'w') as offset_file:
+                offset_file.write("%d %d\n" % (self._inode, self.offset))
+            os.rename(temp_file, self.offset_file)
+        except (IOError, OSError):
+            _logger.exception("Couldn't save offset to %s", self.offset_file)
+
+
 def swallow_all_but_db_exceptions(func):
     def _swallow(*args, **kwargs):
         try:
@@ -489,6 +942,9 @@ def parse_options():
     parser.add_option("-q", "--quiet", action="store_true", dest="quiet",
                       help="quietly exit without returning an error code if "
                       "logengine is already running")
+    parser.add_option("-f", "--follow", action="store_true", dest="follow",
+                      help="run continuously, following the log file "
+                      "instead of reading and truncating it")
 
     return parser.parse_args()
 
@@ -508,6 +964,8 @@ def main():
         # get rid of old records
         delete_old_messages(config)
         sys.exit(0)
+    elif options.follow:
+        follow(config, options)
     else:
         logengine(config, options)
 
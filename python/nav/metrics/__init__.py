@@ -26,6 +26,10 @@ class GraphiteConfigParser(NAVConfigParser):
 [carbon]
 host = 127.0.0.1
 port = 2003
+protocol = udp
+queue_size = 100000
+batch_size = 500
+flush_interval = 1.0
 
 [graphiteweb]
 base=http://localhost:8000/
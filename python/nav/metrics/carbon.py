@@ -15,16 +15,42 @@
 #
 """
 This module implements various common API to send metrics to a
-Graphite/Carbon backend. It currently only supports the UDP line protocol,
-as it's the easiest to implement, and will also work without vodoo in
-asynchronous programs (i .e. such as ipdevpoll, which is implemented using
-Twisted).
+Graphite/Carbon backend.
+
+Two transports are supported, selectable through the `protocol` option of
+graphite.conf:
+
+* `udp`: Carbon's plaintext UDP line protocol. This is the default, as it's
+  the easiest to implement, and will also work without vodoo in
+  asynchronous programs (i .e. such as ipdevpoll, which is implemented using
+  Twisted). Metrics are silently lost whenever the receiver cannot keep up.
+
+* `pickle`: Carbon's pickle protocol, over a persistent TCP connection.
+  Metrics are queued in a bounded in-memory queue and sent in batches, by
+  size and by time. The connection is re-established with an exponential
+  backoff when lost. Inside a running Twisted reactor, all network I/O is
+  non-blocking, and sending is paused while the transport's write buffer is
+  full. Counters of sent, dropped and queued metrics are themselves sent as
+  metrics. Queued metrics are flushed when the program exits, or when the
+  reactor shuts down.
+
 """
+import atexit
 import logging
+import os
 import socket
+import struct
+import sys
 import time
 import warnings
+import weakref
+from collections import deque
+
+from django.utils.six.moves import cPickle as pickle
+from twisted.internet.protocol import Protocol, ReconnectingClientFactory
+
 from nav.metrics import CONFIG
+from nav.metrics.templates import metric_path_for_carbon_sender
 
 _logger = logging.getLogger(__name__)
 _error_timestamp = 0
@@ -118,6 +144,8 @@ def send_metrics(metric_tuples):
     """
     host = CONFIG.get("carbon", "host")
     port = CONFIG.getint("carbon", "port")
+    if CONFIG.get("carbon", "protocol").strip().lower() == PICKLE:
+        return get_pickle_sender(host, port).send(metric_tuples)
     return send_metrics_to(metric_tuples, host, port)
 
 
@@ -158,3 +186,344 @@ def metrics_to_packets(metric_tuples):
     if output:
         packet = bytes(output)
         yield packet
+
+
+#
+# Pickle protocol transport
+#
+
+PICKLE = 'pickle'
+MAX_BACKOFF_DELAY = 60  # seconds
+_pickle_sender = None
+
+
+def get_pickle_sender(host, port):
+    """Returns this process' pickle sender, creating it on the first call.
+
+    If the Twisted reactor is running when the sender is created, a
+    non-blocking TwistedPickleSender is used, otherwise a SocketPickleSender.
+
+    """
+    # pylint: disable=W0603
+    global _pickle_sender
+    if _pickle_sender is None:
+        options = dict(
+            queue_size=CONFIG.getint("carbon", "queue_size"),
+            batch_size=CONFIG.getint("carbon", "batch_size"),
+            flush_interval=CONFIG.getfloat("carbon", "flush_interval"),
+        )
+        if _reactor_is_running():
+            _pickle_sender = TwistedPickleSender(host, port, **options)
+        else:
+            _pickle_sender = SocketPickleSender(host, port, **options)
+    return _pickle_sender
+
+
+def _reactor_is_running():
+    reactor = sys.modules.get('twisted.internet.reactor')
+    return bool(reactor and reactor.running)
+
+
+def metrics_to_pickle(metric_tuples):
+    """Converts a list of metric tuples to a length-prefixed Carbon pickle
+    protocol message.
+
+    :param metric_tuples: A list of metric tuples in the form
+                          [(path, (timestamp, value)), ...]
+
+    """
+    payload = pickle.dumps(list(metric_tuples), protocol=2)
+    return struct.pack("!L", len(payload)) + payload
+
+
+def _to_pickle_tuple(metric_tuple):
+    """Converts a metric tuple to builtin types only, as Carbon's pickle
+    receiver refuses to unpickle anything else (such as Decimal values).
+    """
+    path, (timestamp, value) = metric_tuple
+    return str(path), (int(timestamp), float(value))
+
+
+class PickleSender(object):
+    """Base class for queueing metrics for batched transmission to a
+    Carbon pickle receiver.
+
+    Subclasses must implement flush().
+
+    """
+    stats_interval = 60  # seconds
+
+    def __init__(self, host, port=2004, queue_size=100000, batch_size=500,
+                 flush_interval=1.0):
+        self.host = host
+        self.port = port
+        self.queue = deque()
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sent = 0
+        self.dropped = 0
+        self.name = os.path.basename(sys.argv[0] or 'python')
+        self._last_flush = time.time()
+        self._last_stats = time.time()
+
+    def __repr__(self):
+        return "<%s [%s]:%s queued=%d sent=%d dropped=%d>" % (
+            self.__class__.__name__, self.host, self.port, len(self.queue),
+            self.sent, self.dropped)
+
+    def send(self, metric_tuples):
+        """Queues metrics for sending, flushing the queue when a batch is
+        full or the flush interval has passed.
+
+        Metrics that do not fit in the queue are dropped.
+
+        """
+        self._enqueue(metric_tuples)
+        self._enqueue_stats()
+        now = time.time()
+        if (len(self.queue) >= self.batch_size or
+                now - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def _enqueue(self, metric_tuples):
+        for metric in metric_tuples:
+            if len(self.queue) >= self.queue_size:
+                self.dropped += 1
+                continue
+            try:
+                self.queue.append(_to_pickle_tuple(metric))
+            except (TypeError, ValueError) as error:
+                _logger.debug("dropping invalid metric %r: %s", metric, error)
+                self.dropped += 1
+
+    def _enqueue_stats(self):
+        now = time.time()
+        if now - self._last_stats >= self.stats_interval:
+            self._last_stats = now
+            self._enqueue(self.get_stats_metrics(now))
+
+    def get_stats_metrics(self, timestamp=None):
+        """Returns the sender's counters as a list of metric tuples"""
+        timestamp = timestamp or time.time()
+        counters = (('sent', self.sent),
+                    ('dropped', self.dropped),
+                    ('queued', len(self.queue)))
+        return [(metric_path_for_carbon_sender(self.name, counter),
+                 (timestamp, value))
+                for counter, value in counters]
+
+    def next_batch(self):
+        """Removes and returns the next batch of metrics from the queue"""
+        count = min(self.batch_size, len(self.queue))
+        return [self.queue.popleft() for _ in range(count)]
+
+    def requeue(self, batch):
+        """Puts an unsent batch back at the front of the queue, dropping
+        whatever doesn't fit.
+
+        """
+        room = max(0, self.queue_size - len(self.queue))
+        self.dropped += max(0, len(batch) - room)
+        self.queue.extendleft(reversed(batch[:room]))
+
+    def flush(self):
+        """Sends as many queued metrics as possible"""
+        raise NotImplementedError
+
+
+class SocketPickleSender(PickleSender):
+    """Sends metrics using a blocking TCP socket, for use in programs that
+    aren't Twisted based.
+
+    """
+    connect_timeout = 5.0
+
+    def __init__(self, *args, **kwargs):
+        super(SocketPickleSender, self).__init__(*args, **kwargs)
+        self.sock = None
+        self._backoff = 0
+        self._next_attempt = 0
+        atexit.register(_close_at_exit, weakref.ref(self))
+
+    def flush(self):
+        self._last_flush = time.time()
+        while self.queue:
+            if not self._connect():
+                return
+            batch = self.next_batch()
+            try:
+                self.sock.sendall(metrics_to_pickle(batch))
+            except socket.error as error:
+                self.requeue(batch)
+                self._disconnect(error)
+                return
+            self.sent += len(batch)
+
+    def close(self):
+        """Makes a final attempt at flushing the queue, regardless of any
+        reconnection backoff, and closes the connection.
+        """
+        self._next_attempt = 0
+        self.flush()
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def _connect(self):
+        if self.sock:
+            return True
+        if time.time() < self._next_attempt:
+            return False
+        try:
+            self.sock = socket.create_connection((self.host, self.port),
+                                                 self.connect_timeout)
+        except socket.error as error:
+            self._disconnect(error)
+            return False
+        self._backoff = 0
+        return True
+
+    def _disconnect(self, error):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        self._backoff = min(MAX_BACKOFF_DELAY, (self._backoff * 2) or 1)
+        self._next_attempt = time.time() + self._backoff
+        _handle_error(error, self.host, self.port)
+
+
+def _close_at_exit(sender_ref):
+    sender = sender_ref()
+    if sender is not None:
+        sender.close()
+
+
+class TwistedPickleSender(PickleSender):
+    """Sends metrics using a non-blocking, automatically reconnecting Twisted
+    TCP connection.
+
+    """
+    shutdown_timeout = 5.0  # seconds
+
+    def __init__(self, *args, **kwargs):
+        from twisted.internet import reactor, task
+        super(TwistedPickleSender, self).__init__(*args, **kwargs)
+        self.reactor = reactor
+        self.protocol = None
+        self.paused = False
+        self.factory = _CarbonClientFactory(self)
+        self.factory.maxDelay = MAX_BACKOFF_DELAY
+        self._closed = None
+        self._close_timeout = None
+        reactor.connectTCP(self.host, self.port, self.factory)
+        self.loop = task.LoopingCall(self.send, [])
+        self.loop.start(self.flush_interval, now=False)
+        reactor.addSystemEventTrigger('before', 'shutdown', self.shutdown)
+
+    def send(self, metric_tuples):
+        from twisted.python import threadable
+        if not threadable.isInIOThread():
+            self.reactor.callFromThread(self.send, list(metric_tuples))
+            return
+        super(TwistedPickleSender, self).send(metric_tuples)
+
+    def flush(self):
+        self._last_flush = time.time()
+        while self.queue and self.protocol and not self.paused:
+            batch = self.next_batch()
+            self.protocol.transport.write(metrics_to_pickle(batch))
+            self.sent += len(batch)
+
+    def shutdown(self):
+        """Flushes the queue and closes the connection, as the reactor shuts
+        down.
+
+        :returns: A Deferred that fires when the connection has been closed,
+                  or when shutdown_timeout has passed while waiting for a
+                  connection to send the queued metrics on.
+
+        """
+        from twisted.internet import defer
+        if self.loop.running:
+            self.loop.stop()
+        if not self.queue and not self.protocol:
+            self.factory.stopTrying()
+            return None
+        self._closed = defer.Deferred()
+        self._close_timeout = self.reactor.callLater(self.shutdown_timeout,
+                                                     self._shutdown_done)
+        if self.protocol:
+            self._close()
+        return self._closed
+
+    def _close(self):
+        transport = self.protocol.transport
+        transport.unregisterProducer()
+        self.paused = False
+        self.flush()
+        self.factory.stopTrying()
+        transport.loseConnection()
+
+    def _shutdown_done(self):
+        self.factory.stopTrying()
+        if self._close_timeout and self._close_timeout.active():
+            self._close_timeout.cancel()
+        if not self._closed.called:
+            self._closed.callback(None)
+
+    # IPushProducer implementation, letting the transport tell us when its
+    # write buffer is full
+
+    def pauseProducing(self):
+        self.paused = True
+
+    def resumeProducing(self):
+        self.paused = False
+        self.flush()
+
+    def stopProducing(self):
+        self.protocol = None
+
+    def connection_made(self, protocol):
+        _logger.debug("connected to carbon at [%s]:%s", self.host, self.port)
+        self.protocol = protocol
+        self.paused = False
+        protocol.transport.registerProducer(self, True)
+        if self._closed is not None:
+            self._close()
+        else:
+            self.flush()
+
+    def connection_lost(self, reason=None):
+        self.protocol = None
+        if self._closed is not None:
+            self._shutdown_done()
+            return
+        error = reason.getErrorMessage() if reason else "connection lost"
+        _handle_error(error, self.host, self.port)
+
+
+class _CarbonClientProtocol(Protocol):
+    def connectionMade(self):
+        self.factory.sender.connection_made(self)
+
+    def connectionLost(self, reason=None):
+        self.factory.sender.connection_lost(reason)
+
+
+class _CarbonClientFactory(ReconnectingClientFactory):
+    protocol = _CarbonClientProtocol
+
+    def __init__(self, sender):
+        self.sender = sender
+
+    def buildProtocol(self, addr):
+        self.resetDelay()
+        return ReconnectingClientFactory.buildProtocol(self, addr)
+
+    def clientConnectionFailed(self, connector, reason):
+        _handle_error(reason.getErrorMessage(), self.sender.host,
+                      self.sender.port)
+        ReconnectingClientFactory.clientConnectionFailed(self, connector,
+                                                         reason)
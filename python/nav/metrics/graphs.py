@@ -96,7 +96,7 @@ META_LOOKUPS = (
     (re.compile(r'devices\.(?P<sysname>[^_]+)[^.]+\..*\.sysuptime$'),
      dict(alias="{sysname}", title="Uptime", unit="days")),
 
-    (re.compile(r'\.ipdevpoll\..*\.runtime$'),
+    (re.compile(r'\.ipdevpoll\..*\.(runtime|lateness)$'),
      dict(transform="keepLastValue({id})")),
 
 )
@@ -15,15 +15,33 @@
 #
 """Functions for reverse-mapping metric names to NAV objects"""
 
+from collections import defaultdict, OrderedDict
 import re
+import threading
+import time
+import uuid
 
+from nav.metrics.names import escape_metric_name
 from nav.models.manage import Netbox, Interface, Prefix, Sensor
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
 from django.utils.lru_cache import lru_cache
 from django.utils.six import iteritems
 
 
-__all__ = ['reverses', 'lookup']
+__all__ = ['reverses', 'reverses_many', 'lookup', 'lookup_many',
+           'invalidate_cache']
 _reverse_handlers = []
+_bulk_reverse_handlers = {}
+
+CACHE_TIMEOUT = 300  # seconds, the staleness bound of lookup_many()
+CACHE_SIZE = 20000  # entries
+_GENERATION_KEY = 'nav.metrics.lookup:generation'
+
+# The characters replaced by escape_metric_name(), as arguments to the SQL
+# translate() function
+_ESCAPED_CHARS = "./ (),"
+_ESCAPE_ARGS = [_ESCAPED_CHARS, "_" * len(_ESCAPED_CHARS)]
 
 
 def _lookup(metric):
@@ -46,6 +64,141 @@ def _lookup(metric):
 lookup = lru_cache(maxsize=200)(_lookup)
 
 
+def lookup_many(metrics):
+    """
+    Looks up the NAV objects of many metric paths at once.
+
+    Metric paths are grouped by the reverse lookup function that handles
+    them, and each group is resolved using a single database query, if the
+    lookup function has a bulk counterpart registered using
+    reverses_many().  Results are kept in a bounded in-process cache for
+    CACHE_TIMEOUT seconds, or until invalidate_cache() is called in any
+    process.
+
+    Changes that are made without sending Django model signals, such as
+    ipdevpoll's queryset.update() calls, raw SQL or changes made by
+    processes that never import this module, do not invalidate the cache.
+    Results may therefore be up to CACHE_TIMEOUT seconds out of date.
+
+    :param metrics: An iterable of Graphite metric paths.
+    :return: A dict of {metric: object}, where object is None for metrics
+             that could not be mapped to a NAV object.
+
+    """
+    metrics = set(metrics)
+    _lookup_cache.validate(_get_generation())
+    result = {}
+    groups = defaultdict(list)
+    for metric in metrics:
+        found, obj = _lookup_cache.get(metric)
+        if found:
+            result[metric] = obj
+            continue
+        for pattern, func in _reverse_handlers:
+            match = pattern.search(metric)
+            if match:
+                groups[func].append((metric, match.groupdict()))
+                break
+        else:
+            result[metric] = None
+
+    resolved = {}
+    for func, matches in iteritems(groups):
+        kwargs_list = [kwargs for _metric, kwargs in matches]
+        bulk_func = _bulk_reverse_handlers.get(func)
+        if bulk_func:
+            objects = bulk_func(kwargs_list)
+        else:
+            objects = [func(**kwargs) for kwargs in kwargs_list]
+        for (metric, _kwargs), obj in zip(matches, objects):
+            resolved[metric] = obj
+
+    result.update(resolved)
+    _lookup_cache.update(resolved)
+    return result
+
+
+def invalidate_cache(**_kwargs):
+    """Invalidates all metric lookups cached by lookup_many(), in every
+    process.
+
+    This is connected to the post_save and post_delete signals of the models
+    that metrics are mapped to.  The results are cached in each process, while
+    a cache generation key is kept in Django's shared cache: Every process
+    discards its cached results once it sees that the generation has changed.
+
+    Changes that send no signals here are not seen, see lookup_many().
+
+    """
+    cache.set(_GENERATION_KEY, uuid.uuid4().hex, None)
+    _lookup_cache.validate(None)
+
+
+for _model in (Netbox, Interface, Sensor, Prefix):
+    post_save.connect(invalidate_cache, sender=_model,
+                      dispatch_uid='nav.metrics.lookup')
+    post_delete.connect(invalidate_cache, sender=_model,
+                        dispatch_uid='nav.metrics.lookup')
+
+
+def _get_generation():
+    generation = cache.get(_GENERATION_KEY)
+    if generation is None:
+        # The key may have been evicted, so pick a new generation, as others
+        # may have been set since this process last looked
+        cache.add(_GENERATION_KEY, uuid.uuid4().hex, None)
+        generation = cache.get(_GENERATION_KEY)
+    return generation
+
+
+class _LookupCache(object):
+    """A thread-safe, size-bounded, least-recently-used cache of metric
+    lookup results, which expire after a given number of seconds.
+
+    The cache is emptied whenever it is validated against a different cache
+    generation than the last time.
+
+    """
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.generation = None
+        self._entries = OrderedDict()  # {metric: (expiry time, object)}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def validate(self, generation):
+        """Empties the cache unless generation is the current generation"""
+        with self._lock:
+            if generation != self.generation or generation is None:
+                self._entries.clear()
+                self.generation = generation
+
+    def get(self, metric):
+        """Returns a (found, object) tuple for metric"""
+        with self._lock:
+            entry = self._entries.pop(metric, None)
+            if entry is None or entry[0] < time.time():
+                return False, None
+            self._entries[metric] = entry
+            return True, entry[1]
+
+    def update(self, objects):
+        """Caches a dict of {metric: object}"""
+        expires = time.time() + self.timeout
+        with self._lock:
+            for metric, obj in iteritems(objects):
+                self._entries.pop(metric, None)
+                self._entries[metric] = (expires, obj)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+_lookup_cache = _LookupCache(CACHE_SIZE, CACHE_TIMEOUT)
+
+
 def reverses(pattern):
     """Decorator to map regex patterns to reverse lookup functions"""
     try:
@@ -60,6 +213,22 @@ def reverses(pattern):
     return _decorator
 
 
+def reverses_many(func):
+    """Decorator to register a function that performs the reverse lookups of
+    func for many metrics at once.
+
+    The decorated function is called with a list of keyword argument dicts,
+    like the ones func would be called with, and must return a list of the
+    corresponding results.
+
+    """
+    def _decorator(bulk_func):
+        _bulk_reverse_handlers[func] = bulk_func
+        return bulk_func
+
+    return _decorator
+
+
 ### Reverse lookup functions
 
 @reverses(r'\.devices\.(?P<sysname>[^.]+)\.ports\.(?P<ifname>[^\.]+)')
@@ -77,7 +246,7 @@ def _reverse_sensor(sysname, name):
 
 
 @reverses(r'\.devices\.(?P<sysname>[^.]+)\.cpu\.(?P<cpuname>[^.]+)')
-def _reverse_device(sysname, cpuname):
+def _reverse_cpu(sysname, cpuname):
     netbox = _single_like_match(Netbox, sysname=sysname)
     sysname = getattr(netbox, 'sysname', sysname)
     return "%s: %s" % (sysname, cpuname)
@@ -102,8 +271,120 @@ def _reverse_prefix(netaddr):
     return _single_like_match(Prefix, netaddr=netaddr)
 
 
+### Bulk reverse lookup functions
+
+@reverses_many(_reverse_interface)
+def _reverse_interfaces(kwargs_list):
+    sysnames = set(kwargs['sysname'] for kwargs in kwargs_list)
+    ifnames = set(kwargs['ifname'] for kwargs in kwargs_list)
+    interfaces = _escaped_match(
+        Interface.objects.select_related('netbox'),
+        ('netbox.sysname', sysnames),
+        ('interface.ifname', ifnames, 'interface.ifdescr', ifnames))
+    by_ifname = defaultdict(list)
+    by_ifdescr = defaultdict(list)
+    for interface in interfaces:
+        sysname = escape_metric_name(interface.netbox.sysname)
+        by_ifname[(sysname, escape_metric_name(interface.ifname))].append(
+            interface)
+        by_ifdescr[(sysname, escape_metric_name(interface.ifdescr))].append(
+            interface)
+    return [_single(by_ifname.get((kwargs['sysname'], kwargs['ifname']))) or
+            _single(by_ifdescr.get((kwargs['sysname'], kwargs['ifname'])))
+            for kwargs in kwargs_list]
+
+
+@reverses_many(_reverse_sensor)
+def _reverse_sensors(kwargs_list):
+    sensors = _escaped_match(
+        Sensor.objects.select_related('netbox'),
+        ('netbox.sysname', set(kwargs['sysname'] for kwargs in kwargs_list)),
+        ('sensor.internal_name', set(kwargs['name']
+                                     for kwargs in kwargs_list)))
+    by_name = defaultdict(list)
+    for sensor in sensors:
+        by_name[(escape_metric_name(sensor.netbox.sysname),
+                 escape_metric_name(sensor.internal_name))].append(sensor)
+    return [_single(by_name.get((kwargs['sysname'], kwargs['name'])))
+            for kwargs in kwargs_list]
+
+
+@reverses_many(_reverse_cpu)
+def _reverse_cpus(kwargs_list):
+    netboxes = _netboxes_by_sysname(kwargs_list)
+    return ["%s: %s" % (getattr(netboxes.get(kwargs['sysname']), 'sysname',
+                                kwargs['sysname']),
+                        kwargs['cpuname'])
+            for kwargs in kwargs_list]
+
+
+@reverses_many(_reverse_uptime)
+def _reverse_uptimes(kwargs_list):
+    netboxes = _netboxes_by_sysname(kwargs_list)
+    return [netboxes.get(kwargs['sysname']) or kwargs['sysname']
+            for kwargs in kwargs_list]
+
+
+@reverses_many(_reverse_device)
+def _reverse_devices(kwargs_list):
+    netboxes = _netboxes_by_sysname(kwargs_list)
+    return [netboxes.get(kwargs['sysname']) for kwargs in kwargs_list]
+
+
+@reverses_many(_reverse_prefix)
+def _reverse_prefixes(kwargs_list):
+    prefixes = _escaped_match(
+        Prefix.objects.all(),
+        ('prefix.netaddr', set(kwargs['netaddr'] for kwargs in kwargs_list)))
+    by_netaddr = defaultdict(list)
+    for prefix in prefixes:
+        by_netaddr[escape_metric_name(str(prefix.net_address))].append(prefix)
+    return [_single(by_netaddr.get(kwargs['netaddr']))
+            for kwargs in kwargs_list]
+
+
 ### Helper functions
 
+def _netboxes_by_sysname(kwargs_list):
+    """Returns a dict of {escaped_sysname: netbox} for the sysnames of
+    kwargs_list, leaving out ambiguous sysnames.
+    """
+    netboxes = _escaped_match(
+        Netbox.objects.all(),
+        ('netbox.sysname', set(kwargs['sysname'] for kwargs in kwargs_list)))
+    by_sysname = defaultdict(list)
+    for netbox in netboxes:
+        by_sysname[escape_metric_name(netbox.sysname)].append(netbox)
+    return dict((sysname, matches[0])
+                for sysname, matches in iteritems(by_sysname)
+                if len(matches) == 1)
+
+
+def _escaped_match(qset, *conditions):
+    """Filters qset by the escaped values of columns.
+
+    Each condition is a sequence of one or more (column, values) pairs, of
+    which at least one must match.  A pair matches if the value of column,
+    escaped like a metric name component, is among values.
+
+    """
+    where = []
+    params = []
+    for condition in conditions:
+        clauses = []
+        for column, values in zip(condition[::2], condition[1::2]):
+            clauses.append("translate({0}::TEXT, %s, %s) = ANY(%s)".format(
+                column))
+            params.extend(_ESCAPE_ARGS + [list(values)])
+        where.append(" OR ".join(clauses))
+    return qset.extra(where=where, params=params)
+
+
+def _single(matches):
+    if matches and len(matches) == 1:
+        return matches[0]
+
+
 def _single_like_match(model, related=None, **kwargs):
     args = [("{field}::TEXT LIKE %s".format(field=key), value)
             for key, value in iteritems(kwargs)]
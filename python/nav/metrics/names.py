@@ -18,6 +18,7 @@
 from collections import OrderedDict
 import itertools
 import json
+from django.utils.lru_cache import lru_cache
 from django.utils.six.moves.urllib.parse import urlencode, urljoin
 from django.utils.six.moves.urllib.request import Request, urlopen
 from django.utils.six.moves.urllib.error import URLError
@@ -36,6 +37,11 @@ def escape_metric_name(string):
     return string.replace('\x00', '')  # some devices have crazy responses!
 
 
+# A memoized escape_metric_name, for names that recur on every collection run,
+# such as counter, sensor and cpu names.
+cached_escape_metric_name = lru_cache(maxsize=10000)(escape_metric_name)
+
+
 def join_series(names):
     """Joins a list of metric names to a single series list.
 
@@ -16,13 +16,36 @@
 """
 Metric naming templates for various things that NAV sends/retrieves from
 Graphite.
+
+The device and interface prefixes are memoized in bounded LRU caches, keyed
+on sysname and (sysname, ifname), as the stats collectors in ipdevpoll will
+otherwise escape the same names over and over again on every collection run.
 """
+import socket
+
 from django.utils import six
+from django.utils.lru_cache import lru_cache
 
-from nav.metrics.names import escape_metric_name
+from nav.metrics.names import escape_metric_name, cached_escape_metric_name
 
 # pylint: disable=C0111
 
+DEVICE_PREFIX_CACHE_SIZE = 10000
+INTERFACE_PREFIX_CACHE_SIZE = 50000
+
+
+def clear_metric_prefix_caches():
+    """Empties all the memoized metric prefix caches"""
+    _device_prefix.cache_clear()
+    _interface_prefix.cache_clear()
+    cached_escape_metric_name.cache_clear()
+
+
+def _get_sysname(sysname):
+    if hasattr(sysname, 'sysname'):
+        return sysname.sysname
+    return sysname
+
 
 def metric_prefix_for_ipdevpoll_job(sysname, job_name):
     tmpl = "{device}.ipdevpoll.{job_name}"
@@ -42,23 +65,30 @@ def metric_path_for_bandwith_peak(sysname, is_percent):
                        percent="_percent" if is_percent else "")
 
 
+def metric_path_for_carbon_sender(program, counter):
+    tmpl = "nav.carbon-sender.{hostname}.{program}.{counter}"
+    return tmpl.format(hostname=escape_metric_name(socket.gethostname()),
+                       program=escape_metric_name(program),
+                       counter=escape_metric_name(counter))
+
+
 def metric_path_for_cpu_load(sysname, cpu_name, interval):
     tmpl = "{cpu}.{cpu_name}.loadavg{interval}min"
     return tmpl.format(cpu=metric_prefix_for_cpu(sysname),
-                       cpu_name=escape_metric_name(cpu_name),
+                       cpu_name=cached_escape_metric_name(cpu_name),
                        interval=escape_metric_name(str(interval)))
 
 
 def metric_path_for_cpu_utilization(sysname, cpu_name):
     tmpl = "{cpu}.{cpu_name}.utilization"
     return tmpl.format(cpu=metric_prefix_for_cpu(sysname),
-                       cpu_name=escape_metric_name(cpu_name))
+                       cpu_name=cached_escape_metric_name(cpu_name))
 
 
 def metric_path_for_interface(sysname, ifname, counter):
     tmpl = "{interface}.{counter}"
     return tmpl.format(interface=metric_prefix_for_interface(sysname, ifname),
-                       counter=escape_metric_name(counter))
+                       counter=cached_escape_metric_name(counter))
 
 
 def metric_path_for_packet_loss(sysname):
@@ -85,7 +115,7 @@ def metric_prefix_for_sensors(sysname):
 def metric_path_for_sensor(sysname, sensor):
     tmpl = "{prefix}.{sensor}"
     return tmpl.format(prefix=metric_prefix_for_sensors(sysname),
-                       sensor=escape_metric_name(sensor))
+                       sensor=cached_escape_metric_name(sensor))
 
 
 def metric_path_for_service_availability(sysname, handler, service_id):
@@ -117,13 +147,21 @@ def metric_prefix_for_cpu(sysname):
 
 
 def metric_prefix_for_device(sysname):
+    return _device_prefix(_get_sysname(sysname))
+
+
+@lru_cache(maxsize=DEVICE_PREFIX_CACHE_SIZE)
+def _device_prefix(sysname):
     tmpl = "nav.devices.{sysname}"
-    if hasattr(sysname, 'sysname'):
-        sysname = sysname.sysname
     return tmpl.format(sysname=escape_metric_name(sysname))
 
 
 def metric_prefix_for_interface(sysname, ifname):
+    return _interface_prefix(_get_sysname(sysname), ifname)
+
+
+@lru_cache(maxsize=INTERFACE_PREFIX_CACHE_SIZE)
+def _interface_prefix(sysname, ifname):
     tmpl = "{ports}.{ifname}"
     return tmpl.format(ports=metric_prefix_for_ports(sysname),
                        ifname=escape_metric_name(ifname))
@@ -160,12 +198,11 @@ def metric_prefix_for_system(sysname):
 
 def metric_prefix_for_multicast_group(group):
     tmpl = "nav.multicast.groups.{group}"
-    return tmpl.format(group=escape_metric_name(six.text_type(group)))
+    return tmpl.format(group=cached_escape_metric_name(six.text_type(group)))
 
 
 def metric_path_for_multicast_usage(group, sysname):
     tmpl = "{group}.igmp_usage.{sysname}"
-    if hasattr(sysname, 'sysname'):
-        sysname = sysname.sysname
+    sysname = _get_sysname(sysname)
     return tmpl.format(group=metric_prefix_for_multicast_group(group),
-                       sysname=escape_metric_name(sysname))
+                       sysname=cached_escape_metric_name(sysname))
@@ -59,20 +59,24 @@ This module should provide an API for evaluating threshold expressions.
 Alerting is outside of the scope of this module.
 
 """
+from collections import OrderedDict, namedtuple
 from datetime import timedelta
 from functools import partial
+from multiprocessing.pool import ThreadPool
 import logging
 import re
+import time
 
 from django.utils.six import iteritems, iterkeys
 
 from nav.metrics.data import get_metric_average
-from nav.metrics.graphs import get_metric_meta, extract_series_name
+from nav.metrics.graphs import (get_metric_meta, extract_series_name,
+                                translate_serieslist_to_regex)
 
 
 # Pattern to extract the ID of a metric from a series name returned in a
 # Graphite render response.
-from nav.metrics.lookup import lookup
+from nav.metrics.lookup import lookup, lookup_many
 from nav.models.manage import Interface
 
 
@@ -87,6 +91,9 @@ YEAR = timedelta(days=365).total_seconds()
 
 MEGA = 1e6
 
+DEFAULT_WORKERS = 4
+DEFAULT_BATCH_SIZE = 20
+
 _logger = logging.getLogger(__name__)
 
 
@@ -117,6 +124,8 @@ class ThresholdEvaluator(object):
         self.period = period
         self.raw = raw
         self.result = {}
+        self.maximums = None
+        self.fetch_time = None
 
         if not raw:
             meta = get_metric_meta(target)
@@ -139,8 +148,26 @@ class ThresholdEvaluator(object):
         _logger.debug("retrieved %d values from graphite for %r, "
                       "period %s: %r",
                       len(averages), self.target, self.period, averages)
-        self.result = dict((extract_series_name(key), dict(value=value))
-                           for key, value in iteritems(averages))
+        return self.set_values(averages)
+
+    def set_values(self, averages, only_matching=False):
+        """
+        Sets the values to evaluate from a dict of average values retrieved
+        from Graphite.
+
+        :param averages: A dict of {series_name: average_value}.
+        :param only_matching: If True, only the series that match this
+                              evaluator's target are used.
+        """
+        result = ((extract_series_name(key), value)
+                  for key, value in iteritems(averages))
+        if only_matching:
+            pattern = translate_serieslist_to_regex(
+                extract_series_name(self.orig_target))
+            result = ((metric, value) for metric, value in result
+                      if _matches_fully(pattern, metric))
+        self.result = dict((metric, dict(value=value))
+                           for metric, value in result)
         return self.result
 
     def evaluate(self, expression, invert=False):
@@ -189,7 +216,10 @@ class ThresholdEvaluator(object):
         if metric in self.result:
             current = self.result[metric]['value']
             if percent:
-                maximum = get_metric_maximum(metric)
+                if self.maximums is not None:
+                    maximum = self.maximums.get(metric)
+                else:
+                    maximum = get_metric_maximum(metric)
                 if not maximum:
                     return None  # cannot relatively match a maximum=0
                 self.result[metric]['max'] = maximum
@@ -213,6 +243,109 @@ def get_metric_maximum(metric):
                 return maximum
 
 
+def get_metric_maximums(metrics):
+    """
+    Returns the maximum values of many metrics, like get_metric_maximum(),
+    using a fixed number of database queries.
+
+    :returns: A dict of {metric: maximum} for each metric whose maximum value
+              could be determined.
+    """
+    counters = [metric for metric in metrics
+                if 'octets' in metric.split('.')[-1].lower()]
+    maximums = {}
+    for metric, obj in iteritems(lookup_many(counters)):
+        if isinstance(obj, Interface) and obj.speed:
+            # Same unsafe assumption as in get_metric_maximum()
+            maximums[metric] = obj.speed * MEGA
+    return maximums
+
+
+Batch = namedtuple('Batch', 'period targets evaluators combined')
+
+
+def get_values_in_batches(evaluators, workers=DEFAULT_WORKERS,
+                          batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Retrieves the values of many evaluators from Graphite, like calling
+    get_values() on each of them, but using fewer, concurrent requests.
+
+    The targets of non-raw evaluators that look at the same period are
+    combined into requests of up to batch_size targets, since the values
+    returned for each metric do not depend on which evaluator asked for them.
+    Raw evaluators are only combined with other evaluators of the same
+    target.  Up to workers requests are made concurrently.
+
+    :returns: A dict of {evaluator: exception} for the evaluators whose
+              values could not be retrieved.
+    """
+    batches = make_batches(evaluators, batch_size)
+    if not batches:
+        return {}
+    pool = ThreadPool(min(workers, len(batches)))
+    try:
+        results = pool.map(_fetch_batch, batches)
+    finally:
+        pool.close()
+        pool.join()
+
+    errors = {}
+    for batch, (averages, error, fetch_time) in zip(batches, results):
+        for evaluator in batch.evaluators:
+            evaluator.fetch_time = fetch_time
+            if error:
+                errors[evaluator] = error
+            else:
+                evaluator.set_values(averages, only_matching=batch.combined)
+    return errors
+
+
+def make_batches(evaluators, batch_size=DEFAULT_BATCH_SIZE):
+    """Groups evaluators into batches whose targets can be retrieved from
+    Graphite in a single request.
+
+    :returns: A list of Batch tuples.
+    """
+    groups = OrderedDict()
+    for evaluator in evaluators:
+        key = (evaluator.period, evaluator.target if evaluator.raw else None)
+        targets = groups.setdefault(key, OrderedDict())
+        targets.setdefault(evaluator.target, []).append(evaluator)
+
+    batches = []
+    for (period, _raw_target), targets in iteritems(groups):
+        targets = list(iteritems(targets))
+        for index in range(0, len(targets), batch_size):
+            chunk = targets[index:index + batch_size]
+            batches.append(Batch(
+                period=period,
+                targets=[target for target, _evaluators in chunk],
+                evaluators=[evaluator for _target, members in chunk
+                            for evaluator in members],
+                combined=len(chunk) > 1))
+    return batches
+
+
+def _fetch_batch(batch):
+    start = "-{0}".format(interval_to_graphite(batch.period))
+    start_time = time.time()
+    try:
+        averages = get_metric_average(
+            batch.targets, start=start, end='now', ignore_unknown=True)
+    except Exception as error:  # pylint: disable=broad-except
+        return None, error, time.time() - start_time
+    fetch_time = time.time() - start_time
+    _logger.debug("retrieved %d values from graphite for %d targets, "
+                  "period %s, in %.3f s", len(averages), len(batch.targets),
+                  batch.period, fetch_time)
+    return averages, None, fetch_time
+
+
+def _matches_fully(pattern, string):
+    match = pattern.match(string)
+    return match is not None and match.end() == len(string)
+
+
 class InvalidExpressionError(Exception):
     """Invalid threshold match expression"""
     pass
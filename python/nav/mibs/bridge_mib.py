@@ -19,11 +19,12 @@ from twisted.internet import defer
 
 from . import mibretriever
 from nav.mibs import reduce_index
+from nav.smidumps import get_mib
 
 
 class BridgeMib(mibretriever.MibRetriever):
     """MibRetriever implementation for BRIDGE-MIB"""
-    from nav.smidumps.bridge_mib import MIB as mib
+    mib = get_mib('bridge_mib')
 
     def get_baseport_ifindex_map(self):
         """Retrieves the mapping between baseport numbers and ifindexes.
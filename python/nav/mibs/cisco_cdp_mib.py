@@ -24,13 +24,14 @@ from twisted.internet import defer
 from nav.mibs import reduce_index
 
 from . import mibretriever
+from nav.smidumps import get_mib
 
 ADDRESS_TYPE_IP = 1
 
 
 class CiscoCDPMib(mibretriever.MibRetriever):
     "A MibRetriever for handling CISCO-CDP-MIB"
-    from nav.smidumps.cisco_cdp_mib import MIB as mib
+    mib = get_mib('cisco_cdp_mib')
 
     def get_neighbors_last_change(self):
         """Retrieves the sysUpTime value of the last time the cdp neighbors
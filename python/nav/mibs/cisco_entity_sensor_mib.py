@@ -15,11 +15,12 @@
 #
 
 from nav.mibs.entity_sensor_mib import EntitySensorMib
+from nav.smidumps import get_mib
 
 
 class CiscoEntitySensorMib(EntitySensorMib):
     """This MIB should collect all present sensors from Cisco NEXUS boxes."""
-    from nav.smidumps.cisco_entity_sensor_mib import MIB as mib
+    mib = get_mib('cisco_entity_sensor_mib')
     TYPE_COLUMN = 'entSensorType'
     SCALE_COLUMN = 'entSensorScale'
     PRECISION_COLUMN = 'entSensorPrecision'
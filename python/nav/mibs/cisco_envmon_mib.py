@@ -21,6 +21,7 @@ from twisted.internet import defer
 from nav.mibs import reduce_index
 from nav.mibs import mibretriever
 from nav.models.manage import Sensor
+from nav.smidumps import get_mib
 
 
 POWER_SENSOR_TYPE = {
@@ -33,7 +34,7 @@ POWER_SENSOR_TYPE = {
 
 
 class CiscoEnvMonMib(mibretriever.MibRetriever):
-    from nav.smidumps.cisco_envmon_mib import MIB as mib
+    mib = get_mib('cisco_envmon_mib')
 
     def _get_voltage_sensors(self):
         df = self.retrieve_columns([
@@ -19,11 +19,12 @@ from __future__ import absolute_import
 from IPy import IP
 from twisted.internet import defer
 from . import mibretriever
+from nav.smidumps import get_mib
 
 
 class CiscoHSRPMib(mibretriever.MibRetriever):
     """A MibRetriever for handling CISCO-HSRP-MIB"""
-    from nav.smidumps.cisco_hsrp_mib import MIB as mib
+    mib = get_mib('cisco_hsrp_mib')
 
     @defer.inlineCallbacks
     def get_virtual_addresses(self):
@@ -19,6 +19,7 @@ from twisted.internet import defer
 
 from .ip_mib import IpMib
 from nav.oids import OID
+from nav.smidumps import get_mib
 
 
 class CiscoIetfIpMib(IpMib):
@@ -32,7 +33,7 @@ class CiscoIetfIpMib(IpMib):
     IP-MIB.
 
     """
-    from nav.smidumps.cisco_ietf_ip_mib import MIB as mib
+    mib = get_mib('cisco_ietf_ip_mib')
 
     @classmethod
     def address_index_to_ip(cls, index):
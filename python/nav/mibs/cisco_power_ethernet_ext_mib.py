@@ -14,7 +14,8 @@
 # along with NAV. If not, see <http://www.gnu.org/licenses/>.
 #
 from nav.mibs import mibretriever
+from nav.smidumps import get_mib
 
 
 class CiscoPowerEthernetExtMib(mibretriever.MibRetriever):
-    from nav.smidumps.cisco_power_ethernet_ext_mib import MIB as mib
+    mib = get_mib('cisco_power_ethernet_ext_mib')
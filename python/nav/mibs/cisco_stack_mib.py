@@ -14,10 +14,11 @@
 # along with NAV. If not, see <http://www.gnu.org/licenses/>.
 #
 from nav.mibs import mibretriever
+from nav.smidumps import get_mib
 
 
 class CiscoStackMib(mibretriever.MibRetriever):
-    from nav.smidumps.cisco_stack_mib import MIB as mib
+    mib = get_mib('cisco_stack_mib')
 
     def get_bandwidth_percent(self):
         return self.get_next('sysTraffic')
@@ -21,11 +21,12 @@ from collections import namedtuple
 from twisted.internet import defer
 
 from . import mibretriever
+from nav.smidumps import get_mib
 
 
 class CiscoVlanIftableRelationshipMib(mibretriever.MibRetriever):
     """A CISCO-VLAN-IFTABLE-RELATIONSHIP-MIB MibRetriever"""
-    from nav.smidumps.cisco_vlan_iftable_relationship_mib import MIB as mib
+    mib = get_mib('cisco_vlan_iftable_relationship_mib')
 
     @defer.inlineCallbacks
     def get_routed_vlan_ifindexes(self):
@@ -19,12 +19,13 @@ from twisted.internet.defer import returnValue
 
 from nav.bitvector import BitVector
 from . import mibretriever
+from nav.smidumps import get_mib
 
 CHARS_IN_1024_BITS = 128
 
 
 class CiscoVTPMib(mibretriever.MibRetriever):
-    from nav.smidumps.cisco_vtp_mib import MIB as mib
+    mib = get_mib('cisco_vtp_mib')
 
     @defer.inlineCallbacks
     def get_trunk_native_vlans(self):
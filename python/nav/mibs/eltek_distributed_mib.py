@@ -18,6 +18,7 @@ from twisted.internet.defer import inlineCallbacks, returnValue
 from nav.mibs.mibretriever import MibRetriever
 from nav.models.manage import Sensor
 from nav.oids import OID
+from nav.smidumps import get_mib
 
 DESIRED_SENSORS = (
     'batteryVoltage',
@@ -41,7 +42,7 @@ UNIT_TRANSLATION = {
 
 class EltekDistributedMib(MibRetriever):
     """MibRetriever for ELTEK-DISTRIBUTED-MIB"""
-    from nav.smidumps.eltek_distributed_mib import MIB as mib
+    mib = get_mib('eltek_distributed_mib')
 
     @inlineCallbacks
     def get_all_sensors(self):
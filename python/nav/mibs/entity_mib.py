@@ -27,13 +27,14 @@ from twisted.internet import defer
 
 from nav.oids import OID
 from nav.mibs import mibretriever
+from nav.smidumps import get_mib
 
 _logger = logging.getLogger(__name__)
 
 
 class EntityMib(mibretriever.MibRetriever):
     """MibRetriever for the ENTITY-MIB"""
-    from nav.smidumps.entity_mib import MIB as mib
+    mib = get_mib('entity_mib')
 
     def retrieve_alternate_bridge_mibs(self):
         """Retrieves a list of alternate bridge mib instances.
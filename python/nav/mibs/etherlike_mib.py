@@ -18,11 +18,12 @@
 from __future__ import absolute_import
 from twisted.internet import defer
 from . import mibretriever
+from nav.smidumps import get_mib
 
 
 class EtherLikeMib(mibretriever.MibRetriever):
     """MibRetriever for EtherLike-MIB"""
-    from nav.smidumps.etherlike_mib import MIB as mib
+    mib = get_mib('etherlike_mib')
 
     @defer.inlineCallbacks
     def get_duplex(self):
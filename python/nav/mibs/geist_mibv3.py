@@ -24,6 +24,7 @@ to detect and collect sensor-information.
 """
 from nav.oids import OID
 from .itw_mibv3 import ItWatchDogsMibV3
+from nav.smidumps import get_mib
 
 
 class GeistMibV3(ItWatchDogsMibV3):
@@ -38,9 +39,9 @@ class GeistMibV3(ItWatchDogsMibV3):
     objects for anything, so we don't need to care about this name change here.
 
     """
-    from nav.smidumps.geist_mibv3 import MIB as mib
+    mib = get_mib('geist_mibv3')
 
-    oid_name_map = {OID(attrs['oid']): name
-                    for name, attrs in mib['nodes'].items()}
+    oid_name_map = {OID(oid): name
+                    for name, (oid, _nodetype) in mib.index.items()}
 
     lowercase_nodes = {key.lower(): key for key in mib['nodes']}
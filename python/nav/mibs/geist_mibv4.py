@@ -29,6 +29,7 @@ external sensors available at the time of this implementation.
 """
 from nav.oids import OID
 from .itw_mibv4 import ItWatchDogsMibV4
+from nav.smidumps import get_mib
 
 
 class GeistMibV4(ItWatchDogsMibV4):
@@ -41,9 +42,9 @@ class GeistMibV4(ItWatchDogsMibV4):
     same.
 
     """
-    from nav.smidumps.geist_mibv4 import MIB as mib
+    mib = get_mib('geist_mibv4')
 
-    oid_name_map = {OID(attrs['oid']): name
-                    for name, attrs in mib['nodes'].items()}
+    oid_name_map = {OID(oid): name
+                    for name, (oid, _nodetype) in mib.index.items()}
 
     lowercase_nodes = {key.lower(): key for key in mib['nodes']}
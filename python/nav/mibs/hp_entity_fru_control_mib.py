@@ -25,12 +25,13 @@ from nav.mibs import mibretriever
 
 from nav.mibs.hpicf_fan_mib import HpIcfFanMib
 from nav.mibs.hpicf_powersupply_mib import HpIcfPowerSupplyMib
+from nav.smidumps import get_mib
 
 
 class HpEntityFruControlMib(mibretriever.MibRetriever):
     """Actually a wrapper class around two classes that retrieve status
     for powersupplies and fans in HP netboxes."""
-    from nav.smidumps.hpicf_powersupply_mib import MIB as mib
+    mib = get_mib('hpicf_powersupply_mib')
 
     def __init__(self, agent_proxy):
         """A good old constructor."""
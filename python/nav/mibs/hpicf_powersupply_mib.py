@@ -25,11 +25,12 @@ from nav.mibs import reduce_index
 from nav.mibs import mibretriever
 
 from nav.models.manage import PowerSupplyOrFan as PSU
+from nav.smidumps import get_mib
 
 
 class HpIcfPowerSupplyMib(mibretriever.MibRetriever):
     """ A class for collecting powersupply states from HP netboxes."""
-    from nav.smidumps.hpicf_powersupply_mib import MIB as mib
+    mib = get_mib('hpicf_powersupply_mib')
 
     def __init__(self, agent_proxy):
         """ Constructor, anything more to say...?"""
@@ -20,6 +20,7 @@ from twisted.internet.defer import inlineCallbacks, returnValue
 from nav.mibs import reduce_index
 from nav.mibs.mibretriever import MibRetriever
 from nav.models.manage import Sensor
+from nav.smidumps import get_mib
 
 PHASE_LAST_POWER_READING = 'ibmPduPhaseLastPowerReading'
 
@@ -35,7 +36,7 @@ class IbmPduMib(MibRetriever):
     """MibRetriever implementation for IBM-PDU-MIB, as used by IBM/Lenovo Power
     Distribution Units.
     """
-    from nav.smidumps.ibm_pdu_mib import MIB as mib
+    mib = get_mib('ibm_pdu_mib')
 
     @inlineCallbacks
     def get_all_sensors(self):
@@ -17,11 +17,12 @@
 from collections import defaultdict
 from twisted.internet.defer import inlineCallbacks, returnValue
 from nav.mibs import mibretriever, reduce_index
+from nav.smidumps import get_mib
 
 
 class IEEE8023LagMib(mibretriever.MibRetriever):
     """"A MibRetriever for handling IEEE8023-LAG-MIB"""
-    from nav.smidumps.ieee8023_lag_mib import MIB as mib
+    mib = get_mib('ieee8023_lag_mib')
 
     @inlineCallbacks
     def retrieve_selected_aggregators(self):
@@ -21,10 +21,11 @@ from nav.mibs import reduce_index
 from nav.mibs import mibretriever
 
 from nav.mibs.entity_mib import EntityTable
+from nav.smidumps import get_mib
 
 
 class IfMib(mibretriever.MibRetriever):
-    from nav.smidumps.if_mib import MIB as mib
+    mib = get_mib('if_mib')
 
     def get_if_table_last_change(self):
         "Retrieves the sysUpTime value of the last time ifTable changed"
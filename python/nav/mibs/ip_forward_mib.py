@@ -25,6 +25,7 @@ from twisted.internet.defer import inlineCallbacks, returnValue
 from . import mibretriever
 from nav.oidparsers import consume
 from nav.oidparsers import InetPrefix, ObjectIdentifier, TypedInetAddress
+from nav.smidumps import get_mib
 
 # Extracted from IANA-RPROTO-MIB::IANAipRouteProtocol, revision 200009260000Z
 IANA_IP_ROUTE_PROTOCOLS = {
@@ -53,7 +54,7 @@ CidrRouteEntry = namedtuple('CidrRouteEntry', ('index', 'destination', 'policy',
 
 class IpForwardMib(mibretriever.MibRetriever):
     """A MibRetriever implementation for IP-FORWARD-MIB"""
-    from nav.smidumps.ip_forward_mib import MIB as mib
+    mib = get_mib('ip_forward_mib')
 
     @inlineCallbacks
     def get_routes(self, protocols=None):
@@ -24,6 +24,7 @@ from nav.oids import OID
 from nav.oidparsers import IPV4_ID, IPV6_ID, oid_to_ipv6, oid_to_ipv4
 from nav.ipdevpoll.utils import binary_mac_to_hex
 from . import mibretriever
+from nav.smidumps import get_mib
 
 IP_IN_OCTETS = 'ipIfStatsHCInOctets'
 IP_OUT_OCTETS = 'ipIfStatsHCOutOctets'
@@ -31,7 +32,7 @@ IP_OUT_OCTETS = 'ipIfStatsHCOutOctets'
 
 class IpMib(mibretriever.MibRetriever):
     """MibRetriever implementation for IP-MIB"""
-    from nav.smidumps.ip_mib import MIB as mib
+    mib = get_mib('ip_mib')
 
     @staticmethod
     def inetaddress_to_ip(oid):
@@ -101,8 +102,9 @@ class IpMib(mibretriever.MibRetriever):
         if not root or not root.oid.is_a_prefix_of(index):
             return index
 
-        children = (c.oid for c in six.itervalues(cls.nodes)
-                    if root.oid.is_a_prefix_of(c.oid))
+        children = (OID(oid)
+                    for oid, _nodetype in six.itervalues(cls.mib.index)
+                    if root.oid.is_a_prefix_of(oid))
         matched_prefixes = [
             c for c in children if c.is_a_prefix_of(index)] + [root.oid]
         if matched_prefixes:
@@ -26,11 +26,12 @@ from twisted.internet import defer
 from nav.ipdevpoll.utils import binary_mac_to_hex
 from . import mibretriever
 from . import ip_mib
+from nav.smidumps import get_mib
 
 
 class Ipv6Mib(mibretriever.MibRetriever):
     """A MibRetriever for the deprecated IPv6-MIB"""
-    from nav.smidumps.ipv6_mib import MIB as mib
+    mib = get_mib('ipv6_mib')
 
     @staticmethod
     def ipv6address_to_ip(oid):
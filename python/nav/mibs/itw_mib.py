@@ -29,6 +29,7 @@ from nav.mibs import reduce_index
 from nav.mibs import mibretriever
 from nav.models.manage import Sensor
 from nav.oids import OID
+from nav.smidumps import get_mib
 
 
 def for_table(table_name):
@@ -48,10 +49,10 @@ def for_table(table_name):
 
 class ItWatchDogsMib(mibretriever.MibRetriever):
     """A class that tries to retrieve all sensors from WeatherGoose I"""
-    from nav.smidumps.itw_mib import MIB as mib
+    mib = get_mib('itw_mib')
 
-    oid_name_map = dict((OID(attrs['oid']), name)
-                        for name, attrs in mib['nodes'].items())
+    oid_name_map = dict((OID(oid), name)
+                        for name, (oid, _nodetype) in mib.index.items())
     lowercase_nodes = dict((key.lower(), key)
                            for key in mib['nodes'])
 
@@ -916,7 +917,7 @@ class ItWatchDogsMib(mibretriever.MibRetriever):
     @defer.inlineCallbacks
     def _get_sensor_count(self):
         """Count all available sensors in this WxGoose"""
-        sensor_counts_oid = self.mib['nodes']['sensorCounts']['oid']
+        sensor_counts_oid = self.nodes['sensorCounts'].oid
         sensor_counts = yield self.retrieve_column('sensorCounts')
         mapped_counts = ((sensor_counts_oid + OID(key[0:1]), count)
                          for key, count in sensor_counts.items())
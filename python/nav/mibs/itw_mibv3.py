@@ -29,14 +29,15 @@ from nav.models.manage import Sensor
 from nav.oids import OID
 
 from .itw_mib import for_table
+from nav.smidumps import get_mib
 
 
 class ItWatchDogsMibV3(mibretriever.MibRetriever):
     """A class that tries to retrieve all sensors from WeatherGoose II"""
-    from nav.smidumps.itw_mibv3 import MIB as mib
+    mib = get_mib('itw_mibv3')
 
-    oid_name_map = dict((OID(attrs['oid']), name)
-                        for name, attrs in mib['nodes'].items())
+    oid_name_map = dict((OID(oid), name)
+                        for name, (oid, _nodetype) in mib.index.items())
 
     lowercase_nodes = dict((key.lower(), key)
                            for key in mib['nodes'])
@@ -924,7 +925,7 @@ class ItWatchDogsMibV3(mibretriever.MibRetriever):
     @defer.inlineCallbacks
     def _get_sensor_count(self):
         """Count all available sensors in this WxGoose"""
-        sensor_counts_oid = self.mib['nodes']['sensorCounts']['oid']
+        sensor_counts_oid = self.nodes['sensorCounts'].oid
         sensor_counts = yield self.retrieve_column('sensorCounts')
         mapped_counts = ((sensor_counts_oid + OID(key[0:1]), count)
                          for key, count in sensor_counts.items())
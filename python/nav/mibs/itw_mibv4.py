@@ -35,11 +35,12 @@ from nav.models.manage import Sensor
 from nav.oids import OID
 
 from .itw_mib import for_table
+from nav.smidumps import get_mib
 
 
 class ItWatchDogsMibV4(mibretriever.MibRetriever):
     """A class that tries to retrieve all internal sensors from WeatherGoose II"""
-    from nav.smidumps.itw_mibv4 import MIB as mib
+    mib = get_mib('itw_mibv4')
 
     def _get_oid_for_sensor(self, sensor_name):
         """Return the OID for the given sensor-name as a string; Return
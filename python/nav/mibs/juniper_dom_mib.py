@@ -21,6 +21,7 @@ from twisted.internet import defer
 from twisted.internet.defer import returnValue
 from nav.mibs.mibretriever import MibRetriever
 from nav.models.manage import Sensor
+from nav.smidumps import get_mib
 
 COLUMNS = {
     "jnxDomCurrentRxLaserPower": {
@@ -53,7 +54,7 @@ COLUMNS = {
 
 class JuniperDomMib(MibRetriever):
     """MibRetriever for Juniper DOM Sensors"""
-    from nav.smidumps.juniper_dom_mib import MIB as mib
+    mib = get_mib('juniper_dom_mib')
 
     @defer.inlineCallbacks
     def get_all_sensors(self):
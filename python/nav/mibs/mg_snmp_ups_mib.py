@@ -17,11 +17,12 @@
 """
 from nav.mibs.ups_mib import UpsMib
 from nav.models.manage import Sensor
+from nav.smidumps import get_mib
 
 
 class MgSnmpUpsMib(UpsMib):
     """ A custom class for retrieving sensors from MGE UPSes."""
-    from nav.smidumps.mg_snmp_ups_mib import MIB as mib
+    mib = get_mib('mg_snmp_ups_mib')
 
     sensor_columns = {
         'mginputVoltage': {
@@ -21,7 +21,8 @@ definitions and dump them as Python data structures.
 
 To create a new MIB-aware retriever class, inherit from the
 MibRetriever class and set the class-variable "mib" to point to a MIB
-data structure as dumped by libsmi's smidump command.
+data structure as dumped by libsmi's smidump command, preferably as loaded by
+nav.smidumps.get_mib().
 
 The class will be imbued with knowledge of the MIB in question, and
 several convenience methods to work with data retrieval.  An instance
@@ -32,6 +33,11 @@ this to allow asynchronous data retrieval.
 
 import logging
 
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
 from django.utils import six
 
 from twisted.internet import defer, reactor
@@ -43,9 +49,12 @@ from nav.ipdevpoll import ContextLogger
 from nav.ipdevpoll.utils import fire_eventually
 from nav.errors import GeneralException
 from nav.oids import OID
+from nav.smidumps import MibData
 
 _logger = logging.getLogger(__name__)
 TEXT_TYPES = ("DisplayString", "SnmpAdminString")
+# column access values that will never yield values when walked
+INACCESSIBLE = ("noaccess", "notifyonly")
 
 
 class MibRetrieverError(GeneralException):
@@ -76,7 +85,7 @@ class MIBObject(object):
         self.raw_mib_data = mib['nodes'][name]
         self.module = mib['moduleName']
         self.name = name
-        self.oid = self.raw_mib_data['oid']
+        self.oid = OID(self.raw_mib_data['oid'])
         self.enum = {}
 
         try:
@@ -173,23 +182,21 @@ class MibTableDescriptor(object):
         table_name -- the name of the table from the mib.
 
         """
-        if (table_name not in mib.nodes or
-                mib.nodes[table_name].raw_mib_data['nodetype'] != 'table'):
+        index = mib.mib.index
+        if index.get(table_name, (None, None))[1] != 'table':
             raise MibRetrieverError("%s is not a table" % table_name)
 
         table_object = mib.nodes[table_name]
-        for node in mib.nodes.values():
-            if table_object.oid.is_a_prefix_of(node.oid) and \
-                    node.raw_mib_data['nodetype'] == 'row':
-                row_object = mib.nodes[node.name]
+        for name, (oid, nodetype) in six.iteritems(index):
+            if nodetype == 'row' and table_object.oid.is_a_prefix_of(oid):
+                row_object = mib.nodes[name]
                 # Only one row node type per table
                 break
 
         columns = {}
-        for node in mib.nodes.values():
-            if row_object.oid.is_a_prefix_of(node.oid) and \
-                    node.raw_mib_data['nodetype'] == 'column':
-                columns[node.name] = mib.nodes[node.name]
+        for name, (oid, nodetype) in six.iteritems(index):
+            if nodetype == 'column' and row_object.oid.is_a_prefix_of(oid):
+                columns[name] = mib.nodes[name]
 
         return cls(table_object, row_object, columns)
 
@@ -198,12 +205,8 @@ class MibTableDescriptor(object):
         """Build table descriptors for all tables in a mib.
 
         mib -- MibRetriever instance"""
-        table_descriptors = []
-        for node in mib.nodes.values():
-            if node.raw_mib_data['nodetype'] == 'table':
-                table_descriptors.append(
-                    MibTableDescriptor.build(mib, node.name))
-        return table_descriptors
+        return [MibTableDescriptor.build(mib, name)
+                for name in _names_of_type(mib.mib, 'table')]
 
 
 class MibTableResultRow(dict):
@@ -258,16 +261,19 @@ class MibRetrieverMaker(type):
             # This may be the MibRetriever base class or a MixIn of some sort
             return
 
-        # modify mib data to slightly optimize later OID manipulation
-        convert_oids(mib)
+        if not isinstance(mib, MibData):
+            mib = cls.mib = MibData.from_dict(mib)
 
-        MibRetrieverMaker.__make_node_objects(cls)
-        cls.tables = dict((t.table.name, t)
-                          for t in MibTableDescriptor.build_all(cls))
+        # node objects and table descriptors are only built when used
+        cls.nodes = LazyMapping(
+            mib.index, lambda node_name: MIBObject(mib, node_name))
+        cls.tables = LazyMapping(
+            _names_of_type(mib, 'table'),
+            lambda table_name: MibTableDescriptor.build(cls, table_name))
+        cls.text_columns = TextColumns(mib)
 
         MibRetrieverMaker.__make_scalar_getters(cls)
         MibRetrieverMaker.__make_table_getters(cls)
-        MibRetrieverMaker.__prepopulate_text_columns(cls)
 
         MibRetrieverMaker.modules[mib['moduleName']] = cls
 
@@ -277,13 +283,12 @@ class MibRetrieverMaker(type):
     @staticmethod
     def __make_scalar_getters(cls):
         """Make a get_* method for every scalar MIB node."""
-        for node in cls.nodes.values():
-            if node.raw_mib_data['nodetype'] == 'scalar':
-                method_name = 'get_%s' % node.name
-                # Only create method if a custom one was not present
-                if not hasattr(cls, method_name):
-                    setattr(cls, method_name,
-                            MibRetrieverMaker.__scalar_getter(node.name))
+        for node_name in _names_of_type(cls.mib, 'scalar'):
+            method_name = 'get_%s' % node_name
+            # Only create method if a custom one was not present
+            if not hasattr(cls, method_name):
+                setattr(cls, method_name,
+                        MibRetrieverMaker.__scalar_getter(node_name))
 
     @staticmethod
     def __scalar_getter(node_name):
@@ -331,25 +336,6 @@ class MibRetrieverMaker(type):
         getter.__name__ = node_name
         return getter
 
-    @staticmethod
-    def __make_node_objects(cls):
-        cls.nodes = dict((node_name, MIBObject(cls.mib, node_name))
-                         for node_name in cls.mib['nodes'].keys())
-
-    @staticmethod
-    def __prepopulate_text_columns(cls):
-        """Prepopulates the new MibRetriever class' text_columns attribute
-        with a set of names of contained MIB objects that can be considered as
-        text types.
-
-        """
-        nodes = {
-            node_name
-            for node_name in cls.mib['nodes']
-            if is_text_object(cls.mib, node_name)
-        }
-        cls.text_columns = nodes
-
 
 @six.add_metaclass(MibRetrieverMaker)
 class MibRetriever(object):
@@ -393,26 +379,6 @@ class MibRetriever(object):
         if node.raw_mib_data['nodetype'] != 'column':
             self._logger.debug("%s is not a table column", column_name)
 
-        def _result_formatter(result):
-            formatted_result = {}
-            # result keys may be OID objects/tuples or strings, depending on
-            # snmp library used
-            if node.oid not in result and str(node.oid) not in result:
-                self._logger.debug("%s (%s) seems to be unsupported, result "
-                                   "keys were: %r",
-                                   column_name, node.oid, result.keys())
-                return {}
-            varlist = result.get(node.oid, result.get(str(node.oid), None))
-
-            for oid, value in varlist.items():
-                # Extract index information from oid
-                row_index = OID(oid).strip_prefix(node.oid)
-                if column_name in self.text_columns:
-                    value = safestring(value)
-                formatted_result[row_index] = value
-
-            return formatted_result
-
         def _valueerror_handler(failure):
             failure.trap(ValueError)
             self._logger.warning("got a possibly strange response from device "
@@ -422,14 +388,41 @@ class MibRetriever(object):
             return {}  # alternative is to retry or raise a Timeout exception
 
         deferred = self.agent_proxy.getTable([str(node.oid)])
-        deferred.addCallbacks(_result_formatter, _valueerror_handler)
+        deferred.addCallbacks(self._format_column, _valueerror_handler,
+                              callbackArgs=(column_name,))
         return deferred
 
+    def _format_column(self, result, column_name):
+        """Formats a column from a getTable() or getColumns() result as a
+        dictionary of { row_index: column_value }.
+
+        """
+        node = self.nodes[column_name]
+        formatted_result = {}
+        # result keys may be OID objects/tuples or strings, depending on
+        # snmp library used
+        if node.oid not in result and str(node.oid) not in result:
+            self._logger.debug("%s (%s) seems to be unsupported, result "
+                               "keys were: %r",
+                               column_name, node.oid, result.keys())
+            return {}
+        varlist = result.get(node.oid, result.get(str(node.oid), None))
+
+        for oid, value in varlist.items():
+            # Extract index information from oid
+            row_index = OID(oid).strip_prefix(node.oid)
+            if column_name in self.text_columns:
+                value = safestring(value)
+            formatted_result[row_index] = value
+
+        return formatted_result
+
     def retrieve_columns(self, column_names):
         """Retrieve a set of table columns.
 
         The table columns may come from different tables, as long as
-        the table rows are indexed the same way.
+        the table rows are indexed the same way.  All the columns are walked
+        in parallel, using the agent proxy's getColumns() method.
 
         Returns a deferred whose result is a dictionary:
 
@@ -438,17 +431,54 @@ class MibRetriever(object):
         """
         def _sortkey(col):
             return self.nodes[col].oid
-        columns = iter(sorted(column_names, key=_sortkey))
+        columns = sorted(column_names, key=_sortkey)
 
-        final_result = {}
-        my_deferred = defer.Deferred()
+        def _result_formatter(result):
+            return self._aggregate_columns(
+                [(column, self._format_column(result, column))
+                 for column in columns],
+                column_names)
 
-        def _result_aggregate(result, column):
+        def _valueerror_handler(failure):
+            failure.trap(ValueError)
+            self._logger.debug("got a possibly strange response from device "
+                               "when walking %d columns, retrying them one "
+                               "by one: %s", len(columns),
+                               failure.getErrorMessage())
+            return self._retrieve_columns_serially(columns, column_names)
+
+        deferred = self.agent_proxy.getColumns(
+            [str(self.nodes[column].oid) for column in columns])
+        deferred.addCallbacks(_result_formatter, _valueerror_handler)
+        return deferred
+
+    @staticmethod
+    def _aggregate_columns(column_results, column_names):
+        """Aggregates a list of (column_name, { row_index: column_value })
+        tuples into a dictionary of { row_index: MibTableResultRow instance }.
+
+        """
+        final_result = {}
+        for column, result in column_results:
             for row_index, value in result.items():
                 if row_index not in final_result:
                     final_result[row_index] = \
                         MibTableResultRow(row_index, column_names)
                 final_result[row_index][column] = value
+        return final_result
+
+    def _retrieve_columns_serially(self, columns, column_names):
+        """Retrieves a set of table columns one by one, as an alternative to
+        retrieve_columns() for when the agent cannot handle walking them in
+        parallel.
+
+        """
+        columns = iter(columns)
+        column_results = []
+        my_deferred = defer.Deferred()
+
+        def _result_aggregate(result, column):
+            column_results.append((column, result))
             return True
 
         # schedule the next iteration (i.e. collect next column)
@@ -456,7 +486,8 @@ class MibRetriever(object):
             try:
                 column = next(columns)
             except StopIteration:
-                my_deferred.callback(final_result)
+                my_deferred.callback(
+                    self._aggregate_columns(column_results, column_names))
                 return
             deferred = self.retrieve_column(column)
             deferred.addCallback(_result_aggregate, column)
@@ -478,8 +509,15 @@ class MibRetriever(object):
         dictionary value is a MibTableResultRow instance, which can be accessed
         as both a dictionary and a list.
 
+        The table's accessible columns are walked in parallel, using the agent
+        proxy's getColumns() method.
+
         """
         table = self.tables[table_name]
+        column_oids = [str(column.oid)
+                       for column in sorted(table.columns.values())
+                       if column.raw_mib_data.get('access') not in
+                       INACCESSIBLE]
 
         def _result_formatter(result):
             formatted_result = {}
@@ -510,7 +548,7 @@ class MibRetriever(object):
 
             return formatted_result
 
-        deferred = self.agent_proxy.getTable([str(table.table.oid)])
+        deferred = self.agent_proxy.getColumns(column_oids)
         deferred.addCallback(_result_formatter)
         return deferred
 
@@ -702,20 +740,6 @@ class MultiMibMixIn(MibRetriever):
         return alt_agent
 
 
-def convert_oids(mib):
-    """Convert a mib data structure's oid strings to OID objects.
-
-    mib is expected to be a data structure as dumped by the smidump utility
-    (using the -python option).
-
-    """
-    for node_name in mib['nodes']:
-        node = mib['nodes'][node_name]
-        if isinstance(node['oid'], six.string_types):
-            # oid_tuple = tuple(int(i) for i in node['oid'].split('.'))
-            node['oid'] = OID(node['oid'])
-
-
 def is_text_object(mib_dict, obj_name):
     """Verifies whether a given MIB object has a syntax that can be considered
     a text type.
@@ -736,3 +760,53 @@ def is_text_object(mib_dict, obj_name):
         type_name in TEXT_TYPES
         or parent_type_name in TEXT_TYPES
     )
+
+
+class LazyMapping(Mapping):
+    """A read-only mapping whose values are created by a factory function the
+    first time they are looked up.
+
+    """
+    def __init__(self, keys, factory):
+        self._keys = keys
+        self._factory = factory
+        self._values = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            if key not in self._keys:
+                raise
+        value = self._values[key] = self._factory(key)
+        return value
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class TextColumns(object):
+    """The names of the objects of a MIB that can be considered as text
+    types, determined as they are asked for.
+
+    """
+    def __init__(self, mib):
+        self._mib = mib
+        self._answers = {}
+
+    def __contains__(self, obj_name):
+        if obj_name not in self._answers:
+            self._answers[obj_name] = (obj_name in self._mib['nodes'] and
+                                       is_text_object(self._mib, obj_name))
+        return self._answers[obj_name]
+
+
+def _names_of_type(mib, nodetype):
+    return [name for name, (_oid, type_) in six.iteritems(mib.index)
+            if type_ == nodetype]
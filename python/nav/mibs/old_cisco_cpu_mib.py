@@ -15,10 +15,11 @@
 #
 from twisted.internet import defer
 from nav.mibs import mibretriever
+from nav.smidumps import get_mib
 
 
 class OldCiscoCpuMib(mibretriever.MibRetriever):
-    from nav.smidumps.old_cisco_cpu_mib import MIB as mib
+    mib = get_mib('old_cisco_cpu_mib')
 
     @defer.inlineCallbacks
     def get_cpu_loadavg(self):
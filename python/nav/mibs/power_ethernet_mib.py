@@ -15,10 +15,11 @@
 #
 from twisted.internet import defer
 from nav.mibs import mibretriever
+from nav.smidumps import get_mib
 
 
 class PowerEthernetMib(mibretriever.MibRetriever):
-    from nav.smidumps.power_ethernet_mib import MIB as mib
+    mib = get_mib('power_ethernet_mib')
 
     @defer.inlineCallbacks
     def get_groups_table(self):
@@ -19,6 +19,7 @@ from twisted.internet import defer
 from nav.mibs import reduce_index
 from nav.mibs.ups_mib import UpsMib
 from nav.models.manage import Sensor
+from nav.smidumps import get_mib
 
 R_PDU_LOAD_STATUS_LOAD = 'rPDULoadStatusLoad'
 R_PDU_LOAD_STATUS_BANK_NUMBER = 'rPDULoadStatusBankNumber'
@@ -39,7 +40,7 @@ U_TIMETICKS = dict(u_o_m=Sensor.UNIT_SECONDS, precision=2)
 
 class PowerNetMib(UpsMib):
     """ Custom class for retrieveing sensors from APC UPSes."""
-    from nav.smidumps.powernet_mib import MIB as mib
+    mib = get_mib('powernet_mib')
 
     sensor_columns = {
         'atsInputVoltage': U_VOLT,
@@ -32,6 +32,7 @@ from nav.mibs import reduce_index
 from nav.mibs import mibretriever
 from nav.models.manage import Sensor
 from nav.oids import OID
+from nav.smidumps import get_mib
 
 # from .itw_mib import for_table
 
@@ -53,7 +54,7 @@ def for_table(table_name):
 
 class Pwt3PhaseV1Mib(mibretriever.MibRetriever):
     """A class that tries to retrieve all sensors from Powertek PDU"""
-    from nav.smidumps.pwt_3phasev2_10_mibv1 import MIB as mib
+    mib = get_mib('pwt_3phasev2_10_mibv1')
 
     def _get_oid_for_sensor(self, sensor_name):
         """Return the OID for the given sensor-name as a string; Return
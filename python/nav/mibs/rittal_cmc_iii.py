@@ -22,6 +22,7 @@ from twisted.internet import defer
 from twisted.internet.defer import returnValue
 from nav.mibs.mibretriever import MibRetriever
 from nav.models.manage import Sensor
+from nav.smidumps import get_mib
 
 DEGREES_CELSIUS = "\xb0C"
 DEGREES_FAHRENHEIT = "\xb0F"
@@ -66,7 +67,7 @@ IGNORED_STATUSES = {
 
 class RittalCMCIIIMib(MibRetriever):
     """MibRetriever for Rittal CMC III devices"""
-    from nav.smidumps.rittal_cmc_iii_mib import MIB as mib
+    mib = get_mib('rittal_cmc_iii_mib')
 
     def get_module_name(self):
         """Returns the MIB module name"""
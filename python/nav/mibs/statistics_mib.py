@@ -20,13 +20,14 @@ from django.utils.six import iteritems
 from twisted.internet import defer
 
 from nav.mibs import mibretriever, reduce_index
+from nav.smidumps import get_mib
 
 MulticastStat = namedtuple("MulticastStat", "group ifindex vlan access")
 
 
 class StatisticsMib(mibretriever.MibRetriever):
     """HP STATISTICS-MIB"""
-    from nav.smidumps.statistics_mib import MIB as mib
+    mib = get_mib('statistics_mib')
 
     @defer.inlineCallbacks
     def get_cpu_utilization(self):
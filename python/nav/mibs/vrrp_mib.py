@@ -19,11 +19,12 @@ from __future__ import absolute_import
 from IPy import IP
 from twisted.internet import defer
 from . import mibretriever
+from nav.smidumps import get_mib
 
 
 class VRRPMib(mibretriever.MibRetriever):
     """A MibRetriever for handling VRRP-MIB"""
-    from nav.smidumps.vrrp_mib import MIB as mib
+    mib = get_mib('vrrp_mib')
 
     @defer.inlineCallbacks
     def get_virtual_addresses(self):
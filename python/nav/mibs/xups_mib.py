@@ -17,11 +17,12 @@
 """
 from nav.mibs.ups_mib import UpsMib
 from nav.models.manage import Sensor
+from nav.smidumps import get_mib
 
 
 class XupsMib(UpsMib):
     """ A custom class for retrieving sensors from EATON UPSes."""
-    from nav.smidumps.xups_mib import MIB as mib
+    mib = get_mib('xups_mib')
 
     sensor_columns = {
         'xupsInputVoltage': {
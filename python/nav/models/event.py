@@ -22,6 +22,7 @@ from collections import defaultdict
 import logging
 import datetime as dt
 
+from django.apps import apps
 from django.db import models
 from django.db.models import Q
 from django.utils.encoding import python_2_unicode_compatible
@@ -237,6 +238,9 @@ class EventMixIn(object):
         be some physical or logical subcomponents of a Netbox.
 
         """
+        if hasattr(self, '_cached_subject'):
+            return self._cached_subject
+
         if self.subid:
             subid = self.subid
             if self.event_type_id in self.SUBID_MAP:
@@ -262,6 +266,38 @@ class EventMixIn(object):
         return self.netbox or self.device or UnknownEventSubject(self)
 
 
+def prefetch_subjects(events):
+    """Looks up the subjects of a list of events/alerts in bulk, using a
+    single query per subject model, and caches them on each event for
+    subsequent calls to their get_subject() method.
+
+    Only subjects of event types listed in EventMixIn.SUBID_MAP are
+    prefetched; the subjects of any other event will still be looked up on
+    demand.
+
+    """
+    subids = defaultdict(set)
+    for event in events:
+        if event.subid and event.event_type_id in EventMixIn.SUBID_MAP:
+            subids[EventMixIn.SUBID_MAP[event.event_type_id]].add(event.subid)
+
+    subjects = {}
+    for model_name, ids in subids.items():
+        model = apps.get_model('models', model_name)
+        try:
+            found = model.objects.in_bulk(list(ids))
+        except ValueError:
+            continue  # non-numerical subids, leave them for get_subject()
+        subjects[model_name] = dict((str(pk), obj)
+                                    for pk, obj in found.items())
+
+    for event in events:
+        model_name = EventMixIn.SUBID_MAP.get(event.event_type_id)
+        subject = subjects.get(model_name, {}).get(str(event.subid))
+        if subject is not None:
+            event._cached_subject = subject
+
+
 @python_2_unicode_compatible
 class ThresholdEvent(object):
     """
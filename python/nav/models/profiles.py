@@ -564,12 +564,22 @@ class AlertProfile(models.Model):
         # Could have been done with a ModelManager, but the logic
         # is somewhat tricky to do with the django ORM.
 
+        return self.find_active_timeperiod(self.timeperiod_set.all())
+
+    def find_active_timeperiod(self, timeperiods, now=None):
+        """Finds the currently active timeperiod for this profile among a
+        list of all its timeperiods, without querying the database.
+
+        :param timeperiods: An iterable of this profile's TimePeriod objects.
+        :param now: The datetime to find the active timeperiod for. Defaults
+                    to the current time.
+        """
         logger = logging.getLogger(
             'nav.alertengine.alertprofile.get_active_timeperiod')
 
-        now = datetime.now()
+        now = now or datetime.now()
 
-        # Limit our query to the correct type of time periods
+        # Limit ourselves to the correct type of time periods
         if now.isoweekday() in [6, 7]:
             valid_during = [TimePeriod.ALL_WEEK, TimePeriod.WEEKENDS]
         else:
@@ -577,8 +587,9 @@ class AlertProfile(models.Model):
 
         # The following code should get the currently active timeperiod.
         active_timeperiod = None
-        timeperiods = list(self.timeperiod_set.filter(
-            valid_during__in=valid_during).order_by('start'))
+        timeperiods = sorted((period for period in timeperiods
+                              if period.valid_during in valid_during),
+                             key=lambda period: period.start)
         # If the current time is before the start of the first time
         # period, the active time period is the last one (i.e. from
         # the day before)
@@ -870,7 +881,7 @@ class Filter(models.Model):
     def __str__(self):
         return self.name
 
-    def verify(self, alert):
+    def verify(self, alert, expressions=None):
         """Combines expressions to an ORM query that will tell us if an alert
         matched.
 
@@ -881,6 +892,9 @@ class Filter(models.Model):
         Running alertengine in debug mode will print the dicts to the logs.
 
         :type alert: nav.models.event.AlertQueue
+        :param expressions: An optional subset of this filter's expressions to
+                            verify the alert against. If omitted, all of them
+                            are used.
         """
         logger = logging.getLogger('nav.alertengine.filter.check')
 
@@ -888,7 +902,10 @@ class Filter(models.Model):
         exclude = {}
         extra = {'where': [], 'params': []}
 
-        for expression in self.expression_set.all():
+        if expressions is None:
+            expressions = self.expression_set.all()
+
+        for expression in expressions:
             # Handle IP datatypes:
             if expression.match_field.data_type == MatchField.IP:
                 # Trick the ORM into joining the tables we want
@@ -0,0 +1,4 @@
+-- Notify the eventEngine when other processes modify the alert history, so
+-- that it can reload its cached map of unresolved alerts
+CREATE OR REPLACE RULE alerthist_notify_update AS ON UPDATE TO alerthist DO ALSO NOTIFY alerthist_changed;
+CREATE OR REPLACE RULE alerthist_notify_delete AS ON DELETE TO alerthist DO ALSO NOTIFY alerthist_changed;
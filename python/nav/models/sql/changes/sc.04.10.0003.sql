@@ -0,0 +1,54 @@
+-- Notify snmptrapd when netboxes or interfaces change, so that it can
+-- invalidate its cached lookups of trap agents and interfaces. The payload of
+-- each notification is the netboxid of the changed netbox or interface.
+CREATE OR REPLACE FUNCTION notify_netbox_changed()
+RETURNS TRIGGER AS $$
+  BEGIN
+    IF TG_OP = 'DELETE' THEN
+      PERFORM pg_notify('netbox_changed', CAST(OLD.netboxid AS text));
+    ELSE
+      PERFORM pg_notify('netbox_changed', CAST(NEW.netboxid AS text));
+    END IF;
+    RETURN NULL;
+  END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER trig_notify_netbox_changed
+    AFTER INSERT OR DELETE ON manage.netbox
+    FOR EACH ROW
+    EXECUTE PROCEDURE notify_netbox_changed();
+
+CREATE TRIGGER trig_notify_netbox_updated
+    AFTER UPDATE ON manage.netbox
+    FOR EACH ROW
+    WHEN (OLD.ip IS DISTINCT FROM NEW.ip
+          OR OLD.sysname IS DISTINCT FROM NEW.sysname
+          OR OLD.roomid IS DISTINCT FROM NEW.roomid)
+    EXECUTE PROCEDURE notify_netbox_changed();
+
+
+CREATE OR REPLACE FUNCTION notify_interface_changed()
+RETURNS TRIGGER AS $$
+  BEGIN
+    IF TG_OP = 'DELETE' THEN
+      PERFORM pg_notify('interface_changed', CAST(OLD.netboxid AS text));
+    ELSE
+      PERFORM pg_notify('interface_changed', CAST(NEW.netboxid AS text));
+    END IF;
+    RETURN NULL;
+  END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER trig_notify_interface_changed
+    AFTER INSERT OR DELETE ON manage.interface
+    FOR EACH ROW
+    EXECUTE PROCEDURE notify_interface_changed();
+
+CREATE TRIGGER trig_notify_interface_updated
+    AFTER UPDATE ON manage.interface
+    FOR EACH ROW
+    WHEN (OLD.ifindex IS DISTINCT FROM NEW.ifindex
+          OR OLD.ifname IS DISTINCT FROM NEW.ifname
+          OR OLD.ifalias IS DISTINCT FROM NEW.ifalias
+          OR OLD.moduleid IS DISTINCT FROM NEW.moduleid)
+    EXECUTE PROCEDURE notify_interface_changed();
@@ -31,6 +31,7 @@ from nav.enterprise.ids import (VENDOR_ID_CISCOSYSTEMS,
                                 VENDOR_ID_H3C,
                                 VENDOR_ID_DELL_INC,
                                 VENDOR_ID_HEWLETT_PACKARD)
+from nav.smidumps import get_mib
 
 
 _logger = logging.getLogger("nav.portadmin.snmputils")
@@ -74,8 +75,7 @@ class FantasyVlan(object):
 class SNMPHandler(object):
     """A basic class for SNMP-read and -write to switches."""
 
-    from nav.smidumps.qbridge_mib import MIB as qbridgemib
-    QBRIDGENODES = qbridgemib['nodes']
+    QBRIDGENODES = get_mib('qbridge_mib')['nodes']
 
     SYSOBJECTID = '.1.3.6.1.2.1.1.2.0'
     SYSLOCATION = '1.3.6.1.2.1.1.6.0'
@@ -555,8 +555,7 @@ class SNMPHandler(object):
 class Cisco(SNMPHandler):
     """A specialized class for handling ports in CISCO switches."""
 
-    from nav.smidumps.cisco_vtp_mib import MIB as vtp_mib
-    VTPNODES = vtp_mib['nodes']
+    VTPNODES = get_mib('cisco_vtp_mib')['nodes']
 
     VTPVLANSTATE = VTPNODES['vtpVlanState']['oid']
     VTPVLANTYPE = VTPNODES['vtpVlanType']['oid']
@@ -825,7 +824,7 @@ class Dell(SNMPHandler):
     Uses DNOS-SWITCHING-MIB
     """
 
-    from nav.smidumps.dnos_switching_mib import MIB as mib
+    mib = get_mib('dnos_switching_mib')
 
     PORT_MODE_ACCESS = 1
     PORT_MODE_TRUNK = 2
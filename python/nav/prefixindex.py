@@ -0,0 +1,158 @@
+#
+# Copyright (C) 2019 Uninett AS
+#
+# This file is part of Network Administration Visualized (NAV).
+#
+# NAV is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.  You should have received a copy of the GNU General Public License
+# along with NAV. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Longest-prefix-match indexing of IP prefixes.
+
+Prefixes are indexed on their integer network addresses, in one hash table per
+prefix length and IP version.  Looking up an address is a matter of masking
+the address' integer value for each prefix length present in the index, from
+the longest to the shortest, until a match is found.  The cost of a lookup is
+thereby bounded by the number of distinct prefix lengths in the index, not by
+the number of indexed prefixes.
+
+"""
+from IPy import IP
+
+ADDRESS_BITS = {4: 32, 6: 128}
+
+
+class PrefixIndex(object):
+    """A longest-prefix-match index of IPv4 and IPv6 prefixes.
+
+    Each indexed prefix is associated with an arbitrary value, such as a
+    database primary key.
+
+    Example:
+
+    >>> index = PrefixIndex()
+    >>> index.add('10.0.0.0/8', 1)
+    >>> index.add('10.0.42.0/24', 2)
+    >>> index.lookup('10.0.42.1')
+    2
+    >>> index.lookup('10.1.0.1')
+    1
+    >>> index.lookup('192.168.0.1') is None
+    True
+
+    """
+    def __init__(self, prefixes=None):
+        """Initializes a prefix index.
+
+        :param prefixes: An optional dict of {prefix: value} to populate the
+                         index with.
+
+        """
+        # {version: {prefixlen: {network >> hostbits: value}}}
+        self._tables = dict((version, {}) for version in ADDRESS_BITS)
+        # {version: [prefixlen, ...]}, sorted by descending prefix length
+        self._lengths = dict((version, []) for version in ADDRESS_BITS)
+        # {(version, prefixlen, network >> hostbits): value}
+        self._entries = {}
+        if prefixes:
+            self.update(prefixes)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, prefix):
+        return self._make_key(prefix) in self._entries
+
+    def __repr__(self):
+        return "<%s with %d prefixes>" % (self.__class__.__name__, len(self))
+
+    @staticmethod
+    def _make_key(prefix):
+        if not isinstance(prefix, IP):
+            prefix = IP(prefix)
+        version = prefix.version()
+        prefixlen = prefix.prefixlen()
+        hostbits = ADDRESS_BITS[version] - prefixlen
+        return version, prefixlen, prefix.int() >> hostbits
+
+    def add(self, prefix, value):
+        """Adds a prefix to the index, replacing any value previously
+        associated with the same prefix.
+
+        """
+        key = version, prefixlen, network = self._make_key(prefix)
+        table = self._tables[version]
+        if prefixlen not in table:
+            table[prefixlen] = {}
+            self._lengths[version] = sorted(table, reverse=True)
+        table[prefixlen][network] = value
+        self._entries[key] = value
+
+    def remove(self, prefix):
+        """Removes a prefix from the index.
+
+        :raises KeyError: if the prefix isn't indexed.
+
+        """
+        self._remove_key(*self._make_key(prefix))
+
+    def update(self, prefixes):
+        """Adds or replaces every prefix in a {prefix: value} dict"""
+        for prefix, value in prefixes.items():
+            self.add(prefix, value)
+
+    def sync(self, prefixes):
+        """Incrementally updates the index to contain exactly the prefixes
+        of a {prefix: value} dict, touching only the entries that differ.
+
+        :returns: A tuple of (added_or_changed_count, removed_count)
+
+        """
+        wanted = dict((self._make_key(prefix), (prefix, value))
+                      for prefix, value in prefixes.items())
+        removed = [key for key in self._entries if key not in wanted]
+        for version, prefixlen, network in removed:
+            self._remove_key(version, prefixlen, network)
+
+        changed = 0
+        for key, (prefix, value) in wanted.items():
+            if key not in self._entries or self._entries[key] != value:
+                self.add(prefix, value)
+                changed += 1
+        return changed, len(removed)
+
+    def _remove_key(self, version, prefixlen, network):
+        del self._entries[(version, prefixlen, network)]
+        table = self._tables[version]
+        del table[prefixlen][network]
+        if not table[prefixlen]:
+            del table[prefixlen]
+            self._lengths[version] = sorted(table, reverse=True)
+
+    def lookup(self, addr, default=None):
+        """Looks up the value of the longest indexed prefix that contains
+        addr.
+
+        :param addr: An IP address, either as an IPy.IP object or as a
+                     string.
+        :param default: The value to return if no prefix matches addr.
+
+        """
+        if not isinstance(addr, IP):
+            addr = IP(addr)
+        version = addr.version()
+        addr_int = addr.int()
+        bits = ADDRESS_BITS[version]
+        table = self._tables[version]
+        for prefixlen in self._lengths[version]:
+            networks = table[prefixlen]
+            network = addr_int >> (bits - prefixlen)
+            if network in networks:
+                return networks[network]
+        return default
@@ -1,5 +1,235 @@
+#
+# Copyright (C) 2019 Uninett AS
+#
+# This file is part of Network Administration Visualized (NAV).
+#
+# NAV is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.  You should have received a copy of the GNU General Public License
+# along with NAV. If not, see <http://www.gnu.org/licenses/>.
+#
 """Raw SNMP SMI module dumps.
 
 As dumped by smidump dump using the python format option.
 
+The dumps are large dictionaries, and importing them is slow and memory
+hungry.  Use get_mib() to get at them instead: It loads MIB data from a
+compact, precompiled MIB store, if one has been built by compile_all(), and
+only unpacks the definitions of the MIB nodes that are actually looked up.
+Compiled stores are memory mapped, so their pages can be shared between
+processes.
+
+A compiled MIB store is a file consisting of a short binary preamble, a
+marshalled header and a marshalled blob for each MIB node.  The header holds
+all top-level MIB module definitions except nodes, and an index of each
+node's name, OID, node type and blob position.
+
 """
+from __future__ import absolute_import
+
+from collections import OrderedDict
+import glob
+import importlib
+import marshal
+import mmap
+import os
+import struct
+import sys
+import threading
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
+
+COMPILED_SUFFIX = '.mibc'
+FORMAT_VERSION = 1
+
+# magic, format version, python major, python minor, header length
+_PREAMBLE = struct.Struct('<4sBBBI')
+_MAGIC = b'NMIB'
+
+_mibs = {}
+_mibs_lock = threading.Lock()
+
+
+class MibData(dict):
+    """The data of a single MIB module, as dumped by smidump.
+
+    This behaves like the dictionary of the original dump, except that the
+    'nodes' item is a MibNodes mapping, which only loads node definitions as
+    they are looked up.
+
+    """
+    def __init__(self, items, nodes):
+        super(MibData, self).__init__(items)
+        self['nodes'] = nodes
+
+    @property
+    def index(self):
+        """An ordered dict of {node_name: (oid, nodetype)}, where oid is a
+        string, for all the nodes of this MIB.
+        """
+        return self['nodes'].index
+
+    @classmethod
+    def from_dict(cls, mib):
+        """Wraps a MIB dump dictionary, as imported from one of the smidump
+        modules.
+        """
+        nodes = mib.get('nodes', {})
+        index = OrderedDict((name, (node['oid'], node['nodetype']))
+                            for name, node in nodes.items())
+        items = ((key, value) for key, value in mib.items()
+                 if key != 'nodes')
+        return cls(items, MibNodes(index, nodes.__getitem__))
+
+
+class MibNodes(Mapping):
+    """A read-only mapping of MIB node names to node definition dicts.
+
+    Node definitions are loaded on demand, using a loader function, and are
+    kept once loaded.
+
+    """
+    def __init__(self, index, loader):
+        self.index = index
+        self._loader = loader
+        self._nodes = {}
+
+    def __getitem__(self, name):
+        try:
+            return self._nodes[name]
+        except KeyError:
+            if name not in self.index:
+                raise
+        node = self._nodes[name] = self._loader(name)
+        return node
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+
+def get_mib(name):
+    """Returns the MIB data of a smidump module.
+
+    The data is loaded from the module's compiled MIB store, if present and
+    up to date.  Otherwise, the module itself is imported.  The data is
+    loaded only once per process.
+
+    :param name: The name of a module in this package, e.g. 'if_mib'.
+    :returns: A MibData instance.
+
+    """
+    with _mibs_lock:
+        if name not in _mibs:
+            _mibs[name] = _load(name)
+        return _mibs[name]
+
+
+def _load(name):
+    source = os.path.join(os.path.dirname(__file__), name + '.py')
+    compiled = os.path.join(os.path.dirname(__file__), name + COMPILED_SUFFIX)
+    try:
+        if os.path.getmtime(compiled) >= os.path.getmtime(source):
+            return load_compiled(compiled)
+    except (EnvironmentError, ValueError, EOFError, TypeError):
+        pass
+    module = importlib.import_module('.' + name, __name__)
+    return MibData.from_dict(module.MIB)
+
+
+def load_compiled(filename):
+    """Loads a compiled MIB store.
+
+    :raises ValueError: if filename is not a MIB store compiled by this
+                        version of NAV and Python.
+    :returns: A MibData instance.
+
+    """
+    with open(filename, 'rb') as store:
+        data = mmap.mmap(store.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, version, major, minor, header_length = _PREAMBLE.unpack(
+            data[:_PREAMBLE.size])
+    except struct.error:
+        raise ValueError("%s is not a compiled MIB store" % filename)
+    if (magic, version, (major, minor)) != (
+            _MAGIC, FORMAT_VERSION, tuple(sys.version_info[:2])):
+        raise ValueError("%s was not compiled for this version of NAV and "
+                         "Python" % filename)
+
+    start = _PREAMBLE.size + header_length
+    items, node_index = marshal.loads(data[_PREAMBLE.size:start])
+    index = OrderedDict()
+    positions = {}
+    for name, oid, nodetype, offset, length in node_index:
+        index[name] = (oid, nodetype)
+        positions[name] = (start + offset, start + offset + length)
+
+    def _load_node(name):
+        begin, end = positions[name]
+        return marshal.loads(data[begin:end])
+
+    return MibData(items, MibNodes(index, _load_node))
+
+
+def compile_mib(mib, filename):
+    """Compiles the MIB dump dictionary mib into a MIB store in filename"""
+    blobs = []
+    node_index = []
+    offset = 0
+    for name, node in mib.get('nodes', {}).items():
+        blob = marshal.dumps(node)
+        node_index.append((name, node['oid'], node['nodetype'], offset,
+                           len(blob)))
+        blobs.append(blob)
+        offset += len(blob)
+    items = dict((key, value) for key, value in mib.items()
+                 if key != 'nodes')
+    header = marshal.dumps((items, node_index))
+
+    tmpname = filename + '.tmp'
+    with open(tmpname, 'wb') as store:
+        store.write(_PREAMBLE.pack(_MAGIC, FORMAT_VERSION,
+                                   sys.version_info[0], sys.version_info[1],
+                                   len(header)))
+        store.write(header)
+        for blob in blobs:
+            store.write(blob)
+    os.rename(tmpname, filename)
+
+
+def compile_all(directory=None):
+    """Compiles MIB stores for all the smidump modules in directory.
+
+    :param directory: The directory of the nav.smidumps package to compile.
+                      Defaults to the directory of this package.
+    :returns: A list of the names of the compiled modules.
+
+    """
+    directory = directory or os.path.dirname(__file__)
+    names = []
+    for source in sorted(glob.glob(os.path.join(directory, '*.py'))):
+        name = os.path.splitext(os.path.basename(source))[0]
+        if name.startswith('_'):
+            continue
+        namespace = {}
+        with open(source, 'rb') as module:
+            exec(compile(module.read(), source, 'exec'), namespace)
+        compile_mib(namespace['MIB'],
+                    os.path.join(directory, name + COMPILED_SUFFIX))
+        names.append(name)
+    return names
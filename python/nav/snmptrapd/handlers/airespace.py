@@ -20,12 +20,13 @@ All values from AIRESPACE-WIRELESS-MIB
 
 """
 
-from nav.smidumps.airespace_wireless_mib import MIB
+from nav.smidumps import get_mib
 from nav.event import Event
 import logging
 
 _logger = logging.getLogger(__name__)
 
+MIB = get_mib('airespace_wireless_mib')
 NODES = MIB['nodes']
 TRAPS = MIB['notifications']
 
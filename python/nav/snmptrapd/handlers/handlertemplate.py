@@ -61,8 +61,10 @@ def handleTrap(trap, config=None):
         e['alerttype'] = 'linkUp'
         e['module'] = module
 
+        # Posting through the trap lets snmptrapd post the events of
+        # several traps to the event queue together.
         try:
-            e.post()
+            trap.post_event(e)
         except nav.errors.GeneralException as why:
             _logger.error(why)
             return False
@@ -22,6 +22,7 @@ import nav.errors
 
 from nav.db import getConnection
 from nav.event import Event
+from nav.snmptrapd import lookup
 
 _logger = logging.getLogger('nav.snmptrapd.linkupdown')
 
@@ -48,7 +49,7 @@ def handleTrap(trap, config=None):
     down = trap.genericType == 'LINKDOWN'
     success = post_link_event(down,
                               trap.netbox.netboxid, deviceid, interfaceid,
-                              modulename, ifname, ifalias)
+                              modulename, ifname, ifalias, trap=trap)
     if success:
         _logger.info("Interface %s (%s) on %s is %s.",
                      ifname, ifalias, trap.agent, 'down' if down else 'up')
@@ -66,23 +67,13 @@ def get_ifindex_from_trap(trap, config):
 
 def get_interface_details(netboxid, ifindex):
     """Get interfaceid, deviceid, modulename, ifname, ifalias for interface"""
-    idquery = """SELECT
-                   interfaceid, module.deviceid,
-                   module.name AS modulename,
-                   interface.ifname, interface.ifalias
-                 FROM netbox
-                 JOIN interface USING (netboxid)
-                 LEFT JOIN module USING (moduleid)
-                 WHERE netbox.netboxid=%s AND ifindex = %s"""
-    _logger.debug(idquery)
-    cursor = getConnection('default').cursor()
     try:
-        cursor.execute(idquery, (netboxid, ifindex))
+        details = lookup.get_interface_details(netboxid, ifindex)
     except nav.db.driver.ProgrammingError:
         _logger.exception("Unexpected error when querying database")
     else:
-        if cursor.rowcount > 0:
-            return cursor.fetchone()
+        if details:
+            return details
         else:
             _logger.debug('Could not find ifindex %s on %s',
                           ifindex, netboxid)
@@ -91,8 +82,12 @@ def get_interface_details(netboxid, ifindex):
 
 
 def post_link_event(down, netboxid, deviceid, interfaceid, modulename, ifname,
-                    ifalias):
-    """Posts a linkState event on the event qeueue"""
+                    ifalias, trap=None):
+    """Posts a linkState event on the event qeueue.
+
+    If trap is given, the event is posted through the trap, to be batched
+    with the events of other traps.
+    """
     state = 's' if down else 'e'
 
     event = Event(source="snmptrapd", target="eventEngine",
@@ -105,7 +100,10 @@ def post_link_event(down, netboxid, deviceid, interfaceid, modulename, ifname,
     event['ifalias'] = ifalias or ''
 
     try:
-        event.post()
+        if trap:
+            trap.post_event(event)
+        else:
+            event.post()
     except nav.errors.GeneralException:
         _logger.exception("Unexpected exception while posting event")
         return False
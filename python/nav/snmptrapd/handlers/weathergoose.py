@@ -23,12 +23,13 @@ from collections import defaultdict
 import itertools
 
 import nav.event
+from nav.smidumps import get_mib
 
 _logger = logging.getLogger(__name__)
 
 
 class WeatherGoose1(object):
-    from nav.smidumps.itw_mib import MIB
+    MIB = get_mib('itw_mib')
 
     # Define supported traps and relations
     TRAPS = MIB['notifications']
@@ -162,7 +163,7 @@ class WeatherGoose1(object):
 
 
 class WeatherGoose2(WeatherGoose1):
-    from nav.smidumps.itw_mibv3 import MIB
+    MIB = get_mib('itw_mibv3')
 
     # Define supported traps and relations
     TRAPS = MIB['notifications']
@@ -193,7 +194,7 @@ _geistpattern = re.compile("^cm")
 
 class GeistWeatherGoose(WeatherGoose2):
     """The rebranded MIB after IT Watchdogs merged with Geist"""
-    from nav.smidumps.geist_mibv3 import MIB
+    MIB = get_mib('geist_mibv3')
 
     # Define supported traps and relations
     TRAPS = MIB['notifications']
@@ -0,0 +1,270 @@
+#
+# Copyright (C) 2019 Uninett AS
+#
+# This file is part of Network Administration Visualized (NAV).
+#
+# NAV is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.  You should have received a copy of the GNU General Public
+# License along with NAV. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Cached database lookups for trap handler modules.
+
+Most traps are sent by a small number of chatty devices, so the netbox of a
+trap agent and the interface referenced by a trap are nearly always the same
+as the last time.  The lookup functions of this module cache their results for
+a limited time, in caches of a limited size shared by all handler modules and
+handler worker threads.
+
+Cached results are also invalidated as soon as netboxes or interfaces change,
+given the notifications issued by the database triggers of
+``sc.04.10.0003.sql`` and a running :py:class:`ChangeListener`.
+
+"""
+import errno
+import logging
+import select
+import threading
+import time
+from collections import namedtuple, OrderedDict
+
+import psycopg2
+import psycopg2.extensions
+
+from nav.db import getConnection, get_connection_string
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_TTL = 300  # seconds
+
+AgentNetbox = namedtuple('Agent', 'netboxid sysname roomid')
+InterfaceDetails = namedtuple(
+    'InterfaceDetails', 'interfaceid deviceid modulename ifname ifalias')
+
+NETBOX_CHANGED = 'netbox_changed'
+INTERFACE_CHANGED = 'interface_changed'
+
+
+class LookupCache(object):
+    """A thread-safe, least-recently-used cache of lookup results, which
+    expire after a given number of seconds.
+
+    """
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # {key: (timestamp, value)}
+        self._lock = threading.Lock()
+        self._generation = 0  # incremented by every invalidation
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return "<%s with %d entries>" % (self.__class__.__name__, len(self))
+
+    def get_or_load(self, key, loader, *args):
+        """Returns the value cached under key, or calls loader(*args) to
+        produce and cache it if no unexpired value is cached.
+
+        Values of None are cached just like any other value.  Any exception
+        raised by loader is propagated, and nothing is cached.  Neither is
+        the value cached if the cache was invalidated while it was loaded, as
+        it may then already be stale.
+
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._entries[key] = entry
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        value = loader(*args)
+        with self._lock:
+            if generation != self._generation:
+                return value
+            self._entries.pop(key, None)
+            self._entries[key] = (now, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, match=None):
+        """Removes cached values.
+
+        :param match: A function that returns True for the keys to remove.
+                      If omitted, all values are removed.
+
+        """
+        with self._lock:
+            self._generation += 1
+            if match is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if match(key)]:
+                del self._entries[key]
+
+
+agents = LookupCache()
+interfaces = LookupCache()
+
+
+def configure(max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL):
+    """Sets the size and time-to-live limits of all lookup caches"""
+    for cache in (agents, interfaces):
+        cache.max_size = max_size
+        cache.ttl = ttl
+
+
+def get_netbox(agent):
+    """Returns an AgentNetbox tuple describing the netbox that has the IP
+    address agent, or None if there is no such netbox.
+
+    """
+    return agents.get_or_load(agent, _load_netbox, agent)
+
+
+def _load_netbox(agent):
+    cursor = getConnection('snmptrapd').cursor()
+    cursor.execute(
+        "SELECT netboxid, sysname, roomid FROM netbox WHERE ip = %s",
+        (agent,),
+    )
+    if cursor.rowcount < 1:
+        return None
+    return AgentNetbox(*cursor.fetchone())
+
+
+def get_interface_details(netboxid, ifindex):
+    """Returns an InterfaceDetails tuple describing the interface with ifindex
+    on netboxid, or None if there is no such interface.
+
+    """
+    return interfaces.get_or_load((netboxid, str(ifindex)),
+                                  _load_interface_details, netboxid, ifindex)
+
+
+def _load_interface_details(netboxid, ifindex):
+    cursor = getConnection('default').cursor()
+    cursor.execute(
+        """SELECT
+             interfaceid, module.deviceid,
+             module.name AS modulename,
+             interface.ifname, interface.ifalias
+           FROM netbox
+           JOIN interface USING (netboxid)
+           LEFT JOIN module USING (moduleid)
+           WHERE netbox.netboxid=%s AND ifindex = %s""",
+        (netboxid, ifindex))
+    if cursor.rowcount < 1:
+        return None
+    return InterfaceDetails(*cursor.fetchone())
+
+
+def invalidate_netbox(netboxid=None):
+    """Invalidates all cached lookups related to a netbox, or to all netboxes
+    if netboxid is None.
+
+    Netboxes are cached by IP address, so a netbox change invalidates all
+    cached agent lookups.
+
+    """
+    agents.invalidate()
+    invalidate_interfaces(netboxid)
+
+
+def invalidate_interfaces(netboxid=None):
+    """Invalidates all cached interface lookups for a netbox, or for all
+    netboxes if netboxid is None.
+
+    """
+    if netboxid is None:
+        interfaces.invalidate()
+    else:
+        interfaces.invalidate(lambda key: key[0] == netboxid)
+
+
+class ChangeListener(object):
+    """Listens for netbox and interface change notifications from PostgreSQL
+    in a separate thread, invalidating the lookup caches accordingly.
+
+    """
+    RECONNECT_DELAY = 30  # seconds
+    POLL_TIMEOUT = 60  # seconds
+
+    def __init__(self):
+        self._thread = None
+        self._connection = None
+
+    def start(self):
+        """Starts listening in a daemon thread"""
+        self._thread = threading.Thread(target=self._run,
+                                        name="lookup-change-listener")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self._listen()
+                while True:
+                    self._wait_for_notifications()
+            except psycopg2.Error as error:
+                _logger.warning("lost database connection used to listen for "
+                                "changes (%s), retrying in %d seconds", error,
+                                self.RECONNECT_DELAY)
+                self._connection = None
+                time.sleep(self.RECONNECT_DELAY)
+
+    def _listen(self):
+        self._connection = psycopg2.connect(
+            get_connection_string(script_name='snmptrapd'))
+        self._connection.set_isolation_level(
+            psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = self._connection.cursor()
+        cursor.execute("LISTEN %s" % NETBOX_CHANGED)
+        cursor.execute("LISTEN %s" % INTERFACE_CHANGED)
+        # we may have missed notifications while we weren't listening
+        invalidate_netbox()
+        _logger.debug("listening for netbox and interface changes")
+
+    def _wait_for_notifications(self):
+        try:
+            select.select([self._connection], [], [], self.POLL_TIMEOUT)
+        except select.error as error:
+            if error.args[0] != errno.EINTR:
+                raise
+        self._connection.poll()
+        notifies = self._connection.notifies[:]
+        del self._connection.notifies[:]
+        handle_notifications(notifies)
+
+
+def handle_notifications(notifies):
+    """Invalidates cached lookups according to a list of psycopg2 Notify
+    objects, whose payloads are netbox ids.
+
+    """
+    for notify in notifies:
+        try:
+            netboxid = int(notify.payload)
+        except ValueError:
+            netboxid = None
+        _logger.debug("got %s notification for netbox %s", notify.channel,
+                      netboxid)
+        if notify.channel == NETBOX_CHANGED:
+            invalidate_netbox(netboxid)
+        elif notify.channel == INTERFACE_CHANGED:
+            invalidate_interfaces(netboxid)
@@ -0,0 +1,257 @@
+#
+# Copyright (C) 2019 Uninett AS
+#
+# This file is part of Network Administration Visualized (NAV).
+#
+# NAV is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.  You should have received a copy of the GNU General Public
+# License along with NAV. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Decoupling of trap reception from trap handling.
+
+The trap listener's receive loop must get back to reading its sockets as soon
+as possible, or the kernel's socket buffers will overflow during trap storms.
+A :py:class:`TrapPipeline` therefore only puts received traps on a bounded
+queue, which is consumed by a pool of handler worker threads.  When the queue
+is full, new traps are dropped rather than blocking the receive loop.
+
+Each worker takes as many queued traps as are available, up to a maximum batch
+size, and handles them in turn.  Events posted by handler modules using
+:py:meth:`SNMPTrap.post_event` are collected in an :py:class:`EventBatch` and
+are posted to the event queue using a single transaction, once the whole batch
+of traps has been handled.
+
+"""
+import logging
+import threading
+
+from django.utils.six.moves import queue
+
+from nav.event import EventQ
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_STATS_INTERVAL = 300  # seconds
+
+_STOP = object()
+
+
+class TrapCounters(object):
+    """Thread-safe counters of the traps that have passed through a
+    pipeline.
+
+    """
+    NAMES = ('received', 'queued', 'dropped', 'handled')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = dict((name, 0) for name in self.NAMES)
+
+    def increment(self, name, count=1):
+        """Increments the counter called name by count"""
+        with self._lock:
+            self._counters[name] += count
+
+    def __getitem__(self, name):
+        return self._counters[name]
+
+    def snapshot(self):
+        """Returns a dict of the current values of all counters"""
+        with self._lock:
+            return dict(self._counters)
+
+    def __str__(self):
+        counters = self.snapshot()
+        return ", ".join("%s=%d" % (name, counters[name])
+                         for name in self.NAMES)
+
+
+class EventBatch(object):
+    """Collects events posted while handling a batch of traps, so that they
+    can be posted to the event queue together.
+
+    """
+    def __init__(self):
+        self.events = []
+
+    def __len__(self):
+        return len(self.events)
+
+    def add(self, event):
+        """Adds an event to the batch"""
+        self.events.append(event)
+
+    def flush(self):
+        """Posts all the events of this batch to the event queue, in a single
+        transaction.  If that fails, the events are posted one by one, so that
+        a single bad event cannot prevent the others from being posted.
+
+        :returns: The number of events that were posted.
+
+        """
+        events, self.events = self.events, []
+        if not events:
+            return 0
+        try:
+            return EventQ.post_events(events)
+        except Exception:  # noqa
+            _logger.warning("Failed to post a batch of %d events, posting "
+                            "them one by one", len(events), exc_info=True)
+
+        posted = 0
+        for event in events:
+            try:
+                event.post()
+            except Exception:  # noqa
+                _logger.exception("Unexpected exception while posting event "
+                                  "%r", event)
+            else:
+                posted += 1
+        return posted
+
+
+class TrapPipeline(object):
+    """A bounded queue of received traps, consumed by a pool of worker
+    threads that call a trap handler function for each trap.
+
+    """
+    def __init__(self, handler, workers=DEFAULT_WORKERS,
+                 queue_size=DEFAULT_QUEUE_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                 stats_interval=DEFAULT_STATS_INTERVAL):
+        """Initializes a trap pipeline.
+
+        :param handler: A function that handles a single SNMPTrap.
+        :param workers: The number of handler worker threads to run.
+        :param queue_size: The maximum number of traps waiting to be handled.
+        :param batch_size: The maximum number of traps a worker takes from
+                           the queue at a time.
+        :param stats_interval: How often, in seconds, to log the trap
+                               counters. 0 disables logging.
+
+        """
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.stats_interval = stats_interval
+        self.queue = queue.Queue(queue_size)
+        self.counters = TrapCounters()
+        self._threads = []
+        self._stopped = threading.Event()
+        self._dropping = False
+
+    def start(self):
+        """Starts the handler worker threads"""
+        for number in range(self.workers):
+            self._start_thread(self._work, "trap-handler-%d" % number)
+        if self.stats_interval:
+            self._start_thread(self._log_stats_periodically, "trap-stats")
+        _logger.debug("started %d trap handler workers", self.workers)
+
+    def _start_thread(self, target, name):
+        thread = threading.Thread(target=target, name=name)
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+
+    def put(self, trap):
+        """Queues a received trap for handling, or drops it if the queue is
+        full.  Never blocks, and is meant to be used as the trap listener's
+        callback.
+
+        """
+        self.counters.increment('received')
+        try:
+            self.queue.put_nowait(trap)
+        except queue.Full:
+            self.counters.increment('dropped')
+            if not self._dropping:
+                self._dropping = True
+                _logger.warning("trap queue is full (%d traps), dropping "
+                                "incoming traps", self.queue.maxsize)
+        else:
+            self.counters.increment('queued')
+            if self._dropping:
+                self._dropping = False
+                _logger.warning("trap queue has room again, %s",
+                                self.counters)
+
+    __call__ = put
+
+    def stop(self, timeout=None):
+        """Stops the handler workers once all traps queued so far have been
+        handled.
+
+        :param timeout: The maximum number of seconds to wait for each
+                        worker to finish.
+
+        """
+        self._stopped.set()
+        workers = [thread for thread in self._threads
+                   if thread.name.startswith("trap-handler")]
+        try:
+            for _ in workers:
+                self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            _logger.warning("timed out waiting for trap handlers, %d traps "
+                            "remain unhandled", self.queue.qsize())
+            return
+        for thread in workers:
+            thread.join(timeout)
+        self.log_stats()
+
+    def _work(self):
+        while True:
+            batch = self._get_batch()
+            traps = [trap for trap in batch if trap is not _STOP]
+            self._handle_batch(traps)
+            if len(traps) < len(batch):
+                return
+
+    def _get_batch(self):
+        """Waits for a trap to become available on the queue, and returns it
+        along with any other immediately available traps, up to batch_size
+        traps in total.
+
+        """
+        batch = [self.queue.get()]
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _handle_batch(self, traps):
+        events = EventBatch()
+        for trap in traps:
+            trap.event_batch = events
+            try:
+                self.handler(trap)
+            except Exception:  # noqa
+                _logger.exception("Unhandled exception when handling trap "
+                                  "(%s)", id(trap))
+            finally:
+                trap.event_batch = None
+            self.counters.increment('handled')
+        if events:
+            posted = events.flush()
+            _logger.debug("posted %d events from %d traps", posted,
+                          len(traps))
+
+    def _log_stats_periodically(self):
+        while not self._stopped.wait(self.stats_interval):
+            self.log_stats()
+
+    def log_stats(self):
+        """Logs the current trap counters and queue length"""
+        _logger.info("trap counters: %s, queue length=%d", self.counters,
+                     self.queue.qsize())
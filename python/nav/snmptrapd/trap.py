@@ -16,22 +16,20 @@
 """Trap related data structures."""
 import string
 import logging
-from collections import namedtuple
 
-from nav.db import getConnection
+from nav.snmptrapd import lookup
 
 _logger = logging.getLogger(__name__)
 
 
-AgentNetbox = namedtuple('Agent', 'netboxid sysname roomid')
-
-
 class SNMPTrap(object):
     """Represents an SNMP trap or notification, in a structure agnostic to
     SNMP v1 and v2c differences.
 
     :
     """
+    # Set by nav.snmptrapd.pipeline while the trap is being handled
+    event_batch = None
 
     def __init__(self, src, agent, type, genericType, snmpTrapOID, uptime,
                  community, version, varbinds):
@@ -52,20 +50,12 @@ class SNMPTrap(object):
 
     def _lookup_agent(self):
         """Attempts to look up the corresponding netbox of this trap"""
-        conn = getConnection('snmptrapd')
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT netboxid, sysname, roomid FROM netbox WHERE ip = %s",
-            (self.agent,),
-        )
-
-        if cur.rowcount < 1:
+        netbox = lookup.get_netbox(self.agent)
+        if netbox is None:
             _logger.warning(
                 "Unable to match trap agent %s to a NAV-monitored device",
                 self.agent)
-            return None
-
-        return AgentNetbox(*cur.fetchone())
+        return netbox
 
     @property
     def netbox(self):
@@ -73,6 +63,19 @@ class SNMPTrap(object):
             setattr(self, '_netbox', self._lookup_agent())
         return getattr(self, '_netbox')
 
+    def post_event(self, event):
+        """Posts an event on behalf of a handler module.
+
+        If this trap is being handled as part of a batch of traps, the event
+        is posted to the event queue along with the events of the other traps
+        of the batch, once they have all been handled.
+
+        """
+        if self.event_batch is None:
+            event.post()
+        else:
+            self.event_batch.add(event)
+
     def __str__(self):
         text = "Got snmp version %s trap\n" % self.version
         text = (text + "Src: %s, Community: %s, Uptime: %s\n") % (
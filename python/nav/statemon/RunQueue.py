@@ -91,9 +91,18 @@ class Worker(threading.Thread):
 
 # pylint: disable=invalid-name
 def RunQueue(*args, **kwargs):
-    """Instantiates or retrieves the RunQueue singleton"""
+    """Instantiates or retrieves the RunQueue singleton.
+
+    The asynchronous engine of nav.statemon.asyncengine is used instead of
+    the threaded one if the engine option of servicemon.conf is set to async.
+    """
     if getattr(_RunQueue, '_instance') is None:
-        setattr(_RunQueue, '_instance', _RunQueue(*args, **kwargs))
+        if config.serviceconf().get('engine', 'threads') == 'async':
+            from .asyncengine import AsyncRunQueue
+            instance = AsyncRunQueue(*args, **kwargs)
+        else:
+            instance = _RunQueue(*args, **kwargs)
+        setattr(_RunQueue, '_instance', instance)
     return getattr(_RunQueue, '_instance')
 
 
@@ -19,6 +19,7 @@ import time
 import logging
 
 from django.utils import six
+from twisted.internet import defer, threads
 
 from nav.statemon import config, RunQueue, db, statistics, event
 
@@ -63,6 +64,13 @@ class AbstractChecker(object):
         version = ""
         # and then we return status UP, and our version string.
         return Event.UP, version
+
+    When servicemon runs its asynchronous engine, the blocking execute() is
+    run in a thread from a limited thread pool.  A checker may also provide a
+    native, non-blocking implementation of its test, in the form of an
+    execute_async() method that returns a Deferred which fires with the same
+    (status, info) tuple as execute().  This will be used by the asynchronous
+    engine instead.
     """
     IPV6_SUPPORT = False
     DESCRIPTION = ""
@@ -83,6 +91,7 @@ class AbstractChecker(object):
         self.netboxid = service['netboxid']
         self.args = service['args']
         self.version = service['version']
+        self.previous_version = self.version
         self._sysname = service['sysname']
         # This is (and should be) used by all subclasses
         self.port = int(service['args'].get('port', port))
@@ -105,8 +114,16 @@ class AbstractChecker(object):
         test. If the service has been unavailable for more than self.runcount
         times, it marks the service as down.
         """
-        orig_version = self.version
-        status, info = self.execute_test()
+        self.handle_result(*self.execute_test())
+
+    def handle_result(self, status, info):
+        """
+        Handles the (status, info) result of a test.  If the status has
+        changed it schedules a new test. If the service has been unavailable
+        for more than self.runcount times, it marks the service as down.
+        """
+        orig_version = self.previous_version
+        self.previous_version = self.version
         service = "%s:%s" % (self.sysname, self.get_type())
         _logger.info("%-20s -> %s", service, info)
 
@@ -198,6 +215,33 @@ class AbstractChecker(object):
         """Executes the actual service test implemented by a plugin"""
         raise NotImplementedError
 
+    def execute_test_async(self):
+        """
+        Executes and times the test without blocking, returning a Deferred
+        that fires with a (status, info) tuple.
+
+        The test is run by self.execute_async(), if the subclass provides
+        one.  Otherwise, the blocking self.execute_test() is run in a thread
+        from the reactor's thread pool.
+        """
+        execute_async = getattr(self, 'execute_async', None)
+        if execute_async is None:
+            return threads.deferToThread(self.execute_test)
+
+        start = time.time()
+
+        def _failed(failure):
+            return event.Event.DOWN, str(failure.value)
+
+        def _timed(result):
+            self.response_time = time.time() - start
+            return result
+
+        deferred = defer.maybeDeferred(execute_async)
+        deferred.addErrback(_failed)
+        deferred.addCallback(_timed)
+        return deferred
+
     @property
     def sysname(self):
         """Returns the sysname of which this service is running on.
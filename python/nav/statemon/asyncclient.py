@@ -0,0 +1,138 @@
+#
+# Copyright (C) 2019 Uninett AS
+#
+# This file is part of Network Administration Visualized (NAV).
+#
+# NAV is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License version 3 as published by the Free
+# Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.  You should have received a copy of the GNU General Public
+# License along with NAV. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Non-blocking network client utilities for service checkers.
+
+These are used by the native execute_async() implementations of service
+checkers, which are run by servicemon's asynchronous engine.
+"""
+from collections import deque
+
+from twisted.internet import defer, protocol
+from twisted.protocols.basic import LineOnlyReceiver
+from twisted.python.failure import Failure
+
+try:
+    from twisted.internet import ssl
+except ImportError:  # pyOpenSSL is not installed
+    ssl = None
+
+TLS_SUPPORT = ssl is not None
+
+
+class LineClient(LineOnlyReceiver):
+    """A client protocol that reads lines on request.
+
+    Lines may be terminated by either CRLF or LF, and are returned without
+    their terminators.
+    """
+    delimiter = b'\n'
+
+    def __init__(self):
+        self._lines = deque()
+        self._readers = deque()
+        self._lost = None
+
+    def lineReceived(self, line):
+        line = line.rstrip(b'\r')
+        if self._readers:
+            self._readers.popleft().callback(line)
+        else:
+            self._lines.append(line)
+
+    def lineLengthExceeded(self, line):
+        self.transport.loseConnection()
+
+    def connectionLost(self, reason=protocol.connectionDone):
+        self._lost = reason
+        while self._readers:
+            self._readers.popleft().errback(reason)
+
+    def read_line(self, timeout=None, clock=None):
+        """Returns a Deferred that fires with the next line received.
+
+        :param timeout: If set, the Deferred fails with a
+                        defer.TimeoutError if no line is received within this
+                        number of seconds.
+        """
+        if self._lines:
+            return defer.succeed(self._lines.popleft())
+        if self._lost:
+            return defer.fail(self._lost)
+
+        deferred = defer.Deferred(self._readers.remove)
+        self._readers.append(deferred)
+        if timeout is not None:
+            with_timeout(deferred, timeout, clock)
+        return deferred
+
+    def send_line(self, line):
+        """Sends a line of bytes, terminated by CRLF"""
+        self.transport.write(line + b'\r\n')
+
+    def close(self):
+        """Closes the connection"""
+        if self.transport:
+            self.transport.loseConnection()
+
+
+def connect(host, port, timeout, tls=False, clock=None):
+    """Connects to a TCP port.
+
+    :param tls: If True, a TLS session will be negotiated, without verifying
+                the server certificate.
+    :returns: A Deferred that fires with a connected LineClient.
+    """
+    clock = clock or _get_reactor()
+    creator = protocol.ClientCreator(clock, LineClient)
+    if tls:
+        if not TLS_SUPPORT:
+            raise RuntimeError("TLS support requires pyOpenSSL")
+        return creator.connectSSL(host, port, ssl.ClientContextFactory(),
+                                  timeout=timeout)
+    return creator.connectTCP(host, port, timeout=timeout)
+
+
+def with_timeout(deferred, timeout, clock=None):
+    """Cancels deferred unless it has fired within timeout seconds, in which
+    case it fails with a defer.TimeoutError.
+
+    :returns: deferred
+    """
+    clock = clock or _get_reactor()
+    timed_out = []
+
+    def _time_out():
+        timed_out.append(True)
+        deferred.cancel()
+
+    call = clock.callLater(timeout, _time_out)
+
+    def _done(result):
+        if call.active():
+            call.cancel()
+        elif (timed_out and isinstance(result, Failure)
+              and result.check(defer.CancelledError)):
+            return Failure(defer.TimeoutError(
+                "no response within %s seconds" % timeout))
+        return result
+
+    deferred.addBoth(_done)
+    return deferred
+
+
+def _get_reactor():
+    from twisted.internet import reactor
+    return reactor
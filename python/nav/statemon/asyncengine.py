@@ -0,0 +1,140 @@
+#
+# Copyright (C) 2019 Uninett AS
+#
+# This file is part of Network Administration Visualized (NAV).
+#
+# NAV is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License version 3 as published by the Free
+# Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.  You should have received a copy of the GNU General Public
+# License along with NAV. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+An event-driven alternative to the threaded RunQueue.
+
+Service checkers are run concurrently by the Twisted reactor, in a single
+thread of its own.  Checkers that provide a native execute_async()
+implementation only wait for network events, and thousands of them can be
+in progress at the same time.  Other checkers are run in the reactor's thread
+pool, whose size is limited by the maxthreads option.
+"""
+import logging
+import threading
+import time
+
+from twisted.internet import defer
+
+from . import config
+
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENT = 1000
+DEFAULT_MAX_THREADS = 10
+
+
+class AsyncRunQueue(object):
+    """
+    Runs service checkers using the Twisted reactor, which is run in a
+    separate thread.  This has the same interface as the threaded RunQueue.
+    """
+    def __init__(self, **kwargs):
+        self.conf = config.serviceconf()
+        self._max_concurrent = int(self.conf.get('max concurrent checks',
+                                                 DEFAULT_MAX_CONCURRENT))
+        _logger.info("Setting max concurrent checks=%i",
+                     self._max_concurrent)
+        self._max_threads = int(self.conf.get('maxthreads',
+                                              DEFAULT_MAX_THREADS))
+        _logger.info("Setting maxthreads=%i", self._max_threads)
+        self._controller = kwargs.get('controller', self)
+        self._reactor = kwargs.get('reactor') or _get_reactor()
+        self._semaphore = defer.DeferredSemaphore(self._max_concurrent)
+        self._active = set()
+        self._thread = None
+
+    def start(self):
+        """Starts the reactor thread, unless it is already running"""
+        if self._thread:
+            return
+        self._reactor.suggestThreadPoolSize(self._max_threads)
+        self._thread = threading.Thread(
+            target=self._reactor.run, name="reactor",
+            kwargs=dict(installSignalHandlers=False))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def enq(self, runnable):
+        """
+        Enqueues a checker to be run. It accepts a checker, or a tuple
+        containing (timestamp, checker).  If given in the last form, the
+        checker will be run as quickly as possible after time timestamp has
+        occured.
+
+        This may be called from any thread.
+        """
+        self.start()
+        if isinstance(runnable, tuple):
+            timestamp, checker = runnable
+            self._reactor.callFromThread(self.schedule, timestamp, checker)
+        else:
+            self._reactor.callFromThread(self.run, runnable)
+
+    def schedule(self, timestamp, checker):
+        """Runs checker at time timestamp"""
+        delay = max(0, timestamp - time.time())
+        self._reactor.callLater(delay, self.run, checker)
+
+    def run(self, checker):
+        """
+        Runs checker as soon as the maximum number of concurrent checks
+        allows it, unless it is already running or waiting to run.
+
+        :returns: A Deferred that fires when the checker has finished.
+        """
+        if id(checker) in self._active:
+            _logger.debug("%r is already queued, not checking it again",
+                          checker)
+            return defer.succeed(None)
+        self._active.add(id(checker))
+        deferred = self._semaphore.run(self._check, checker)
+        deferred.addBoth(self._finished, checker)
+        return deferred
+
+    def _check(self, checker):
+        deferred = checker.execute_test_async()
+        deferred.addCallback(lambda result: checker.handle_result(*result))
+        deferred.addErrback(self._failed, checker)
+        return deferred
+
+    def _finished(self, result, checker):
+        self._active.discard(id(checker))
+        return result
+
+    @staticmethod
+    def _failed(failure, checker):
+        _logger.error("Unhandled error while running %r: %s", checker,
+                      failure.getTraceback())
+
+    @property
+    def active_count(self):
+        """The number of checkers currently running or waiting to run"""
+        return len(self._active)
+
+    def terminate(self):
+        """Stops the reactor, abandoning any checks in progress"""
+        if not self._thread:
+            return
+        _logger.info("Waiting for the reactor to stop...")
+        self._reactor.callFromThread(self._reactor.stop)
+        self._thread.join()
+        _logger.info("The reactor has stopped")
+
+
+def _get_reactor():
+    from twisted.internet import reactor
+    return reactor
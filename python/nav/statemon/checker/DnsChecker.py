@@ -20,6 +20,8 @@ import socket
 import dns.exception
 import dns.message
 import dns.query
+from twisted.internet import defer
+from twisted.names import client as names_client, dns as names_dns
 
 from nav.statemon.abstractchecker import AbstractChecker
 from nav.statemon.event import Event
@@ -88,3 +90,46 @@ class DnsChecker(AbstractChecker):
                 return Event.DOWN, "Other error while requesting %s" % request
             else:
                 return Event.DOWN, "Timeout while requesting %s" % request
+
+    @defer.inlineCallbacks
+    def execute_async(self):
+        ip, _port = self.get_address()
+        request = self.args.get("request", "").strip()
+        if not request:
+            defer.returnValue((Event.UP, "Argument request must be supplied"))
+
+        resolver = names_client.Resolver(servers=[(ip, 53)])
+        timeout = (self.timeout,)
+        try:
+            answers, _authority, _additional = yield resolver.query(
+                names_dns.Query(request, names_dns.ALL_RECORDS, names_dns.IN),
+                timeout)
+        except defer.TimeoutError:
+            result = (Event.DOWN, "Timeout while requesting %s" % request)
+        except Exception:  # pylint: disable=broad-except
+            result = (Event.DOWN,
+                      "Other error while requesting %s" % request)
+        else:
+            if answers:
+                result = (Event.UP, "Ok")
+            else:
+                result = (Event.UP, "No record found, request=%s" % request)
+            yield self._get_version_async(resolver)
+        defer.returnValue(result)
+
+    @defer.inlineCallbacks
+    def _get_version_async(self, resolver):
+        # Not all DNS servers will answer this, so any error is ignored
+        try:
+            answers, _authority, _additional = yield resolver.query(
+                names_dns.Query("version.bind", names_dns.TXT, names_dns.CH),
+                (self.timeout,))
+        except Exception:  # pylint: disable=broad-except
+            return
+        for answer in answers:
+            if answer.type == names_dns.TXT and answer.payload.data:
+                version = answer.payload.data[0]
+                if isinstance(version, bytes):
+                    version = version.decode('utf-8', 'replace')
+                self.version = version
+                return
@@ -15,8 +15,12 @@
 #
 """HTTP Service Checker"""
 from nav import buildconf
+import base64
 import contextlib
 
+from twisted.internet import defer
+
+from nav.statemon import asyncclient
 from nav.statemon.event import Event
 from nav.statemon.abstractchecker import AbstractChecker
 from django.utils.six.moves.urllib.parse import urlsplit
@@ -48,6 +52,7 @@ class HttpChecker(AbstractChecker):
         ('timeout', ''),
     )
     PORT = 80
+    TLS = False
 
     def __init__(self, service, **kwargs):
         AbstractChecker.__init__(self, service, port=0, **kwargs)
@@ -79,13 +84,66 @@ class HttpChecker(AbstractChecker):
                 i.putheader("Authorization", "Basic %s" % auth.encode("base64"))
             i.endheaders()
             response = i.getresponse()
-            if 200 <= response.status < 400 or (response.status == 401 and not username):
-                status = Event.UP
-                version = response.getheader('SERVER')
-                self.version = version
-                info = 'OK (%s) %s' % (str(response.status), version)
-            else:
-                status = Event.DOWN
-                info = 'ERROR (%s) %s' % (str(response.status), url)
-
-            return status, info
+            return self.check_response(response.status,
+                                       response.getheader('SERVER'),
+                                       url, username)
+
+    @defer.inlineCallbacks
+    def execute_async(self):
+        ip, port = self.get_address()
+        url = self.args.get('url', '')
+        username = self.args.get('username')
+        password = self.args.get('password', '')
+        if not url:
+            url = "/"
+        _protocol, vhost, path, query, _fragment = urlsplit(url)
+        if '?' in url:
+            path = path + '?' + query
+        if not vhost:
+            vhost = '[%s]' % ip if ':' in ip else ip
+            if port and port != self.PORT:
+                vhost = '%s:%s' % (vhost, port)
+
+        request = [
+            'GET %s HTTP/1.0' % (path or '/'),
+            'Host: %s' % vhost,
+            'User-Agent: NAV/servicemon; version %s' % buildconf.VERSION,
+        ]
+        if username:
+            auth = "%s:%s" % (username, password)
+            request.append('Authorization: Basic %s' % base64.b64encode(
+                auth.encode('utf-8')).decode('ascii'))
+
+        client = yield asyncclient.connect(ip, port or self.PORT,
+                                           self.timeout, tls=self.TLS)
+        try:
+            for line in request + ['']:
+                client.send_line(line.encode('utf-8'))
+            status_line = yield client.read_line(self.timeout)
+            headers = {}
+            while True:
+                line = yield client.read_line(self.timeout)
+                if not line:
+                    break
+                name, _sep, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+        finally:
+            client.close()
+
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            defer.returnValue((Event.DOWN, 'Invalid HTTP response: %r' %
+                               status_line))
+        defer.returnValue(self.check_response(status, headers.get('server'),
+                                              url, username))
+
+    def check_response(self, status, server, url, username=None):
+        """Returns a (status, info) tuple from the status code and Server
+        header of an HTTP response.
+        """
+        if 200 <= status < 400 or (status == 401 and not username):
+            self.version = server
+            return Event.UP, 'OK (%s) %s' % (str(status), server)
+        else:
+            return Event.DOWN, 'ERROR (%s) %s' % (str(status), url)
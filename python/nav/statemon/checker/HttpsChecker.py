@@ -20,6 +20,7 @@ import socket
 
 from ssl import wrap_socket
 
+from nav.statemon import asyncclient
 from nav.statemon.checker.HttpChecker import HttpChecker
 
 
@@ -39,6 +40,10 @@ class HTTPSConnection(http_client.HTTPSConnection):
 class HttpsChecker(HttpChecker):
     """HTTPS"""
     PORT = 443
+    TLS = True
+
+    if not asyncclient.TLS_SUPPORT:
+        execute_async = None  # run the blocking execute() in a thread
 
     def connect(self, ip, port):
         return HTTPSConnection(self.timeout, ip, port)
@@ -17,6 +17,10 @@
 import select
 import socket
 
+from twisted.internet import defer
+from twisted.internet.error import ConnectionClosed
+
+from nav.statemon import asyncclient
 from nav.statemon.abstractchecker import AbstractChecker
 from nav.statemon.event import Event
 
@@ -43,3 +47,15 @@ class PortChecker(AbstractChecker):
         sock.close()
 
         return status, txt
+
+    @defer.inlineCallbacks
+    def execute_async(self):
+        ip, port = self.get_address()
+        client = yield asyncclient.connect(ip, port, self.timeout)
+        try:
+            yield client.read_line(self.timeout)
+        except (defer.TimeoutError, ConnectionClosed):
+            pass  # a banner is not required
+        finally:
+            client.close()
+        defer.returnValue((Event.UP, 'Alive'))
@@ -18,6 +18,10 @@ import re
 import socket
 import smtplib
 
+from django.utils import six
+from twisted.internet import defer
+
+from nav.statemon import asyncclient
 from nav.statemon.abstractchecker import AbstractChecker
 from nav.statemon.event import Event
 
@@ -44,6 +48,25 @@ class SmtpChecker(AbstractChecker):
             smtp.quit()
         except smtplib.SMTPException:
             pass
+        return self.check_greeting(code, msg)
+
+    @defer.inlineCallbacks
+    def execute_async(self):
+        ip, port = self.get_address()
+        client = yield asyncclient.connect(ip, port, self.timeout)
+        try:
+            code, msg = yield read_reply(client, self.timeout)
+            client.send_line(b'QUIT')
+        finally:
+            client.close()
+        defer.returnValue(self.check_greeting(code, msg))
+
+    def check_greeting(self, code, msg):
+        """Returns a (status, info) tuple from the reply code and message of
+        an SMTP server greeting.
+        """
+        if isinstance(msg, six.binary_type):
+            msg = msg.decode('utf-8', 'replace')
         if code != 220:
             return Event.DOWN, msg
         try:
@@ -57,6 +80,25 @@ class SmtpChecker(AbstractChecker):
         return Event.UP, msg
 
 
+@defer.inlineCallbacks
+def read_reply(client, timeout):
+    """Reads a possibly multi-line SMTP reply from a LineClient.
+
+    :returns: A Deferred (code, message) tuple, like smtplib.SMTP.getreply()
+    """
+    lines = []
+    while True:
+        line = yield client.read_line(timeout)
+        lines.append(line[4:].strip())
+        if line[3:4] != b'-':
+            break
+    try:
+        code = int(line[:3])
+    except ValueError:
+        code = -1
+    defer.returnValue((code, b"\n".join(lines)))
+
+
 # pylint: disable=R0904
 class SMTP(smtplib.SMTP):
     """A customized SMTP protocol interface"""
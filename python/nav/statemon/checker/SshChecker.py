@@ -18,6 +18,9 @@
 
 import socket
 
+from twisted.internet import defer
+
+from nav.statemon import asyncclient
 from nav.statemon.abstractchecker import AbstractChecker
 from nav.statemon.event import Event
 
@@ -52,3 +55,26 @@ class SshChecker(AbstractChecker):
             sock.close()
         self.version = version
         return Event.UP, version
+
+    @defer.inlineCallbacks
+    def execute_async(self):
+        (hostname, port) = self.get_address()
+        client = None
+        try:
+            client = yield asyncclient.connect(hostname, port, self.timeout)
+            line = yield client.read_line(self.timeout)
+            version = line.decode('utf-8', 'replace').strip()
+            protocol, major = version.split('-')[:2]
+            client.send_line(("%s-%s-%s" % (
+                protocol, major, "NAV_Servicemon")).encode('utf-8'))
+        except Exception as err:
+            result = (Event.DOWN,
+                      "Failed to send version reply to %s: %s" % (
+                          self.get_address(), str(err)))
+        else:
+            self.version = version
+            result = (Event.UP, version)
+        finally:
+            if client:
+                client.close()
+        defer.returnValue(result)
@@ -37,6 +37,7 @@ from psycopg2.errorcodes import IN_FAILED_SQL_TRANSACTION
 from psycopg2.errorcodes import lookup as pg_err_lookup
 
 from nav.db import get_connection_string
+from nav.event import Event as QueueEvent, insert_events
 from nav.util import synchronized
 
 from . import checkermap
@@ -60,6 +61,9 @@ class DbError(Exception):
 
 _queryLock = threading.Lock()
 
+# The maximum number of queued events to commit in a single transaction
+MAX_EVENT_BATCH = 500
+
 
 class _DB(threading.Thread):
     _instance = None
@@ -137,18 +141,33 @@ class _DB(threading.Thread):
         """Runs the event posting loop, popping events from the queue"""
         self.connect()
         while 1:
-            event = self.queue.get()
-            _logger.debug("Got event: [%s]", event)
+            events = self._get_events()
+            _logger.debug("Got events: %r", events)
             try:
-                self.commit_event(event)
-                self.db.commit()
+                self.commit_events(events)
             except Exception:
-                # If we fail to commit the event, place it
+                # If we fail to commit the events, place them
                 # back in our queue
-                _logger.debug("Failed to commit event, rescheduling...")
-                self.new_event(event)
+                _logger.debug("Failed to commit %d events, rescheduling...",
+                              len(events))
+                for event in events:
+                    self.new_event(event)
                 time.sleep(5)
 
+    def _get_events(self):
+        """Waits for an event to become available on the queue, and returns
+        it along with any other immediately available events, up to
+        MAX_EVENT_BATCH events in total.
+
+        """
+        events = [self.queue.get()]
+        while len(events) < MAX_EVENT_BATCH:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
     @synchronized(_queryLock)
     def query(self, statement, values=None, commit=1):
         """
@@ -212,15 +231,57 @@ class _DB(threading.Thread):
 
     def commit_event(self, event):
         """Commits an event to the database event queue"""
-        if event.source not in ("serviceping", "pping"):
-            _logger.critical("Invalid source for event: %s", event.source)
-            return
-        if event.eventtype == "version":
-            statement = """UPDATE service SET version = %s
-                           WHERE serviceid = %s"""
-            self.execute(statement, (event.version, event.serviceid))
-            return
+        self.commit_events([event])
+
+    def commit_events(self, events):
+        """Commits a list of events to the database event queue, in a single
+        transaction.
+
+        If the transaction fails because of an integrity error, which is
+        typically caused by an event for a netbox or service that has just
+        been deleted, the events are committed one by one, and the offending
+        events are thrown away.
+
+        """
+        try:
+            self._commit_events(events)
+        except psycopg2.IntegrityError:
+            if len(events) == 1:
+                _logger.critical("Database integrity error, throwing away "
+                                 "event: %r", events[0], exc_info=True)
+                return
+            for event in events:
+                self.commit_events([event])
+
+    @synchronized(_queryLock)
+    def _commit_events(self, events):
+        versions = []
+        queue_events = []
+        for event in events:
+            if event.source not in ("serviceping", "pping"):
+                _logger.critical("Invalid source for event: %s", event.source)
+            elif event.eventtype == "version":
+                versions.append((event.version, event.serviceid))
+            else:
+                queue_events.append(self._make_queue_event(event))
+
+        cursor = self.cursor()
+        try:
+            if versions:
+                cursor.executemany("""UPDATE service SET version = %s
+                                      WHERE serviceid = %s""", versions)
+            insert_events(cursor, queue_events)
+            self.db.commit()
+        except Exception:
+            try:
+                self.db.rollback()
+            except Exception:
+                _logger.critical("Failed to rollback")
+            raise
 
+    @staticmethod
+    def _make_queue_event(event):
+        """Converts a statemon Event to a nav.event.Event"""
         if event.status == Event.UP:
             value = 100
             state = 'e'
@@ -231,20 +292,13 @@ class _DB(threading.Thread):
             value = 1
             state = 'x'
 
-        nextid = self.query("SELECT nextval('eventq_eventqid_seq')")[0][0]
-        statement = """INSERT INTO eventq
-                       (eventqid, subid, netboxid, eventtypeid,
-                        state, value, source, target)
-                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
-        values = (nextid, event.serviceid, event.netboxid,
-                  event.eventtype, state, value, event.source, "eventEngine")
-        self.execute(statement, values)
-
-        statement = """INSERT INTO eventqvar
-                       (eventqid, var, val) VALUES
-                       (%s, %s, %s)"""
-        values = (nextid, 'descr', event.info)
-        self.execute(statement, values)
+        queue_event = QueueEvent(source=event.source, target="eventEngine",
+                                 netboxid=event.netboxid,
+                                 subid=event.serviceid,
+                                 eventtypeid=event.eventtype,
+                                 state=state, value=value)
+        queue_event['descr'] = event.info
+        return queue_event
 
     def hosts_to_ping(self):
         """Returns a list of netboxes to ping, from the database"""
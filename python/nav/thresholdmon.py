@@ -18,6 +18,7 @@
 from __future__ import absolute_import
 
 import logging
+import time
 from optparse import OptionParser
 from collections import defaultdict
 
@@ -28,6 +29,9 @@ from nav.models.manage import Netbox, Interface, Sensor
 from nav.models.thresholds import ThresholdRule
 from nav.models.event import EventQueue as Event, AlertHistory
 from nav.metrics.lookup import lookup
+from nav.metrics.thresholds import (get_values_in_batches, get_metric_maximums,
+                                    EXPRESSION_PATTERN, DEFAULT_WORKERS,
+                                    DEFAULT_BATCH_SIZE)
 
 import django
 from django.db import transaction
@@ -41,7 +45,7 @@ _logger = logging.getLogger('nav.thresholdmon')
 def main():
     """Main thresholdmon program"""
     parser = make_option_parser()
-    (_options, _args) = parser.parse_args()
+    (options, _args) = parser.parse_args()
 
     init_generic_logging(
         logfile=LOG_FILE,
@@ -50,7 +54,7 @@ def main():
         read_config=True,
     )
     django.setup()
-    scan()
+    scan(workers=options.workers, batch_size=options.batch_size)
 
 
 def make_option_parser():
@@ -60,31 +64,76 @@ def make_option_parser():
         description=("Scans metric values for exceeded thresholds, according"
                      "to configured threshold rules.")
     )
+    parser.add_option("-w", "--workers", type="int", default=DEFAULT_WORKERS,
+                      help="the maximum number of concurrent requests to "
+                      "Graphite (default: %default)")
+    parser.add_option("-b", "--batch-size", type="int",
+                      default=DEFAULT_BATCH_SIZE,
+                      help="the maximum number of rule targets to retrieve "
+                      "from Graphite per request (default: %default)")
     return parser
 
 
-def scan():
-    """Scans for threshold rules and evaluates them"""
-    rules = ThresholdRule.objects.all()
+def scan(workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE):
+    """Scans for threshold rules and evaluates them.
+
+    The values of all rules are retrieved from Graphite up front, in
+    combined, concurrent requests, and the maximum values needed by
+    percentage thresholds are looked up all at once.
+    """
+    rules = list(ThresholdRule.objects.all())
     alerts = get_unresolved_threshold_alerts()
 
     _logger.info("evaluating %d rules", len(rules))
+    start = time.time()
+    evaluators = dict((rule.id, rule.get_evaluator()) for rule in rules)
+    errors = get_values_in_batches(list(evaluators.values()),
+                                   workers=workers, batch_size=batch_size)
+    _logger.info("retrieved values for %d rules in %.2f s", len(rules),
+                 time.time() - start)
+
+    maximums = get_metric_maximums(
+        metric for rule in rules if _uses_percent(rule)
+        for metric in evaluators[rule.id].result)
+    for evaluator in evaluators.values():
+        evaluator.maximums = maximums
+
     for rule in rules:
-        evaluate_rule(rule, alerts)
-    _logger.info("done")
+        evaluator = evaluators[rule.id]
+        evaluate_rule(rule, alerts, evaluator, errors.get(evaluator))
+    _logger.info("done in %.2f s", time.time() - start)
+
+
+def _uses_percent(rule):
+    for expression in (rule.alert, rule.clear):
+        match = EXPRESSION_PATTERN.match(expression or '')
+        if match and match.group('percent'):
+            return True
+    return False
 
 
 # pylint: disable=W0703
-def evaluate_rule(rule, alerts):
+def evaluate_rule(rule, alerts, evaluator=None, error=None):
     """
     Evaluates the current status of a single rule and posts events if
     necessary.
+
+    :param evaluator: A ThresholdEvaluator for rule, whose values have
+                      already been retrieved.  If omitted, a new evaluator is
+                      made to retrieve them.
+    :param error: An exception that occurred while retrieving the values of
+                  evaluator.
     """
     _logger.debug("evaluating rule %r", rule)
+    start = time.time()
 
-    evaluator = rule.get_evaluator()
     try:
-        if not evaluator.get_values():
+        if error:
+            raise error
+        if evaluator is None:
+            evaluator = rule.get_evaluator()
+            evaluator.get_values()
+        if not evaluator.result:
             _logger.warning(
                 "did not find any matching values for rule %r %s",
                 rule.target, rule.alert
@@ -95,6 +144,19 @@ def evaluate_rule(rule, alerts):
         )
         return
 
+    try:
+        _evaluate_rule(rule, alerts, evaluator)
+    finally:
+        _logger.info("rule %s (%s): %d values, retrieved in %s s, "
+                     "evaluated in %.3f s", rule.id, rule.target,
+                     len(evaluator.result),
+                     "%.3f" % evaluator.fetch_time
+                     if evaluator.fetch_time is not None else "?",
+                     time.time() - start)
+
+
+def _evaluate_rule(rule, alerts, evaluator):
+
     # post new exceed events
     try:
         exceeded = evaluator.evaluate(rule.alert)
@@ -15,13 +15,18 @@
 #
 """Serializers for status API data"""
 
+from collections import defaultdict
+
 from nav.six import reverse
 from django.template.defaultfilters import urlize
 from django.utils.encoding import force_text
 from django.utils.html import strip_tags
 from rest_framework import serializers
 from nav.models import event, profiles
+from nav.models.event import prefetch_subjects
 from nav.models.fields import INFINITY
+from nav.models.manage import Netbox, NetboxCategory
+from nav.models.service import Service
 
 
 class AccountSerializer(serializers.ModelSerializer):
@@ -66,6 +71,120 @@ class EventTypeSerializer(serializers.ModelSerializer):
         fields = ('id', 'description')
 
 
+class AlertBatch(object):
+    """Resolves the subjects of a batch of alerts, along with their
+    maintenance states and device groups, using a few bulk queries.
+
+    Every value is looked up only once per batch.  Alert subjects are cached
+    on the alerts themselves, so that subsequent get_subject() calls are
+    free.
+
+    """
+    def __init__(self, alerts):
+        self.alerts = list(alerts)
+        self._ids = set(alert.pk for alert in self.alerts)
+        self._maintenance = {}
+        self._netboxes_on_maintenance = None
+        self._services_on_maintenance = None
+        self._device_groups = None
+
+        prefetch_subjects([alert for alert in self.alerts
+                           if not hasattr(alert, '_cached_subject')])
+        for alert in self.alerts:
+            subject = self.get_subject(alert)
+            # the netbox of the alert is likely already loaded, while the
+            # netbox of a prefetched subject is not
+            netbox_id = getattr(subject, 'netbox_id', None)
+            if netbox_id is not None and netbox_id == alert.netbox_id:
+                subject.netbox = alert.netbox
+
+    def __contains__(self, alert):
+        return alert.pk in self._ids
+
+    @staticmethod
+    def get_subject(alert):
+        """Returns the subject of alert"""
+        if not hasattr(alert, '_cached_subject'):
+            alert._cached_subject = alert.get_subject()
+        return alert._cached_subject
+
+    def is_on_maintenance(self, alert):
+        """Returns True if the subject of alert is on maintenance, or None if
+        this cannot be determined.
+        """
+        if alert.pk not in self._maintenance:
+            if self._netboxes_on_maintenance is None:
+                self._load_maintenance_states()
+            self._maintenance[alert.pk] = self._is_subject_on_maintenance(
+                self.get_subject(alert))
+        return self._maintenance[alert.pk]
+
+    def _is_subject_on_maintenance(self, subject):
+        netbox_id = _get_netbox_id(subject)
+        if netbox_id is None:
+            return None
+        if (isinstance(subject, Service) and
+                (netbox_id, str(subject.pk)) in self._services_on_maintenance):
+            return True
+        return netbox_id in self._netboxes_on_maintenance
+
+    def _load_maintenance_states(self):
+        netbox_ids = set(_get_netbox_id(self.get_subject(alert))
+                         for alert in self.alerts)
+        netbox_ids.discard(None)
+        self._netboxes_on_maintenance = set()
+        self._services_on_maintenance = set()
+        if not netbox_ids:
+            return
+
+        states = event.AlertHistory.objects.unresolved(
+            'maintenanceState').filter(
+                netbox__in=netbox_ids,
+                variables__variable__in=('netbox', 'service'),
+            ).values_list('netbox', 'subid', 'variables__variable').distinct()
+        for netbox_id, subid, variable in states:
+            if variable == 'netbox':
+                self._netboxes_on_maintenance.add(netbox_id)
+            else:
+                self._services_on_maintenance.add((netbox_id, subid))
+
+    def get_device_groups(self, alert):
+        """Returns the device group ids of the netbox of alert, if any"""
+        if alert.netbox_id is None:
+            return None
+        if self._device_groups is None:
+            self._device_groups = defaultdict(list)
+            netbox_ids = set(alert.netbox_id for alert in self.alerts)
+            netbox_ids.discard(None)
+            categories = NetboxCategory.objects.filter(
+                netbox__in=netbox_ids).values_list('netbox', 'category')
+            for netbox_id, group_id in categories:
+                self._device_groups[netbox_id].append(group_id)
+        return self._device_groups.get(alert.netbox_id, [])
+
+
+def _get_netbox_id(subject):
+    """Returns the id of the netbox an alert subject is, or belongs to"""
+    if isinstance(subject, Netbox):
+        return subject.pk
+    netbox_id = getattr(subject, 'netbox_id', None)
+    if netbox_id is None:
+        netbox = getattr(subject, 'netbox', None)
+        netbox_id = getattr(netbox, 'pk', None)
+    return netbox_id
+
+
+class AlertHistoryListSerializer(serializers.ListSerializer):
+    """Serializes a list of alerts, resolving their subjects, maintenance
+    states and device groups as a single batch.
+    """
+    def to_representation(self, data):
+        alerts = data.all() if hasattr(data, 'all') else data
+        self.child.batch = AlertBatch(alerts)
+        return super(AlertHistoryListSerializer, self).to_representation(
+            self.child.batch.alerts)
+
+
 class AlertHistorySerializer(serializers.ModelSerializer):
     """Serializer for the AlertHistory model"""
     subject = serializers.SerializerMethodField(source='get_subject')
@@ -85,33 +204,32 @@ class AlertHistorySerializer(serializers.ModelSerializer):
     start_time = serializers.DateTimeField()
     end_time = serializers.SerializerMethodField()
 
-    @staticmethod
-    def get_subject(obj):
+    batch = None
+
+    def get_batch(self, obj):
+        """Returns the AlertBatch that obj is serialized as a part of"""
+        if self.batch is None or obj not in self.batch:
+            self.batch = AlertBatch([obj])
+        return self.batch
+
+    def get_subject(self, obj):
         """Return textual description of object"""
-        return force_text(obj.get_subject())
+        return force_text(self.get_batch(obj).get_subject(obj))
 
-    @staticmethod
-    def get_subject_url(obj):
+    def get_subject_url(self, obj):
         """Returns an absolute URL for the subject, or None if not applicable"""
+        subject = self.get_batch(obj).get_subject(obj)
         try:
-            return obj.get_subject().get_absolute_url()
+            return subject.get_absolute_url()
         except AttributeError:
             try:
-                return obj.get_subject().netbox.get_absolute_url()
+                return subject.netbox.get_absolute_url()
             except AttributeError:
                 return None
 
-    @staticmethod
-    def is_on_maintenance(obj):
+    def is_on_maintenance(self, obj):
         """Returns True if alert subject is on maintenance"""
-        try:
-            return obj.get_subject().is_on_maintenance()
-        except AttributeError:
-            try:
-                # attempt fallback to owning netbox, if any
-                return obj.get_subject().netbox.is_on_maintenance()
-            except AttributeError:
-                pass
+        return self.get_batch(obj).is_on_maintenance(obj)
 
     @staticmethod
     def get_event_history_url(obj):
@@ -119,22 +237,21 @@ class AlertHistorySerializer(serializers.ModelSerializer):
         return "".join([reverse('devicehistory-view'), '?eventtype=', 'e_',
                         obj.event_type.id])
 
-    @staticmethod
-    def get_netbox_history_url(obj):
+    def get_netbox_history_url(self, obj):
         """Returns a device history URL for this subject, if it is a Netbox"""
-        if AlertHistorySerializer.get_subject_type(obj) == 'Netbox':
+        subject = self.get_batch(obj).get_subject(obj)
+        if isinstance(subject, Netbox):
             return reverse('devicehistory-view-netbox',
-                           kwargs={'netbox_id': obj.get_subject().id})
+                           kwargs={'netbox_id': subject.id})
 
     @staticmethod
     def get_event_details_url(obj):
         """Returns the url to the details page for this event"""
         return reverse('event-details', kwargs={'event_id': obj.pk})
 
-    @staticmethod
-    def get_subject_type(obj):
+    def get_subject_type(self, obj):
         """Returns the class name of the subject"""
-        return obj.get_subject().__class__.__name__
+        return self.get_batch(obj).get_subject(obj).__class__.__name__
 
     @staticmethod
     def get_end_time(obj):
@@ -144,15 +261,11 @@ class AlertHistorySerializer(serializers.ModelSerializer):
         """
         return obj.end_time if obj.end_time != INFINITY else "infinity"
 
-    @staticmethod
-    def get_device_groups(obj):
+    def get_device_groups(self, obj):
         """Returns all the device groups for the netbox if any"""
-        try:
-            netbox = obj.netbox
-            return netbox.groups.values_list('id', flat=True)
-        except:
-            pass
+        return self.get_batch(obj).get_device_groups(obj)
 
     class Meta(object):
         model = event.AlertHistory
         fields = '__all__'
+        list_serializer_class = AlertHistoryListSerializer
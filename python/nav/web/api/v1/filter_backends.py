@@ -146,12 +146,11 @@ class AlertHistoryFilterBackend(filters.BaseFilterBackend):
 
         on_maintenance = request.query_params.get("on_maintenance", False)
         if not on_maintenance:
-            is_on_maintenance = (
-                alert_serializers.AlertHistorySerializer.is_on_maintenance)
-
             # It's time we stop being a queryset, since we now need to filter
             # on computed values
-            queryset = [i for i in queryset if not is_on_maintenance(i)]
+            batch = alert_serializers.AlertBatch(queryset)
+            queryset = [i for i in batch.alerts
+                        if not batch.is_on_maintenance(i)]
 
         return queryset
 
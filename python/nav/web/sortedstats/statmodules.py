@@ -24,7 +24,7 @@ from nav.six import reverse
 
 from nav.metrics.data import (get_metric_average, get_metric_max,
                               get_metric_data)
-from nav.metrics.lookup import lookup
+from nav.metrics.lookup import lookup_many
 
 _logger = logging.getLogger(__name__)
 
@@ -81,7 +81,7 @@ class Stat(object):
 
     def get_metric_lookups(self):
         """Return a mapping of metric -> object"""
-        return {x: lookup(x) for x in self.get_graph_metrics()}
+        return lookup_many(self.get_graph_metrics())
 
     def get_graph_url(self):
         """Gets the graph url to display the statistics as a graph"""
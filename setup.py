@@ -1,6 +1,7 @@
 import os
+import runpy
 from glob import glob
-from setuptools import setup, find_packages
+from setuptools import setup, find_packages, Command
 from distutils.command.build import build
 
 TOP_SRCDIR = os.path.abspath(os.path.dirname(__file__))
@@ -22,8 +23,28 @@ def find_scripts():
                 yield candidate
 
 
-# Ensure CSS files are built every time build is invoked
-build.sub_commands = [('build_sass', None)] + build.sub_commands
+class build_mibs(Command):
+    """Precompiles the smidump MIB modules into compact MIB stores"""
+    description = "precompile smidump MIB modules into compact MIB stores"
+    user_options = []
+
+    def initialize_options(self):
+        self.build_lib = None
+
+    def finalize_options(self):
+        self.set_undefined_options('build_py', ('build_lib', 'build_lib'))
+
+    def run(self):
+        directory = os.path.join(self.build_lib, 'nav', 'smidumps')
+        smidumps = runpy.run_path(os.path.join(directory, '__init__.py'))
+        compiled = smidumps['compile_all'](directory)
+        self.announce("compiled %d MIB stores" % len(compiled), level=2)
+
+
+# Ensure CSS files are built every time build is invoked, and MIB stores are
+# compiled after the Python modules have been built
+build.sub_commands = ([('build_sass', None)] + build.sub_commands +
+                      [('build_mibs', None)])
 
 
 setup(
@@ -63,5 +84,9 @@ setup(
         },
     },
 
+    cmdclass={
+        'build_mibs': build_mibs,
+    },
+
     zip_safe=False,
 )
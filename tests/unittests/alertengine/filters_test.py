@@ -0,0 +1,105 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from nav.alertengine.filters import (AlertRecord, CompiledFilter,
+                                     UncompilableExpression,
+                                     compile_expression, compile_filter)
+from nav.models.profiles import Expression, MatchField, Operator
+
+
+def make_expression(value_id, operator, value, data_type=MatchField.STRING,
+                    name='field'):
+    match_field = MatchField(value_id=value_id, data_type=data_type,
+                             name=name)
+    return Expression(match_field=match_field, operator=operator, value=value)
+
+
+def make_record(sysname='foo-sw.example.org', severity=50):
+    netbox = Mock(sysname=sysname, room=None)
+    return AlertRecord(Mock(netbox=netbox, severity=severity))
+
+
+class TestExpressionCompilation(TestCase):
+    def assertMatches(self, expression, record):
+        self.assertTrue(compile_expression(expression)(record))
+
+    def assertNotMatches(self, expression, record):
+        self.assertFalse(compile_expression(expression)(record))
+
+    def test_equals_should_be_case_sensitive(self):
+        expr = make_expression('netbox.sysname', Operator.EQUALS,
+                               'FOO-SW.example.org')
+        self.assertNotMatches(expr, make_record())
+
+    def test_in_should_match_any_listed_value(self):
+        expr = make_expression('netbox.sysname', Operator.IN,
+                               'bar|foo-sw.example.org')
+        self.assertMatches(expr, make_record())
+
+    def test_not_equal_should_match_missing_netbox(self):
+        expr = make_expression('netbox.sysname', Operator.NOT_EQUAL, 'bar')
+        self.assertMatches(expr, AlertRecord(Mock(netbox=None)))
+
+    def test_contains_should_be_case_insensitive(self):
+        expr = make_expression('netbox.sysname', Operator.CONTAINS, 'SW')
+        self.assertMatches(expr, make_record())
+
+    def test_wildcard_should_match_like_ilike(self):
+        expr = make_expression('netbox.sysname', Operator.WILDCARD,
+                               'FOO_sw.%')
+        self.assertMatches(expr, make_record())
+
+    def test_wildcard_should_be_anchored(self):
+        expr = make_expression('netbox.sysname', Operator.WILDCARD, 'foo')
+        self.assertNotMatches(expr, make_record())
+
+    def test_integer_comparison_should_convert_value(self):
+        expr = make_expression('alertq.severity', Operator.GREATER, '40',
+                               data_type=MatchField.INTEGER)
+        self.assertMatches(expr, make_record(severity=50))
+
+    def test_regexp_should_search_case_insensitively(self):
+        expr = make_expression('netbox.sysname', Operator.REGEXP, '^FOO-')
+        self.assertMatches(expr, make_record())
+
+    def test_postgresql_specific_regexp_should_not_compile(self):
+        expr = make_expression('netbox.sysname', Operator.REGEXP,
+                               '[[:digit:]]')
+        with self.assertRaises(UncompilableExpression):
+            compile_expression(expr)
+
+    def test_string_ordering_should_not_compile(self):
+        expr = make_expression('netbox.sysname', Operator.GREATER, 'a')
+        with self.assertRaises(UncompilableExpression):
+            compile_expression(expr)
+
+    def test_multi_valued_relation_should_not_compile(self):
+        expr = make_expression('module.name', Operator.EQUALS, 'a')
+        with self.assertRaises(UncompilableExpression):
+            compile_expression(expr)
+
+    def test_ip_field_should_not_compile(self):
+        expr = make_expression('netbox.ip', Operator.EQUALS, '10.0.0.1',
+                               data_type=MatchField.IP)
+        with self.assertRaises(UncompilableExpression):
+            compile_expression(expr)
+
+
+class TestCompiledFilter(TestCase):
+    def test_uncompilable_expressions_should_be_verified_using_sql(self):
+        compiled_expr = make_expression('netbox.sysname', Operator.EQUALS,
+                                        'foo-sw.example.org')
+        sql_expr = make_expression('module.name', Operator.EQUALS, 'a')
+        filtr = Mock(id=1)
+        compiled = compile_filter(filtr, [compiled_expr, sql_expr])
+        record = make_record()
+
+        compiled.matches(record)
+        filtr.verify.assert_called_once_with(record.alert, [sql_expr])
+
+    def test_sql_should_not_be_used_when_predicates_fail(self):
+        filtr = Mock(id=1)
+        compiled = CompiledFilter(filtr, [lambda record: False], [Mock()])
+        self.assertFalse(compiled.matches(make_record()))
+        self.assertFalse(filtr.verify.called)
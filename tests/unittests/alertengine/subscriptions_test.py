@@ -0,0 +1,67 @@
+from datetime import datetime, time
+from unittest import TestCase
+
+from mock import Mock
+
+from nav.alertengine.subscriptions import (AccountSubscriptions,
+                                           subscription_sort_key)
+from nav.models.profiles import AlertProfile, AlertSubscription, TimePeriod
+
+# A monday and a saturday
+WEEKDAY = datetime(2019, 6, 3, 12, 0)
+WEEKEND = datetime(2019, 6, 8, 12, 0)
+
+
+def make_timeperiods():
+    return [
+        TimePeriod(id=1, start=time(8, 0), valid_during=TimePeriod.WEEKDAYS),
+        TimePeriod(id=2, start=time(16, 0), valid_during=TimePeriod.WEEKDAYS),
+        TimePeriod(id=3, start=time(0, 0), valid_during=TimePeriod.WEEKENDS),
+    ]
+
+
+class TestFindActiveTimeperiod(TestCase):
+    def setUp(self):
+        self.profile = AlertProfile(id=1)
+
+    def test_should_find_latest_started_weekday_period(self):
+        period = self.profile.find_active_timeperiod(make_timeperiods(),
+                                                     WEEKDAY)
+        self.assertEqual(period.id, 1)
+
+    def test_should_find_weekend_period(self):
+        period = self.profile.find_active_timeperiod(make_timeperiods(),
+                                                     WEEKEND)
+        self.assertEqual(period.id, 3)
+
+    def test_early_morning_should_find_last_period_of_day(self):
+        early = datetime(2019, 6, 3, 7, 0)
+        period = self.profile.find_active_timeperiod(make_timeperiods(),
+                                                     early)
+        self.assertEqual(period.id, 2)
+
+
+class TestAccountSubscriptions(TestCase):
+    def setUp(self):
+        self.account = AccountSubscriptions(Mock(), AlertProfile(id=1))
+        self.account.timeperiods = make_timeperiods()
+
+    def test_should_return_subscriptions_of_active_period(self):
+        subscription = (Mock(), ())
+        self.account.subscriptions[3].append(subscription)
+        self.assertEqual(self.account.get_active_subscriptions(WEEKEND),
+                         [subscription])
+
+    def test_should_return_nothing_for_periods_without_subscriptions(self):
+        self.account.subscriptions[3].append((Mock(), ()))
+        self.assertEqual(self.account.get_active_subscriptions(WEEKDAY), [])
+
+
+def test_subscriptions_should_sort_in_priority_order():
+    types = [AlertSubscription.WEEKLY, AlertSubscription.NOW,
+             AlertSubscription.DAILY, AlertSubscription.NEXT]
+    subscriptions = sorted((Mock(type=t) for t in types),
+                           key=subscription_sort_key)
+    assert [s.type for s in subscriptions] == [
+        AlertSubscription.NOW, AlertSubscription.NEXT,
+        AlertSubscription.DAILY, AlertSubscription.WEEKLY]
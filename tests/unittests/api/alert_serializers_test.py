@@ -0,0 +1,101 @@
+from mock import patch, Mock
+import pytest
+
+from nav.models.event import AlertHistory
+from nav.models.manage import Netbox, Interface
+from nav.models.service import Service
+from nav.web.api.v1.alert_serializers import (AlertBatch,
+                                              AlertHistorySerializer)
+
+PREFIX = 'nav.web.api.v1.alert_serializers.'
+
+
+def make_alert(pk, netbox, subject=None):
+    alert = AlertHistory(id=pk, netbox=netbox, event_type_id='boxState')
+    if subject is not None:
+        alert._cached_subject = subject
+    return alert
+
+
+@pytest.fixture
+def netboxes():
+    return Netbox(id=1, sysname='a'), Netbox(id=2, sysname='b')
+
+
+@pytest.fixture
+def alerts(netboxes):
+    first, second = netboxes
+    return [
+        make_alert(1, first),
+        make_alert(2, first, Interface(id=7, netbox_id=1)),
+        make_alert(3, second, Service(id=5, netbox_id=2)),
+        make_alert(4, second, Service(id=6, netbox_id=2)),
+        make_alert(5, None, Mock(spec=[])),
+    ]
+
+
+@pytest.fixture(autouse=True)
+def prefetch_subjects():
+    with patch(PREFIX + 'prefetch_subjects') as prefetch:
+        yield prefetch
+
+
+@pytest.fixture
+def maintenance_states():
+    with patch(PREFIX + 'event.AlertHistory.objects.unresolved') as unresolved:
+        states = unresolved.return_value.filter.return_value
+        states.values_list.return_value.distinct.return_value = [
+            (1, '', 'netbox'), (2, '5', 'service')]
+        yield unresolved
+
+
+class TestAlertBatch(object):
+    def test_should_resolve_subjects_of_batch(self, alerts, netboxes,
+                                              prefetch_subjects):
+        batch = AlertBatch(alerts)
+        prefetch_subjects.assert_called_once_with(alerts[:1])
+        assert batch.get_subject(alerts[0]) is netboxes[0]
+
+    def test_should_share_netbox_of_alert_with_subject(self, alerts,
+                                                       netboxes):
+        AlertBatch(alerts)
+        assert alerts[1].get_subject().netbox is netboxes[0]
+
+    def test_should_find_maintenance_states_in_one_query(
+            self, alerts, maintenance_states):
+        batch = AlertBatch(alerts)
+        states = [batch.is_on_maintenance(alert) for alert in alerts]
+        assert states == [True, True, True, False, None]
+        assert maintenance_states.call_count == 1
+
+    def test_should_find_device_groups_in_one_query(self, alerts):
+        with patch(PREFIX + 'NetboxCategory.objects.filter') as filtr:
+            filtr.return_value.values_list.return_value = [
+                (1, 'SRV'), (1, 'LAB'), (3, 'OTHER')]
+            batch = AlertBatch(alerts)
+            groups = [batch.get_device_groups(alert) for alert in alerts]
+        assert groups == [['SRV', 'LAB'], ['SRV', 'LAB'], [], [], None]
+        assert filtr.call_count == 1
+
+
+class TestAlertHistorySerializer(object):
+    def test_should_serialize_list_as_one_batch(self, alerts):
+        serializer = AlertHistorySerializer(alerts, many=True)
+        with patch('rest_framework.serializers.ListSerializer.'
+                   'to_representation') as to_representation:
+            serializer.to_representation(alerts)
+        child = serializer.child
+        to_representation.assert_called_once_with(child.batch.alerts)
+        assert all(child.get_batch(alert) is child.batch for alert in alerts)
+
+    def test_should_make_batch_for_single_alert(self, alerts):
+        serializer = AlertHistorySerializer(alerts[0])
+        batch = serializer.get_batch(alerts[0])
+        assert alerts[0] in batch
+        assert alerts[1] not in batch
+        assert serializer.get_batch(alerts[0]) is batch
+
+    def test_should_report_netbox_subject(self, alerts):
+        serializer = AlertHistorySerializer(alerts[0])
+        assert serializer.get_subject_type(alerts[0]) == 'Netbox'
+        assert serializer.get_subject(alerts[0]) == 'a'
@@ -0,0 +1,67 @@
+import threading
+
+from mock import Mock, patch
+import pytest
+
+from nav import db, ObjectCache
+from nav.django.legacy import LegacyCleanupMiddleware
+
+
+def make_connection(key):
+    return db.ConnectionObject(Mock(), key)
+
+
+@pytest.fixture
+def connection_cache():
+    cache = ObjectCache()
+    with patch.object(db, '_connection_cache', cache):
+        yield cache
+
+
+@pytest.fixture
+def exited_thread():
+    thread = threading.Thread(target=lambda: None)
+    thread.start()
+    thread.join()
+    return thread
+
+
+class TestLegacyCleanupMiddleware(object):
+    def test_should_roll_back_connections_of_current_thread(
+            self, connection_cache):
+        ident = threading.current_thread().ident
+        mine = make_connection(('nav', 'nav', ident))
+        connection_cache.cache(mine)
+        response = Mock()
+
+        assert LegacyCleanupMiddleware().process_response(
+            Mock(), response) is response
+        assert mine.object.rollback.called
+        assert not mine.object.close.called
+
+    def test_should_close_connections_of_exited_threads(
+            self, connection_cache, exited_thread):
+        orphan = make_connection(('nav', 'nav', exited_thread.ident))
+        connection_cache.cache(orphan)
+        if exited_thread.ident in set(
+                thread.ident for thread in threading.enumerate()):
+            pytest.skip("thread ident was reused")
+
+        LegacyCleanupMiddleware().process_response(Mock(), Mock())
+        assert orphan.object.close.called
+        assert not orphan.object.rollback.called
+        assert not connection_cache
+
+    def test_should_not_iterate_over_live_connection_cache(
+            self, connection_cache):
+        ident = threading.current_thread().ident
+        connection = make_connection(('nav', 'nav', ident))
+
+        def rollback():
+            # another thread caching a connection meanwhile
+            connection_cache.cache(make_connection(('nav', 'nav', -1)))
+        connection.object.rollback.side_effect = rollback
+        connection_cache.cache(connection)
+        connection_cache.cache(make_connection(('nav', 'other', ident)))
+
+        LegacyCleanupMiddleware().process_response(Mock(), Mock())
@@ -0,0 +1,74 @@
+import datetime
+from collections import defaultdict
+from unittest import TestCase
+
+from mock import patch
+
+from nav.eventengine import unresolved
+from nav.models.event import AlertHistory
+from nav.models.fields import INFINITY
+
+
+def make_history(alert_id, end_time=INFINITY, event_type='boxState'):
+    return AlertHistory(id=alert_id, netbox_id=1, subid='',
+                        event_type_id=event_type, end_time=end_time)
+
+
+class TestUnresolvedRecord(TestCase):
+    def setUp(self):
+        patchers = [
+            patch.object(unresolved, '_unresolved_alerts_map', {}),
+            patch.object(unresolved, '_maintenance_map', defaultdict(set)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_opened_alert_should_be_added_to_map(self):
+        alert = make_history(1)
+        unresolved.record(alert)
+        self.assertIs(unresolved.get_map()[alert.get_key()], alert)
+
+    def test_resolved_alert_should_be_removed_from_map(self):
+        unresolved.record(make_history(1))
+        resolved = make_history(1, end_time=datetime.datetime.now())
+        unresolved.record(resolved)
+        self.assertNotIn(resolved.get_key(), unresolved.get_map())
+
+    def test_stateless_alert_should_not_remove_other_alert_from_map(self):
+        alert = make_history(1)
+        unresolved.record(alert)
+        unresolved.record(make_history(2, end_time=None))
+        self.assertIs(unresolved.get_map()[alert.get_key()], alert)
+
+    def test_opened_maintenance_alert_should_put_netbox_on_maintenance(self):
+        unresolved.record(make_history(1, event_type='maintenanceState'))
+        self.assertTrue(unresolved.netbox_is_on_maintenance(1))
+
+    def test_resolved_maintenance_alert_should_take_netbox_off_maintenance(
+            self):
+        unresolved.record(make_history(1, event_type='maintenanceState'))
+        unresolved.record(make_history(1, end_time=datetime.datetime.now(),
+                                       event_type='maintenanceState'))
+        self.assertFalse(unresolved.netbox_is_on_maintenance(1))
+
+
+@patch('nav.eventengine.unresolved.update')
+class TestUnresolvedUpdateIfStale(TestCase):
+    def test_should_update_when_invalidated(self, update):
+        with patch.object(unresolved, '_last_update', 0):
+            unresolved.invalidate()
+            unresolved.update_if_stale(300)
+        self.assertTrue(update.called)
+
+    def test_should_not_update_when_fresh(self, update):
+        with patch('time.time', return_value=1000), \
+             patch.object(unresolved, '_last_update', 900):
+            unresolved.update_if_stale(300)
+        self.assertFalse(update.called)
+
+    def test_should_update_when_too_old(self, update):
+        with patch('time.time', return_value=1000), \
+             patch.object(unresolved, '_last_update', 500):
+            unresolved.update_if_stale(300)
+        self.assertTrue(update.called)
@@ -0,0 +1,64 @@
+import pytest
+
+from nav.enterprise import ids
+from nav.enterprise.ids import EnterpriseTable
+
+DATA = b"""# A comment
+#
+ACME 42
+BETA_CORP 7
+CISCOSYSTEMS 9
+ZETA 4711
+"""
+
+
+@pytest.fixture
+def table(tmpdir):
+    datafile = tmpdir.join('ids.txt')
+    datafile.write(DATA, mode='wb')
+    return EnterpriseTable(str(datafile))
+
+
+class TestEnterpriseTable(object):
+    @pytest.mark.parametrize("name,number", [
+        ('ACME', 42), ('BETA_CORP', 7), ('CISCOSYSTEMS', 9), ('ZETA', 4711)])
+    def test_should_find_number_by_name(self, table, name, number):
+        assert table.get_number(name) == number
+
+    @pytest.mark.parametrize("name", ['', 'AAA', 'BETA', 'CISCO', 'ZZZ'])
+    def test_should_not_find_unknown_names(self, table, name):
+        assert table.get_number(name) is None
+
+    def test_should_find_name_by_number(self, table):
+        assert table.get_name(42) == 'ACME'
+        assert table.get_name(4711) == 'ZETA'
+
+    def test_should_not_find_unknown_or_partial_numbers(self, table):
+        assert table.get_name(2) is None
+        assert table.get_name(471) is None
+
+    def test_should_iterate_in_name_order(self, table):
+        assert list(table) == [('ACME', 42), ('BETA_CORP', 7),
+                               ('CISCOSYSTEMS', 9), ('ZETA', 4711)]
+
+
+class TestEnterpriseIdsModule(object):
+    def test_constants_should_be_importable(self):
+        from nav.enterprise.ids import (VENDOR_ID_CISCOSYSTEMS,
+                                        VENDOR_ID_HEWLETT_PACKARD)
+        assert VENDOR_ID_CISCOSYSTEMS == 9
+        assert VENDOR_ID_HEWLETT_PACKARD == 11
+
+    def test_unknown_constants_should_raise_attributeerror(self):
+        assert not hasattr(ids, 'VENDOR_ID_NO_SUCH_VENDOR_AT_ALL')
+        with pytest.raises(AttributeError):
+            ids.SOMETHING_ELSE
+
+    def test_get_constant_name_should_return_full_name(self):
+        assert ids.get_constant_name(9) == 'VENDOR_ID_CISCOSYSTEMS'
+        assert ids.get_constant_name(-1) is None
+
+    def test_data_file_should_be_sorted(self):
+        names = [name for name, _number in ids.get_table()]
+        assert names == sorted(names)
+        assert len(names) > 40000
@@ -0,0 +1,95 @@
+from mock import Mock, patch
+import pytest
+
+from nav import event as navevent
+from nav.event import Event, EventQ, insert_events
+
+
+class FakeCursor(object):
+    def __init__(self):
+        self.statements = []
+        self.next_id = 100
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+        if sql.startswith("SELECT nextval"):
+            count = params[0]
+            self.rows = [(self.next_id + i,) for i in range(count)]
+            self.next_id += count
+
+    def fetchall(self):
+        return self.rows
+
+
+def make_event(netboxid=1, **variables):
+    event = Event(source='pping', target='eventEngine', netboxid=netboxid,
+                  eventtypeid='boxState', state='s')
+    event.update(variables)
+    return event
+
+
+class TestInsertEvents(object):
+    def test_should_insert_all_events_using_three_statements(self):
+        cursor = FakeCursor()
+        events = [make_event(netboxid, descr='down')
+                  for netboxid in range(1, 11)]
+        eventqids = insert_events(cursor, events)
+        assert eventqids == list(range(100, 110))
+        assert len(cursor.statements) == 3
+
+    def test_should_use_defaults_for_unset_fields(self):
+        cursor = FakeCursor()
+        insert_events(cursor, [make_event()])
+        sql, params = cursor.statements[1]
+        assert sql.count('DEFAULT') == 5
+        assert params == [100, 'pping', 'eventEngine', 1, 'boxState', 's']
+
+    def test_should_pair_variables_with_event_ids(self):
+        cursor = FakeCursor()
+        insert_events(cursor, [make_event(1), make_event(2, descr='x')])
+        sql, params = cursor.statements[2]
+        assert params == [101, 'descr', 'x']
+
+    def test_should_skip_variable_insert_when_there_are_none(self):
+        cursor = FakeCursor()
+        insert_events(cursor, [make_event(1), make_event(2)])
+        assert len(cursor.statements) == 2
+
+    def test_should_split_large_batches(self):
+        cursor = FakeCursor()
+        with patch.object(navevent, 'MAX_BATCH_SIZE', 4):
+            eventqids = insert_events(cursor,
+                                      [make_event(i) for i in range(10)])
+        assert len(set(eventqids)) == 10
+        assert len(cursor.statements) == 6
+
+    def test_should_refuse_empty_event(self):
+        with pytest.raises(navevent.EventIncompleteError):
+            insert_events(FakeCursor(), [Event()])
+
+
+class TestPostEvents(object):
+    def test_should_set_eventqids_after_commit(self):
+        conn = Mock()
+        conn.cursor.return_value = FakeCursor()
+        events = [make_event(1), make_event(2)]
+        with patch.object(EventQ, '_get_connection', return_value=conn):
+            assert EventQ.post_events(events) == 2
+        assert conn.commit.called
+        assert [event.eventqid for event in events] == [100, 101]
+
+    def test_should_roll_back_on_failure(self):
+        conn = Mock()
+        conn.cursor.return_value.execute.side_effect = Exception("boom")
+        events = [make_event()]
+        with patch.object(EventQ, '_get_connection', return_value=conn):
+            with pytest.raises(Exception):
+                EventQ.post_events(events)
+        assert conn.rollback.called
+        assert events[0].eventqid is None
+
+    def test_should_refuse_already_posted_events(self):
+        event = make_event()
+        event.eventqid = 42
+        with pytest.raises(navevent.EventAlreadyPostedError):
+            EventQ.post_events([event])
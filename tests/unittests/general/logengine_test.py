@@ -1,11 +1,12 @@
 import datetime
 import pytest
-from mock import Mock
+from mock import Mock, patch
 from unittest import TestCase
 import random
 import logging
 logging.raiseExceptions = False
 
+from nav import db
 from nav import logengine
 
 now = datetime.datetime.now()
@@ -160,3 +161,254 @@ non_conforming_lines = [
 def test_non_conforming_lines(line):
     msg = logengine.create_message(line)
     assert msg is None, "line shouldn't be parseable: %s" % line
+
+
+def test_make_message_row(loglines):
+    database = Mock('cursor')
+    database.execute = Mock()
+    database.fetchone = Mock(return_value=[42])
+    message = logengine.create_message(loglines[0])
+    exceptions = logengine.PriorityExceptions({}, {}, {})
+    row = logengine.make_message_row(message, database,
+                                     {}, {}, {}, exceptions)
+    assert row == (str(message.time), 42, 5, 42, message.description)
+
+
+@pytest.mark.parametrize("line", non_conforming_lines)
+def test_parse_message_should_reject_non_conforming_lines(line):
+    assert logengine.parse_message(line) is None
+
+
+def test_parse_message_should_agree_with_create_message(loglines):
+    for line in loglines:
+        parsed = logengine.parse_message(line)
+        message = logengine.create_message(line)
+        assert parsed == (message.time, message.origin, message.category,
+                          message.type, message.facility, message.priorityid,
+                          message.mnemonic, message.description)
+
+
+def test_parse_message_should_guess_last_year_in_january():
+    line = ("Dec 31 23:59:58 10.0.42.103 : %LINK-3-UPDOWN: Interface "
+            "GigabitEthernet1/0/30, changed state to up")
+    parsed = logengine.parse_message(line, datetime.datetime(2019, 1, 1))
+    assert parsed.time == datetime.datetime(2018, 12, 31, 23, 59, 58)
+
+
+def test_parse_message_should_find_category():
+    line = ("Oct 28 13:15:06 x-gsw.example.org 1030: Oct 28 13:15:05.310 "
+            "CEST: %LINK-3-UPDOWN: Interface Gi1/0/29, changed state to up")
+    assert logengine.parse_message(line).category == 'gsw'
+
+
+def test_parse_messages_should_log_unparseable_cisco_lines():
+    database = Mock()
+    lines = ["garbage LINK-3-UPDOWN: up", TestParsing.message]
+    messages = list(logengine.parse_messages(lines, database))
+    assert len(messages) == 1
+    database.execute.assert_called_once_with(
+        "INSERT INTO errorerror (message) VALUES (%s)", (lines[0],))
+
+
+class TestPriorityExceptions(object):
+    @pytest.fixture
+    def exceptions(self):
+        return logengine.PriorityExceptions(
+            {'x-gsw.example.org': '7', 'bad.example.org': 'x'},
+            {'link-3-updown': '6'},
+            {'link-3-updown': {'y-gw.example.org': '2'}})
+
+    def test_should_keep_priority_without_exceptions(self, exceptions):
+        assert exceptions.get_priority(
+            'SYS-5-CONFIG_I', 'y-gw.example.org', 5) == 5
+
+    def test_should_override_by_type(self, exceptions):
+        assert exceptions.get_priority(
+            'LINK-3-UPDOWN', 'z-sw.example.org', 3) == 6
+
+    def test_should_override_by_origin_before_type(self, exceptions):
+        assert exceptions.get_priority(
+            'LINK-3-UPDOWN', 'X-GSW.example.org', 3) == 7
+
+    def test_should_override_by_type_and_origin_first(self, exceptions):
+        assert exceptions.get_priority(
+            'LINK-3-UPDOWN', 'y-gw.example.org', 3) == 2
+
+    def test_should_ignore_invalid_priority(self, exceptions):
+        assert exceptions.get_priority(
+            'LINK-3-UPDOWN', 'bad.example.org', 3) == 3
+
+
+class TestCopyMessageRows(object):
+    def test_should_copy_all_rows_in_one_statement(self):
+        database = Mock()
+        rows = [('2019-10-28 13:15:05', 1, 5, 2, 'up'),
+                ('2019-10-28 13:15:06', 1, 5, 2, 'down')]
+        assert logengine.copy_message_rows(rows, database) == 2
+        assert database.copy_expert.call_count == 1
+        data = database.copy_expert.call_args[0][1].read()
+        assert data == (u'2019-10-28 13:15:05\t1\t5\t2\tup\n'
+                        u'2019-10-28 13:15:06\t1\t5\t2\tdown\n')
+
+    def test_should_escape_special_characters(self):
+        database = Mock()
+        rows = [('2019-10-28 13:15:05', None, 5, 2, 'a\tb\\c\r\n')]
+        logengine.copy_message_rows(rows, database)
+        data = database.copy_expert.call_args[0][1].read()
+        assert data == u'2019-10-28 13:15:05\t\\N\t5\t2\ta\\tb\\\\c\\r\\n\n'
+
+    def test_should_not_copy_empty_batch(self):
+        database = Mock()
+        assert logengine.copy_message_rows([], database) == 0
+        assert not database.copy_expert.called
+
+
+class TestLogTailer(object):
+    @pytest.fixture
+    def logfile(self, tmpdir):
+        return tmpdir.join('cisco.log')
+
+    @pytest.fixture
+    def tailer(self, logfile, tmpdir):
+        logfile.write(b'')
+        return logengine.LogTailer(str(logfile),
+                                   str(tmpdir.join('logengine.offset')))
+
+    def test_should_read_only_complete_lines(self, logfile, tailer):
+        logfile.write(b'one\ntwo\nthr', mode='ab')
+        assert tailer.read_lines(10) == [b'one', b'two']
+        logfile.write(b'ee\n', mode='ab')
+        assert tailer.read_lines(10) == [b'three']
+        assert tailer.read_lines(10) == []
+        assert tailer.offset == len(b'one\ntwo\nthree\n')
+
+    def test_should_read_at_most_max_lines(self, logfile, tailer):
+        logfile.write(b'one\ntwo\nthree\n', mode='ab')
+        assert tailer.read_lines(2) == [b'one', b'two']
+        assert tailer.offset == len(b'one\ntwo\n')
+        assert tailer.read_lines(2) == [b'three']
+
+    def test_should_follow_rotated_file(self, logfile, tailer):
+        logfile.write(b'one\ntwo', mode='ab')
+        assert tailer.read_lines(10) == [b'one']
+        logfile.rename(logfile.dirpath('cisco.log.1'))
+        logfile.write(b'three\n')
+        assert tailer.read_lines(10) == [b'two']
+        assert tailer.read_lines(10) == [b'three']
+
+    def test_should_restart_truncated_file(self, logfile, tailer):
+        logfile.write(b'one\ntwo\n', mode='ab')
+        assert tailer.read_lines(10) == [b'one', b'two']
+        logfile.write(b'new\n')
+        assert tailer.read_lines(10) == [b'new']
+
+    def test_should_resume_from_saved_offset(self, logfile, tailer):
+        logfile.write(b'one\ntwo\n', mode='ab')
+        assert tailer.read_lines(1) == [b'one']
+        tailer.save_offset()
+        resumed = logengine.LogTailer(tailer.filename, tailer.offset_file)
+        assert resumed.read_lines(10) == [b'two']
+
+    def test_should_ignore_offset_of_another_file(self, logfile, tailer):
+        logfile.write(b'one\ntwo\n', mode='ab')
+        tailer.read_lines(10)
+        tailer.save_offset()
+        logfile.remove()
+        logfile.write(b'three\n')
+        resumed = logengine.LogTailer(tailer.filename, tailer.offset_file)
+        assert resumed.read_lines(10) == [b'three']
+
+    def test_should_wait_for_missing_file(self, logfile, tmpdir):
+        tailer = logengine.LogTailer(str(logfile))
+        assert tailer.read_lines(10) == []
+        logfile.write(b'one\n')
+        assert tailer.read_lines(10) == [b'one']
+
+
+class TestBatchInserter(object):
+    @pytest.fixture
+    def connection(self):
+        connection = Mock()
+        cursor = connection.cursor.return_value
+        cursor.fetchall.return_value = []
+        cursor.fetchone.return_value = [1]
+        return connection
+
+    @pytest.fixture
+    def inserter(self, connection):
+        inserter = logengine.BatchInserter('utf-8', Mock(
+            get_priority=lambda _type, _origin, priority: priority))
+        with patch('nav.logengine.db.getConnection', return_value=connection):
+            yield inserter
+
+    @pytest.fixture
+    def lines(self, loglines):
+        return [line.encode('utf-8') for line in loglines[:3]]
+
+    def test_should_copy_batch(self, inserter, connection, lines):
+        assert inserter.insert(lines) == 3
+        cursor = connection.cursor.return_value
+        assert cursor.copy_expert.call_count == 1
+        assert connection.commit.called
+
+    def test_should_insert_singly_on_data_error(self, inserter, connection,
+                                                lines):
+        cursor = connection.cursor.return_value
+        cursor.copy_expert.side_effect = db.driver.DataError("bad data")
+        inserted = []
+
+        def execute(sql, params=None):
+            if sql.startswith("INSERT INTO log_message "):
+                if params[-1].endswith('changed state to down'):
+                    raise db.driver.DataError("bad data")
+                inserted.append(params)
+        cursor.execute.side_effect = execute
+
+        assert inserter.insert(lines) == 2
+        assert len(inserted) == 2
+        cursor.execute.assert_any_call("ROLLBACK TO SAVEPOINT log_message")
+        assert connection.commit.called
+
+    def test_should_raise_on_connection_error(self, inserter, connection,
+                                              lines):
+        cursor = connection.cursor.return_value
+        cursor.copy_expert.side_effect = db.driver.OperationalError("gone")
+        with pytest.raises(db.driver.OperationalError):
+            inserter.insert(lines)
+        assert connection.rollback.called
+        assert not connection.commit.called
+        assert inserter.categories is None
+
+    def test_should_raise_when_database_is_down(self, lines):
+        inserter = logengine.BatchInserter('utf-8', Mock())
+        with patch('nav.logengine.db.getConnection',
+                   side_effect=db.driver.OperationalError("down")):
+            with pytest.raises(db.driver.OperationalError):
+                inserter.insert(lines)
+
+
+class StopFollowing(Exception):
+    pass
+
+
+@patch('nav.logengine.verify_singleton', Mock())
+def test_follow_should_retry_batch_without_saving_offset(loglines, tmpdir):
+    logfile = tmpdir.join('cisco.log')
+    logfile.write(u'\n'.join(loglines[:2]) + u'\n')
+    offset_file = tmpdir.join('logengine.offset')
+    config = Mock(has_option=Mock(return_value=False),
+                  get=Mock(return_value=str(logfile)))
+    insert = Mock(side_effect=[db.driver.OperationalError("down"), 2])
+    sleep = Mock(side_effect=[None, StopFollowing()])
+
+    with patch('nav.logengine.NAV_CONFIG', {'PID_DIR': str(tmpdir)}), \
+            patch('nav.logengine.get_priority_exceptions', Mock()), \
+            patch('nav.logengine.BatchInserter.insert', insert), \
+            patch('nav.logengine.time.sleep', sleep):
+        with pytest.raises(StopFollowing):
+            logengine.follow(config, Mock())
+
+    assert insert.call_count == 2
+    assert insert.call_args_list[0] == insert.call_args_list[1]
+    assert sleep.call_args_list[0][0] == (1,)
+    assert offset_file.check()
@@ -0,0 +1,54 @@
+from unittest import TestCase
+
+from IPy import IP
+
+from nav.prefixindex import PrefixIndex
+
+
+class TestPrefixIndex(TestCase):
+    def setUp(self):
+        self.index = PrefixIndex({
+            '10.0.0.0/8': 1,
+            '10.0.42.0/24': 2,
+            '10.0.42.128/25': 3,
+            '2001:db8::/32': 4,
+            '2001:db8:1::/48': 5,
+        })
+
+    def test_should_find_most_specific_ipv4_prefix(self):
+        self.assertEqual(self.index.lookup('10.0.42.200'), 3)
+        self.assertEqual(self.index.lookup('10.0.42.1'), 2)
+        self.assertEqual(self.index.lookup('10.99.0.1'), 1)
+
+    def test_should_find_most_specific_ipv6_prefix(self):
+        self.assertEqual(self.index.lookup('2001:db8:1::1'), 5)
+        self.assertEqual(self.index.lookup('2001:db8:2::1'), 4)
+
+    def test_should_accept_ipy_addresses(self):
+        self.assertEqual(self.index.lookup(IP('10.0.42.1')), 2)
+
+    def test_should_return_default_on_no_match(self):
+        self.assertIsNone(self.index.lookup('192.168.0.1'))
+        self.assertEqual(self.index.lookup('2001:db9::1', default=0), 0)
+
+    def test_ipv4_and_ipv6_should_not_mix(self):
+        index = PrefixIndex({'0.0.0.0/0': 'v4'})
+        self.assertIsNone(index.lookup('::1'))
+
+    def test_removed_prefix_should_not_match(self):
+        self.index.remove('10.0.42.128/25')
+        self.assertEqual(self.index.lookup('10.0.42.200'), 2)
+        self.assertNotIn('10.0.42.128/25', self.index)
+
+    def test_sync_should_only_apply_differences(self):
+        changed, removed = self.index.sync({
+            '10.0.0.0/8': 1,
+            '10.0.42.0/24': 2,
+            '10.0.42.128/25': 3,
+            '2001:db8::/32': 42,
+            '192.168.0.0/16': 6,
+        })
+        self.assertEqual((changed, removed), (2, 1))
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.index.lookup('2001:db8:1::1'), 42)
+        self.assertEqual(self.index.lookup('192.168.1.1'), 6)
@@ -0,0 +1,92 @@
+import struct
+
+from mock import patch
+import pytest
+
+from nav import smidumps
+from nav.smidumps import (MibData, compile_mib, load_compiled, get_mib,
+                          COMPILED_SUFFIX)
+
+MIB = {
+    'moduleName': 'TEST-MIB',
+    'typedefs': {'Status': {'basetype': 'Enumeration'}},
+    'nodes': {
+        'testTable': {'nodetype': 'table', 'oid': '1.3.6.1.4.1.99.1'},
+        'testEntry': {'nodetype': 'row', 'oid': '1.3.6.1.4.1.99.1.1'},
+        'testName': {'nodetype': 'column', 'oid': '1.3.6.1.4.1.99.1.1.1',
+                     'syntax': {'type': {'module': 'SNMPv2-TC',
+                                         'name': 'DisplayString'}}},
+        'testCount': {'nodetype': 'scalar', 'oid': '1.3.6.1.4.1.99.2'},
+    },
+}
+
+
+@pytest.fixture
+def store(tmpdir):
+    filename = str(tmpdir.join('test_mib' + COMPILED_SUFFIX))
+    compile_mib(MIB, filename)
+    return filename
+
+
+class TestCompiledMibStore(object):
+    def test_should_load_the_same_data_that_was_compiled(self, store):
+        mib = load_compiled(store)
+        data = dict(mib)
+        data['nodes'] = dict(mib['nodes'])
+        assert data == MIB
+
+    def test_should_index_nodes_without_loading_them(self, store):
+        mib = load_compiled(store)
+        assert mib.index['testEntry'] == ('1.3.6.1.4.1.99.1.1', 'row')
+        assert 'testName' in mib['nodes']
+        assert not mib['nodes']._nodes
+
+    def test_should_only_load_nodes_that_are_looked_up(self, store):
+        mib = load_compiled(store)
+        assert mib['nodes']['testCount'] == MIB['nodes']['testCount']
+        assert list(mib['nodes']._nodes) == ['testCount']
+
+    def test_should_raise_keyerror_on_unknown_nodes(self, store):
+        with pytest.raises(KeyError):
+            load_compiled(store)['nodes']['noSuchNode']
+
+    def test_should_refuse_store_compiled_by_other_python(self, store):
+        with open(store, 'r+b') as data:
+            data.seek(struct.calcsize('<4sB'))
+            data.write(b'\x01')
+        with pytest.raises(ValueError):
+            load_compiled(store)
+
+    def test_should_refuse_garbage(self, tmpdir):
+        garbage = tmpdir.join('garbage' + COMPILED_SUFFIX)
+        garbage.write('garbage')
+        with pytest.raises(ValueError):
+            load_compiled(str(garbage))
+
+
+class TestGetMib(object):
+    def test_should_fall_back_to_importing_module(self):
+        with patch.dict(smidumps._mibs, clear=True):
+            mib = get_mib('snmpv2_mib')
+            assert isinstance(mib, MibData)
+            assert mib['moduleName'] == 'SNMPv2-MIB'
+            assert 'sysUpTime' in mib['nodes']
+
+    def test_should_load_each_mib_only_once(self):
+        with patch.dict(smidumps._mibs, clear=True):
+            assert get_mib('snmpv2_mib') is get_mib('snmpv2_mib')
+
+    def test_should_prefer_compiled_store(self, tmpdir):
+        compile_mib(MIB, str(tmpdir.join('snmpv2_mib' + COMPILED_SUFFIX)))
+        tmpdir.join('snmpv2_mib.py').write('')
+        tmpdir.join('snmpv2_mib.py').setmtime(0)
+        with patch.object(smidumps, '__file__',
+                          str(tmpdir.join('__init__.py'))):
+            assert smidumps._load('snmpv2_mib')['moduleName'] == 'TEST-MIB'
+
+
+def test_from_dict_should_wrap_nodes_of_dump():
+    mib = MibData.from_dict(MIB)
+    assert mib['moduleName'] == 'TEST-MIB'
+    assert mib['nodes']['testName'] is MIB['nodes']['testName']
+    assert list(mib.index) == list(MIB['nodes'])
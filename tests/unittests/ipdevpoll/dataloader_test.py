@@ -0,0 +1,59 @@
+from unittest import TestCase
+
+from mock import patch, Mock
+
+from nav.ipdevpoll import shadows
+from nav.ipdevpoll.dataloader import NetboxLoader
+
+
+def make_netbox(netboxid):
+    netbox = shadows.Netbox()
+    netbox.id = netboxid
+    netbox.sysname = 'box%d.example.org' % netboxid
+    netbox.snmp_up = True
+    return netbox
+
+
+@patch('nav.ipdevpoll.dataloader.django_debug_cleanup', Mock())
+@patch('nav.ipdevpoll.dataloader.load_last_updated_times',
+       Mock(return_value={}))
+@patch('nav.ipdevpoll.dataloader.event.AlertHistory.objects.unresolved',
+       Mock(return_value=Mock(values_list=Mock(return_value=[]))))
+class TestNetboxLoaderIncrementalReload(TestCase):
+    def setUp(self):
+        self.loader = NetboxLoader()
+        self.digests = {1: 'a', 2: 'b', 3: 'c'}
+        self.loaded_ids = []
+
+        def _load_netboxes(netbox_ids, snmp_down, full_reload=False):
+            self.loaded_ids.append(set(netbox_ids))
+            return [make_netbox(i) for i in netbox_ids]
+
+        patchers = [
+            patch('nav.ipdevpoll.dataloader.load_netbox_digests',
+                  Mock(side_effect=lambda: dict(self.digests))),
+            patch.object(NetboxLoader, 'last_updated_times', None),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.loader._load_netboxes = _load_netboxes
+
+    def test_first_load_should_load_everything(self):
+        new_ids, lost_ids, _ = self.loader.load_all_s()
+        self.assertEqual(new_ids, set([1, 2, 3]))
+        self.assertEqual(lost_ids, set())
+
+    def test_second_load_should_only_load_changed_netboxes(self):
+        self.loader.load_all_s()
+        self.digests[2] = 'changed'
+        self.loader.load_all_s()
+        self.assertEqual(self.loaded_ids[-1], set([2]))
+
+    def test_removed_netbox_should_be_reported_as_lost(self):
+        self.loader.load_all_s()
+        del self.digests[3]
+        new_ids, lost_ids, _ = self.loader.load_all_s()
+        self.assertEqual(new_ids, set())
+        self.assertEqual(lost_ids, set([3]))
+        self.assertNotIn(3, self.loader)
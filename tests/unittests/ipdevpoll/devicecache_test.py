@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+from mock import patch
+from twisted.internet import defer
+
+from nav.ipdevpoll.devicecache import DeviceCache
+
+
+class TestDeviceCache(object):
+    def test_should_return_cached_value(self):
+        cache = DeviceCache(max_devices=10)
+        cache.set(1, 'sensors', ['foo'])
+        assert cache.get(1, 'sensors') == ['foo']
+
+    def test_should_return_default_for_unknown_key(self):
+        cache = DeviceCache(max_devices=10)
+        cache.set(1, 'sensors', ['foo'])
+        assert cache.get(1, 'interfaces', 'default') == 'default'
+        assert cache.get(2, 'sensors') is None
+
+    def test_should_expire_old_values(self):
+        cache = DeviceCache(max_devices=10, max_age=timedelta(minutes=1))
+        cache.set(1, 'sensors', ['foo'])
+        later = datetime.now() + timedelta(minutes=2)
+        with patch('nav.ipdevpoll.devicecache.datetime') as mock_datetime:
+            mock_datetime.now.return_value = later
+            assert cache.get(1, 'sensors') is None
+
+    def test_should_evict_least_recently_used_netbox(self):
+        cache = DeviceCache(max_devices=2)
+        cache.set(1, 'sensors', 'one')
+        cache.set(2, 'sensors', 'two')
+        cache.get(1, 'sensors')
+        cache.set(3, 'sensors', 'three')
+        assert len(cache) == 2
+        assert cache.get(2, 'sensors') is None
+        assert cache.get(1, 'sensors') == 'one'
+
+    def test_invalidate_should_remove_all_values_of_netbox(self):
+        cache = DeviceCache(max_devices=10)
+        cache.set(1, 'sensors', 'one')
+        cache.set(1, 'netbox_list', ['one'])
+        cache.set(2, 'sensors', 'two')
+        cache.invalidate(1)
+        assert cache.get(1, 'sensors') is None
+        assert cache.get(1, 'netbox_list') is None
+        assert cache.get(2, 'sensors') == 'two'
+
+    def test_get_or_load_should_not_load_cached_value(self):
+        cache = DeviceCache(max_devices=10)
+        cache.set(1, 'sensors', 'one')
+        with patch('nav.ipdevpoll.devicecache.db.run_in_thread') as run:
+            df = cache.get_or_load(1, 'sensors', lambda: 'loaded')
+            assert not run.called
+        assert df.result == 'one'
+
+    def test_get_or_load_should_cache_loaded_value(self):
+        cache = DeviceCache(max_devices=10)
+        with patch('nav.ipdevpoll.devicecache.db.run_in_thread',
+                   side_effect=lambda func: defer.succeed(func())):
+            df = cache.get_or_load(1, 'sensors', lambda: 'loaded')
+        assert df.result == 'loaded'
+        assert cache.get(1, 'sensors') == 'loaded'
@@ -0,0 +1,81 @@
+from mock import patch
+import pytest
+from twisted.internet import defer, task
+
+from nav.ipdevpoll import joblog
+
+
+@pytest.fixture
+def buffer():
+    buffer = joblog.JobLogBuffer(max_size=3, max_age=10)
+    buffer.clock = task.Clock()
+    buffer.callLater = buffer.clock.callLater
+    with patch('nav.ipdevpoll.joblog.reactor') as reactor, \
+            patch('nav.ipdevpoll.joblog.db.run_in_thread',
+                  return_value=defer.succeed(None)) as run_in_thread:
+        buffer.reactor = reactor
+        buffer.run_in_thread = run_in_thread
+        yield buffer
+
+
+def add_record(buffer, netbox_id=1, success=True):
+    buffer.add(netbox_id, 'inventory', 1500000000.0, 4.2, success, 3600)
+
+
+def test_records_should_be_buffered(buffer):
+    add_record(buffer)
+    add_record(buffer)
+    assert len(buffer) == 2
+    assert not buffer.run_in_thread.called
+
+
+def test_should_flush_when_full(buffer):
+    for netbox_id in range(3):
+        add_record(buffer, netbox_id)
+    assert len(buffer) == 0
+    func, records = buffer.run_in_thread.call_args[0]
+    assert func is joblog.insert_job_records
+    assert [r.netbox_id for r in records] == [0, 1, 2]
+
+
+def test_should_flush_when_oldest_record_is_too_old(buffer):
+    add_record(buffer)
+    buffer.clock.advance(5)
+    add_record(buffer)
+    buffer.clock.advance(5)
+    assert len(buffer) == 0
+    func, records = buffer.run_in_thread.call_args[0]
+    assert len(records) == 2
+
+
+def test_should_flush_on_shutdown(buffer):
+    add_record(buffer)
+    add_record(buffer)
+    buffer.reactor.addSystemEventTrigger.assert_called_once_with(
+        "before", "shutdown", buffer.flush)
+
+
+def test_should_keep_success_semantics(buffer):
+    add_record(buffer, 1, success=True)
+    add_record(buffer, 2, success=None)
+    add_record(buffer, 3, success=False)
+    _func, records = buffer.run_in_thread.call_args[0]
+    assert [r.success for r in records] == [True, None, False]
+
+
+def test_flushing_empty_buffer_should_not_touch_database(buffer):
+    buffer.flush()
+    assert not buffer.run_in_thread.called
+
+
+def test_insert_should_use_a_single_query():
+    records = [joblog.JobRecord(netbox_id, 'inventory', None, 1.0, True, 60)
+               for netbox_id in range(5)]
+    with patch('nav.ipdevpoll.joblog.connection') as connection:
+        cursor = connection.cursor.return_value
+        cursor.rowcount = 5
+        joblog.insert_job_records(records)
+    assert cursor.execute.call_count == 1
+    sql, params = cursor.execute.call_args[0]
+    assert sql.count(joblog.ROW_TEMPLATE) == 5
+    assert len(params) == 5 * len(joblog.JobRecord._fields)
@@ -16,12 +16,13 @@
 
 import os
 import datetime
+import importlib
 from IPy import IP
 
 from twisted.internet import defer
 from twisted.python import failure
 
-from mock import Mock
+from mock import Mock, patch
 import pytest
 
 from nav.mibs.cisco_hsrp_mib import CiscoHSRPMib
@@ -35,6 +36,12 @@ from nav.mibs.ip_mib import IpMib, IndexToIpException
 from nav.mibs.ipv6_mib import Ipv6Mib
 from nav.mibs.entity_mib import EntityMib, parse_dateandtime_tc
 from nav.mibs.snmpv2_mib import Snmpv2Mib
+from nav.mibs.if_mib import IfMib
+from nav.mibs import mibretriever
+from nav.mibs.cd6c_mib import CD6CMib
+from nav.mibs.itw_mib import ItWatchDogsMib
+from nav.mibs.itw_mibv3 import ItWatchDogsMibV3
+from nav import smidumps
 
 
 class TestIpMib(object):
@@ -164,6 +171,109 @@ class TestCiscoHSRPMib(object):
         assert (IP('10.0.42.1'), 155) in df.result.items()
 
 
+class TestMibRetrieverColumns(object):
+    def setup_method(self, method):
+        self.agent = Mock('AgentProxy')
+        self.agent.getColumns = Mock(return_value=defer.succeed({
+            '.1.3.6.1.2.1.2.2.1.2': {'.1.3.6.1.2.1.2.2.1.2.1': b'eth0',
+                                     '.1.3.6.1.2.1.2.2.1.2.2': b'eth1'},
+            '.1.3.6.1.2.1.2.2.1.8': {'.1.3.6.1.2.1.2.2.1.8.1': 1},
+        }))
+
+    def test_retrieve_columns_should_walk_columns_in_one_request(self):
+        mib = IfMib(self.agent)
+        mib.retrieve_columns(['ifOperStatus', 'ifDescr'])
+        self.agent.getColumns.assert_called_once_with(
+            ['.1.3.6.1.2.1.2.2.1.2', '.1.3.6.1.2.1.2.2.1.8'])
+
+    def test_retrieve_columns_should_aggregate_rows(self):
+        mib = IfMib(self.agent)
+        df = mib.retrieve_columns(['ifOperStatus', 'ifDescr'])
+        assert df.called
+        assert df.result[OID('.1')]['ifDescr'] == u'eth0'
+        assert df.result[OID('.1')]['ifOperStatus'] == 1
+        assert df.result[OID('.2')]['ifDescr'] == u'eth1'
+        assert df.result[OID('.2')]['ifOperStatus'] is None
+
+    def test_retrieve_table_should_walk_accessible_columns(self):
+        mib = IfMib(self.agent)
+        df = mib.retrieve_table('ifTable')
+        assert df.called
+        oids = self.agent.getColumns.call_args[0][0]
+        assert '.1.3.6.1.2.1.2.2.1.1' in oids  # ifIndex
+        assert len(oids) == len(mib.tables['ifTable'].columns)
+        assert df.result[OID('.1')]['ifDescr'] == b'eth0'
+
+
+
+@patch.dict(mibretriever.MibRetrieverMaker.modules)
+class TestMibRetrieverMaker(object):
+    def test_should_only_build_node_objects_that_are_used(self):
+        class MockedMib(IfMib):
+            pass
+
+        assert not MockedMib.nodes._values
+        assert MockedMib.nodes['ifDescr'].oid == OID('.1.3.6.1.2.1.2.2.1.2')
+        assert list(MockedMib.nodes._values) == ['ifDescr']
+
+    def test_should_describe_tables_without_loading_other_nodes(self):
+        table = IfMib.tables['ifTable']
+        assert table.row.name == 'ifEntry'
+        assert table.column_index['ifDescr'] == 2
+        assert 'ifXTable' in IfMib.tables
+        assert 'ifDescr' not in IfMib.tables
+
+    def test_should_know_text_columns(self):
+        assert 'ifDescr' in IfMib.text_columns
+        assert 'ifOperStatus' not in IfMib.text_columns
+        assert 'noSuchNode' not in IfMib.text_columns
+
+    def test_should_accept_plain_mib_dicts(self):
+        from nav.smidumps.if_mib import MIB
+
+        class PlainMib(mibretriever.MibRetriever):
+            mib = MIB
+
+        assert PlainMib.mib['moduleName'] == 'IF-MIB'
+        assert hasattr(PlainMib, 'get_ifNumber')
+        assert hasattr(PlainMib, 'get_ifTable')
+
+
+@pytest.fixture
+def compiled_mib(tmpdir):
+    """Returns a function that loads a smidump module from a compiled store"""
+    def _compiled_mib(name):
+        module = importlib.import_module('nav.smidumps.' + name)
+        store = str(tmpdir.join(name + smidumps.COMPILED_SUFFIX))
+        smidumps.compile_mib(module.MIB, store)
+        return smidumps.load_compiled(store)
+    return _compiled_mib
+
+
+@patch.dict(mibretriever.MibRetrieverMaker.modules)
+class TestCompiledMibRetrievers(object):
+    @pytest.mark.parametrize("mib_class,name", [
+        (ItWatchDogsMib, 'itw_mib'),
+        (ItWatchDogsMibV3, 'itw_mibv3'),
+    ])
+    def test_should_count_itw_sensors(self, compiled_mib, mib_class, name):
+        compiled_class = type('Compiled', (mib_class,),
+                              {'mib': compiled_mib(name)})
+        mib = compiled_class(Mock())
+        mib.retrieve_column = Mock(
+            return_value=defer.succeed({OID('2.0'): 1}))
+        result = mib._get_sensor_count()
+        assert result.result == {'climateCount': 1}
+
+    def test_should_make_cd6c_sensor_oids(self, compiled_mib):
+        compiled_class = type('Compiled', (CD6CMib,),
+                              {'mib': compiled_mib('cd6c_mib')})
+        sensor = compiled_class(Mock()).create_sensor(
+            CD6CMib.sensors['temp'][0])
+        assert isinstance(sensor['oid'], OID)
+        assert str(sensor['oid']).endswith('.0')
+
+
 def test_short_dateandtime_parses_properly():
     parsed = parse_dateandtime_tc(b'\xdf\x07\x05\x0e\x0c\x1e*\x05')
     assert parsed == datetime.datetime(2015, 5, 14, 12, 30, 42, 500000)
@@ -1,4 +1,7 @@
+from IPy import IP
+
 from nav.ipdevpoll.storage import ContainerRepository
+from nav.ipdevpoll import shadows
 from nav.ipdevpoll.plugins.arp import ipv6_address_in_mappings, Arp
 
 
@@ -10,4 +13,18 @@ def test_none_in_mappings_should_not_raise():
 def test_make_new_mappings_should_not_raise_on_empty_ip():
     a = Arp(None, None, ContainerRepository())
     mappings = [(None, '00:0b:ad:c0:ff:ee')]
-    a._make_new_mappings(mappings)
+    a._make_mappings(mappings)
+
+
+def test_make_mappings_should_add_arp_containers():
+    containers = ContainerRepository()
+    a = Arp(None, None, containers)
+    a._make_mappings([(IP('10.0.0.1'), '00:0b:ad:c0:ff:ee')])
+    assert len(containers[shadows.Arp]) == 1
+
+
+def test_make_mappings_should_ensure_arp_manager_runs_on_empty_result():
+    containers = ContainerRepository()
+    a = Arp(None, None, containers)
+    a._make_mappings([])
+    assert shadows.Arp in containers
@@ -0,0 +1,86 @@
+from collections import Counter
+
+from mock import Mock, patch
+
+from nav.ipdevpoll.pool import HashRing, WorkerPool
+
+
+def make_worker(slot, active_jobs=0, done=False):
+    worker = Mock(name='worker%s' % slot)
+    worker.slot = slot
+    worker.active_jobs = active_jobs
+    worker.done.return_value = done
+    return worker
+
+
+class TestHashRing(object):
+    def test_should_map_keys_consistently(self):
+        ring = HashRing(range(4))
+        assert ring.get_nodes(42) == HashRing(range(4)).get_nodes(42)
+
+    def test_should_list_every_node_once(self):
+        ring = HashRing(range(4))
+        assert sorted(ring.get_nodes(42)) == [0, 1, 2, 3]
+
+    def test_should_spread_keys_across_nodes(self):
+        ring = HashRing(range(4))
+        counts = Counter(ring.get_nodes(key)[0] for key in range(1000))
+        assert len(counts) == 4
+        assert min(counts.values()) > 100
+
+    def test_removing_node_should_only_move_its_own_keys(self):
+        ring = HashRing(range(4))
+        before = dict((key, ring.get_nodes(key)[0]) for key in range(1000))
+        ring.remove(2)
+        for key in range(1000):
+            if before[key] != 2:
+                assert ring.get_nodes(key)[0] == before[key]
+            else:
+                assert ring.get_nodes(key)[0] != 2
+
+
+class TestWorkerPoolAffinity(object):
+    def setup_method(self, method):
+        self.patcher = patch.object(WorkerPool, '_spawn_worker')
+        self.patcher.start()
+        self.pool = WorkerPool(workers=4, max_jobs=None)
+        for slot in range(4):
+            self.pool.slots[slot] = make_worker(slot)
+        self.pool.workers = set(self.pool.slots.values())
+
+    def teardown_method(self, method):
+        self.patcher.stop()
+
+    def _choose(self, netbox):
+        ready = [w for w in self.pool.workers if not w.done()]
+        return self.pool._choose_worker(netbox, ready)
+
+    def test_should_choose_same_worker_for_same_netbox(self):
+        worker = self._choose(42)
+        worker.active_jobs += 1
+        assert self._choose(42) is worker
+
+    def test_should_choose_first_slot_on_ring(self):
+        slot = self.pool.ring.get_nodes(42)[0]
+        assert self._choose(42) is self.pool.slots[slot]
+
+    def test_should_skip_slot_with_no_ready_worker(self):
+        first, second = self.pool.ring.get_nodes(42)[:2]
+        self.pool.slots[first].done.return_value = True
+        assert self._choose(42) is self.pool.slots[second]
+
+    def test_should_skip_overloaded_worker(self):
+        first, second = self.pool.ring.get_nodes(42)[:2]
+        self.pool.slots[first].active_jobs = 100
+        assert self._choose(42) is self.pool.slots[second]
+
+    def test_should_choose_least_loaded_worker_without_netbox(self):
+        for slot, worker in self.pool.slots.items():
+            worker.active_jobs = 10 - slot
+        assert self._choose(None) is self.pool.slots[3]
+
+    def test_dead_worker_should_be_replaced_in_same_slot(self):
+        worker = self.pool.slots[1]
+        self.pool.worker_died(worker)
+        assert 1 not in self.pool.slots
+        self.pool._spawn_worker.assert_called_with(1)
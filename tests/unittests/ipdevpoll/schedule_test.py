@@ -1,4 +1,7 @@
-from mock import Mock
+import datetime
+from collections import Counter
+
+from mock import Mock, patch
 
 import pytest
 from twisted.internet import defer, task
@@ -19,10 +22,21 @@ def netbox_job_scheduler():
     return schedule.NetboxJobScheduler(job,  netbox, pool)
 
 
-def test_netbox_job_scheduler_reschedule_on_success(netbox_job_scheduler):
+@pytest.fixture
+def clock():
+    clock = task.Clock()
+    with patch('nav.ipdevpoll.schedule.time') as mock_time:
+        mock_time.time = clock.seconds
+        yield clock
+
+
+@patch('nav.ipdevpoll.schedule.send_metrics')
+def test_netbox_job_scheduler_reschedule_on_success(send_metrics,
+                                                    netbox_job_scheduler,
+                                                    clock):
     pool = netbox_job_scheduler.pool
     pool.execute_job.return_value = defer.succeed(True)
-    clock = task.Clock()
+    netbox_job_scheduler.phase = 0
     netbox_job_scheduler.callLater = clock.callLater
     netbox_job_scheduler.start()
     clock.advance(1)
@@ -32,3 +46,83 @@ def test_netbox_job_scheduler_reschedule_on_success(netbox_job_scheduler):
     assert pool.execute_job.call_count == 2
     pool.execute_job.assert_called_with('myjob', 1, plugins=[],
                                         interval=10)
+
+
+@patch('nav.ipdevpoll.schedule.send_metrics')
+def test_netbox_job_scheduler_should_reschedule_at_phase(send_metrics,
+                                                         netbox_job_scheduler,
+                                                         clock):
+    pool = netbox_job_scheduler.pool
+    pool.execute_job.return_value = defer.succeed(True)
+    netbox_job_scheduler.phase = 3.0
+    netbox_job_scheduler.callLater = clock.callLater
+    clock.advance(100)
+    netbox_job_scheduler.start()
+    clock.advance(0)
+    assert pool.execute_job.call_count == 1
+    # half an interval must pass before the next run, so 103 is skipped
+    clock.advance(12.9)
+    assert pool.execute_job.call_count == 1
+    clock.advance(0.1)
+    assert pool.execute_job.call_count == 2
+
+
+@patch('nav.ipdevpoll.schedule.send_metrics')
+def test_netbox_job_scheduler_should_log_lateness(send_metrics,
+                                                  netbox_job_scheduler,
+                                                  clock):
+    netbox_job_scheduler.pool.execute_job.return_value = defer.Deferred()
+    netbox_job_scheduler.netbox.sysname = 'example-sw.example.org'
+    netbox_job_scheduler.callLater = clock.callLater
+    netbox_job_scheduler.start(5)
+    clock.advance(6)
+    netbox_job_scheduler.job_counters.clear()
+    (path, (timestamp, lateness)), = send_metrics.call_args[0][0]
+    assert path.endswith('.ipdevpoll.myjob.lateness')
+    assert lateness == 1
+
+
+def test_initial_delay_should_be_zero_for_jobs_that_never_ran(
+        netbox_job_scheduler):
+    assert netbox_job_scheduler.get_initial_delay(None) == 0
+    assert netbox_job_scheduler.get_initial_delay(datetime.datetime.min) == 0
+
+
+def test_initial_delay_should_be_within_interval(netbox_job_scheduler):
+    delay = netbox_job_scheduler.get_initial_delay(datetime.datetime.now())
+    assert 0 <= delay < netbox_job_scheduler.job.interval
+
+
+def test_initial_delay_should_not_exceed_due_time(netbox_job_scheduler):
+    interval = netbox_job_scheduler.job.interval
+    last_updated = datetime.datetime.now() - datetime.timedelta(
+        seconds=interval - 2)
+    assert netbox_job_scheduler.get_initial_delay(last_updated) <= 2
+
+
+def test_initial_delay_should_be_short_for_overdue_jobs(netbox_job_scheduler):
+    last_updated = datetime.datetime.now() - datetime.timedelta(days=1)
+    delay = netbox_job_scheduler.get_initial_delay(last_updated)
+    assert 0 <= delay < schedule.MAX_OVERDUE_SPLAY
+
+
+class TestPhase(object):
+    def test_phase_should_be_stable(self):
+        assert (schedule.get_phase(1, '5minstats', 300) ==
+                schedule.get_phase(1, '5minstats', 300))
+
+    def test_phase_should_be_within_interval(self):
+        for netbox_id in range(100):
+            assert 0 <= schedule.get_phase(netbox_id, 'inventory', 60) < 60
+
+    def test_phases_should_be_spread_across_interval(self):
+        phases = [schedule.get_phase(netbox_id, '5minstats', 300)
+                  for netbox_id in range(1000)]
+        buckets = Counter(int(phase // 30) for phase in phases)
+        assert len(buckets) == 10
+        assert min(buckets.values()) > 50
+
+    def test_next_run_time_should_be_at_phase(self):
+        assert schedule.get_next_run_time(1000, 300, 100) == 1000
+        assert schedule.get_next_run_time(1001, 300, 100) == 1300
+        assert schedule.get_next_run_time(950, 300, 100) == 1000
@@ -0,0 +1,21 @@
+import datetime
+from unittest import TestCase
+
+from nav.models.fields import INFINITY
+from nav.ipdevpoll.shadows.cam import CamManager, CamDetails
+
+NOW = datetime.datetime(2019, 1, 1, 12, 0)
+
+
+class TestCamCloseUpdates(TestCase):
+    def test_open_record_should_get_end_time_and_miss_count(self):
+        upd = CamManager._get_close_update(CamDetails(1, INFINITY, 0), NOW)
+        self.assertEqual(upd, dict(end_time=NOW, miss_count=1))
+
+    def test_closed_record_should_only_get_miss_count(self):
+        upd = CamManager._get_close_update(CamDetails(1, NOW, 1), NOW)
+        self.assertEqual(upd, dict(miss_count=2))
+
+    def test_record_at_max_miss_count_should_get_null_miss_count(self):
+        upd = CamManager._get_close_update(CamDetails(1, NOW, 2), NOW)
+        self.assertEqual(upd, dict(miss_count=None))
@@ -0,0 +1,201 @@
+from bisect import bisect_right
+
+from twisted.internet import defer, error
+from twisted.python import failure
+
+from nav.oids import OID
+from nav.ipdevpoll.snmp.common import (AgentProxyMixIn, ColumnWalker,
+                                       ColumnWalkError, SnmpError,
+                                       SNMPParameters)
+
+IFDESCR = '.1.3.6.1.2.1.2.2.1.2'
+IFTYPE = '.1.3.6.1.2.1.2.2.1.3'
+IFSPEED = '.1.3.6.1.2.1.2.2.1.5'
+
+
+def make_mib_view(rows=5):
+    view = {}
+    for ifindex in range(1, rows + 1):
+        view[OID(IFDESCR) + (ifindex,)] = 'eth%d' % ifindex
+        view[OID(IFTYPE) + (ifindex,)] = 6
+        view[OID(IFSPEED) + (ifindex,)] = 1000000000
+    view[OID('.1.3.6.1.2.1.2.2.1.7.1')] = 1  # ifAdminStatus.1
+    return view
+
+
+class FakeAgent(object):
+    """An agent serving the variables of a static MIB view"""
+    snmpVersion = 'v2c'
+
+    def __init__(self, *args, **kwargs):
+        self.view = make_mib_view()
+        self.max_varbinds = None
+        self.multi_oid_broken = False
+        self.bulk_error = None
+        self.bulk_requests = []
+        self.bulk_repetitions = []
+        self.table_requests = []
+
+    def _next(self, oid):
+        oids = sorted(self.view)
+        position = bisect_right(oids, oid)
+        if position < len(oids):
+            return oids[position]
+        return oid  # endOfMibView
+
+    def _getbulk(self, nonrepeaters, maxrepetitions, oids):
+        self.bulk_requests.append(list(oids))
+        self.bulk_repetitions.append(maxrepetitions)
+        if self.bulk_error:
+            return defer.fail(self.bulk_error)
+        if self.multi_oid_broken:
+            oids = oids[:1]
+        current = list(oids)
+        response = []
+        for _ in range(maxrepetitions):
+            for position, oid in enumerate(current):
+                current[position] = self._next(oid)
+                response.append((current[position],
+                                 self.view.get(current[position])))
+        return defer.succeed(response[:self.max_varbinds])
+
+    def getTable(self, oids, **kwargs):
+        self.table_requests.append(list(oids))
+        result = {}
+        for oid in oids:
+            column = OID(oid)
+            result[oid] = dict((str(key), value)
+                               for key, value in self.view.items()
+                               if column.is_a_prefix_of(key))
+        return defer.succeed(result)
+
+
+class MockAgentProxy(AgentProxyMixIn, FakeAgent):
+    pass
+
+
+def make_proxy(max_repetitions=10):
+    return MockAgentProxy(snmp_parameters=SNMPParameters(
+        timeout=1.5, max_repetitions=max_repetitions, throttle_delay=0))
+
+
+def get_result(df):
+    assert df.called
+    if isinstance(df.result, failure.Failure):
+        df.result.raiseException()
+    return df.result
+
+
+class TestColumnWalker(object):
+    def test_should_retrieve_all_columns(self):
+        proxy = make_proxy()
+        result = get_result(
+            ColumnWalker(proxy, [IFDESCR, IFTYPE, IFSPEED], 10).walk())
+        assert result == proxy.getTable([IFDESCR, IFTYPE, IFSPEED]).result
+
+    def test_should_advance_all_columns_in_the_same_request(self):
+        proxy = make_proxy()
+        get_result(ColumnWalker(proxy, [IFDESCR, IFTYPE, IFSPEED], 30).walk())
+        assert len(proxy.bulk_requests) == 1
+        assert len(proxy.bulk_requests[0]) == 3
+
+    def test_should_divide_repetitions_between_columns(self):
+        proxy = make_proxy()
+        get_result(ColumnWalker(proxy, [IFDESCR, IFTYPE, IFSPEED], 10).walk())
+        assert proxy.bulk_repetitions[0] == 3
+
+    def test_should_request_at_most_max_repetitions_columns(self):
+        proxy = make_proxy()
+        result = get_result(
+            ColumnWalker(proxy, [IFDESCR, IFTYPE, IFSPEED], 2).walk())
+        assert result == proxy.getTable([IFDESCR, IFTYPE, IFSPEED]).result
+        assert all(len(oids) <= 2 for oids in proxy.bulk_requests)
+        assert all(repetitions >= 1
+                   for repetitions in proxy.bulk_repetitions)
+
+    def test_should_resume_after_truncated_responses(self):
+        proxy = make_proxy()
+        proxy.max_varbinds = 4
+        result = get_result(
+            ColumnWalker(proxy, [IFDESCR, IFTYPE, IFSPEED], 10).walk())
+        assert result == proxy.getTable([IFDESCR, IFTYPE, IFSPEED]).result
+        assert len(proxy.bulk_requests) > 1
+
+    def test_should_finish_at_end_of_mib_view(self):
+        proxy = make_proxy()
+        proxy.view = dict((oid, value) for oid, value in proxy.view.items()
+                          if not OID(IFSPEED).is_a_prefix_of(oid))
+        proxy.view[OID(IFSPEED) + (1,)] = 42
+        del proxy.view[OID('.1.3.6.1.2.1.2.2.1.7.1')]
+        result = get_result(ColumnWalker(proxy, [IFDESCR, IFSPEED], 10).walk())
+        assert result[IFSPEED] == {IFSPEED + '.1': 42}
+
+    def test_should_fail_when_agent_ignores_additional_oids(self):
+        proxy = make_proxy()
+        proxy.multi_oid_broken = True
+        df = ColumnWalker(proxy, [IFDESCR, IFTYPE], 10).walk()
+        assert df.called
+        assert df.result.check(ColumnWalkError)
+        df.addErrback(lambda _: None)
+
+    def test_should_fail_on_empty_response(self):
+        proxy = make_proxy()
+        proxy.max_varbinds = 0
+        df = ColumnWalker(proxy, [IFDESCR, IFTYPE], 10).walk()
+        assert df.called
+        assert df.result.check(ColumnWalkError)
+        df.addErrback(lambda _: None)
+
+
+class TestGetColumns(object):
+    def test_should_walk_columns_in_parallel(self):
+        proxy = make_proxy()
+        result = get_result(proxy.getColumns([IFDESCR, IFSPEED]))
+        assert sorted(result) == [IFDESCR, IFSPEED]
+        assert len(result[IFDESCR]) == 5
+        assert not proxy.table_requests
+
+    def test_should_cache_columns_individually(self):
+        proxy = make_proxy(max_repetitions=20)
+        get_result(proxy.getColumns([IFDESCR, IFSPEED]))
+        result = get_result(proxy.getTable([IFDESCR]))
+        assert len(result[IFDESCR]) == 5
+        get_result(proxy.getColumns([IFSPEED, IFDESCR]))
+        assert len(proxy.bulk_requests) == 1
+        assert not proxy.table_requests
+
+    def test_should_fall_back_to_serial_walks(self):
+        proxy = make_proxy()
+        proxy.multi_oid_broken = True
+        result = get_result(proxy.getColumns([IFDESCR, IFTYPE]))
+        assert len(result[IFTYPE]) == 5
+        assert proxy.table_requests == [[IFDESCR], [IFTYPE]]
+
+    def test_should_fall_back_to_serial_walks_on_timeout(self):
+        proxy = make_proxy()
+        proxy.bulk_error = error.TimeoutError()
+        result = get_result(proxy.getColumns([IFDESCR, IFTYPE]))
+        assert len(result[IFTYPE]) == 5
+        assert proxy.table_requests == [[IFDESCR], [IFTYPE]]
+
+    def test_should_fall_back_to_serial_walks_on_agent_error(self):
+        proxy = make_proxy()
+        proxy.bulk_error = SnmpError("tooBig")
+        result = get_result(proxy.getColumns([IFDESCR, IFTYPE]))
+        assert len(result[IFDESCR]) == 5
+        assert proxy.table_requests == [[IFDESCR], [IFTYPE]]
+
+    def test_should_not_retry_parallel_walk_after_failure(self):
+        proxy = make_proxy()
+        proxy.multi_oid_broken = True
+        get_result(proxy.getColumns([IFDESCR, IFTYPE]))
+        requests = len(proxy.bulk_requests)
+        get_result(proxy.getColumns([IFSPEED, '.1.3.6.1.2.1.2.2.1.7']))
+        assert len(proxy.bulk_requests) == requests
+
+    def test_should_walk_serially_with_snmpv1(self):
+        proxy = make_proxy()
+        proxy.snmpVersion = 'v1'
+        get_result(proxy.getColumns([IFDESCR, IFTYPE]))
+        assert not proxy.bulk_requests
+        assert proxy.table_requests == [[IFDESCR], [IFTYPE]]
@@ -0,0 +1,135 @@
+from decimal import Decimal
+import socket
+import struct
+
+from mock import Mock, patch
+
+from django.utils.six.moves import cPickle as pickle
+
+from nav.metrics.carbon import (metrics_to_pickle, PickleSender,
+                                SocketPickleSender, TwistedPickleSender)
+
+METRICS = [('nav.a', (1000, 1)), ('nav.b', (1000, 2)), ('nav.c', (1000, 3))]
+
+
+def test_metrics_to_pickle_should_be_length_prefixed():
+    message = metrics_to_pickle(METRICS)
+    length, = struct.unpack("!L", message[:4])
+    assert length == len(message) - 4
+    assert pickle.loads(message[4:]) == METRICS
+
+
+class DummySender(PickleSender):
+    flush = Mock()
+
+
+def test_sender_should_drop_metrics_when_queue_is_full():
+    sender = DummySender('localhost', queue_size=2, batch_size=10)
+    sender.send(METRICS)
+    assert len(sender.queue) == 2
+    assert sender.dropped == 1
+
+
+def test_requeued_batch_should_be_first_in_line():
+    sender = DummySender('localhost', queue_size=10, batch_size=2)
+    sender.send(METRICS)
+    batch = sender.next_batch()
+    sender.requeue(batch)
+    assert list(sender.queue) == METRICS
+
+
+def test_stats_metrics_should_include_all_counters():
+    sender = DummySender('localhost')
+    paths = [path for path, _ in sender.get_stats_metrics()]
+    assert len(paths) == 3
+    assert all(path.startswith('nav.carbon-sender.') for path in paths)
+
+
+@patch('nav.metrics.carbon._handle_error', Mock())
+def test_socket_sender_should_keep_metrics_on_send_failure():
+    sender = SocketPickleSender('localhost', batch_size=10)
+    sender.sock = Mock(sendall=Mock(side_effect=socket.error("broken")))
+    sender.send(METRICS)
+    sender.flush()
+    assert list(sender.queue) == METRICS
+    assert sender.sock is None
+    assert sender.sent == 0
+
+
+def test_socket_sender_should_count_sent_metrics():
+    sender = SocketPickleSender('localhost', batch_size=2)
+    sender.sock = Mock()
+    sender.send(METRICS)
+    sender.flush()
+    assert sender.sent == 3
+    assert not sender.queue
+
+
+def test_sender_should_queue_metrics_as_builtin_types():
+    sender = DummySender('localhost')
+    sender.send([(u'nav.a', (1000.5, Decimal('1.5')))])
+    path, (timestamp, value) = sender.queue[0]
+    assert (type(path), type(timestamp), type(value)) == (str, int, float)
+    assert (path, timestamp, value) == ('nav.a', 1000, 1.5)
+
+
+def test_sender_should_drop_invalid_metrics():
+    sender = DummySender('localhost')
+    sender.send([('nav.a', (1000, None)), ('nav.b', (1000, 'x'))])
+    assert not sender.queue
+    assert sender.dropped == 2
+
+
+@patch('nav.metrics.carbon.atexit.register')
+def test_socket_sender_should_flush_at_exit(register):
+    sender = SocketPickleSender('localhost')
+    sender.send(METRICS[:1])
+    assert sender.queue
+
+    sock = Mock()
+    exit_hook, sender_ref = register.call_args[0]
+    with patch('socket.create_connection', return_value=sock):
+        exit_hook(sender_ref)
+    assert not sender.queue
+    assert sock.sendall.called
+    assert sock.close.called
+
+
+@patch('twisted.internet.task.LoopingCall', Mock())
+@patch('twisted.internet.reactor')
+class TestTwistedPickleSender(object):
+    def test_should_flush_before_reactor_shutdown(self, reactor):
+        sender = TwistedPickleSender('localhost')
+        reactor.addSystemEventTrigger.assert_called_once_with(
+            'before', 'shutdown', sender.shutdown)
+        sender.protocol = protocol = Mock()
+        sender.paused = True
+        sender.send(METRICS)
+
+        closed = sender.shutdown()
+        assert not sender.queue
+        assert protocol.transport.write.called
+        assert protocol.transport.loseConnection.called
+
+        sender.connection_lost()
+        assert closed.called
+
+    def test_should_wait_for_connection_at_shutdown(self, reactor):
+        sender = TwistedPickleSender('localhost')
+        sender.send(METRICS)
+        closed = sender.shutdown()
+        assert sender.queue
+
+        protocol = Mock()
+        sender.connection_made(protocol)
+        assert not sender.queue
+        assert protocol.transport.loseConnection.called
+        assert not closed.called
+
+    def test_should_give_up_on_connection_at_shutdown_timeout(self, reactor):
+        sender = TwistedPickleSender('localhost')
+        sender.send(METRICS)
+        closed = sender.shutdown()
+        timeout_func = reactor.callLater.call_args[0][1]
+        timeout_func()
+        assert closed.called
@@ -0,0 +1,148 @@
+from django.core.cache.backends.locmem import LocMemCache
+from mock import Mock, patch
+import pytest
+
+from nav.metrics import lookup
+from nav.metrics.lookup import lookup_many, invalidate_cache
+from nav.models.manage import Interface, Netbox
+
+IN_OCTETS = 'nav.devices.{0}.ports.{1}.ifInOctets'
+
+
+@pytest.fixture(autouse=True)
+def cache():
+    cache = LocMemCache('nav-metrics-lookup-test', {})
+    with patch.object(lookup, 'cache', cache):
+        yield cache
+    cache.clear()
+    lookup._lookup_cache.validate(None)
+
+
+def make_interface(sysname, ifname, ifdescr=None):
+    return Interface(netbox=Netbox(sysname=sysname), ifname=ifname,
+                     ifdescr=ifdescr or ifname)
+
+
+class TestLookupMany(object):
+    @patch('nav.metrics.lookup.Interface')
+    def test_should_resolve_interfaces_using_a_single_query(self, interface):
+        gi1 = make_interface('a.example.org', 'Gi1/1', 'GigabitEthernet1/1')
+        gi2 = make_interface('a.example.org', 'Gi1/2', 'GigabitEthernet1/2')
+        qset = interface.objects.select_related.return_value
+        qset.extra.return_value = [gi1, gi2]
+        metrics = [IN_OCTETS.format('a_example_org', 'Gi1_1'),
+                   IN_OCTETS.format('a_example_org', 'GigabitEthernet1_2'),
+                   IN_OCTETS.format('b_example_org', 'Gi1_1')]
+        assert lookup_many(metrics) == {
+            metrics[0]: gi1,
+            metrics[1]: gi2,
+            metrics[2]: None,
+        }
+        assert qset.extra.call_count == 1
+
+    @patch('nav.metrics.lookup.Interface')
+    def test_should_ignore_ambiguous_interfaces(self, interface):
+        qset = interface.objects.select_related.return_value
+        qset.extra.return_value = [make_interface('a.example.org', 'Gi1/1'),
+                                   make_interface('a.example.org', 'Gi1.1')]
+        metric = IN_OCTETS.format('a_example_org', 'Gi1_1')
+        assert lookup_many([metric]) == {metric: None}
+
+    @patch('nav.metrics.lookup.Netbox')
+    def test_should_resolve_devices_and_cpus(self, netbox):
+        box = Netbox(sysname='a.example.org')
+        netbox.objects.all.return_value.extra.return_value = [box]
+        device = 'nav.devices.a_example_org.system.sysuptime'
+        cpu = 'nav.devices.a_example_org.cpu.cpu1.loadavg5min'
+        assert lookup_many([device, cpu]) == {
+            device: box,
+            cpu: 'a.example.org: cpu1',
+        }
+
+    def test_should_map_unknown_metrics_to_none(self):
+        assert lookup_many(['carbon.agents.foo']) == {
+            'carbon.agents.foo': None}
+
+    def test_should_use_cached_results(self):
+        metric = IN_OCTETS.format('a', 'b')
+        bulk = Mock(return_value=['first'])
+        with patch.dict(lookup._bulk_reverse_handlers,
+                        {lookup._reverse_interface: bulk}):
+            assert lookup_many([metric]) == {metric: 'first'}
+            bulk.return_value = ['second']
+            assert lookup_many([metric]) == {metric: 'first'}
+        assert bulk.call_count == 1
+
+    def test_should_cache_misses(self):
+        metric = IN_OCTETS.format('a', 'b')
+        bulk = Mock(return_value=[None])
+        with patch.dict(lookup._bulk_reverse_handlers,
+                        {lookup._reverse_interface: bulk}):
+            lookup_many([metric])
+            assert lookup_many([metric]) == {metric: None}
+        assert bulk.call_count == 1
+
+    def test_invalidate_cache_should_discard_cached_results(self):
+        metric = IN_OCTETS.format('a', 'b')
+        bulk = Mock(return_value=['first'])
+        with patch.dict(lookup._bulk_reverse_handlers,
+                        {lookup._reverse_interface: bulk}):
+            lookup_many([metric])
+            invalidate_cache()
+            bulk.return_value = ['second']
+            assert lookup_many([metric]) == {metric: 'second'}
+
+    def test_should_see_invalidations_by_other_processes(self, cache):
+        metric = IN_OCTETS.format('a', 'b')
+        bulk = Mock(return_value=['first'])
+        with patch.dict(lookup._bulk_reverse_handlers,
+                        {lookup._reverse_interface: bulk}):
+            lookup_many([metric])
+            cache.set(lookup._GENERATION_KEY, 'another process', None)
+            bulk.return_value = ['second']
+            assert lookup_many([metric]) == {metric: 'second'}
+
+    def test_should_not_store_results_in_shared_cache(self, cache):
+        metric = IN_OCTETS.format('a', 'b')
+        with patch.dict(lookup._bulk_reverse_handlers,
+                        {lookup._reverse_interface: Mock(return_value=[1])}):
+            lookup_many([metric])
+        assert list(cache._cache) == [cache.make_key(lookup._GENERATION_KEY)]
+
+    def test_should_fall_back_to_single_lookups(self):
+        metric = IN_OCTETS.format('a', 'b')
+        with patch.dict(lookup._bulk_reverse_handlers, clear=True):
+            with patch.object(lookup, '_single_like_match',
+                              return_value='found') as single:
+                assert lookup_many([metric]) == {metric: 'found'}
+        assert single.called
+
+
+class TestLookupCache(object):
+    def test_should_evict_least_recently_used_entries(self):
+        cache = lookup._LookupCache(max_size=2, timeout=60)
+        cache.update({'a': 1, 'b': 2})
+        cache.get('a')
+        cache.update({'c': 3})
+        assert len(cache) == 2
+        assert cache.get('a') == (True, 1)
+        assert cache.get('b') == (False, None)
+
+    def test_should_expire_entries(self):
+        cache = lookup._LookupCache(max_size=2, timeout=-1)
+        cache.update({'a': None})
+        assert cache.get('a') == (False, None)
+
+    def test_should_cache_none(self):
+        cache = lookup._LookupCache(max_size=2, timeout=60)
+        cache.update({'a': None})
+        assert cache.get('a') == (True, None)
+
+    def test_should_empty_on_new_generation(self):
+        cache = lookup._LookupCache(max_size=2, timeout=60)
+        cache.validate('1')
+        cache.update({'a': 1})
+        cache.validate('1')
+        assert len(cache) == 1
+        cache.validate('2')
+        assert len(cache) == 0
@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from nav.metrics import templates
+from nav.metrics.templates import (
+    metric_path_for_interface,
+    metric_prefix_for_interface,
+    clear_metric_prefix_caches,
+)
+
+
+class MetricPrefixCacheTests(TestCase):
+    def setUp(self):
+        clear_metric_prefix_caches()
+
+    def test_interface_path_should_be_escaped(self):
+        path = metric_path_for_interface('foo.example.org', 'Gi1/0/1',
+                                         'ifInOctets')
+        self.assertEqual(
+            path, 'nav.devices.foo_example_org.ports.Gi1_0_1.ifInOctets')
+
+    def test_netbox_object_and_sysname_should_give_same_prefix(self):
+        netbox = Mock(sysname='foo.example.org')
+        self.assertEqual(metric_prefix_for_interface(netbox, 'Gi1/0/1'),
+                         metric_prefix_for_interface('foo.example.org',
+                                                     'Gi1/0/1'))
+
+    def test_repeated_interface_prefix_should_be_cached(self):
+        metric_prefix_for_interface('foo.example.org', 'Gi1/0/1')
+        metric_prefix_for_interface('foo.example.org', 'Gi1/0/1')
+        info = templates._interface_prefix.cache_info()
+        self.assertEqual(info.hits, 1)
+        self.assertEqual(info.misses, 1)
+
+    def test_renamed_netbox_should_not_get_stale_prefix(self):
+        netbox = Mock(sysname='foo.example.org')
+        metric_prefix_for_interface(netbox, 'Gi1/0/1')
+        netbox.sysname = 'bar.example.org'
+        self.assertEqual(metric_prefix_for_interface(netbox, 'Gi1/0/1'),
+                         'nav.devices.bar_example_org.ports.Gi1_0_1')
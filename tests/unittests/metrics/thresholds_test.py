@@ -1,7 +1,15 @@
+from datetime import timedelta
+
+from mock import patch
 import pytest
 
+from nav.metrics import thresholds
 from nav.metrics.graphs import (extract_series_name,
                                 translate_serieslist_to_regex)
+from nav.metrics.thresholds import (ThresholdEvaluator, make_batches,
+                                    get_values_in_batches,
+                                    get_metric_maximums)
+from nav.models.manage import Interface
 
 series_name_data = (
     ('scaleToSeconds(nonNegativeDerivative(scale(nav.devices.example-sw_example_org.ports.Po3.ifOutOctets,8)),1)',
@@ -39,3 +47,85 @@ def test_translate_serieslist_to_regex(series, matches, nonmatches):
 
     for string in nonmatches:
         assert not pattern.match(string), "%s matches %s" % (string, series)
+
+
+IN_OCTETS = 'nav.devices.{0}.ports.{1}.ifInOctets'
+
+
+def transformed(metric):
+    return ('scaleToSeconds(nonNegativeDerivative(scale({0},8)),1)'
+            .format(metric))
+
+
+class TestBatches(object):
+    def test_should_combine_targets_of_same_period(self):
+        evaluators = [ThresholdEvaluator(IN_OCTETS.format(sysname, '*'))
+                      for sysname in ('a', 'b', 'c')]
+        batches = make_batches(evaluators, batch_size=2)
+        assert [len(batch.targets) for batch in batches] == [2, 1]
+        assert batches[0].combined and not batches[1].combined
+
+    def test_should_not_combine_different_periods(self):
+        evaluators = [
+            ThresholdEvaluator(IN_OCTETS.format('a', '*')),
+            ThresholdEvaluator(IN_OCTETS.format('b', '*'),
+                               period=timedelta(minutes=5)),
+        ]
+        assert len(make_batches(evaluators)) == 2
+
+    def test_should_only_combine_raw_targets_that_are_equal(self):
+        evaluators = [ThresholdEvaluator('sumSeries(nav.a.*)', raw=True),
+                      ThresholdEvaluator('sumSeries(nav.a.*)', raw=True),
+                      ThresholdEvaluator('sumSeries(nav.b.*)', raw=True)]
+        batches = make_batches(evaluators)
+        assert [len(batch.evaluators) for batch in batches] == [2, 1]
+        assert not any(batch.combined for batch in batches)
+
+
+class TestGetValuesInBatches(object):
+    @patch('nav.metrics.thresholds.get_metric_average')
+    def test_should_attribute_values_to_matching_rules(self, average):
+        average.return_value = {
+            transformed(IN_OCTETS.format('a', 'Gi1')): 10.0,
+            transformed(IN_OCTETS.format('b', 'Gi1')): 20.0,
+        }
+        first = ThresholdEvaluator(IN_OCTETS.format('a', '*'))
+        second = ThresholdEvaluator(IN_OCTETS.format('b', '*'))
+        assert get_values_in_batches([first, second]) == {}
+        assert average.call_count == 1
+        assert first.result == {IN_OCTETS.format('a', 'Gi1'): {'value': 10.0}}
+        assert second.result == {
+            IN_OCTETS.format('b', 'Gi1'): {'value': 20.0}}
+
+    @patch('nav.metrics.thresholds.get_metric_average')
+    def test_should_report_errors_per_evaluator(self, average):
+        error = Exception("graphite is down")
+        average.side_effect = error
+        evaluator = ThresholdEvaluator(IN_OCTETS.format('a', '*'))
+        assert get_values_in_batches([evaluator]) == {evaluator: error}
+
+
+class TestGetMetricMaximums(object):
+    @patch('nav.metrics.thresholds.lookup_many')
+    def test_should_find_interface_speeds(self, lookup_many):
+        metrics = [IN_OCTETS.format('a_example_org', 'Gi1_1'),
+                   IN_OCTETS.format('a_example_org', 'Gi1_2'),
+                   IN_OCTETS.format('b_example_org', 'Gi1_1'),
+                   'nav.devices.a_example_org.ports.Gi1_1.ifInErrors']
+        lookup_many.return_value = {
+            metrics[0]: Interface(speed=1000.0),
+            metrics[1]: Interface(speed=100.0),
+            metrics[2]: None,
+        }
+        assert get_metric_maximums(metrics) == {
+            metrics[0]: 1000.0 * thresholds.MEGA,
+            metrics[1]: 100.0 * thresholds.MEGA,
+        }
+        lookup_many.assert_called_once_with(metrics[:3])
+
+    def test_should_use_maximums_when_set(self):
+        metric = IN_OCTETS.format('a', 'Gi1')
+        evaluator = ThresholdEvaluator(IN_OCTETS.format('a', '*'))
+        evaluator.set_values({transformed(metric): 60.0})
+        evaluator.maximums = {metric: 100.0}
+        assert evaluator.evaluate('>50%') == [(metric, 60.0)]
@@ -0,0 +1,28 @@
+from mock import patch, Mock
+
+from nav.models.event import EventQueue as Event, prefetch_subjects
+
+
+def make_event(event_type, subid):
+    return Event(event_type_id=event_type, subid=subid)
+
+
+@patch('nav.models.event.apps.get_model')
+def test_prefetch_subjects_should_use_one_query_per_model(get_model):
+    interface = Mock()
+    model = get_model.return_value
+    model.objects.in_bulk.return_value = {42: interface}
+    events = [make_event('linkState', '42'), make_event('linkState', '42')]
+
+    prefetch_subjects(events)
+
+    assert model.objects.in_bulk.call_count == 1
+    assert all(event.get_subject() is interface for event in events)
+
+
+@patch('nav.models.event.apps.get_model')
+def test_prefetch_subjects_should_ignore_unmapped_event_types(get_model):
+    event = make_event('boxState', '')
+    prefetch_subjects([event])
+    assert not get_model.called
+    assert not hasattr(event, '_cached_subject')
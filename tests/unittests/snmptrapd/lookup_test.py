@@ -0,0 +1,100 @@
+from collections import namedtuple
+
+from mock import Mock, patch
+import pytest
+
+from nav.snmptrapd import lookup
+from nav.snmptrapd.lookup import LookupCache
+
+Notify = namedtuple('Notify', 'pid channel payload')
+
+
+@pytest.fixture
+def clock():
+    with patch('nav.snmptrapd.lookup.time') as mocked:
+        mocked.time.return_value = 1000.0
+        yield mocked
+
+
+class TestLookupCache(object):
+    def test_should_only_load_value_once(self, clock):
+        cache = LookupCache()
+        loader = Mock(return_value=42)
+        assert cache.get_or_load('key', loader, 'arg') == 42
+        assert cache.get_or_load('key', loader, 'arg') == 42
+        loader.assert_called_once_with('arg')
+
+    def test_should_cache_none(self, clock):
+        cache = LookupCache()
+        loader = Mock(return_value=None)
+        cache.get_or_load('key', loader)
+        cache.get_or_load('key', loader)
+        assert loader.call_count == 1
+
+    def test_should_reload_expired_value(self, clock):
+        cache = LookupCache(ttl=60)
+        loader = Mock(return_value=42)
+        cache.get_or_load('key', loader)
+        clock.time.return_value += 61
+        cache.get_or_load('key', loader)
+        assert loader.call_count == 2
+
+    def test_should_evict_least_recently_used_value(self, clock):
+        cache = LookupCache(max_size=2)
+        cache.get_or_load('a', Mock())
+        cache.get_or_load('b', Mock())
+        cache.get_or_load('a', Mock())
+        cache.get_or_load('c', Mock())
+        assert len(cache) == 2
+        loader = Mock()
+        cache.get_or_load('a', loader)
+        assert not loader.called
+        cache.get_or_load('b', loader)
+        assert loader.called
+
+    def test_should_not_cache_on_loader_failure(self, clock):
+        cache = LookupCache()
+        with pytest.raises(ValueError):
+            cache.get_or_load('key', Mock(side_effect=ValueError))
+        assert len(cache) == 0
+
+    def test_invalidate_should_remove_matching_keys(self, clock):
+        cache = LookupCache()
+        for key in [(1, '1'), (1, '2'), (2, '1')]:
+            cache.get_or_load(key, Mock())
+        cache.invalidate(lambda key: key[0] == 1)
+        assert len(cache) == 1
+
+    def test_should_not_cache_value_loaded_across_invalidation(self, clock):
+        cache = LookupCache()
+
+        def loader():
+            cache.invalidate()  # e.g. a change notice from another thread
+            return 'stale'
+        assert cache.get_or_load('key', loader) == 'stale'
+        assert len(cache) == 0
+        assert cache.get_or_load('key', Mock(return_value='fresh')) == 'fresh'
+
+
+class TestNotifications(object):
+    def setup_method(self):
+        lookup.agents.invalidate()
+        lookup.interfaces.invalidate()
+        for key in [(1, '1'), (1, '2'), (2, '1')]:
+            lookup.interfaces.get_or_load(key, Mock())
+        lookup.agents.get_or_load('10.0.0.1', Mock())
+
+    def test_interface_change_should_invalidate_interfaces_of_netbox(self):
+        lookup.handle_notifications(
+            [Notify(1, lookup.INTERFACE_CHANGED, '1')])
+        assert len(lookup.interfaces) == 1
+        assert len(lookup.agents) == 1
+
+    def test_netbox_change_should_invalidate_agents(self):
+        lookup.handle_notifications([Notify(1, lookup.NETBOX_CHANGED, '2')])
+        assert len(lookup.interfaces) == 2
+        assert len(lookup.agents) == 0
+
+    def test_unknown_payload_should_invalidate_everything(self):
+        lookup.handle_notifications([Notify(1, lookup.INTERFACE_CHANGED, '')])
+        assert len(lookup.interfaces) == 0
@@ -0,0 +1,98 @@
+from mock import Mock, patch
+
+from nav.snmptrapd.pipeline import TrapPipeline, EventBatch
+from nav.snmptrapd.trap import SNMPTrap
+
+
+def make_trap():
+    return SNMPTrap('10.0.0.1', '10.0.0.1', None, 'LINKDOWN',
+                    '.1.3.6.1.6.3.1.1.5.3', 0, 'public', 2, {})
+
+
+class TestTrapPipeline(object):
+    def test_should_queue_traps_without_handling_them(self):
+        handler = Mock()
+        pipeline = TrapPipeline(handler, queue_size=10)
+        pipeline.put(make_trap())
+        assert pipeline.queue.qsize() == 1
+        assert pipeline.counters['received'] == 1
+        assert pipeline.counters['queued'] == 1
+        assert not handler.called
+
+    def test_should_drop_traps_when_queue_is_full(self):
+        pipeline = TrapPipeline(Mock(), queue_size=2)
+        for _ in range(5):
+            pipeline.put(make_trap())
+        assert pipeline.queue.qsize() == 2
+        assert pipeline.counters.snapshot() == dict(
+            received=5, queued=2, dropped=3, handled=0)
+
+    def test_should_handle_queued_traps_on_stop(self):
+        handler = Mock()
+        pipeline = TrapPipeline(handler, workers=2, stats_interval=0)
+        pipeline.start()
+        for _ in range(10):
+            pipeline.put(make_trap())
+        pipeline.stop(timeout=5)
+        assert handler.call_count == 10
+        assert pipeline.counters['handled'] == 10
+
+    def test_should_take_at_most_batch_size_traps(self):
+        pipeline = TrapPipeline(Mock(), batch_size=3)
+        for _ in range(5):
+            pipeline.put(make_trap())
+        assert len(pipeline._get_batch()) == 3
+        assert len(pipeline._get_batch()) == 2
+
+    @patch('nav.snmptrapd.pipeline.EventQ')
+    def test_should_post_events_of_a_batch_after_handling_it(self, eventq):
+        event = Mock()
+
+        def handler(trap):
+            trap.post_event(event)
+            assert not eventq.post_events.called
+
+        pipeline = TrapPipeline(handler)
+        traps = [make_trap(), make_trap()]
+        pipeline._handle_batch(traps)
+        eventq.post_events.assert_called_once_with([event, event])
+        assert not event.post.called
+        assert all(trap.event_batch is None for trap in traps)
+
+    def test_should_survive_handler_exceptions(self):
+        handler = Mock(side_effect=Exception("boom"))
+        pipeline = TrapPipeline(handler)
+        pipeline._handle_batch([make_trap(), make_trap()])
+        assert handler.call_count == 2
+        assert pipeline.counters['handled'] == 2
+
+
+@patch('nav.snmptrapd.pipeline.EventQ')
+class TestEventBatch(object):
+    def test_flush_should_post_all_events_at_once(self, eventq):
+        eventq.post_events.return_value = 2
+        batch = EventBatch()
+        batch.add(Mock())
+        batch.add(Mock())
+        assert batch.flush() == 2
+        assert eventq.post_events.call_count == 1
+        assert len(batch) == 0
+
+    def test_flush_should_post_remaining_events_after_failure(self, eventq):
+        eventq.post_events.side_effect = Exception("integrity error")
+        failing = Mock()
+        failing.post.side_effect = Exception("database is gone")
+        working = Mock()
+        batch = EventBatch()
+        batch.add(failing)
+        batch.add(working)
+        assert batch.flush() == 1
+        assert working.post.called
+        assert len(batch) == 0
+
+
+class TestSNMPTrapPostEvent(object):
+    def test_should_post_directly_when_not_batched(self):
+        event = Mock()
+        make_trap().post_event(event)
+        assert event.post.called
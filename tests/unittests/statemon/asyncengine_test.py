@@ -0,0 +1,239 @@
+import mock
+import pytest
+from twisted.internet import defer, task
+from twisted.internet.error import ConnectionDone
+from twisted.python.failure import Failure
+from twisted.test.proto_helpers import StringTransport
+
+from nav.statemon import asyncclient
+from nav.statemon.asyncengine import AsyncRunQueue
+from nav.statemon.event import Event
+
+
+class FakeReactor(task.Clock):
+    def callFromThread(self, func, *args, **kwargs):
+        func(*args, **kwargs)
+
+    def suggestThreadPoolSize(self, size):
+        pass
+
+    def run(self, installSignalHandlers=True):
+        pass
+
+
+class FakeChecker(object):
+    def __init__(self):
+        self.pending = defer.Deferred()
+        self.results = []
+
+    def execute_test_async(self):
+        return self.pending
+
+    def handle_result(self, status, info):
+        self.results.append((status, info))
+
+
+@pytest.fixture
+def runqueue():
+    with mock.patch('nav.statemon.asyncengine.config') as config:
+        config.serviceconf.return_value = {'max concurrent checks': '2'}
+        yield AsyncRunQueue(reactor=FakeReactor())
+
+
+class TestAsyncRunQueue(object):
+    def test_should_handle_result_of_checker(self, runqueue):
+        checker = FakeChecker()
+        runqueue.enq(checker)
+        assert runqueue.active_count == 1
+        checker.pending.callback((Event.UP, 'ok'))
+        assert checker.results == [(Event.UP, 'ok')]
+        assert runqueue.active_count == 0
+
+    def test_should_not_run_a_queued_checker_twice(self, runqueue):
+        checker = FakeChecker()
+        runqueue.run(checker)
+        runqueue.run(checker)
+        checker.pending.callback((Event.UP, 'ok'))
+        assert len(checker.results) == 1
+
+    def test_should_limit_concurrent_checks(self, runqueue):
+        checkers = [FakeChecker() for _ in range(3)]
+        for checker in checkers:
+            checker.execute_test_async = mock.Mock(
+                return_value=checker.pending)
+            runqueue.run(checker)
+        assert not checkers[2].execute_test_async.called
+        checkers[0].pending.callback((Event.UP, 'ok'))
+        assert checkers[2].execute_test_async.called
+
+    def test_should_run_scheduled_checker_when_due(self, runqueue):
+        checker = FakeChecker()
+        with mock.patch('time.time', return_value=0):
+            runqueue.enq((10, checker))
+        assert runqueue.active_count == 0
+        runqueue._reactor.advance(10)
+        assert runqueue.active_count == 1
+
+    def test_should_survive_failing_checker(self, runqueue):
+        checker = FakeChecker()
+        checker.handle_result = mock.Mock(side_effect=ValueError)
+        deferred = runqueue.run(checker)
+        checker.pending.callback((Event.UP, 'ok'))
+        assert deferred.called
+        assert runqueue.active_count == 0
+
+
+@pytest.fixture
+def make_checker():
+    with mock.patch('nav.statemon.abstractchecker.config'), \
+            mock.patch('nav.statemon.abstractchecker.db'), \
+            mock.patch('nav.statemon.abstractchecker.RunQueue'):
+        def _make_checker(cls, **args):
+            service = dict(id=1, ip='10.0.0.1', netboxid=1, args=args,
+                           version=None, sysname='example')
+            return cls(service)
+        yield _make_checker
+
+
+class TestExecuteTestAsync(object):
+    def test_should_time_native_check(self, make_checker):
+        from nav.statemon.checker.PortChecker import PortChecker
+        checker = make_checker(PortChecker)
+        checker.execute_async = lambda: defer.succeed((Event.UP, 'Alive'))
+        deferred = checker.execute_test_async()
+        assert deferred.result == (Event.UP, 'Alive')
+        assert checker.response_time is not None
+
+    def test_should_report_native_check_failure_as_down(self, make_checker):
+        from nav.statemon.checker.PortChecker import PortChecker
+        checker = make_checker(PortChecker)
+        checker.execute_async = lambda: defer.fail(ValueError('boom'))
+        deferred = checker.execute_test_async()
+        assert deferred.result == (Event.DOWN, 'boom')
+
+    @mock.patch('nav.statemon.abstractchecker.threads')
+    def test_should_run_blocking_check_in_a_thread(self, threads,
+                                                   make_checker):
+        from nav.statemon.checker.DummyChecker import DummyChecker
+        checker = make_checker(DummyChecker)
+        checker.execute_test_async()
+        threads.deferToThread.assert_called_once_with(checker.execute_test)
+
+
+def connected_client():
+    client = asyncclient.LineClient()
+    client.makeConnection(StringTransport())
+    return client
+
+
+class TestLineClient(object):
+    def test_should_return_lines_received_before_reading(self):
+        client = connected_client()
+        client.dataReceived(b'one\r\ntwo\n')
+        assert client.read_line().result == b'one'
+        assert client.read_line().result == b'two'
+
+    def test_should_fire_pending_read_when_line_arrives(self):
+        client = connected_client()
+        deferred = client.read_line()
+        assert not deferred.called
+        client.dataReceived(b'line\r\n')
+        assert deferred.result == b'line'
+
+    def test_should_fail_pending_read_when_connection_is_lost(self):
+        client = connected_client()
+        deferred = client.read_line()
+        client.connectionLost(Failure(ConnectionDone()))
+        assert isinstance(deferred.result.value, ConnectionDone)
+        deferred.addErrback(lambda failure: None)
+
+    def test_should_time_out_read(self):
+        clock = task.Clock()
+        client = connected_client()
+        deferred = client.read_line(timeout=5, clock=clock)
+        clock.advance(5)
+        assert deferred.result.check(defer.TimeoutError)
+        deferred.addErrback(lambda failure: None)
+        client.dataReceived(b'late\n')
+        assert client.read_line().result == b'late'
+
+    def test_should_cancel_timeout_when_line_arrives(self):
+        clock = task.Clock()
+        client = connected_client()
+        client.read_line(timeout=5, clock=clock)
+        client.dataReceived(b'line\n')
+        assert not clock.getDelayedCalls()
+
+
+class TestNativeCheckers(object):
+    def run_check(self, checker, response):
+        client = connected_client()
+        with mock.patch('nav.statemon.asyncclient.connect',
+                        return_value=defer.succeed(client)):
+            deferred = checker.execute_async()
+        client.dataReceived(response)
+        return deferred.result, client.transport.value()
+
+    def test_ssh_checker_should_reply_with_version(self, make_checker):
+        from nav.statemon.checker.SshChecker import SshChecker
+        checker = make_checker(SshChecker)
+        result, sent = self.run_check(checker, b'SSH-2.0-OpenSSH_7.4\r\n')
+        assert result == (Event.UP, 'SSH-2.0-OpenSSH_7.4')
+        assert sent == b'SSH-2.0-NAV_Servicemon\r\n'
+        assert checker.version == 'SSH-2.0-OpenSSH_7.4'
+
+    def test_smtp_checker_should_read_multiline_greeting(self, make_checker):
+        from nav.statemon.checker.SmtpChecker import SmtpChecker
+        checker = make_checker(SmtpChecker)
+        result, sent = self.run_check(
+            checker, b'220-mail.example.org ESMTP Postfix\r\n220 welcome\r\n')
+        assert result == (Event.UP, 'mail.example.org ESMTP Postfix\nwelcome')
+        assert sent == b'QUIT\r\n'
+        assert checker.version == 'ESMTP Postfix\nwelcome'
+
+    def test_smtp_checker_should_report_bad_greeting(self, make_checker):
+        from nav.statemon.checker.SmtpChecker import SmtpChecker
+        checker = make_checker(SmtpChecker)
+        result, _sent = self.run_check(checker, b'554 go away\r\n')
+        assert result == (Event.DOWN, 'go away')
+
+    def test_http_checker_should_report_server(self, make_checker):
+        from nav.statemon.checker.HttpChecker import HttpChecker
+        checker = make_checker(HttpChecker, url='http://www.example.org/x?y')
+        result, sent = self.run_check(
+            checker, b'HTTP/1.1 200 OK\r\nServer: nginx\r\n\r\n<html>')
+        assert result == (Event.UP, 'OK (200) nginx')
+        assert sent.startswith(b'GET /x?y HTTP/1.0\r\n'
+                               b'Host: www.example.org\r\n')
+        assert checker.version == 'nginx'
+
+    def test_http_checker_should_report_error_status(self, make_checker):
+        from nav.statemon.checker.HttpChecker import HttpChecker
+        checker = make_checker(HttpChecker)
+        result, _sent = self.run_check(checker, b'HTTP/1.1 500 Oops\r\n\r\n')
+        assert result == (Event.DOWN, 'ERROR (500) /')
+
+    def test_port_checker_should_accept_banner(self, make_checker):
+        from nav.statemon.checker.PortChecker import PortChecker
+        checker = make_checker(PortChecker)
+        result, _sent = self.run_check(checker, b'hello\r\n')
+        assert result == (Event.UP, 'Alive')
+
+    def test_dns_checker_should_report_timeout(self, make_checker):
+        from nav.statemon.checker.DnsChecker import DnsChecker
+        checker = make_checker(DnsChecker, request='www.example.org')
+        with mock.patch('nav.statemon.checker.DnsChecker.names_client') as c:
+            c.Resolver.return_value.query.return_value = defer.fail(
+                defer.TimeoutError())
+            deferred = checker.execute_async()
+        assert deferred.result == (
+            Event.DOWN, 'Timeout while requesting www.example.org')
+
+    def test_dns_checker_should_find_records(self, make_checker):
+        from nav.statemon.checker.DnsChecker import DnsChecker
+        checker = make_checker(DnsChecker, request='www.example.org')
+        with mock.patch('nav.statemon.checker.DnsChecker.names_client') as c:
+            c.Resolver.return_value.query.return_value = defer.succeed(
+                ([mock.Mock()], [], []))
+            deferred = checker.execute_async()
+        assert deferred.result == (Event.UP, 'Ok')
@@ -0,0 +1,45 @@
+from mock import Mock, patch
+import psycopg2
+
+from nav.statemon.db import _DB
+from nav.statemon.event import Event
+
+
+def make_event(netboxid, status=Event.DOWN):
+    return Event(None, netboxid, None, Event.boxState, "pping", status)
+
+
+class TestCommitEvents(object):
+    def test_should_commit_all_events_in_one_transaction(self):
+        db = _DB()
+        db.db = Mock()
+        cursor = Mock()
+        with patch.object(db, 'cursor', return_value=cursor), \
+                patch('nav.statemon.db.insert_events') as insert_events:
+            db.commit_events([make_event(1), make_event(2, Event.UP)])
+        queue_events = insert_events.call_args[0][1]
+        assert [e.state for e in queue_events] == ['s', 'e']
+        assert [e.value for e in queue_events] == [1, 100]
+        assert db.db.commit.call_count == 1
+
+    def test_should_throw_away_events_that_violate_integrity(self):
+        db = _DB()
+        bad = make_event(666)
+
+        def commit(events):
+            if bad in events:
+                raise psycopg2.IntegrityError()
+        with patch.object(db, '_commit_events', side_effect=commit) as mock:
+            db.commit_events([make_event(1), bad, make_event(2)])
+        # one failed batch, followed by three single events
+        assert mock.call_count == 4
+
+    def test_should_not_post_events_from_invalid_sources(self):
+        db = _DB()
+        db.db = Mock()
+        event = make_event(1)
+        event.source = 'somethingelse'
+        with patch.object(db, 'cursor', return_value=Mock()), \
+                patch('nav.statemon.db.insert_events') as insert_events:
+            db.commit_events([event])
+        assert insert_events.call_args[0][1] == []
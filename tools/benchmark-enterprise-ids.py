@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019 Uninett AS
+#
+# This file is part of Network Administration Visualized (NAV).
+#
+# NAV is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.  You should have received a copy of the GNU General Public License
+# along with NAV. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Benchmarks the import time and memory cost of nav.enterprise.ids, as paid by
+every NAV process that needs a vendor id constant.
+
+The lazily loaded nav.enterprise.ids module is compared to a module that
+defines every VENDOR_ID_* constant up front, like nav.enterprise.ids used
+to.  Each import is timed in a fresh Python process, with byte code already
+compiled.  Memory usage is read from /proc, so this only runs on Linux.
+"""
+from __future__ import print_function
+
+import os
+import py_compile
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+from argparse import ArgumentParser
+
+from nav.enterprise import ids
+
+# Measures the resident set size from /proc, as ru_maxrss may be inherited
+# from the parent process
+IMPORT_SCRIPT = """
+import time
+def rss():
+    with open('/proc/self/status') as status:
+        return int(status.read().split('VmRSS:')[1].split()[0])
+before = rss()
+start = time.time()
+from {module} import VENDOR_ID_CISCOSYSTEMS, VENDOR_ID_HEWLETT_PACKARD
+elapsed = time.time() - start
+print(elapsed, rss() - before)
+"""
+
+
+def main():
+    args = parse_args()
+    tmpdir = tempfile.mkdtemp()
+    try:
+        legacy = write_legacy_module(tmpdir)
+        py_compile.compile(legacy)
+        lazy = time_import('nav.enterprise.ids', args.repeat)
+        eager = time_import('legacy_ids', args.repeat, tmpdir)
+    finally:
+        shutil.rmtree(tmpdir)
+
+    for label, (elapsed, rss) in (("constants", eager), ("lazy", lazy)):
+        print("%-10s import %7.2f ms, RSS growth %6d KiB" % (
+            label + ':', elapsed * 1e3, rss))
+
+    table = ids.get_table()
+    lookups = 1000
+    by_name = best_of(lambda: table.get_number('CISCOSYSTEMS'), lookups,
+                      args.repeat)
+    by_number = best_of(lambda: table.get_name(9), lookups, args.repeat)
+    print("lookup by name:   %6.2f us" % (by_name / lookups * 1e6))
+    print("lookup by number: %6.2f us" % (by_number / lookups * 1e6))
+
+
+def write_legacy_module(directory):
+    """Writes a module that defines all vendor id constants, and returns its
+    file name.
+    """
+    filename = os.path.join(directory, 'legacy_ids.py')
+    with open(filename, 'w') as module:
+        for constant, number in ids.iter_constants():
+            module.write("%s = %d\n" % (constant, number))
+    return filename
+
+
+def time_import(module, repeat, path=None):
+    """Returns the best (import time, RSS growth) of repeat imports of module
+    in fresh processes.
+    """
+    env = dict(os.environ)
+    if path:
+        env['PYTHONPATH'] = os.pathsep.join(
+            [path] + env.get('PYTHONPATH', '').split(os.pathsep))
+    results = []
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, '-c', IMPORT_SCRIPT.format(module=module)],
+            env=env)
+        elapsed, rss = output.split()
+        results.append((float(elapsed), int(rss)))
+    return min(results)
+
+
+def best_of(func, number, repeat):
+    return min(timeit.repeat(func, number=number, repeat=repeat))
+
+
+def parse_args():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="number of times to time each operation")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()
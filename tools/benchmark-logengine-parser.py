@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019 Uninett AS
+#
+# This file is part of Network Administration Visualized (NAV).
+#
+# NAV is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.  You should have received a copy of the GNU General Public License
+# along with NAV. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Benchmarks the throughput of logengine's syslog parser against the previous,
+two-regex parser, which is kept here as a reference implementation.
+
+Unless a recorded log file is given, the input is a generated stream of Cisco
+syslog traffic from a few hundred devices, mixed with the odd line formats
+recorded in logengine-sample.log. Every timed cycle parses the same lines.
+
+The reference parser, parsing into Message objects, parsing into compact
+tuples, and the complete conversion of lines into log_message rows (with warm
+category, origin, type and priority exception lookups) are timed separately.
+"""
+from __future__ import print_function
+
+import datetime
+import io
+import os
+import random
+import re
+import timeit
+from argparse import ArgumentParser
+
+from nav import logengine
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      'logengine-sample.log')
+
+#
+# The parser of logengine before it was changed to a single pass
+#
+
+_typical_match_re = re.compile(
+    r"""
+    ^
+    (?P<servmonth>\w+) \s+ (?P<servday>\d+) \s+      # server month and date
+    (?P<servhour>\d+) \: (?P<servmin>\d+) : \d+ \W+  # server hour/min/second
+    (?P<origin>\S+)                                  # origin
+    \W+ (?:(\d{4}) | .*?) \s+ \W*                    # year/msg counter/garbage
+    (?P<month>\w+) \s+ (?P<day>\d+) \s+              # origin month and date
+    ((?P<year>\d{4}) \s+ )?                          # origin year, if present
+    (?P<hour>\d+) : (?P<min>\d+) : (?P<second>\d+)   # origin hour/min/second
+    .* %                                             # eat chars until %
+    (?P<type>[^:]+) :                                # message type
+    \s* (?P<description>.*)                          # message (lstripped)
+    $
+    """, re.VERBOSE)
+
+# Matches log lines where there is no timestamp from the origin
+_not_so_typical_match_re = re.compile(
+    r"""
+    ^
+    (?P<month>\w+) \s+ (?P<day>\d+) \s+              # server month and date
+    ((?P<year>\d{4}) \s+ )?                          # server year, if present
+    (?P<hour>\d+) : (?P<min>\d+) : (?P<second>\d+)   # server time
+    \s*
+    (?P<origin>\S+)                                  # origin
+    .* %                                             # eat chars until %
+    (?P<type>[a-zA-Z0-9\-_]+) :                      # message type
+    \s* (?P<description>.*)                          # message (lstripped)
+    $
+    """, re.VERBOSE)
+
+
+def reference_create_message(line):
+    """Parses a line into a Message object the way logengine used to"""
+    typicalmatch = _typical_match_re.search(line)
+    match = typicalmatch or _not_so_typical_match_re.search(line)
+
+    if match:
+        origin = match.group('origin')
+        month = logengine.find_month(match.group('month'))
+        if 'year' in match.groupdict() and match.group('year'):
+            year = int(match.group('year'))
+        else:
+            year = logengine.find_year(month)
+        day = int(match.group('day'))
+        hour = int(match.group('hour'))
+        minute = int(match.group('min'))
+        second = int(match.group('second'))
+        msgtype = match.group('type')
+        description = match.group('description')
+
+        try:
+            timestamp = datetime.datetime(year, month, day, hour, minute,
+                                          second)
+            return logengine.Message(timestamp, origin, msgtype, description)
+        except (ValueError, TypeError):
+            pass
+
+
+#
+# Generated syslog traffic
+#
+
+# (weight, message type, description) of common Cisco messages
+MESSAGES = [
+    (30, 'SEC-6-IPACCESSLOGP',
+     'list {acl} denied {proto} {ip}({port}) ({ifname} {mac}) -> '
+     '{ip2}({port2}), 1 packet'),
+    (15, 'LINEPROTO-5-UPDOWN',
+     'Line protocol on Interface {ifname}, changed state to {state}'),
+    (15, 'LINK-3-UPDOWN', 'Interface {ifname}, changed state to {state}'),
+    (8, 'DOT1X-5-FAIL',
+     'Authentication failed for client ({mac}) on Interface {shortif} '
+     'AuditSessionID {session}'),
+    (6, 'SW_MATM-4-MACFLAP_NOTIF',
+     'Host {mac} in vlan {vlan} is flapping between port {shortif} and '
+     'port {shortif2}'),
+    (5, 'SPANTREE-5-TOPOTRAP', 'Topology Change Trap for vlan {vlan}'),
+    (4, 'SYS-5-CONFIG_I',
+     'Configured from console by {user} on vty0 ({ip})'),
+    (4, 'ILPOWER-5-POWER_GRANTED', 'Interface {shortif}: Power granted'),
+    (3, 'EC-5-COMPATIBLE',
+     '{shortif} is compatible with port-channel members'),
+    (3, 'OSPF-5-ADJCHG',
+     'Process 1, Nbr {ip} on {ifname} from LOADING to FULL, Loading Done'),
+    (2, 'CDP-4-DUPLEX_MISMATCH',
+     'duplex mismatch discovered on {ifname} (not full duplex), with '
+     '{peer} {ifname2} (full duplex).'),
+    (2, 'HA_EM-6-LOG', 'on_high_cpu: CPU utilization is over 80%:'),
+    (1, 'SNMP-3-AUTHFAIL',
+     'Authentication failure for SNMP req from host {ip}'),
+]
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep',
+          'Oct', 'Nov', 'Dec']
+
+
+class TrafficGenerator(object):
+    """Generates syslog lines as received from a network of Cisco devices"""
+    def __init__(self, odd_lines, devices=400, odd_ratio=0.02, seed=42):
+        self.random = random.Random(seed)
+        self.odd_lines = odd_lines
+        self.odd_ratio = odd_ratio if odd_lines else 0
+        self.devices = [self._make_device(number)
+                        for number in range(devices)]
+        self.weights = [weight for weight, _type, _template in MESSAGES]
+        self.time = datetime.datetime(2019, 10, 28, 13, 15)
+
+    def _make_device(self, number):
+        kind = self.random.choice(['sw', 'sw', 'sw', 'gsw', 'gw', 'fw'])
+        if self.random.random() < 0.5:
+            origin = '%s-%d.example.org' % (kind, number)
+        else:
+            origin = '10.0.%d.%d' % (number // 200, number % 200 + 2)
+        return [origin, self.random.randint(1, 10 ** 6)]
+
+    def lines(self, count):
+        """Returns a list of count generated lines"""
+        return [self.line() for _ in range(count)]
+
+    def line(self):
+        """Returns a generated line"""
+        rand = self.random
+        self.time += datetime.timedelta(seconds=rand.expovariate(20))
+        if rand.random() < self.odd_ratio:
+            return rand.choice(self.odd_lines)
+
+        device = rand.choice(self.devices)
+        device[1] += 1
+        msgtype, template = self._choose_message()
+        description = template.format(
+            acl='acl-%d' % rand.randint(1, 20),
+            proto=rand.choice(['tcp', 'udp']),
+            ip=self._ip(), ip2=self._ip(),
+            port=rand.randint(1024, 65535), port2=rand.randint(1, 1024),
+            ifname=self._ifname(), ifname2=self._ifname(),
+            shortif=self._ifname(short=True),
+            shortif2=self._ifname(short=True),
+            state=rand.choice(['up', 'down']),
+            mac='%04x.%04x.%04x' % tuple(rand.randint(0, 0xffff)
+                                         for _ in range(3)),
+            session='%024X' % rand.getrandbits(96),
+            vlan=rand.randint(1, 4094),
+            user=rand.choice(['admin', 'netops', 'backup']),
+            peer=rand.choice(self.devices)[0])
+
+        server_time = self.time
+        origin_time = server_time - datetime.timedelta(
+            milliseconds=rand.randint(0, 1500))
+        origin_stamp = '%s %2d %s.%03d CEST' % (
+            MONTHS[origin_time.month - 1], origin_time.day,
+            origin_time.strftime('%H:%M:%S'),
+            origin_time.microsecond // 1000)
+        if rand.random() < 0.05:
+            origin_stamp = '*' + origin_stamp
+        return '%s %2d %s %s %d: %s: %%%s: %s' % (
+            MONTHS[server_time.month - 1], server_time.day,
+            server_time.strftime('%H:%M:%S'), device[0], device[1],
+            origin_stamp, msgtype, description)
+
+    def _choose_message(self):
+        point = self.random.uniform(0, sum(self.weights))
+        for weight, msgtype, template in MESSAGES:
+            point -= weight
+            if point <= 0:
+                return msgtype, template
+        return MESSAGES[-1][1:]
+
+    def _ip(self):
+        return '.'.join(str(self.random.randint(1, 254)) for _ in range(4))
+
+    def _ifname(self, short=False):
+        prefix = self.random.choice(
+            [('Gi', 'GigabitEthernet'), ('Te', 'TenGigabitEthernet'),
+             ('Fa', 'FastEthernet')])[0 if short else 1]
+        return '%s%d/0/%d' % (prefix, self.random.randint(1, 4),
+                              self.random.randint(1, 48))
+
+
+class FakeCursor(object):
+    """Accepts inserts of new categories, origins and types"""
+    def __init__(self):
+        self.nextid = 0
+
+    def execute(self, *args):
+        pass
+
+    def fetchone(self):
+        self.nextid += 1
+        return [self.nextid]
+
+
+def main():
+    args = parse_args()
+    sample = read_sample(args.sample, args.charset)
+    if args.logfile:
+        recorded = read_sample(args.logfile, args.charset)
+        lines = (recorded * (args.lines // len(recorded) + 1))[:args.lines]
+        source = "%d recorded lines in %s" % (len(recorded), args.logfile)
+    else:
+        lines = TrafficGenerator(sample).lines(args.lines)
+        source = "generated traffic mixed with the %d lines of %s" % (
+            len(sample), args.sample)
+
+    cursor = FakeCursor()
+    categories, origins, types = {}, {}, {}
+    exceptions = logengine.PriorityExceptions(
+        {'10.0.1.15': '7'}, {'link-3-updown': '4'},
+        {'lineproto-5-updown': {'10.0.42.103': '6'}})
+
+    def reference_cycle():
+        for line in lines:
+            reference_create_message(line)
+
+    def objects_cycle():
+        for line in lines:
+            logengine.create_message(line)
+
+    def tuples_cycle():
+        for _message in logengine.parse_messages(lines):
+            pass
+
+    def rows_cycle():
+        messages = logengine.parse_messages(lines)
+        for _row in logengine.make_message_rows(
+                messages, cursor, categories, origins, types, exceptions):
+            pass
+
+    print("%d lines per cycle, from %s" % (len(lines), source))
+    compare_parsers(lines)
+    rows_cycle()  # warm up the lookup dictionaries
+
+    timings = {}
+    for label, cycle in (("reference", reference_cycle),
+                         ("objects", objects_cycle),
+                         ("tuples", tuples_cycle),
+                         ("rows", rows_cycle)):
+        timings[label] = timing = best_of(cycle, args.repeat)
+        print("%-10s %.3f s/cycle (%.2f us/line, %d lines/s)" % (
+            label + ':', timing, timing / len(lines) * 1e6,
+            len(lines) / timing))
+    print("tuples are parsed %.2f times as fast as by the reference parser"
+          % (timings["reference"] / timings["tuples"]))
+
+
+def compare_parsers(lines):
+    """Verifies that the current parser agrees with the reference parser on
+    every line.
+
+    """
+    now = datetime.datetime.now()
+    parsed = differences = 0
+    for line in lines:
+        reference = reference_create_message(line)
+        if reference:
+            reference = (reference.time, reference.origin, reference.type,
+                         reference.description)
+            parsed += 1
+        message = logengine.parse_message(line, now)
+        if message:
+            message = (message.time, message.origin, message.type,
+                       message.description)
+        if message != reference:
+            differences += 1
+    print("%d lines parseable, parsers disagree on %d lines" % (
+        parsed, differences))
+
+
+def read_sample(filename, charset):
+    with io.open(filename, encoding=charset) as logfile:
+        return [line.rstrip(u'\n') for line in logfile if line.strip()]
+
+
+def best_of(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def parse_args():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("logfile", nargs="?",
+                        help="a recorded log file to use as input, instead "
+                             "of generated traffic")
+    parser.add_argument("--sample", default=SAMPLE,
+                        help="recorded odd lines to mix into generated "
+                             "traffic")
+    parser.add_argument("--charset", default="iso-8859-1",
+                        help="the character set of the log files")
+    parser.add_argument("--lines", type=int, default=200000,
+                        help="number of lines per cycle")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="number of cycles to time")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()
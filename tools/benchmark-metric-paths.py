@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2019 Uninett AS
+#
+# This file is part of Network Administration Visualized (NAV).
+#
+# NAV is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.  You should have received a copy of the GNU General Public License
+# along with NAV. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Micro-benchmarks the construction of interface metric paths, as done by the
+statports plugin of ipdevpoll on every collection run.
+
+The memoized metric path templates are compared to building every path from
+scratch, by escaping every name component on every call.
+"""
+from __future__ import print_function
+
+import timeit
+from argparse import ArgumentParser
+
+from nav.metrics.names import escape_metric_name
+from nav.metrics.templates import (metric_path_for_interface,
+                                   clear_metric_prefix_caches)
+
+COUNTERS = (
+    'ifInOctets', 'ifOutOctets', 'ifInErrors', 'ifOutErrors',
+    'ifInUcastPkts', 'ifOutUcastPkts', 'ifInNUcastPkts', 'ifOutNUcastPkts',
+    'ifInDiscards', 'ifOutDiscards', 'ifHCInOctets', 'ifHCOutOctets',
+)
+
+
+def uncached_path_for_interface(sysname, ifname, counter):
+    """Builds an interface metric path without any memoization"""
+    return "nav.devices.{sysname}.ports.{ifname}.{counter}".format(
+        sysname=escape_metric_name(sysname),
+        ifname=escape_metric_name(ifname),
+        counter=escape_metric_name(counter))
+
+
+def main():
+    args = parse_args()
+    names = [("sw%d.example.org" % box, "GigabitEthernet1/0/%d" % port)
+             for box in range(args.netboxes)
+             for port in range(args.interfaces)]
+
+    def make_cycle(path_func):
+        def _cycle():
+            for sysname, ifname in names:
+                for counter in COUNTERS:
+                    path_func(sysname, ifname, counter)
+        return _cycle
+
+    uncached_cycle = make_cycle(uncached_path_for_interface)
+    cached_cycle = make_cycle(metric_path_for_interface)
+
+    def cold_cycle():
+        clear_metric_prefix_caches()
+        cached_cycle()
+
+    uncached = best_of(uncached_cycle, args.repeat)
+    cold = best_of(cold_cycle, args.repeat)
+    cached_cycle()
+    warm = best_of(cached_cycle, args.repeat)
+
+    paths = len(names) * len(COUNTERS)
+    print("%d netboxes x %d interfaces x %d counters = %d paths per cycle" % (
+        args.netboxes, args.interfaces, len(COUNTERS), paths))
+    for label, timing in (("uncached", uncached),
+                          ("cold cache", cold),
+                          ("warm cache", warm)):
+        print("%-11s %.3f s/cycle (%.2f us/path)" % (
+            label + ':', timing, timing / paths * 1e6))
+    print("saved:      %.3f s/cycle (%.0f%%)" % (
+        uncached - warm, (uncached - warm) / uncached * 100))
+
+
+def best_of(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def parse_args():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--netboxes", type=int, default=100,
+                        help="number of netboxes per cycle")
+    parser.add_argument("--interfaces", type=int, default=48,
+                        help="number of interfaces per netbox")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="number of cycles to time")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()
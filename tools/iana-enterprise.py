@@ -16,7 +16,7 @@
 #
 """
 Retrieves IANAs current list of assigned enterprise numbers, and outputs
-the data NAV wants, as Python code.
+the data NAV wants, in the format of python/nav/enterprise/ids.txt.
 """
 from __future__ import print_function
 import sys
@@ -32,8 +32,7 @@ from nav.enterprise import ids
 IANA_URL = "http://www.iana.org/assignments/enterprise-numbers"
 Enterprise = namedtuple('Enterprise', 'decimal organization contact email')
 
-VENDOR_MAP = {value: constant for constant, value in vars(ids).items()
-              if constant.startswith('VENDOR_ID_')}
+VENDOR_MAP = {value: constant for constant, value in ids.iter_constants()}
 _used_names = Counter(VENDOR_MAP)
 
 REPLACE_PATTERN = re.compile(r'[/_-]', re.UNICODE)
@@ -48,7 +47,10 @@ def main():
     print("# As published at {}".format(IANA_URL))
     print("# Generated by {} on {}".format(os.path.basename(sys.argv[0]),
                                            datetime.now()))
-    print("# pylint: skip-file")
+    print("#")
+    print("# Each line holds the name of a NAV vendor id constant, without "
+          "its VENDOR_ID_")
+    print("# prefix, and its enterprise number.  Lines are sorted by name.")
     print("#")
 
     entmap = {}
@@ -56,7 +58,11 @@ def main():
         var = get_vendor_variable(ent)
         if var:
             entmap[ent] = var
-            print("{} = {}".format(var, ent.decimal))
+
+    lines = sorted((var[len(ids.PREFIX):], ent.decimal)
+                   for ent, var in entmap.items())
+    for name, decimal in lines:
+        print("{} {}".format(name, decimal))
 
     # Is this map really necessary? It's huge!
     # print("\n# Name map\n")